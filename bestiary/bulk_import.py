@@ -0,0 +1,469 @@
+"""
+Bulk monster import engine
+
+Imports a whole Open5e-format monster payload in three stages:
+
+1. Parse: every monster is parsed into plain dicts up front (stats, attacks,
+   abilities, resistances, languages, condition immunities and spells), with
+   no database access.
+2. Resolve: DamageType, Language and Condition rows are loaded into one
+   lookup map each; missing damage types and languages are created in bulk.
+3. Write: Enemy, EnemyStats, EnemyAttack, EnemyAbility, EnemyResistance,
+   EnemyLanguage, EnemyConditionImmunity, EnemySpell and EnemySpellSlot rows
+   are written with bulk_create/bulk_update in batches, in one transaction.
+
+Monsters are keyed by name. Existing monsters are skipped, or replaced in
+place when update_existing is set (the Enemy row and its stats are updated,
+child rows are rebuilt). bulk_create sends no save signals, so the
+'enemies' catalogue version is bumped after an import that wrote rows, which
+retires the cached encounter sampling index (core.sampling).
+
+Usage:
+    from bestiary.bulk_import import MonsterBulkImporter
+
+    result = MonsterBulkImporter(update_existing=True).run(monsters)
+"""
+import re
+import time
+
+from django.db import transaction
+
+from core.cache_utils import bump_catalogue_version
+from bestiary.models import (
+    Enemy, EnemyStats, EnemyAttack, EnemyAbility, EnemySpell, EnemySpellSlot,
+    DamageType, EnemyResistance, Language, EnemyLanguage, Condition,
+    EnemyConditionImmunity
+)
+
+
+DEFAULT_BATCH_SIZE = 500
+
+ATTACK_BONUS_RE = re.compile(r'\+(\d+) to hit')
+ATTACK_DAMAGE_RE = re.compile(r'(\d+d\d+(?:\+\d+)?)\s+(\w+)')
+SAVE_DC_RE = re.compile(r'spell save DC (\d+)')
+AT_WILL_RES = [
+    re.compile(r'at will:([^\n]+)', re.IGNORECASE),
+    re.compile(r'Cantrips \(at will\):([^\n]+)', re.IGNORECASE),
+]
+PER_DAY_RE = re.compile(r'(\d+)/day(?:\s+each)?:([^\n]+)')
+SLOTTED_RE = re.compile(r'(\d+)(?:st|nd|rd|th) level \((\d+) slots?\):([^\n]+)')
+PARENTHETICAL_RE = re.compile(r'\(.*?\)')
+
+RESISTANCE_FIELDS = [
+    ('damage_resistances', 'resistance'),
+    ('damage_immunities', 'immunity'),
+    ('damage_vulnerabilities', 'vulnerability'),
+]
+
+# EnemyStats fields filled from the payload (None values are left untouched)
+STATS_FIELDS = [
+    'strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma',
+    'hit_points', 'armor_class', 'speed',
+    'str_save', 'dex_save', 'con_save', 'int_save', 'wis_save', 'cha_save',
+    'perception', 'stealth', 'athletics', 'acrobatics',
+    'darkvision', 'passive_perception',
+]
+
+
+# ==================== PARSING ====================
+
+def parse_spell_names(spell_text):
+    """Extract title-cased spell names from comma-separated text"""
+    cleaned = spell_text.replace('*', '')
+    cleaned = re.sub(r'\([^)]+\)', '', cleaned)
+    cleaned = cleaned.replace(' and ', ', ')
+    return [s.strip().title() for s in cleaned.split(',') if len(s.strip()) > 1]
+
+
+def parse_spellcasting(desc):
+    """
+    Parse a spellcasting ability description.
+
+    Returns:
+        List of (name, save_dc, slot_level, uses) tuples. slot_level and uses
+        are None for at-will spells; X/day spells use slot level 0.
+    """
+    save_dc_match = SAVE_DC_RE.search(desc)
+    save_dc = int(save_dc_match.group(1)) if save_dc_match else None
+
+    spells = []
+    for pattern in AT_WILL_RES:
+        match = pattern.search(desc)
+        if match:
+            spells.extend((name, save_dc, None, None) for name in parse_spell_names(match.group(1)))
+
+    for match in PER_DAY_RE.finditer(desc):
+        uses = int(match.group(1))
+        spells.extend((name, save_dc, 0, uses) for name in parse_spell_names(match.group(2)))
+
+    for match in SLOTTED_RE.finditer(desc):
+        level, slots = int(match.group(1)), int(match.group(2))
+        spells.extend((name, save_dc, level, slots) for name in parse_spell_names(match.group(3)))
+
+    return spells
+
+
+def parse_languages(languages_str):
+    """Clean language names out of an Open5e languages string"""
+    if not languages_str or languages_str in ('—', '-'):
+        return []
+
+    names = []
+    for lang_name in languages_str.split(','):
+        clean_name = PARENTHETICAL_RE.sub('', lang_name.strip()).strip()
+        clean_name = clean_name.split('but')[0].strip()
+        clean_name = clean_name.split('understands')[0].strip()
+        if clean_name and clean_name != '—' and clean_name not in names:
+            names.append(clean_name)
+    return names
+
+
+def parse_monster(data):
+    """
+    Parse one Open5e monster into plain dicts, without touching the database.
+
+    Args:
+        data: Monster dict in Open5e format
+
+    Returns:
+        dict with keys name, enemy, stats, attacks, abilities, resistances,
+        languages, condition_immunities and spells
+    """
+    name = data.get('name', 'Unknown Monster')
+    senses = data.get('senses') if isinstance(data.get('senses'), dict) else None
+    speed = data.get('speed', '30 ft.')
+    if isinstance(speed, dict):
+        speed = speed.get('walk', '30 ft.')
+
+    stats = {
+        'strength': data.get('strength', 10),
+        'dexterity': data.get('dexterity', 10),
+        'constitution': data.get('constitution', 10),
+        'intelligence': data.get('intelligence', 10),
+        'wisdom': data.get('wisdom', 10),
+        'charisma': data.get('charisma', 10),
+        'hit_points': data.get('hit_points', 1),
+        'armor_class': data.get('armor_class', 10),
+        'speed': speed,
+        'str_save': data.get('strength_save'),
+        'dex_save': data.get('dexterity_save'),
+        'con_save': data.get('constitution_save'),
+        'int_save': data.get('intelligence_save'),
+        'wis_save': data.get('wisdom_save'),
+        'cha_save': data.get('charisma_save'),
+        'perception': data.get('perception'),
+        'stealth': data.get('stealth'),
+        'athletics': data.get('athletics'),
+        'acrobatics': data.get('acrobatics'),
+        'darkvision': senses.get('darkvision') if senses else None,
+        'passive_perception': senses.get('passive_perception', 10) if senses else 10,
+    }
+
+    attacks = []
+    for action in data.get('actions') or []:
+        desc = action.get('desc', '')
+        bonus_match = ATTACK_BONUS_RE.search(desc)
+        damage_match = ATTACK_DAMAGE_RE.search(desc)
+        damage = damage_match.group(1) if damage_match else '1d4'
+        damage_type = damage_match.group(2) if damage_match else 'bludgeoning'
+        attacks.append({
+            'name': action.get('name', 'Attack'),
+            'bonus': int(bonus_match.group(1)) if bonus_match else 0,
+            'damage': f'{damage} {damage_type}',
+        })
+
+    special_abilities = data.get('special_abilities') or []
+    abilities = [
+        {'name': ability.get('name', 'Ability'), 'description': ability.get('desc', '')}
+        for ability in special_abilities
+    ]
+    abilities.extend(
+        {'name': f'[Legendary] {action.get("name", "Action")}', 'description': action.get('desc', '')}
+        for action in data.get('legendary_actions') or []
+    )
+
+    resistances = []
+    for field, resistance_type in RESISTANCE_FIELDS:
+        damage_types_str = data.get(field) or ''
+        for damage_type_name in damage_types_str.replace(';', ',').split(','):
+            damage_type_name = damage_type_name.strip().title()
+            if damage_type_name and (damage_type_name, resistance_type) not in resistances:
+                resistances.append((damage_type_name, resistance_type))
+
+    condition_immunities = [
+        condition.strip().lower()
+        for condition in (data.get('condition_immunities') or '').replace(';', ',').split(',')
+        if condition.strip()
+    ]
+
+    spells = []
+    for ability in special_abilities:
+        if 'spellcasting' in ability.get('name', '').lower():
+            spells.extend(parse_spellcasting(ability.get('desc', '')))
+
+    return {
+        'name': name,
+        'enemy': {
+            'name': name,
+            'hp': data.get('hit_points', 1),
+            'ac': data.get('armor_class', 10),
+            'challenge_rating': str(data.get('challenge_rating', '0')),
+        },
+        'stats': stats,
+        'attacks': attacks,
+        'abilities': abilities,
+        'resistances': resistances,
+        'languages': parse_languages(data.get('languages', '')),
+        'condition_immunities': condition_immunities,
+        'spells': spells,
+    }
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ==================== IMPORT ENGINE ====================
+
+class MonsterBulkImporter:
+    """
+    Staged bulk importer for Open5e monster payloads.
+
+    Attributes:
+        timings: Seconds spent in each stage of the last run
+        errors: (monster name, message) pairs for monsters that failed to parse
+    """
+
+    def __init__(self, update_existing=False, batch_size=DEFAULT_BATCH_SIZE):
+        self.update_existing = update_existing
+        self.batch_size = batch_size
+        self.timings = {}
+        self.errors = []
+        self.received = 0
+
+    def run(self, monsters):
+        """
+        Import Open5e monster dicts from a list or any iterable.
+
+        A generator (e.g. pages streamed by core.importer_fetch) is consumed
+        as it arrives, so parsing overlaps with fetching the later pages.
+
+        Returns:
+            dict with imported, updated, skipped and errors counts, plus the
+            names of imported and updated monsters
+        """
+        self.timings = {}
+        self.errors = []
+        self.received = 0
+
+        start = time.perf_counter()
+        parsed = self.parse(monsters)
+        self.timings['parse'] = time.perf_counter() - start
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            existing = self._load_existing([monster['name'] for monster in parsed])
+            to_create = [monster for monster in parsed if monster['name'] not in existing]
+            to_update = [monster for monster in parsed if monster['name'] in existing] if self.update_existing else []
+            skipped = len(parsed) - len(to_create) - len(to_update)
+
+            damage_types = self._resolve_damage_types(parsed)
+            languages = self._resolve_languages(parsed)
+            conditions = {condition.name: condition for condition in Condition.objects.all()}
+            self.timings['resolve'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            enemies = self._write_enemies(to_create, to_update, existing)
+            self._write_stats(to_create, to_update, enemies)
+            self._clear_children([enemies[monster['name']] for monster in to_update])
+            self._write_children(to_create + to_update, enemies, damage_types, languages, conditions)
+            self.timings['write'] = time.perf_counter() - start
+
+        if to_create or to_update:
+            bump_catalogue_version('enemies')
+
+        return {
+            'imported': len(to_create),
+            'updated': len(to_update),
+            'skipped': skipped + (self.received - len(parsed) - len(self.errors)),
+            'errors': len(self.errors),
+            'imported_names': [monster['name'] for monster in to_create],
+            'updated_names': [monster['name'] for monster in to_update],
+        }
+
+    def parse(self, monsters):
+        """Parse every monster; duplicate names keep the first occurrence"""
+        parsed = []
+        seen = set()
+        for data in monsters:
+            self.received += 1
+            try:
+                monster = parse_monster(data)
+            except Exception as e:
+                self.errors.append((data.get('name', 'Unknown') if isinstance(data, dict) else 'Unknown', str(e)))
+                continue
+            if monster['name'] in seen:
+                continue
+            seen.add(monster['name'])
+            parsed.append(monster)
+        return parsed
+
+    # ---------- resolve ----------
+
+    def _load_existing(self, names):
+        """Map name -> existing Enemy (lowest id wins for duplicate names)"""
+        existing = {}
+        for chunk in _chunks(names, self.batch_size):
+            for enemy in Enemy.objects.filter(name__in=chunk).order_by('-id'):
+                existing[enemy.name] = enemy
+        return existing
+
+    def _resolve_named(self, model, wanted):
+        """
+        Load a name -> row map for a model with a unique name field,
+        bulk-creating any wanted names that are missing.
+
+        Matching is case-insensitive, like the per-row name__iexact lookups
+        this replaces. Names too long for the name column (usually prose
+        that slipped through parsing) are not created.
+        """
+        max_length = model._meta.get_field('name').max_length
+        rows = {row.name.lower(): row for row in model.objects.all()}
+        missing = {}
+        for name in wanted:
+            if name.lower() not in rows and len(name) <= max_length:
+                missing.setdefault(name.lower(), name.title())
+        if missing:
+            model.objects.bulk_create(
+                [model(name=name) for name in missing.values()],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+            for row in model.objects.filter(name__in=list(missing.values())):
+                rows[row.name.lower()] = row
+        return rows
+
+    def _resolve_damage_types(self, parsed):
+        wanted = [name for monster in parsed for name, _ in monster['resistances']]
+        return self._resolve_named(DamageType, wanted)
+
+    def _resolve_languages(self, parsed):
+        wanted = [name for monster in parsed for name in monster['languages']]
+        return self._resolve_named(Language, wanted)
+
+    # ---------- write ----------
+
+    def _write_enemies(self, to_create, to_update, existing):
+        """Create new Enemy rows and update existing ones; return name -> Enemy"""
+        new_enemies = [Enemy(**monster['enemy']) for monster in to_create]
+        Enemy.objects.bulk_create(new_enemies, batch_size=self.batch_size)
+
+        updated = []
+        for monster in to_update:
+            enemy = existing[monster['name']]
+            for key, value in monster['enemy'].items():
+                setattr(enemy, key, value)
+            updated.append(enemy)
+        # INSERT ... ON CONFLICT (id) DO UPDATE is far cheaper to compile and
+        # run than bulk_update's per-row CASE expressions
+        Enemy.objects.bulk_create(
+            updated,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=['hp', 'ac', 'challenge_rating'],
+        )
+
+        enemies = {enemy.name: enemy for enemy in updated}
+        enemies.update((enemy.name, enemy) for enemy in new_enemies)
+        return enemies
+
+    def _write_stats(self, to_create, to_update, enemies):
+        """Create stats for new enemies; update (or create) stats for updated ones"""
+        existing_stats = {}
+        update_ids = [enemies[monster['name']].id for monster in to_update]
+        for chunk in _chunks(update_ids, self.batch_size):
+            for stats in EnemyStats.objects.filter(enemy_id__in=chunk):
+                existing_stats[stats.enemy_id] = stats
+
+        all_stats = []
+        for monster in to_create + to_update:
+            enemy = enemies[monster['name']]
+            values = {key: value for key, value in monster['stats'].items() if value is not None}
+            stats = existing_stats.get(enemy.id)
+            if stats is None:
+                stats = EnemyStats(enemy=enemy, **values)
+            else:
+                for key, value in values.items():
+                    setattr(stats, key, value)
+            all_stats.append(stats)
+
+        # Upsert on the one-to-one enemy column; existing rows keep any
+        # fields the payload left empty because they were loaded first
+        EnemyStats.objects.bulk_create(
+            all_stats,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=['enemy'],
+            update_fields=STATS_FIELDS,
+        )
+
+    def _clear_children(self, enemies):
+        """Delete rebuilt child rows of updated enemies"""
+        enemy_ids = [enemy.id for enemy in enemies]
+        for chunk in _chunks(enemy_ids, self.batch_size):
+            for model in (EnemyAttack, EnemyAbility, EnemyResistance, EnemyLanguage,
+                          EnemyConditionImmunity, EnemySpell):
+                model.objects.filter(enemy_id__in=chunk).delete()
+
+    def _write_children(self, monsters, enemies, damage_types, languages, conditions):
+        """Bulk-create every child row for the given parsed monsters"""
+        attacks, abilities, resistances = [], [], []
+        enemy_languages, immunities, spells, spell_slots = [], [], [], []
+
+        for monster in monsters:
+            enemy = enemies[monster['name']]
+            attacks.extend(EnemyAttack(enemy=enemy, **attack) for attack in monster['attacks'])
+            abilities.extend(EnemyAbility(enemy=enemy, **ability) for ability in monster['abilities'])
+            resistances.extend(
+                EnemyResistance(
+                    enemy=enemy,
+                    damage_type=damage_types[name.lower()],
+                    resistance_type=resistance_type
+                )
+                for name, resistance_type in monster['resistances']
+                if name.lower() in damage_types
+            )
+
+            language_ids = set()
+            for name in monster['languages']:
+                language = languages.get(name.lower())
+                if language and language.id not in language_ids:
+                    language_ids.add(language.id)
+                    enemy_languages.append(EnemyLanguage(enemy=enemy, language=language))
+
+            condition_ids = set()
+            for name in monster['condition_immunities']:
+                condition = conditions.get(name)
+                if condition and condition.id not in condition_ids:
+                    condition_ids.add(condition.id)
+                    immunities.append(EnemyConditionImmunity(enemy=enemy, condition=condition))
+
+            for name, save_dc, slot_level, uses in monster['spells']:
+                spell = EnemySpell(enemy=enemy, name=name, save_dc=save_dc)
+                spells.append(spell)
+                if slot_level is not None:
+                    # No EnemySpellSlot = unlimited (at-will) uses
+                    spell_slots.append((spell, slot_level, uses))
+
+        EnemyAttack.objects.bulk_create(attacks, batch_size=self.batch_size)
+        EnemyAbility.objects.bulk_create(abilities, batch_size=self.batch_size)
+        EnemyResistance.objects.bulk_create(resistances, batch_size=self.batch_size)
+        EnemyLanguage.objects.bulk_create(enemy_languages, batch_size=self.batch_size)
+        EnemyConditionImmunity.objects.bulk_create(immunities, batch_size=self.batch_size)
+        EnemySpell.objects.bulk_create(spells, batch_size=self.batch_size)
+        EnemySpellSlot.objects.bulk_create(
+            [EnemySpellSlot(spell=spell, level=level, uses=uses) for spell, level, uses in spell_slots],
+            batch_size=self.batch_size,
+        )
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CampaignsConfig(AppConfig):
     name = 'campaigns'
+
+    def ready(self):
+        # Connects the signals that retire cached sampling indexes
+        import core.sampling  # noqa: F401
+        # Connects the signals that retire cached campaign snapshots
+        import campaigns.snapshot  # noqa: F401
+        # Connects the signals that retire compiled boss templates
+        import campaigns.boss_templates  # noqa: F401
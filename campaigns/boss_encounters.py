@@ -252,15 +252,15 @@ BOSS_ENCOUNTERS = {
 }
 
 
-def get_random_boss_for_biome(biome):
-    """Get a random boss encounter for the specified biome"""
+def get_random_boss_for_biome(biome, rng=None):
+    """Get a random boss encounter for the specified biome (rng: optional random.Random-like source)"""
     import random
     
     if biome not in BOSS_ENCOUNTERS:
         raise ValueError(f"No boss encounters defined for biome: {biome}")
     
     bosses = BOSS_ENCOUNTERS[biome]
-    return random.choice(bosses)
+    return (rng or random).choice(bosses)
 
 
 def get_all_bosses_for_biome(biome):
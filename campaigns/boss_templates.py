@@ -0,0 +1,143 @@
+"""
+Compiled boss templates
+
+The BOSS_ENCOUNTERS templates (campaigns.boss_encounters) name their boss,
+minions and loot by string. They are compiled once per bestiary and item
+catalogue version into resolved templates:
+
+    {'name', 'flavor_text', 'loot',
+     'boss': {'enemy_id', 'name', 'hp', 'challenge_rating'},
+     'minions': [same as boss, or None when unresolved, in template order],
+     'loot_item_ids': [ids of the guaranteed items that exist]}
+
+Boss encounters store loot_item_ids with their loot, so the boss's
+treasure room is rolled without looking items up by name.
+
+Names are matched the way boss generation always has (first enemy whose
+name contains the template's, by id), against one read of the bestiary.
+Names that match nothing are logged once per compile instead of on every
+generated gauntlet. A bestiary import or any Enemy / EnemyStats write
+bumps the 'enemies' catalogue version, so the next use recompiles; signal
+writes bump it again on commit, so a compile that read the bestiary
+mid-transaction is not kept.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+
+from bestiary.models import Enemy
+from core.cache_utils import get_catalogue_version, retire_catalogue_version
+from items.models import Item
+
+from .boss_encounters import BOSS_ENCOUNTERS
+
+
+logger = logging.getLogger('campaign')
+
+# Creature types a boss falls back to when its own enemy is missing
+FALLBACK_BOSS_TYPES = ('dragon', 'giant', 'aberration', 'fiend')
+
+# Hit points used when an enemy has no stat block
+DEFAULT_BOSS_HP = 100
+DEFAULT_MINION_HP = 20
+
+# ((enemies version, items version), {biome: {template name: compiled}})
+_compiled = None
+
+
+def _enemy_ref(row, default_hp):
+    pk, name, challenge_rating, _, hit_points = row
+    return {
+        'enemy_id': pk,
+        'name': name,
+        'hp': hit_points if hit_points is not None else default_hp,
+        'challenge_rating': challenge_rating,
+    }
+
+
+def _find(rows, needle):
+    needle = needle.lower()
+    return next((row for row in rows if needle in row[1].lower()), None)
+
+
+def compile_templates():
+    """
+    Resolve every boss template against the current bestiary and items
+
+    Missing enemy names, missing loot items and the number of bosses that
+    fell back to another enemy are logged as one warning.
+
+    Returns:
+        dict: {biome: {template name: compiled template}}
+    """
+    rows = list(
+        Enemy.objects.order_by('pk').values_list('pk', 'name', 'challenge_rating', 'creature_type', 'stats__hit_points')
+    )
+    loot_names = {
+        name for bosses in BOSS_ENCOUNTERS.values() for boss in bosses for name in boss['loot'].get('guaranteed_items', [])
+    }
+    item_ids = dict(Item.objects.filter(name__in=loot_names).values_list('name', 'pk'))
+
+    # Fallback boss: the highest CR (as stored) of the boss creature types, else any enemy
+    typed = [row for row in rows if row[3] in FALLBACK_BOSS_TYPES]
+    fallback = max(typed, key=lambda row: row[2] or '') if typed else (rows[0] if rows else None)
+
+    missing_enemies = set()
+    fallback_bosses = 0
+    compiled = {}
+    for biome, bosses in BOSS_ENCOUNTERS.items():
+        for boss in bosses:
+            boss_row = _find(rows, boss['boss_enemy_name'])
+            if boss_row is None:
+                missing_enemies.add(boss['boss_enemy_name'])
+                fallback_bosses += 1
+                boss_row = fallback
+
+            minions = []
+            for minion_name in boss['minions']:
+                minion_row = _find(rows, minion_name)
+                if minion_row is None:
+                    missing_enemies.add(minion_name)
+                minions.append(_enemy_ref(minion_row, DEFAULT_MINION_HP) if minion_row else None)
+
+            compiled.setdefault(biome, {})[boss['name']] = {
+                'name': boss['name'],
+                'flavor_text': boss['flavor_text'],
+                'loot': boss['loot'],
+                'boss': _enemy_ref(boss_row, DEFAULT_BOSS_HP) if boss_row else None,
+                'minions': minions,
+                'loot_item_ids': [
+                    item_ids[name] for name in boss['loot'].get('guaranteed_items', []) if name in item_ids
+                ],
+            }
+
+    missing_items = loot_names - item_ids.keys()
+    if missing_enemies or missing_items:
+        logger.warning(
+            f"Boss templates: no enemies named {', '.join(sorted(missing_enemies)) or '-'}; "
+            f"no items named {', '.join(sorted(missing_items)) or '-'}; "
+            f"{fallback_bosses} bosses use a fallback enemy"
+        )
+    return compiled
+
+
+def _templates():
+    global _compiled
+    version = (get_catalogue_version('enemies'), get_catalogue_version('items'))
+    if _compiled is None or _compiled[0] != version:
+        _compiled = (version, compile_templates())
+    return _compiled
+
+
+def get_compiled_boss(biome, name):
+    """The compiled template for a biome's boss"""
+    return _templates()[1][biome][name]
+
+
+def _retire(sender, **kwargs):
+    retire_catalogue_version('enemies')
+
+
+# Stat blocks carry the hit points compiled into the templates
+for _name, _signal in (('save', post_save), ('delete', post_delete)):
+    _signal.connect(_retire, sender='bestiary.EnemyStats', weak=False, dispatch_uid=f'boss_templates:stats:{_name}')
@@ -0,0 +1,45 @@
+"""
+Background jobs for campaign generation
+
+Generation writes dozens of rows (up to 15 biome encounters plus a boss),
+so the generate-gauntlet and populate endpoints queue these handlers
+instead of running them inside the request (see jobs.runner).
+"""
+from jobs.runner import job
+
+
+@job('campaigns.generate_gauntlet')
+def generate_gauntlet(job):
+    """Generate a gauntlet campaign for the job's owner"""
+    from .serializers import CampaignSerializer
+    from .services.campaign_generator import CampaignGenerator
+
+    campaign = CampaignGenerator().generate_gauntlet(owner=job.owner, **job.payload)
+    boss_encounter = campaign.campaign_encounters.filter(is_boss=True).select_related('encounter').first()
+
+    return {
+        "message": "Gauntlet campaign generated successfully!",
+        "campaign": CampaignSerializer(campaign).data,
+        "encounters": campaign.campaign_encounters.count(),
+        "boss_encounter": boss_encounter.encounter.name if boss_encounter else None,
+        "boss_loot": boss_encounter.boss_loot_table if boss_encounter else {}
+    }
+
+
+@job('campaigns.populate')
+def populate(job):
+    """Auto-populate one of the owner's campaigns with encounters and treasure"""
+    from .models import Campaign
+    from .utils import CampaignGenerator
+
+    campaign = Campaign.objects.get(pk=job.payload['campaign_id'], owner=job.owner)
+    summary = CampaignGenerator.populate_campaign(
+        campaign,
+        num_encounters=job.payload['num_encounters'],
+        auto_treasure=job.payload['auto_treasure']
+    )
+
+    return {
+        "message": "Campaign populated successfully",
+        "summary": summary
+    }
@@ -0,0 +1,91 @@
+"""
+Loot tables for treasure rooms and boss drops (see core.loot)
+
+Treasure rooms roll 'treasure:<room type>' with the room's treasure value;
+bosses roll the loot stored on their CampaignEncounter (guaranteed items,
+by the ids resolved when the boss was generated or else by name, and a
+fixed gold reward), compiled by boss_table(). The templates'
+loot is also registered as 'boss:<boss name>'.
+"""
+from core.loot import compile_spec, register_table
+
+from .boss_encounters import BOSS_ENCOUNTERS
+
+
+TREASURE_TABLES = {
+    'treasure:equipment': {
+        'rolls': (1, 2),
+        'entries': [{'pool': ['category:Weapon', 'category:Armor', 'category:Shield']}],
+        'gold': (10, 50),
+    },
+    'treasure:consumables': {
+        'rolls': (2, 4),
+        'entries': [{'pool': 'category:Consumable', 'quantity': (1, 3)}],
+        'gold': (5, 30),
+    },
+    # Large gold reward: 8-12 gold per point of treasure value
+    'treasure:gold': {
+        'rolls': 0,
+        'gold_per_value': (8, 12),
+    },
+    # Guaranteed magic item, or equipment if there are none
+    'treasure:magical': {
+        'entries': [{'pool': 'category:Magic Item', 'fallback': [['category:Weapon', 'category:Armor']]}],
+        'gold': (50, 100),
+    },
+    # A random mix: items, gold or XP
+    'treasure:mystery': {
+        'entries': [
+            {'table': 'treasure:mystery_items'},
+            {'table': 'treasure:mystery_gold'},
+            {'table': 'treasure:mystery_xp'},
+        ],
+    },
+    'treasure:mystery_items': {
+        'rolls': (1, 3),
+        'entries': [{'pool': 'all', 'quantity': (1, 2)}],
+    },
+    'treasure:mystery_gold': {
+        'rolls': 0,
+        'gold': (30, 150),
+    },
+    'treasure:mystery_xp': {
+        'rolls': 0,
+        'xp_bonus': (50, 200),
+        'gold': (20, 60),
+    },
+}
+
+
+def boss_loot_spec(loot):
+    """Loot table spec for a boss template's (or CampaignEncounter.boss_loot_table's) loot"""
+    if 'item_ids' in loot:
+        guaranteed = [{'item_id': pk} for pk in loot['item_ids']]
+    else:
+        guaranteed = [{'item': name} for name in loot.get('guaranteed_items', [])]
+    return {
+        'rolls': 0,
+        'guaranteed': guaranteed,
+        'gold': loot.get('gold', 0),
+    }
+
+
+def boss_table(campaign_encounter):
+    """
+    Compiled loot table for a boss encounter
+
+    Built from the loot stored on the encounter rather than the template of
+    the same name, so campaigns keep the loot they were generated with.
+    """
+    return compile_spec(
+        boss_loot_spec(campaign_encounter.boss_loot_table or {}),
+        name=f'boss:{campaign_encounter.encounter.name}',
+    )
+
+
+for _name, _spec in TREASURE_TABLES.items():
+    register_table(_name, _spec)
+
+for _bosses in BOSS_ENCOUNTERS.values():
+    for _boss in _bosses:
+        register_table(f"boss:{_boss['name']}", boss_loot_spec(_boss['loot']))
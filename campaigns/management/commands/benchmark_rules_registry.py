@@ -0,0 +1,145 @@
+"""
+Management command to benchmark rules-data lookups
+
+Compares the legacy helpers in the rules-data modules (which normalize names
+and rebuild level ranges on every call) against the frozen indexes in
+core.rules_registry, and reports the one-off cost of importing the data
+modules and building the registry in a fresh interpreter.
+
+Usage: python manage.py benchmark_rules_registry [--iterations 200]
+"""
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+DATA_MODULES = [
+    'campaigns.class_features_data',
+    'campaigns.racial_features_data',
+    'campaigns.background_features_data',
+    'campaigns.feat_data',
+    'characters.starting_equipment',
+    'characters.starting_spells',
+]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+{build}
+built = time.perf_counter()
+print(imported - start, built - imported)
+"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rules-data lookups and load cost, legacy helpers vs rules registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Number of passes over every class/subclass/level combination'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        import_time, build_time = self.measure_load()
+        self.stdout.write('Load cost (fresh interpreter):')
+        self.stdout.write(f'  import data modules:   {import_time * 1000:8.2f} ms')
+        self.stdout.write(f'  build rules registry:  {build_time * 1000:8.2f} ms')
+
+        self.stdout.write(f'\nLookup cost ({iterations} passes):')
+        for label, legacy, registry in self.lookup_benchmarks():
+            legacy_time = self.time_calls(legacy, iterations)
+            registry_time = self.time_calls(registry, iterations)
+            speedup = legacy_time / registry_time if registry_time else float('inf')
+            self.stdout.write(
+                f'  {label:<32} legacy {legacy_time * 1000:8.2f} ms   '
+                f'registry {registry_time * 1000:8.2f} ms   x{speedup:.1f}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    def measure_load(self):
+        """Import the data modules and build the registry in a subprocess"""
+        snippet = IMPORT_SNIPPET.format(
+            imports='\n'.join(f'import {module}' for module in DATA_MODULES),
+            build='from core.rules_registry import RulesRegistry\nRulesRegistry()',
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', snippet],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        import_time, build_time = result.stdout.split()
+        return float(import_time), float(build_time)
+
+    def lookup_benchmarks(self):
+        """Build (label, legacy_calls, registry_calls) triples"""
+        from campaigns import class_features_data as class_data
+        from campaigns.racial_features_data import RACIAL_FEATURES, get_racial_features
+        from campaigns.feat_data import FEAT_DATA, get_feat_config
+        from core.rules_registry import get_rules_registry
+
+        registry = get_rules_registry()
+        class_names = [name.title() for name in class_data.CLASS_FEATURES_2014]
+        subclass_names = list(class_data.SUBCLASS_FEATURES_2014)
+        levels = range(1, 21)
+        rulesets = ('2014', '2024')
+
+        def calls(func, names):
+            return [
+                (func, (name, level, ruleset))
+                for name in names for level in levels for ruleset in rulesets
+            ]
+
+        return [
+            (
+                'class features at level',
+                calls(class_data.get_class_features, class_names),
+                calls(registry.class_features, class_names),
+            ),
+            (
+                'class features up to level',
+                calls(class_data.get_all_features_up_to_level, class_names),
+                calls(registry.class_features_up_to_level, class_names),
+            ),
+            (
+                'subclass features at level',
+                calls(class_data.get_subclass_features, subclass_names),
+                calls(registry.subclass_features, subclass_names),
+            ),
+            (
+                'subclass features up to level',
+                calls(class_data.get_all_subclass_features_up_to_level, subclass_names),
+                calls(registry.subclass_features_up_to_level, subclass_names),
+            ),
+            (
+                'racial features',
+                [(get_racial_features, (name.title(),)) for name in RACIAL_FEATURES],
+                [(registry.racial_features, (name.title(),)) for name in RACIAL_FEATURES],
+            ),
+            (
+                'feat config',
+                [(get_feat_config, (name.upper(),)) for name in FEAT_DATA],
+                [(registry.feat_config, (name.upper(),)) for name in FEAT_DATA],
+            ),
+        ]
+
+    @staticmethod
+    def time_calls(calls, iterations):
+        """Total wall time for running every call `iterations` times"""
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for func, args in calls:
+                func(*args)
+        return time.perf_counter() - start
@@ -0,0 +1,126 @@
+"""
+Management command to benchmark cold worker startup
+
+Boots Django and imports the URLconf (everything a Daphne/gunicorn worker
+loads before serving its first request) in fresh interpreters with
+`-X importtime`, then reports import time per project app. It also times the
+first rules registry lookup with a cold and a warm serialized cache.
+
+Usage: python manage.py benchmark_startup [--runs 5]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+BOOT_SNIPPET = """
+import os, time
+start = time.perf_counter()
+import django
+django.setup()
+import importlib
+importlib.import_module({urlconf!r})
+print(time.perf_counter() - start)
+"""
+
+REGISTRY_SNIPPET = """
+import time
+from core.rules_registry import load_rules_registry
+start = time.perf_counter()
+load_rules_registry({cache_dir!r})
+print(time.perf_counter() - start)
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure cold worker boot time and import time per app'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Number of fresh interpreters to boot (median is reported)'
+        )
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+
+        boot_times = []
+        per_app_runs = []
+        for _ in range(runs):
+            boot_time, per_app = self.boot_once()
+            boot_times.append(boot_time)
+            per_app_runs.append(per_app)
+
+        self.stdout.write(f'Worker boot (django.setup + URLconf), median of {runs}:')
+        self.stdout.write(f'  total: {statistics.median(boot_times) * 1000:8.1f} ms')
+
+        self.stdout.write('\nImport time per package (self time, median):')
+        packages = {name for per_app in per_app_runs for name in per_app}
+        medians = {
+            name: statistics.median(per_app.get(name, 0) for per_app in per_app_runs)
+            for name in packages
+        }
+        for name, micros in sorted(medians.items(), key=lambda item: -item[1]):
+            if name in self.project_packages() or micros >= 5000:
+                marker = '' if name in self.project_packages() else '  (stdlib/third-party)'
+                self.stdout.write(f'  {name:<24} {micros / 1000:8.1f} ms{marker}')
+
+        cold, warm = self.time_registry_load()
+        self.stdout.write('\nFirst rules registry lookup:')
+        self.stdout.write(f'  cold (import data + build + write cache): {cold * 1000:8.1f} ms')
+        self.stdout.write(f'  warm (load serialized cache):             {warm * 1000:8.1f} ms')
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    def project_packages(self):
+        """Top-level packages that belong to this project"""
+        apps = {app.split('.')[0] for app in settings.INSTALLED_APPS if not app.startswith(('django', 'rest_framework', 'corsheaders'))}
+        return apps | {'core', settings.ROOT_URLCONF.split('.')[0]}
+
+    def run_python(self, snippet, extra_args=()):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'dnd_backend.settings')
+        return subprocess.run(
+            [sys.executable, *extra_args, '-c', snippet],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    def boot_once(self):
+        """
+        Boot one worker-equivalent interpreter.
+
+        Returns:
+            (wall time in seconds, {top-level package: self import time in us})
+        """
+        result = self.run_python(
+            BOOT_SNIPPET.format(urlconf=settings.ROOT_URLCONF),
+            extra_args=('-X', 'importtime'),
+        )
+        per_package = defaultdict(int)
+        for line in result.stderr.splitlines():
+            # Format: "import time: <self us> | <cumulative us> | <module>"
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_time, _, module = line[len('import time:'):].split('|')
+            per_package[module.strip().split('.')[0]] += int(self_time)
+        return float(result.stdout.strip().splitlines()[-1]), dict(per_package)
+
+    def time_registry_load(self):
+        """Time load_rules_registry with an empty, then a populated, cache dir"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            snippet = REGISTRY_SNIPPET.format(cache_dir=cache_dir)
+            cold = float(self.run_python(snippet).stdout.strip())
+            warm = float(self.run_python(snippet).stdout.strip())
+        return cold, warm
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0009_campaign_biome_campaign_default_encounter_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='generation_spec',
+            field=models.JSONField(blank=True, default=dict, help_text='Procedural generation parameters (biome, party level and size, encounter count)'),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='seed',
+            field=models.BigIntegerField(blank=True, help_text='Seed of a procedural campaign (null: every encounter was generated up front)', null=True),
+        ),
+    ]
@@ -1,10 +1,14 @@
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.contrib.auth.models import User
 from encounters.models import Encounter
 from characters.models import Character
 from combat.models import CombatSession
+from core.concurrency import guarded_update
+from .snapshot import invalidate_snapshot
 
 
 class Campaign(models.Model):
@@ -69,6 +73,19 @@ class Campaign(models.Model):
         help_text="Number of regular encounters before boss (default 5)"
     )
     
+    # Procedural mode: encounters, treasure rooms and merchants are built
+    # from the seed when the party reaches them (campaigns.services.procedural)
+    seed = models.BigIntegerField(
+        blank=True,
+        null=True,
+        help_text="Seed of a procedural campaign (null: every encounter was generated up front)"
+    )
+    generation_spec = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Procedural generation parameters (biome, party level and size, encounter count)"
+    )
+    
     # Encounter tracking
     current_encounter_index = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     total_encounters = models.IntegerField(default=0, validators=[MinValueValidator(0)])
@@ -143,17 +160,29 @@ class Campaign(models.Model):
                     f"All characters may need to be re-initialized or added properly."
                 )
         
-        if not self.campaign_encounters.exists():
+        # Procedural campaigns build their encounters as they are reached
+        procedural = self.seed is not None
+        if not procedural and not self.campaign_encounters.exists():
             raise ValueError("Campaign must have at least one encounter")
         
         self.status = 'active'
         self.started_at = timezone.now()
         self.current_encounter_index = 0
-        self.total_encounters = self.campaign_encounters.count()
+        if not procedural:
+            self.total_encounters = self.campaign_encounters.count()
         self.save()
     
     def get_current_encounter(self):
-        """Get the current encounter"""
+        """Get the current encounter (materializing it in a procedural campaign)"""
+        if self.seed is not None:
+            encounter_number = self.current_encounter_index + 1
+            if encounter_number > self.total_encounters:
+                return None
+            if self.status != 'active':
+                return self.campaign_encounters.filter(encounter_number=encounter_number).first()
+            from .services.procedural import ProceduralCampaign
+            return ProceduralCampaign(self).materialize_encounter(encounter_number)
+        
         if self.current_encounter_index < self.campaign_encounters.count():
             return self.campaign_encounters.order_by('encounter_number')[self.current_encounter_index]
         return None
@@ -285,11 +314,14 @@ class CampaignCharacter(models.Model):
         )
     
     def take_damage(self, amount):
-        """Apply damage to this character"""
-        self.current_hp = max(0, self.current_hp - amount)
-        if self.current_hp == 0:
-            self.is_alive = False
-        self.save()
+        """Apply damage to this character (decremented in the database)"""
+        amount = max(0, amount)
+        guarded_update(
+            self,
+            current_hp=Greatest(F('current_hp') - amount, 0),
+            is_alive=Case(When(current_hp__lte=amount, then=Value(False)), default=F('is_alive')),
+        )
+        invalidate_snapshot(self.campaign_id)
         return self.current_hp
     
     def heal(self, amount):
@@ -297,10 +329,24 @@ class CampaignCharacter(models.Model):
         if not self.is_alive:
             return self.current_hp  # Can't heal dead characters
         
-        old_hp = self.current_hp
-        self.current_hp = min(self.max_hp, self.current_hp + amount)
-        self.save()
-        return self.current_hp - old_hp  # Return actual healing done
+        amount = max(0, amount)
+        invalidate_snapshot(self.campaign_id)
+        # Common case: the whole amount fits under max HP
+        if guarded_update(
+            self, Q(is_alive=True, current_hp__lte=F('max_hp') - amount),
+            current_hp=F('current_hp') + amount
+        ):
+            return amount
+        
+        # Capped: compare-and-set so the healing done is exact under concurrent writes
+        while True:
+            self.refresh_from_db(fields=['current_hp', 'max_hp', 'is_alive'])
+            if not self.is_alive:
+                return self.current_hp
+            old_hp = self.current_hp
+            new_hp = min(self.max_hp, old_hp + amount)
+            if guarded_update(self, Q(is_alive=True, current_hp=old_hp), current_hp=new_hp):
+                return new_hp - old_hp  # Return actual healing done
     
     def spend_hit_die(self, dice_type=None):
         """Spend one hit die to heal (returns healing amount)"""
@@ -608,22 +654,24 @@ class CharacterXP(models.Model):
         
         # Apply class features - create CharacterFeature instances
         from characters.models import CharacterFeature
-        from .class_features_data import get_class_features, get_subclass_features
+        from core.rules_registry import get_rules_registry
+        registry = get_rules_registry()
         
         features_gained = []
+        new_features = []
         for level in range(old_level + 1, new_level + 1):
             # Get features for this level from the class features data
-            class_features = get_class_features(character.character_class.name, level)
+            class_features = registry.class_features(character.character_class.name, level)
             
             for feature_data in class_features:
                 # Create CharacterFeature instance
-                CharacterFeature.objects.create(
+                new_features.append(CharacterFeature(
                     character=character,
                     name=feature_data['name'],
                     feature_type='class',
                     description=feature_data['description'],
                     source=f"{character.character_class.name} Level {level}"
-                )
+                ))
                 
                 # Track for return value
                 features_gained.append({
@@ -635,17 +683,17 @@ class CharacterXP(models.Model):
             
             # Apply subclass features if character has a subclass
             if character.subclass:
-                subclass_features = get_subclass_features(character.subclass, level)
+                subclass_features = registry.subclass_features(character.subclass, level)
                 
                 for feature_data in subclass_features:
                     # Create CharacterFeature instance
-                    CharacterFeature.objects.create(
+                    new_features.append(CharacterFeature(
                         character=character,
                         name=feature_data['name'],
                         feature_type='class',
                         description=feature_data['description'],
                         source=f"{character.subclass} Level {level}"
-                    )
+                    ))
                     
                     # Track for return value
                     features_gained.append({
@@ -656,6 +704,7 @@ class CharacterXP(models.Model):
                     })
         
         # Save changes
+        CharacterFeature.objects.bulk_create(new_features)
         character.save()
         self.campaign_character.save()
         self.level_ups_gained += levels_gained
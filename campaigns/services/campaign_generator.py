@@ -2,22 +2,25 @@
 Campaign Generator Service
 
 Generates complete gauntlet campaigns with progressive difficulty
-and boss encounters
+and boss encounters. Regular biome encounters come from the encounter
+warm pool when it has stock for the key (encounters.services.warm_pool).
 """
 from django.db import transaction
 
 from campaigns.models import Campaign, CampaignEncounter
 from campaigns.boss_encounters import get_random_boss_for_biome
+from campaigns.boss_templates import get_compiled_boss
 from encounters.models import Encounter, EncounterEnemy
-from encounters.services import BiomeEncounterGenerator
-from bestiary.models import Enemy
+from encounters.services import BiomeEncounterGenerator, warm_pool
+from merchants.models import MerchantEncounter
 
 
 class CampaignGenerator:
     """Generate gauntlet campaigns with biome-specific boss encounters"""
     
     def generate_gauntlet(self, biome, party_level, party_size, 
-                         encounter_count=5, owner=None, name=None):
+                         encounter_count=5, owner=None, name=None, stock_merchants=False,
+                         procedural=False, seed=None):
         """
         Generate a complete gauntlet campaign
         
@@ -28,10 +31,21 @@ class CampaignGenerator:
             encounter_count: Regular encounters before boss (default 5)
             owner: User who owns the campaign
             name: Optional custom name
+            stock_merchants: Pre-stock a hidden merchant after each regular
+                encounter, revealed by discover_merchant
+            procedural: Store only a seed and build each encounter when it
+                is reached (campaigns.services.procedural)
+            seed: Seed of a procedural campaign to replay
             
         Returns:
-            Campaign object with all encounters generated
+            Campaign object with all encounters generated (none, if procedural)
         """
+        if procedural or seed is not None:
+            from .procedural import ProceduralCampaign
+            return ProceduralCampaign.create(
+                biome, party_level, party_size, encounter_count, owner=owner, name=name, seed=seed
+            )
+        
         with transaction.atomic():
             # Create campaign
             campaign_name = name or f"{biome.title()} Gauntlet - Level {party_level}"
@@ -53,8 +67,9 @@ class CampaignGenerator:
                 # Progressive difficulty
                 difficulty = self._get_difficulty_for_encounter(i, encounter_count)
                 
-                # Generate encounter
-                encounter = biome_gen.generate_by_biome(
+                # Take a pre-built encounter from the warm pool (generated on a miss)
+                encounter = warm_pool.take_or_generate(
+                    biome_gen,
                     biome=biome,
                     party_level=party_level,
                     party_size=party_size,
@@ -82,6 +97,9 @@ class CampaignGenerator:
                 boss_loot_table=boss_loot
             )
             
+            if stock_merchants:
+                MerchantEncounter.stock_campaign(campaign, range(1, encounter_count + 1))
+            
             # Update total encounters
             campaign.total_encounters = campaign.campaign_encounters.count()
             campaign.save()
@@ -106,30 +124,22 @@ class CampaignGenerator:
         else:
             return 'deadly'
     
-    def _generate_boss_encounter(self, biome, party_level, party_size):
+    def _generate_boss_encounter(self, biome, party_level, party_size, rng=None):
         """
         Generate biome-specific boss encounter with minions
         
+        Args:
+            rng: Optional random.Random-like source for the boss choice
+        
         Returns:
             tuple: (Encounter object, boss_loot_table dict)
         """
-        # Get random boss for this biome
-        boss_data = get_random_boss_for_biome(biome)
-        
-        # Find boss enemy in database
-        boss_enemy = Enemy.objects.filter(
-            name__icontains=boss_data['boss_enemy_name']
-        ).first()
-        
-        if not boss_enemy:
-            # Fallback: Find any high-CR enemy
-            boss_enemy = Enemy.objects.filter(
-                creature_type__in=['dragon', 'giant', 'aberration', 'fiend']
-            ).order_by('-challenge_rating').first()
-            
-            if not boss_enemy:
-                # Last resort: any enemy
-                boss_enemy = Enemy.objects.first()
+        # Get random boss for this biome, with its enemies already resolved
+        boss_data = get_random_boss_for_biome(biome, rng=rng)
+        compiled = get_compiled_boss(biome, boss_data['name'])
+        boss = compiled['boss']
+        if boss is None:
+            raise ValueError("No enemies in the bestiary to build a boss encounter from")
         
         # Create boss encounter
         encounter = Encounter.objects.create(
@@ -138,30 +148,23 @@ class CampaignGenerator:
             biome=biome
         )
         
-        # Add boss
-        boss_hp = boss_enemy.stats.hit_points if hasattr(boss_enemy, 'stats') else 100
-        EncounterEnemy.objects.create(
+        # Boss plus minions (scaled by party size, max 3)
+        minion_count = min(party_size, 3)
+        rows = [EncounterEnemy(
             encounter=encounter,
-            enemy=boss_enemy,
+            enemy_id=boss['enemy_id'],
             name=boss_data['name'],
-            current_hp=boss_hp
-        )
-        
-        # Add minions (scaled by party size)
-        minion_count = min(party_size, 3)  # Max 3 minions
-        for i, minion_name in enumerate(boss_data['minions'][:minion_count]):
-            minion = Enemy.objects.filter(
-                name__icontains=minion_name
-            ).first()
-            
+            current_hp=boss['hp']
+        )]
+        for i, minion in enumerate(compiled['minions'][:minion_count]):
             if minion:
-                minion_hp = minion.stats.hit_points if hasattr(minion, 'stats') else 20
-                EncounterEnemy.objects.create(
+                rows.append(EncounterEnemy(
                     encounter=encounter,
-                    enemy=minion,
-                    name=f"{minion.name} {i+1}" if minion_count > 1 else minion.name,
-                    current_hp=minion_hp
-                )
+                    enemy_id=minion['enemy_id'],
+                    name=f"{minion['name']} {i+1}" if minion_count > 1 else minion['name'],
+                    current_hp=minion['hp']
+                ))
+        EncounterEnemy.objects.bulk_create(rows)
         
-        # Return encounter and loot table
-        return encounter, boss_data['loot']
+        # Return encounter and loot table, with its items already resolved
+        return encounter, {**boss_data['loot'], 'item_ids': compiled['loot_item_ids']}
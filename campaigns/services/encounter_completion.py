@@ -0,0 +1,170 @@
+"""
+Encounter Completion Pipeline
+
+Settles everything that follows a won campaign encounter in one
+transaction: the encounter is closed, the campaign advances (and may end),
+encounter XP is split across the surviving party with any level-ups, and a
+treasure or recruitment room may be rolled (a boss always drops its loot
+table as a treasure room).
+
+The campaign graph is loaded once up front:
+
+    - the party: alive campaign characters with character, class, stats
+      and XP rows
+    - the encounter with its theme and enemies (with CR)
+
+XP and room rolls are computed in memory from that graph and written with
+bulk statements and conditional updates, so the query count does not
+grow with party or encounter size. Characters who level up still go
+through CharacterXP._level_up() for HP rolls, features and spell slots.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from campaigns.models import CampaignEncounter, RecruitmentRoom, TreasureRoom, TreasureRoomReward
+from campaigns.utils import RecruitmentGenerator, TreasureGenerator, grant_encounter_xp
+from encounters.models import EncounterEnemy
+
+from .procedural import ProceduralCampaign
+
+
+# Solo campaigns recruit until the party reaches this size
+MAX_PARTY_SIZE = 4
+
+
+class EncounterCompletion:
+    """Complete the active encounter of a campaign"""
+
+    def __init__(self, campaign, campaign_encounter, rng=None):
+        """
+        Args:
+            campaign: Campaign the encounter belongs to
+            campaign_encounter: The campaign's current (active) CampaignEncounter
+            rng: random.Random-like source for room rolls (default: random
+                module, or the seeded source of a procedural campaign, which
+                then also fills the rooms)
+        """
+        self.campaign = campaign
+        self.campaign_encounter = campaign_encounter
+        self.loot_rng = None
+        if rng is None and campaign.seed is not None:
+            rng = self.loot_rng = ProceduralCampaign(campaign).rng('rooms', campaign_encounter.encounter_number)
+        self.rng = rng or random
+
+    def recruitment_rng(self):
+        """The seeded source for a procedural campaign's recruits, else None"""
+        if self.campaign.seed is None:
+            return None
+        return ProceduralCampaign(self.campaign).rng('recruitment', self.campaign_encounter.encounter_number)
+
+    def load(self):
+        """Load the party and encounter graph in a fixed number of queries"""
+        self.party = list(
+            self.campaign.get_alive_characters().select_related(
+                'character__character_class', 'character__stats', 'xp_tracking'
+            ).order_by('id')
+        )
+        self.campaign_encounter = CampaignEncounter.objects.select_related(
+            'encounter__theme'
+        ).prefetch_related(
+            Prefetch('encounter__enemies', queryset=EncounterEnemy.objects.select_related('enemy'))
+        ).get(pk=self.campaign_encounter.pk)
+        self.enemies = list(self.campaign_encounter.encounter.enemies.all())
+
+    def run(self, combat_session=None, rewards=None):
+        """
+        Complete the encounter and settle XP and rooms
+
+        Returns:
+            dict: {'campaign_encounter', 'xp_rewards', 'treasure_room', 'recruitment_room'}
+
+        Raises:
+            ValueError: if the encounter is not active (e.g. completed concurrently)
+        """
+        with transaction.atomic():
+            self.load()
+            self.complete_encounter(combat_session, rewards)
+            xp_results = grant_encounter_xp(self.campaign_encounter, self.party, encounter_enemies=self.enemies)
+            treasure_room = self.roll_treasure_room()
+            recruitment_room = self.roll_recruitment_room()
+
+        return {
+            'campaign_encounter': self.campaign_encounter,
+            'xp_rewards': xp_results,
+            'treasure_room': treasure_room,
+            'recruitment_room': recruitment_room,
+        }
+
+    def complete_encounter(self, combat_session, rewards):
+        """Close the encounter and advance the campaign (see CampaignEncounter.complete)"""
+        encounter = self.campaign_encounter
+        changes = {
+            'status': 'completed',
+            'combat_session': combat_session,
+            'completed_at': timezone.now(),
+        }
+        if rewards:
+            changes['rewards'] = rewards
+
+        # Only one request may complete the encounter
+        if not CampaignEncounter.objects.filter(pk=encounter.pk, status='active').update(**changes):
+            raise ValueError("Encounter must be in 'active' status to complete")
+        for field, value in changes.items():
+            setattr(encounter, field, value)
+
+        campaign = self.campaign
+        campaign.current_encounter_index += 1
+        update_fields = ['current_encounter_index']
+        if not self.party or campaign.current_encounter_index >= campaign.total_encounters:
+            campaign.status = 'completed' if self.party else 'failed'
+            campaign.ended_at = timezone.now()
+            update_fields += ['status', 'ended_at']
+        campaign.save(update_fields=update_fields)
+        encounter.campaign = campaign
+
+    def roll_treasure_room(self):
+        """Bosses drop their loot; otherwise treasure every 3rd encounter, or a 20% chance"""
+        encounter = self.campaign_encounter
+        if encounter.is_boss and encounter.boss_loot_table:
+            if self.campaign.treasure_rooms.filter(encounter_number=encounter.encounter_number).exists():
+                return None
+            room = TreasureGenerator.generate_boss_treasure_room(self.campaign, encounter, rng=self.loot_rng)
+        else:
+            encounter_number = encounter.encounter_number
+            should_generate = encounter_number % 3 == 0 or self.rng.random() < 0.2
+            if not should_generate or encounter_number >= self.campaign.total_encounters:
+                return None
+            room = TreasureGenerator.generate_treasure_room(self.campaign, encounter_number, rng=self.loot_rng)
+
+        return TreasureRoom.objects.prefetch_related(
+            Prefetch('reward_items', queryset=TreasureRoomReward.objects.select_related('item'))
+        ).get(pk=room.pk)
+
+    def roll_recruitment_room(self):
+        """Solo campaigns below full strength: every 4th encounter, or 15% after encounter 3"""
+        if self.campaign.start_mode != 'solo' or len(self.party) >= MAX_PARTY_SIZE:
+            return None
+
+        encounter_number = self.campaign_encounter.encounter_number
+        should_generate = (
+            encounter_number % 4 == 0 or
+            (self.rng.random() < 0.15 and encounter_number >= 3)
+        )
+        if not should_generate or encounter_number >= self.campaign.total_encounters:
+            return None
+
+        try:
+            room = RecruitmentGenerator.generate_recruitment_room(
+                self.campaign, encounter_number, rng=self.recruitment_rng()
+            )
+        except ValueError:
+            # Recruitment can't be generated (e.g. no recruits available)
+            return None
+        return RecruitmentRoom.objects.prefetch_related(
+            'available_recruits__character_class',
+            'available_recruits__race',
+            'available_recruits__background',
+        ).get(pk=room.pk)
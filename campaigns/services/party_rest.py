@@ -0,0 +1,181 @@
+"""
+Party Rest Engine
+
+Short and long rests for a whole campaign party in one pass. The resting
+party is loaded (and row-locked) once, every hit-die roll of the rest is
+drawn in a single batch, healing, hit dice and spell slots are settled in
+memory, and the party is written back with one bulk_update.
+
+Spell slots (CampaignCharacter.spell_slots) are restored to the class
+table for the character's level (campaigns.utils.calculate_spell_slots):
+on a long rest for every spellcaster, on a short rest only for classes
+whose slots come back on a short rest (warlock pact magic). Characters
+whose class has no table keep their slots as they are.
+"""
+import random
+
+from django.db import transaction
+from django.utils import timezone
+
+from campaigns.models import CampaignCharacter
+from campaigns.snapshot import invalidate_snapshot
+from campaigns.utils import calculate_spell_slots
+from core.dnd_utils import calculate_ability_modifier
+
+
+# Classes whose spell slots are regained on a short rest
+SHORT_REST_SLOT_CLASSES = {'warlock'}
+
+REST_FIELDS = ['current_hp', 'hit_dice_remaining', 'spell_slots', 'updated_at']
+
+
+def die_size(dice_type):
+    """'d8' or '1d8' -> 8"""
+    try:
+        return int(dice_type.split('d')[-1])
+    except ValueError:
+        return 8
+
+
+def restore_spell_slots(member):
+    """Reset a party member's spell slots to their class table, if it has one"""
+    slots = calculate_spell_slots(member.character.character_class.name, member.character.level)
+    if slots:
+        member.spell_slots = slots
+    return bool(slots)
+
+
+class PartyRest:
+    """Short and long rests for a campaign's alive party"""
+
+    def __init__(self, campaign, rng=None):
+        """
+        Args:
+            campaign: Campaign whose party rests
+            rng: random.Random-like source for hit-die rolls (default: random module)
+        """
+        self.campaign = campaign
+        self.rng = rng or random
+
+    def load_party(self, character_ids=None):
+        """Alive party members (optionally only some), locked for the rest of the transaction"""
+        queryset = self.campaign.get_alive_characters().select_related(
+            'character__character_class', 'character__stats'
+        ).select_for_update(of=('self',)).order_by('id')
+        if character_ids:
+            queryset = queryset.filter(id__in=character_ids)
+        party = list(queryset)
+        if not party:
+            raise ValueError("No alive characters to rest")
+        return party
+
+    def save_party(self, party):
+        now = timezone.now()
+        for member in party:
+            member.updated_at = now
+        CampaignCharacter.objects.bulk_update(party, REST_FIELDS)
+        invalidate_snapshot(self.campaign.id)
+
+    def short_rest(self, character_ids=None, hit_dice_to_spend=None):
+        """
+        Spend hit dice to heal (1 per character unless hit_dice_to_spend says otherwise)
+
+        Args:
+            character_ids: Party members who rest (default: every alive member)
+            hit_dice_to_spend: {campaign_character_id: dice} (int or str keys)
+
+        Returns:
+            list: Per-character results
+
+        Raises:
+            ValueError: if nobody can rest
+        """
+        wanted_by_id = {str(key): value for key, value in (hit_dice_to_spend or {}).items()}
+
+        with transaction.atomic():
+            party = self.load_party(character_ids)
+
+            # Plan every die the party spends, then roll them all at once
+            plan = []
+            for member in party:
+                wanted = wanted_by_id.get(str(member.id), 1)
+                for dice_type, count in member.hit_dice_remaining.items():
+                    spent = min(max(0, count), wanted)
+                    plan.extend([(member, dice_type)] * spent)
+                    wanted -= spent
+            rolls = [self.rng.randint(1, die_size(dice_type)) for _, dice_type in plan]
+
+            con_modifiers = {}
+            for member in party:
+                stats = getattr(member.character, 'stats', None)
+                con_modifiers[member.id] = calculate_ability_modifier(stats.constitution) if stats else 0
+
+            outcome = {member.id: {'healing': 0, 'hit_dice_spent': 0, 'messages': []} for member in party}
+            for (member, dice_type), roll in zip(plan, rolls):
+                remaining = member.hit_dice_remaining
+                remaining[dice_type] -= 1
+                if remaining[dice_type] <= 0:
+                    del remaining[dice_type]
+
+                healed = max(0, min(member.max_hp - member.current_hp, roll + con_modifiers[member.id]))
+                member.current_hp += healed
+                entry = outcome[member.id]
+                entry['healing'] += healed
+                entry['hit_dice_spent'] += 1
+                entry['messages'].append(f"Rolled {roll} on {dice_type}, healed {healed} HP")
+
+            for member in party:
+                if member.character.character_class.name.lower() in SHORT_REST_SLOT_CLASSES:
+                    restore_spell_slots(member)
+
+            self.save_party(party)
+            self.campaign.short_rests_used += 1
+            self.campaign.save(update_fields=['short_rests_used'])
+
+        return [
+            {
+                "character_id": member.id,
+                "character_name": member.character.name,
+                **outcome[member.id],
+                "current_hp": member.current_hp,
+                "max_hp": member.max_hp,
+                "remaining_hit_dice": member.get_available_hit_dice(),
+                "spell_slots": member.spell_slots,
+            }
+            for member in party
+        ]
+
+    def long_rest(self):
+        """
+        Restore HP, hit dice and spell slots for the whole alive party
+
+        Returns:
+            list: Per-character results
+
+        Raises:
+            ValueError: if nobody can rest
+        """
+        with transaction.atomic():
+            party = self.load_party()
+
+            results = []
+            for member in party:
+                old_hp = member.current_hp
+                member.current_hp = member.max_hp
+                member.hit_dice_remaining = {member.character.character_class.hit_dice: member.character.level}
+                restore_spell_slots(member)
+                results.append({
+                    "character_id": member.id,
+                    "character_name": member.character.name,
+                    "hp_restored": member.max_hp - old_hp,
+                    "current_hp": member.current_hp,
+                    "max_hp": member.max_hp,
+                    "hit_dice_restored": member.get_available_hit_dice(),
+                    "spell_slots": member.spell_slots,
+                })
+
+            self.save_party(party)
+            self.campaign.long_rests_used += 1
+            self.campaign.save(update_fields=['long_rests_used'])
+
+        return results
@@ -0,0 +1,139 @@
+"""
+Procedural Campaigns
+
+A procedural gauntlet is stored as a seed and a generation spec on the
+Campaign row; nothing else is written up front. Each encounter is built
+when the party reaches it (Campaign.get_current_encounter), treasure and
+recruitment rooms are rolled when the encounter before them is completed,
+and merchants are stocked when discovered.
+
+Every one of those draws comes from its own random.Random seeded with
+'<seed>:<kind>:<number>', so the same seed replays the same run (against
+the same bestiary and item catalogue) no matter how far earlier runs got
+or in which order rooms were visited. A run abandoned after two
+encounters has written two encounters.
+"""
+import random
+
+from django.db import IntegrityError, transaction
+
+from campaigns.models import Campaign, CampaignEncounter
+from encounters.services import BiomeEncounterGenerator
+from merchants.models import MerchantEncounter
+from merchants.rarity_weights import generate_merchant_name
+
+from .campaign_generator import CampaignGenerator
+
+
+# Bump when generation changes in a way that alters what a seed produces
+SPEC_VERSION = 1
+
+
+def new_seed():
+    """A fresh seed that fits the Campaign.seed column"""
+    return random.SystemRandom().getrandbits(48)
+
+
+class ProceduralCampaign:
+    """Materialize the parts of a procedural campaign as they are reached"""
+
+    def __init__(self, campaign):
+        """
+        Args:
+            campaign: Campaign with a seed
+        """
+        if campaign.seed is None:
+            raise ValueError("Campaign is not procedural")
+        self.campaign = campaign
+        self.spec = campaign.generation_spec
+
+    @classmethod
+    def create(cls, biome, party_level, party_size, encounter_count=5, owner=None, name=None, seed=None):
+        """
+        Create a procedural gauntlet: one Campaign row, no encounters
+
+        Args:
+            seed: Seed to replay (default: a fresh one)
+
+        Returns:
+            Campaign object
+        """
+        return Campaign.objects.create(
+            name=name or f"{biome.title()} Gauntlet - Level {party_level}",
+            description=f"Face {encounter_count} challenges and defeat the {biome} boss!",
+            biome=biome,
+            starting_level=party_level,
+            starting_party_size=party_size,
+            default_encounter_count=encounter_count,
+            total_encounters=encounter_count + 1,
+            owner=owner,
+            seed=seed if seed is not None else new_seed(),
+            generation_spec={
+                'version': SPEC_VERSION,
+                'biome': biome,
+                'party_level': party_level,
+                'party_size': party_size,
+                'encounter_count': encounter_count,
+            },
+        )
+
+    def rng(self, kind, number):
+        """The random source for one part of the run (e.g. 'encounter', 3)"""
+        return random.Random(f'{self.campaign.seed}:{kind}:{number}')
+
+    def materialize_encounter(self, encounter_number):
+        """
+        The CampaignEncounter at a depth, generating it on first reach
+
+        The last depth holds the boss.
+        """
+        existing = self.campaign.campaign_encounters.filter(encounter_number=encounter_number).first()
+        if existing:
+            return existing
+
+        spec = self.spec
+        generator = CampaignGenerator()
+        rng = self.rng('encounter', encounter_number)
+        try:
+            with transaction.atomic():
+                if encounter_number > spec['encounter_count']:
+                    encounter, boss_loot = generator._generate_boss_encounter(
+                        spec['biome'], spec['party_level'], spec['party_size'], rng=rng
+                    )
+                    return CampaignEncounter.objects.create(
+                        campaign=self.campaign,
+                        encounter=encounter,
+                        encounter_number=encounter_number,
+                        is_boss=True,
+                        boss_loot_table=boss_loot
+                    )
+
+                encounter = BiomeEncounterGenerator(rng=rng).generate_by_biome(
+                    biome=spec['biome'],
+                    party_level=spec['party_level'],
+                    party_size=spec['party_size'],
+                    difficulty=generator._get_difficulty_for_encounter(
+                        encounter_number - 1, spec['encounter_count']
+                    )
+                )
+                return CampaignEncounter.objects.create(
+                    campaign=self.campaign,
+                    encounter=encounter,
+                    encounter_number=encounter_number,
+                    is_boss=False
+                )
+        except IntegrityError:
+            # Another request materialized this depth first
+            return self.campaign.campaign_encounters.get(encounter_number=encounter_number)
+
+    def materialize_merchant(self, encounter_number, count=5):
+        """Create and stock the merchant found at a depth"""
+        rng = self.rng('merchant', encounter_number)
+        with transaction.atomic():
+            merchant = MerchantEncounter.objects.create(
+                campaign=self.campaign,
+                encounter_number=encounter_number,
+                merchant_name=generate_merchant_name(rng)
+            )
+            merchant.generate_inventory(count=count, rng=rng)
+        return merchant
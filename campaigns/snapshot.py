@@ -0,0 +1,253 @@
+"""
+Denormalized campaign read model
+
+The campaign screens need the party (HP, hit dice, spell slots, XP), the
+current encounter, rest availability and the campaign's rooms. Rather than
+walking those relations on every request, build_snapshot() assembles them
+into one JSON document in a fixed handful of queries, and get_snapshot()
+serves it from the cache:
+
+    {'id', 'name', 'status', ..., 'party': [...], 'fallen': [...],
+     'current_encounter': {...}, 'encounters': [...],
+     'treasure_rooms': [...], 'recruitment_rooms': [...], 'version'}
+
+'version' is a hash of the document's content; the snapshot endpoint sends
+it as the ETag and answers If-None-Match with 304.
+
+Cache entries are keyed by a per-campaign generation number (the
+catalogue version mechanism from core.cache_utils). Saving or deleting any
+model that feeds the document bumps the campaign's generation, and bumps
+it again when the transaction commits, so the next read rebuilds it and a
+read racing the write can only ever fill a retired key. Character and
+CharacterStats writes retire the snapshot of every campaign the character
+is in. Writes that bypass signals
+(queryset update(), bulk_update) call invalidate_snapshot() themselves.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+
+from core.cache_utils import bump_catalogue_version, get_catalogue_version
+from core.instrumentation import record_cache_lookup
+
+
+def _catalogue(campaign_id):
+    return f'campaign_snapshot:{campaign_id}'
+
+
+def _cache_key(campaign_id):
+    return f'campaign_snapshot:{campaign_id}:v{get_catalogue_version(_catalogue(campaign_id))}'
+
+
+def invalidate_snapshot(campaign_id):
+    """
+    Retire a campaign's cached snapshot now and again once the current
+    transaction commits (a read in between may have cached the old state).
+    """
+    if campaign_id is not None:
+        bump_catalogue_version(_catalogue(campaign_id))
+        transaction.on_commit(lambda: bump_catalogue_version(_catalogue(campaign_id)))
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def party_row(campaign_character):
+    """Party member entry, as returned by the party_status endpoint"""
+    character = campaign_character.character
+    row = {
+        "id": campaign_character.id,
+        "character": character.name,
+        "level": character.level,
+        "class": character.character_class.get_name_display(),
+        "current_hp": campaign_character.current_hp,
+        "max_hp": campaign_character.max_hp,
+        "hp_percentage": (
+            round((campaign_character.current_hp / campaign_character.max_hp) * 100, 1)
+            if campaign_character.max_hp > 0 else 0
+        ),
+        "hit_dice_remaining": campaign_character.hit_dice_remaining,
+        "available_hit_dice": campaign_character.get_available_hit_dice(),
+        "spell_slots": campaign_character.spell_slots,
+        "gold": campaign_character.gold,
+        "is_alive": campaign_character.is_alive,
+    }
+    if hasattr(campaign_character, 'xp_tracking'):
+        xp_tracking = campaign_character.xp_tracking
+        row.update({
+            "current_xp": xp_tracking.current_xp,
+            "total_xp_gained": xp_tracking.total_xp_gained,
+            "level_ups_gained": xp_tracking.level_ups_gained,
+            "pending_asi_levels": xp_tracking.pending_asi_levels,
+            "pending_subclass_selection": xp_tracking.pending_subclass_selection,
+        })
+    return row
+
+
+def _encounter_row(campaign_encounter):
+    return {
+        "id": campaign_encounter.id,
+        "encounter_number": campaign_encounter.encounter_number,
+        "encounter_id": campaign_encounter.encounter_id,
+        "name": campaign_encounter.encounter.name,
+        "biome": campaign_encounter.encounter.biome,
+        "status": campaign_encounter.status,
+        "is_boss": campaign_encounter.is_boss,
+        "combat_session_id": campaign_encounter.combat_session_id,
+    }
+
+
+def build_snapshot(campaign_id):
+    """
+    Assemble a campaign's read model from the database.
+
+    Returns:
+        dict, or None if the campaign does not exist
+    """
+    from .models import Campaign
+
+    campaign = Campaign.objects.filter(pk=campaign_id).first()
+    if campaign is None:
+        return None
+
+    members = list(
+        campaign.campaign_characters.select_related('character__character_class', 'xp_tracking').order_by('id')
+    )
+    encounters = list(campaign.campaign_encounters.select_related('encounter').order_by('encounter_number'))
+    treasure_rooms = campaign.treasure_rooms.annotate(
+        reward_count=Count('reward_items'),
+        unclaimed_rewards=Count('reward_items', filter=Q(reward_items__claimed_by__isnull=True)),
+    ).order_by('encounter_number', 'id')
+    recruitment_rooms = campaign.recruitment_rooms.order_by('encounter_number', 'id')
+
+    party = [party_row(member) for member in members if member.is_alive]
+    index = campaign.current_encounter_index
+    current = encounters[index] if index < len(encounters) else None
+
+    document = {
+        "id": campaign.id,
+        "owner_id": campaign.owner_id,
+        "name": campaign.name,
+        "status": campaign.status,
+        "start_mode": campaign.start_mode,
+        "biome": campaign.biome,
+        "current_encounter_index": index,
+        "total_encounters": campaign.total_encounters,
+        "started_at": _isoformat(campaign.started_at),
+        "ended_at": _isoformat(campaign.ended_at),
+        "short_rests_used": campaign.short_rests_used,
+        "long_rests_used": campaign.long_rests_used,
+        "long_rests_remaining": campaign.long_rests_available - campaign.long_rests_used,
+        "can_short_rest": campaign.status == 'active' and bool(party),
+        "can_long_rest": (
+            campaign.status == 'active' and bool(party) and
+            campaign.long_rests_used < campaign.long_rests_available
+        ),
+        "party": party,
+        "fallen": [
+            {"id": member.id, "character": member.character.name, "died_in_encounter": member.died_in_encounter}
+            for member in members if not member.is_alive
+        ],
+        "current_encounter": _encounter_row(current) if current else None,
+        "encounters": [_encounter_row(encounter) for encounter in encounters],
+        "treasure_rooms": [
+            {
+                "id": room.id,
+                "encounter_number": room.encounter_number,
+                "room_type": room.room_type,
+                "discovered": room.discovered,
+                "loot_distributed": room.loot_distributed,
+                "reward_count": room.reward_count,
+                "unclaimed_rewards": room.unclaimed_rewards,
+            }
+            for room in treasure_rooms
+        ],
+        "recruitment_rooms": [
+            {
+                "id": room.id,
+                "encounter_number": room.encounter_number,
+                "discovered": room.discovered,
+                "recruit_selected_id": room.recruit_selected_id,
+            }
+            for room in recruitment_rooms
+        ],
+    }
+    content = json.dumps(document, sort_keys=True, default=str).encode()
+    document["version"] = hashlib.md5(content).hexdigest()[:16]
+    return document
+
+
+def get_snapshot(campaign_id):
+    """Cached read model for a campaign, or None if it does not exist"""
+    try:
+        campaign_id = int(campaign_id)
+    except (TypeError, ValueError):
+        return None
+
+    cache_key = _cache_key(campaign_id)
+    document = cache.get(cache_key)
+    record_cache_lookup(document is not None)
+    if document is None:
+        document = build_snapshot(campaign_id)
+        if document is not None:
+            cache.set(cache_key, document, settings.CACHE_TTL.get('campaign_snapshot', 3600))
+    return document
+
+
+def _campaign_id_for(instance):
+    """Campaign a saved/deleted row belongs to"""
+    from .models import Campaign, CharacterXP, TreasureRoomReward
+
+    if isinstance(instance, Campaign):
+        return instance.pk
+    if isinstance(instance, CharacterXP):
+        return instance.campaign_character.campaign_id
+    if isinstance(instance, TreasureRoomReward):
+        return instance.treasure_room.campaign_id
+    return instance.campaign_id
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    try:
+        campaign_id = _campaign_id_for(instance)
+    except ObjectDoesNotExist:
+        # Parent already deleted (cascade); its own signal covers the campaign
+        return
+    invalidate_snapshot(campaign_id)
+
+
+for _label in (
+    'campaigns.Campaign', 'campaigns.CampaignCharacter', 'campaigns.CharacterXP',
+    'campaigns.CampaignEncounter', 'campaigns.TreasureRoom', 'campaigns.TreasureRoomReward',
+    'campaigns.RecruitmentRoom',
+):
+    for _name, _signal in (('save', post_save), ('delete', post_delete)):
+        _signal.connect(
+            _invalidate_on_change, sender=_label, weak=False, dispatch_uid=f'campaign_snapshot:{_label}:{_name}'
+        )
+
+
+def _invalidate_character_campaigns(sender, instance, **kwargs):
+    """Party rows carry the character's name, level and class"""
+    from characters.models import Character
+    from .models import CampaignCharacter
+
+    character_id = instance.pk if isinstance(instance, Character) else instance.character_id
+    campaign_ids = CampaignCharacter.objects.filter(character_id=character_id).values_list('campaign_id', flat=True)
+    for campaign_id in set(campaign_ids):
+        invalidate_snapshot(campaign_id)
+
+
+for _label in ('characters.Character', 'characters.CharacterStats'):
+    for _name, _signal in (('save', post_save), ('delete', post_delete)):
+        _signal.connect(
+            _invalidate_character_campaigns, sender=_label, weak=False,
+            dispatch_uid=f'campaign_snapshot:{_label}:{_name}'
+        )
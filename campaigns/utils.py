@@ -4,6 +4,11 @@ Utility functions for campaign roguelite features
 import random
 from django.db import transaction
 
+from core.loot import roll as roll_loot
+from core.sampling import sample_rows
+from .loot_tables import boss_table
+from .snapshot import invalidate_snapshot
+
 
 # D&D 5e Spell Slot Tables
 # Format: {class_name: {level: {slot_level: count}}}
@@ -229,17 +234,26 @@ def calculate_xp_reward(enemy, character_level):
     return int(base_xp * multiplier)
 
 
-def grant_encounter_xp(campaign_encounter, campaign_characters):
+def grant_encounter_xp(campaign_encounter, campaign_characters, encounter_enemies=None):
     """
     Grant XP to all characters in an encounter
     
+    The XP pool is computed once for the whole encounter and split evenly;
+    XP rows are then written in bulk. Only characters who actually level up
+    go through CharacterXP._level_up() (HP rolls, features, spell slots).
+    
     Args:
         campaign_encounter: CampaignEncounter object
-        campaign_characters: QuerySet of CampaignCharacter objects
+        campaign_characters: QuerySet or list of CampaignCharacter objects.
+            Lists should be loaded with select_related('character__character_class',
+            'character__stats', 'xp_tracking') to avoid per-character queries.
+        encounter_enemies: Optional preloaded EncounterEnemy list (with enemy)
     
     Returns:
         dict: Results of XP granting
     """
+    from django.db.models import QuerySet
+    from django.utils import timezone
     from .models import CharacterXP
     from encounters.models import EncounterEnemy
     
@@ -250,43 +264,57 @@ def grant_encounter_xp(campaign_encounter, campaign_characters):
     }
     
     # Get all enemies from the encounter
-    encounter_enemies = EncounterEnemy.objects.filter(
-        encounter=campaign_encounter.encounter
-    )
+    if encounter_enemies is None:
+        encounter_enemies = list(EncounterEnemy.objects.filter(
+            encounter_id=campaign_encounter.encounter_id
+        ).select_related('enemy'))
     
-    if not encounter_enemies.exists():
+    if not encounter_enemies:
         return results
     
-    # Calculate total XP pool from all enemies
-    total_xp_pool = 0
-    for encounter_enemy in encounter_enemies:
-        enemy = encounter_enemy.enemy
-        # Use average party level for XP calculation
-        avg_party_level = sum([cc.character.level for cc in campaign_characters]) // max(1, campaign_characters.count())
-        xp_per_enemy = calculate_xp_reward(enemy, avg_party_level)
-        total_xp_pool += xp_per_enemy * encounter_enemy.quantity
-    
-    # Distribute XP evenly among alive characters
+    if isinstance(campaign_characters, QuerySet):
+        campaign_characters = campaign_characters.select_related(
+            'character__character_class', 'character__stats', 'xp_tracking'
+        )
     alive_characters = [cc for cc in campaign_characters if cc.is_alive]
     
     if not alive_characters:
         return results
     
+    # Calculate total XP pool from all enemies against the average party level
+    # (each EncounterEnemy row is one creature)
+    avg_party_level = sum(cc.character.level for cc in alive_characters) // len(alive_characters)
+    xp_by_enemy = {}
+    total_xp_pool = 0
+    for encounter_enemy in encounter_enemies:
+        if encounter_enemy.enemy_id not in xp_by_enemy:
+            xp_by_enemy[encounter_enemy.enemy_id] = calculate_xp_reward(encounter_enemy.enemy, avg_party_level)
+        total_xp_pool += xp_by_enemy[encounter_enemy.enemy_id]
+    
+    # Distribute XP evenly among alive characters
     xp_per_character = total_xp_pool // len(alive_characters)
     
-    # Grant XP to each character
+    now = timezone.now()
+    new_rows = []
+    existing_rows = []
     with transaction.atomic():
         for campaign_char in alive_characters:
-            xp_tracking, created = CharacterXP.objects.get_or_create(
-                campaign_character=campaign_char
-            )
+            try:
+                xp_tracking = campaign_char.xp_tracking
+                existing_rows.append(xp_tracking)
+            except CharacterXP.DoesNotExist:
+                xp_tracking = CharacterXP(campaign_character=campaign_char)
+                new_rows.append(xp_tracking)
             
-            old_level = campaign_char.character.level
-            result = xp_tracking.add_xp(xp_per_character, source="encounter_completion")
-            new_level = campaign_char.character.level
+            xp_tracking.current_xp += xp_per_character
+            xp_tracking.total_xp_gained += xp_per_character
+            xp_tracking.updated_at = now
             
+            old_level = campaign_char.character.level
+            new_level = max(old_level, xp_tracking._calculate_level(xp_tracking.current_xp))
             level_gained = new_level > old_level
             if level_gained:
+                xp_tracking._level_up(old_level, new_level, new_level - old_level)
                 results['levels_gained'] += (new_level - old_level)
             
             results['characters'].append({
@@ -299,6 +327,13 @@ def grant_encounter_xp(campaign_encounter, campaign_characters):
             })
             
             results['total_xp_granted'] += xp_per_character
+        
+        CharacterXP.objects.bulk_create(new_rows)
+        CharacterXP.objects.bulk_update(existing_rows, [
+            'current_xp', 'total_xp_gained', 'level_ups_gained',
+            'pending_asi_levels', 'pending_subclass_selection', 'updated_at',
+        ])
+        invalidate_snapshot(campaign_encounter.campaign_id)
     
     return results
 
@@ -307,107 +342,67 @@ class TreasureGenerator:
     """Generates treasure rooms for campaigns"""
     
     @staticmethod
-    def generate_treasure_room(campaign, encounter_number):
+    def generate_treasure_room(campaign, encounter_number, rng=None):
         """
         Generate a treasure room after an encounter
         
         Args:
             campaign: Campaign object
             encounter_number: After which encounter this appears
+            rng: Optional random.Random-like source (seeded for procedural campaigns)
         
         Returns:
             TreasureRoom object
         """
-        from .models import TreasureRoom
-        from items.models import Item, ItemCategory
+        rng = rng or random
         
         # Determine room type (weighted random)
-        room_type = TreasureGenerator._select_room_type(encounter_number, campaign.total_encounters)
+        room_type = TreasureGenerator._select_room_type(encounter_number, campaign.total_encounters, rng)
         
         # Calculate treasure value based on progress
         treasure_value = TreasureGenerator._calculate_treasure_value(campaign, encounter_number)
         
-        rewards = {
-            'items': [],
-            'gold': 0,
-            'xp_bonus': 0
-        }
-        
-        if room_type == 'equipment':
-            # Generate equipment items
-            equipment_items = list(Item.objects.filter(
-                category__name__in=['Weapon', 'Armor', 'Shield']
-            ).order_by('?')[:random.randint(1, 2)])
-            
-            if equipment_items:
-                rewards['items'] = [
-                    {'item_id': item.id, 'quantity': 1, 'name': item.name}
-                    for item in equipment_items
-                ]
-            rewards['gold'] = random.randint(10, 50)
-            
-        elif room_type == 'consumables':
-            # Generate consumable items
-            consumables = list(Item.objects.filter(
-                category__name='Consumable'
-            ).order_by('?')[:random.randint(2, 4)])
-            
-            if consumables:
-                rewards['items'] = [
-                    {'item_id': item.id, 'quantity': random.randint(1, 3), 'name': item.name}
-                    for item in consumables
-                ]
-            rewards['gold'] = random.randint(5, 30)
-            
-        elif room_type == 'gold':
-            # Large gold reward
-            base_gold = treasure_value * 10
-            rewards['gold'] = random.randint(int(base_gold * 0.8), int(base_gold * 1.2))
-            
-        elif room_type == 'magical':
-            # Guaranteed magic item (if available)
-            magic_items = list(Item.objects.filter(
-                category__name='Magic Item'
-            ).order_by('?')[:1])
-            
-            if magic_items:
-                item = magic_items[0]
-                rewards['items'] = [
-                    {'item_id': item.id, 'quantity': 1, 'name': item.name}
-                ]
-            else:
-                # Fallback to equipment if no magic items
-                equipment_fallback = list(Item.objects.filter(
-                    category__name__in=['Weapon', 'Armor']
-                ).order_by('?')[:1])
-                if equipment_fallback:
-                    rewards['items'] = [
-                        {'item_id': item.id, 'quantity': 1, 'name': item.name}
-                        for item in equipment_fallback
-                    ]
-            
-            rewards['gold'] = random.randint(50, 100)
-            
-        elif room_type == 'mystery':
-            # Random mix
-            mystery_type = random.choice(['items', 'gold', 'xp'])
-            
-            if mystery_type == 'items':
-                all_items = list(Item.objects.all().order_by('?')[:random.randint(1, 3)])
-                if all_items:
-                    rewards['items'] = [
-                        {'item_id': item.id, 'quantity': random.randint(1, 2), 'name': item.name}
-                        for item in all_items
-                    ]
-            elif mystery_type == 'gold':
-                rewards['gold'] = random.randint(30, 150)
-            else:  # xp
-                rewards['xp_bonus'] = random.randint(50, 200)
-                rewards['gold'] = random.randint(20, 60)
+        rewards = roll_loot(f'treasure:{room_type}', rng=rng, value=treasure_value)
         
         # Always give a small XP bonus
         if rewards['xp_bonus'] == 0:
-            rewards['xp_bonus'] = random.randint(10, 50)
+            rewards['xp_bonus'] = rng.randint(10, 50)
+        
+        return TreasureGenerator._create_room(campaign, encounter_number, room_type, rewards)
+    
+    @staticmethod
+    def generate_boss_treasure_room(campaign, campaign_encounter, rng=None):
+        """
+        Generate the treasure room holding a defeated boss's loot
+        
+        Args:
+            campaign: Campaign object
+            campaign_encounter: The boss CampaignEncounter
+            rng: Optional random.Random-like source
+        
+        Returns:
+            TreasureRoom object
+        """
+        rewards = boss_table(campaign_encounter).roll(rng or random)
+        return TreasureGenerator._create_room(
+            campaign, campaign_encounter.encounter_number, 'magical', rewards
+        )
+    
+    @staticmethod
+    def _create_room(campaign, encounter_number, room_type, rewards):
+        """Create a TreasureRoom and its claimable rewards from a loot roll"""
+        from .models import TreasureRoom, TreasureRoomReward
+        from items.models import Item
+        
+        # Resolve names in one query, skipping items that no longer exist
+        item_rewards = rewards['items']
+        names = dict(Item.objects.filter(
+            pk__in=[item_data['item_id'] for item_data in item_rewards]
+        ).values_list('pk', 'name')) if item_rewards else {}
+        rewards['items'] = [
+            {**item_data, 'name': names[item_data['item_id']]}
+            for item_data in item_rewards if item_data['item_id'] in names
+        ]
         
         treasure_room = TreasureRoom.objects.create(
             campaign=campaign,
@@ -417,20 +412,14 @@ class TreasureGenerator:
         )
         
         # Create individual reward entries for per-character claiming
-        from .models import TreasureRoomReward
-        from items.models import Item
-        
-        # Create item rewards
-        for item_data in rewards.get('items', []):
-            try:
-                item = Item.objects.get(pk=item_data['item_id'])
-                TreasureRoomReward.objects.create(
-                    treasure_room=treasure_room,
-                    item=item,
-                    quantity=item_data.get('quantity', 1)
-                )
-            except Item.DoesNotExist:
-                pass  # Skip if item doesn't exist
+        reward_rows = [
+            TreasureRoomReward(
+                treasure_room=treasure_room,
+                item_id=item_data['item_id'],
+                quantity=item_data.get('quantity', 1)
+            )
+            for item_data in rewards['items']
+        ]
         
         # Create gold rewards (split into individual rewards if multiple, or single if small)
         gold_total = rewards.get('gold', 0)
@@ -443,23 +432,25 @@ class TreasureGenerator:
             for i in range(num_gold_rewards):
                 gold_amount = gold_per_reward + (remainder if i == num_gold_rewards - 1 else 0)
                 if gold_amount > 0:
-                    TreasureRoomReward.objects.create(
+                    reward_rows.append(TreasureRoomReward(
                         treasure_room=treasure_room,
                         gold_amount=gold_amount
-                    )
+                    ))
         
         # Create XP bonus rewards (one per character or split)
         xp_bonus = rewards.get('xp_bonus', 0)
         if xp_bonus > 0:
-            TreasureRoomReward.objects.create(
+            reward_rows.append(TreasureRoomReward(
                 treasure_room=treasure_room,
                 xp_bonus=xp_bonus
-            )
+            ))
+        
+        TreasureRoomReward.objects.bulk_create(reward_rows)
         
         return treasure_room
     
     @staticmethod
-    def _select_room_type(encounter_number, total_encounters):
+    def _select_room_type(encounter_number, total_encounters, rng=random):
         """Select treasure room type with weighted probabilities"""
         # Early encounters: more consumables and gold
         # Late encounters: more equipment and magic items
@@ -494,7 +485,7 @@ class TreasureGenerator:
         # Select based on weights
         room_types = list(weights.keys())
         probabilities = list(weights.values())
-        return random.choices(room_types, weights=probabilities)[0]
+        return rng.choices(room_types, weights=probabilities)[0]
     
     @staticmethod
     def _calculate_treasure_value(campaign, encounter_number):
@@ -508,19 +499,22 @@ class RecruitmentGenerator:
     """Generates recruitment rooms and recruits characters for solo campaigns"""
     
     @staticmethod
-    def generate_recruitment_room(campaign, encounter_number):
+    def generate_recruitment_room(campaign, encounter_number, rng=None):
         """
         Generate a recruitment room after an encounter (solo mode only)
         
         Args:
             campaign: Campaign object (must be in solo mode)
             encounter_number: After which encounter this appears
+            rng: random.Random-like source for the rarity rolls and recruit
+                picks (default: random module)
         
         Returns:
             RecruitmentRoom object
         """
-        from .models import RecruitmentRoom, RecruitableCharacter
+        from .models import RecruitmentRoom
         
+        rng = rng or random
         if campaign.start_mode != 'solo':
             raise ValueError("Recruitment rooms are only available in solo mode")
         
@@ -535,25 +529,21 @@ class RecruitmentGenerator:
         # Select 2-3 recruits based on rarity weights
         # Start with common/uncommon for early game, allow rare/legendary later
         available_rarities = []
-        if random.random() < rarity_weights.get('legendary', 0):
+        if rng.random() < rarity_weights.get('legendary', 0):
             available_rarities.append('legendary')
-        if random.random() < rarity_weights.get('rare', 0):
+        if rng.random() < rarity_weights.get('rare', 0):
             available_rarities.append('rare')
-        if random.random() < rarity_weights.get('uncommon', 0.5):
+        if rng.random() < rarity_weights.get('uncommon', 0.5):
             available_rarities.append('uncommon')
         available_rarities.append('common')  # Always include common as fallback
         
         # Get recruits from available rarities
-        recruits = RecruitableCharacter.objects.filter(
-            rarity__in=available_rarities
-        ).order_by('?')[:3]
+        recruits = sample_rows('recruits', [f'rarity:{rarity}' for rarity in available_rarities], 3, rng=rng)
         
         # If we don't have enough recruits, fill with any available
-        if recruits.count() < 2:
-            additional = RecruitableCharacter.objects.exclude(
-                id__in=[r.id for r in recruits]
-            ).order_by('?')[:2]
-            recruits = list(recruits) + list(additional)
+        if len(recruits) < 2:
+            additional = sample_rows('recruits', ['all'], 2, exclude=[r.id for r in recruits], rng=rng)
+            recruits = recruits + additional
         
         # Create recruitment room
         room = RecruitmentRoom.objects.create(
@@ -748,11 +738,8 @@ class CampaignGenerator:
                 
                 # Select random enemies (1-4 enemies per encounter, scaling with encounter number)
                 num_enemies = random.randint(1, min(4, 1 + (i // 2)))
-                selected_enemies = list(enemies.order_by('?')[:num_enemies])
-                
-                # If we have fewer enemies than needed, use what we have
-                if len(selected_enemies) < num_enemies:
-                    selected_enemies = list(enemies.order_by('?'))
+                # (sample_rows returns every enemy when there are fewer than needed)
+                selected_enemies = sample_rows('enemies', ['all'], num_enemies, queryset=enemies.select_related('stats'))
                 
                 # Add enemies to encounter
                 for j, enemy in enumerate(selected_enemies[:num_enemies]):
@@ -2,7 +2,6 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db import transaction
 import logging
 
 from .models import Campaign, CampaignCharacter, CampaignEncounter, CharacterXP, TreasureRoom, TreasureRoomReward, RecruitableCharacter, RecruitmentRoom
@@ -11,16 +10,23 @@ from .serializers import (
     ShortRestRequestSerializer, LongRestRequestSerializer, TreasureRoomSerializer,
     RecruitableCharacterSerializer, RecruitmentRoomSerializer
 )
-from .utils import grant_encounter_xp, TreasureGenerator, RecruitmentGenerator, CampaignGenerator
+from .utils import TreasureGenerator, RecruitmentGenerator
+from .services.encounter_completion import EncounterCompletion
+from .services.party_rest import PartyRest
+from .services.procedural import ProceduralCampaign
+from .snapshot import get_snapshot
 from encounters.models import Encounter
 from characters.models import Character
 from combat.models import CombatSession
+from core.instrumentation import InstrumentedViewMixin, mark_stage, profiled
+from jobs.runner import enqueue
+from jobs.serializers import JobSerializer
 
 # Campaign logging
 logger = logging.getLogger('campaign')
 
 
-class CampaignViewSet(viewsets.ModelViewSet):
+class CampaignViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """API endpoint for managing campaigns"""
     serializer_class = CampaignSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -33,9 +39,18 @@ class CampaignViewSet(viewsets.ModelViewSet):
             'campaign_characters',
             'campaign_characters__character',
             'campaign_characters__character__stats',
+            'campaign_characters__character__character_class',
+            'campaign_characters__xp_tracking',
             'campaign_encounters'
         ).order_by('-created_at')
     
+    def get_snapshot_or_404(self, pk):
+        """Cached read model (campaigns.snapshot) of one of the user's campaigns, or None"""
+        document = get_snapshot(pk)
+        if document is None or document['owner_id'] != self.request.user.id:
+            return None
+        return document
+    
     def perform_create(self, serializer):
         """Automatically set the owner when creating a campaign"""
         serializer.save(owner=self.request.user)
@@ -51,11 +66,15 @@ class CampaignViewSet(viewsets.ModelViewSet):
             "party_level": 5,
             "party_size": 4,
             "encounter_count": 5,  // Optional, default 5
-            "name": "My Gauntlet"    // Optional
+            "name": "My Gauntlet",   // Optional
+            "stock_merchants": true, // Optional: pre-stock a merchant per encounter
+            "procedural": true,      // Optional: build encounters as they are reached
+            "seed": 123456           // Optional: replay a procedural run
         }
-        """
-        from campaigns.services.campaign_generator import CampaignGenerator
         
+        Returns 202 Accepted with the queued job; the generated campaign is
+        the job's result (GET /api/jobs/<id>/result/).
+        """
         # Extract parameters
         biome = request.data.get('biome')
         party_level = request.data.get('party_level')
@@ -93,6 +112,22 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        seed = request.data.get('seed')
+        if seed is not None:
+            try:
+                seed = int(seed)
+            except (ValueError, TypeError):
+                return Response(
+                    {"error": "seed must be an integer"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Campaign.seed is a signed 64-bit column
+            if not -2 ** 63 <= seed < 2 ** 63:
+                return Response(
+                    {"error": "seed must be between -2^63 and 2^63 - 1"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
         # Validate ranges
         if party_level < 1 or party_level > 20:
             return Response(
@@ -120,40 +155,26 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generate campaign
-        try:
-            generator = CampaignGenerator()
-            campaign = generator.generate_gauntlet(
-                biome=biome,
-                party_level=party_level,
-                party_size=party_size,
-                encounter_count=encounter_count,
-                owner=request.user,
-                name=name
-            )
-            
-            # Get boss info
-            boss_encounter = campaign.campaign_encounters.filter(is_boss=True).first()
-            
-            serializer = self.get_serializer(campaign)
-            return Response({
-                "message": "Gauntlet campaign generated successfully!",
-                "campaign": serializer.data,
-                "encounters": campaign.campaign_encounters.count(),
-                "boss_encounter": boss_encounter.encounter.name if boss_encounter else None,
-                "boss_loot": boss_encounter.boss_loot_table if boss_encounter else {}
-            }, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
-            logger.error(f"Error generating gauntlet: {e}")
-            return Response(
-                {"error": f"Failed to generate gauntlet: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Generation runs in the background job worker
+        job = enqueue('campaigns.generate_gauntlet', {
+            'biome': biome,
+            'party_level': party_level,
+            'party_size': party_size,
+            'encounter_count': encounter_count,
+            'name': name,
+            'stock_merchants': bool(request.data.get('stock_merchants', False)),
+            'procedural': bool(request.data.get('procedural', False)),
+            'seed': seed,
+        }, owner=request.user)
+        
+        return Response({
+            "message": "Gauntlet generation queued",
+            "job": JobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': f'/api/jobs/{job.pk}/'})
     
     @action(detail=True, methods=['post'])
     def populate(self, request, pk=None):
-        """Auto-populate campaign with random encounters and treasures"""
+        """Auto-populate campaign with random encounters and treasures (as a background job)"""
         campaign = self.get_object()
         
         if campaign.status != 'preparing':
@@ -162,25 +183,34 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if campaign.seed is not None:
+            return Response(
+                {"error": "Procedural campaigns generate their own encounters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         num_encounters = request.data.get('num_encounters', 5)
         auto_treasure = request.data.get('auto_treasure', True)
         
         try:
-            summary = CampaignGenerator.populate_campaign(
-                campaign,
-                num_encounters=int(num_encounters),
-                auto_treasure=bool(auto_treasure)
-            )
-            
-            return Response({
-                "message": "Campaign populated successfully",
-                "summary": summary
-            })
-        except Exception as e:
+            num_encounters = int(num_encounters)
+        except (ValueError, TypeError):
             return Response(
-                {"error": f"Failed to populate campaign: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"error": "num_encounters must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        
+        # Population runs in the background job worker
+        job = enqueue('campaigns.populate', {
+            'campaign_id': campaign.id,
+            'num_encounters': num_encounters,
+            'auto_treasure': bool(auto_treasure),
+        }, owner=request.user)
+        
+        return Response({
+            "message": "Campaign population queued",
+            "job": JobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': f'/api/jobs/{job.pk}/'})
     
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
@@ -296,6 +326,12 @@ class CampaignViewSet(viewsets.ModelViewSet):
     def add_encounter(self, request, pk=None):
         """Add an encounter to the campaign"""
         campaign = self.get_object()
+        
+        if campaign.seed is not None:
+            return Response(
+                {"error": "Procedural campaigns generate their own encounters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         encounter_id = request.data.get('encounter_id')
         
         if not encounter_id:
@@ -374,6 +410,7 @@ class CampaignViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=True, methods=['post'])
+    @profiled('complete_encounter')
     def complete_encounter(self, request, pk=None):
         """Complete the current encounter"""
         campaign = self.get_object()
@@ -405,50 +442,21 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 )
         
         try:
-            encounter.complete(combat_session=combat_session, rewards=rewards)
-            
-            # Grant XP to all characters
-            characters = campaign.get_alive_characters()
-            xp_results = grant_encounter_xp(encounter, characters)
-            
-            # Check if treasure room should be generated (every 2-3 encounters, or random 20% chance)
-            treasure_room = None
-            import random
-            should_generate_treasure = (
-                encounter.encounter_number % 3 == 0 or  # Every 3rd encounter
-                random.random() < 0.2  # 20% random chance
+            mark_stage('rules')
+            outcome = EncounterCompletion(campaign, encounter).run(
+                combat_session=combat_session, rewards=rewards
             )
+            encounter = outcome['campaign_encounter']
+            treasure_room = outcome['treasure_room']
+            recruitment_room = outcome['recruitment_room']
             
-            if should_generate_treasure and encounter.encounter_number < campaign.total_encounters:
-                treasure_room = TreasureGenerator.generate_treasure_room(
-                    campaign,
-                    encounter.encounter_number
-                )
-            
-            # Check if recruitment room should be generated (solo mode only, every 3-5 encounters)
-            recruitment_room = None
-            if campaign.start_mode == 'solo' and campaign.get_alive_characters().count() < 4:
-                should_generate_recruitment = (
-                    encounter.encounter_number % 4 == 0 or  # Every 4th encounter
-                    (random.random() < 0.15 and encounter.encounter_number >= 3)  # 15% chance after encounter 3
-                )
-                
-                if should_generate_recruitment and encounter.encounter_number < campaign.total_encounters:
-                    try:
-                        recruitment_room = RecruitmentGenerator.generate_recruitment_room(
-                            campaign,
-                            encounter.encounter_number
-                        )
-                    except ValueError as e:
-                        # Silently fail if recruitment can't be generated (e.g., party already full)
-                        pass
-            
+            mark_stage('serialize')
             serializer = CampaignEncounterSerializer(encounter)
             response_data = {
                 "message": f"Encounter {encounter.encounter_number} completed",
                 "campaign_encounter": serializer.data,
                 "campaign_status": campaign.status,
-                "xp_rewards": xp_results
+                "xp_rewards": outcome['xp_rewards']
             }
             
             if treasure_room:
@@ -501,61 +509,20 @@ class CampaignViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
-        character_ids = data.get('character_ids', [])
-        hit_dice_to_spend = data.get('hit_dice_to_spend', {})
-        
-        # Get characters to rest
-        if character_ids:
-            characters = campaign.campaign_characters.filter(
-                id__in=character_ids,
-                is_alive=True
+        try:
+            results = PartyRest(campaign).short_rest(
+                character_ids=data.get('character_ids', []),
+                hit_dice_to_spend=data.get('hit_dice_to_spend', {})
             )
-        else:
-            characters = campaign.get_alive_characters()
-        
-        if not characters.exists():
+        except ValueError as e:
             return Response(
-                {"error": "No alive characters to rest"},
+                {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        results = []
-        total_healing = 0
-        
-        with transaction.atomic():
-            for char in characters:
-                # Determine how many hit dice to spend
-                if char.id in hit_dice_to_spend:
-                    dice_to_spend = hit_dice_to_spend[char.id]
-                else:
-                    dice_to_spend = 1  # Default: spend 1 hit die
-                
-                # Spend hit dice
-                healing_done = 0
-                messages = []
-                for _ in range(min(dice_to_spend, char.get_available_hit_dice())):
-                    healing, message = char.spend_hit_die()
-                    healing_done += healing
-                    messages.append(message)
-                
-                results.append({
-                    "character_id": char.id,
-                    "character_name": char.character.name,
-                    "healing": healing_done,
-                    "hit_dice_spent": min(dice_to_spend, char.get_available_hit_dice()),
-                    "messages": messages,
-                    "current_hp": char.current_hp,
-                    "max_hp": char.max_hp,
-                    "remaining_hit_dice": char.get_available_hit_dice()
-                })
-                total_healing += healing_done
-            
-            campaign.short_rests_used += 1
-            campaign.save()
-        
         return Response({
             "message": "Short rest completed",
-            "total_healing": total_healing,
+            "total_healing": sum(result["healing"] for result in results),
             "short_rests_used": campaign.short_rests_used,
             "characters": results
         })
@@ -581,41 +548,14 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        characters = campaign.get_alive_characters()
-        if not characters.exists():
+        try:
+            results = PartyRest(campaign).long_rest()
+        except ValueError as e:
             return Response(
-                {"error": "No alive characters to rest"},
+                {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        results = []
-        
-        with transaction.atomic():
-            for char in characters:
-                # Full HP recovery
-                old_hp = char.current_hp
-                char.current_hp = char.max_hp
-                
-                # Restore all hit dice
-                char.restore_all_hit_dice()
-                
-                # TODO: Restore spell slots (would need class-specific logic)
-                # For now, we'll leave spell slots as-is
-                
-                char.save()
-                
-                results.append({
-                    "character_id": char.id,
-                    "character_name": char.character.name,
-                    "hp_restored": char.max_hp - old_hp,
-                    "current_hp": char.current_hp,
-                    "max_hp": char.max_hp,
-                    "hit_dice_restored": char.get_available_hit_dice()
-                })
-            
-            campaign.long_rests_used += 1
-            campaign.save()
-        
         return Response({
             "message": "Long rest completed",
             "long_rests_used": campaign.long_rests_used,
@@ -654,42 +594,35 @@ class CampaignViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def party_status(self, request, pk=None):
         """Get party status (HP, resources)"""
-        campaign = self.get_object()
-        party_status = []
-        
-        for char in campaign.get_alive_characters():
-            xp_info = {}
-            if hasattr(char, 'xp_tracking'):
-                xp_tracking = char.xp_tracking
-                xp_info = {
-                    "current_xp": xp_tracking.current_xp,
-                    "total_xp_gained": xp_tracking.total_xp_gained,
-                    "level_ups_gained": xp_tracking.level_ups_gained,
-                }
-            
-            party_status.append({
-                "id": char.id,
-                "character": char.character.name,
-                "level": char.character.level,
-                "class": char.character.character_class.get_name_display(),
-                "current_hp": char.current_hp,
-                "max_hp": char.max_hp,
-                "hp_percentage": round((char.current_hp / char.max_hp) * 100, 1) if char.max_hp > 0 else 0,
-                "hit_dice_remaining": char.hit_dice_remaining,
-                "available_hit_dice": char.get_available_hit_dice(),
-                "spell_slots": char.spell_slots,
-                "is_alive": char.is_alive,
-                **xp_info
-            })
+        document = self.get_snapshot_or_404(pk)
+        if document is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         
         return Response({
-            "party": party_status,
-            "total_characters": len(party_status),
-            "short_rests_used": campaign.short_rests_used,
-            "long_rests_used": campaign.long_rests_used,
-            "long_rests_remaining": campaign.long_rests_available - campaign.long_rests_used
+            "party": document['party'],
+            "total_characters": len(document['party']),
+            "short_rests_used": document['short_rests_used'],
+            "long_rests_used": document['long_rests_used'],
+            "long_rests_remaining": document['long_rests_remaining']
         })
     
+    @action(detail=True, methods=['get'])
+    def snapshot(self, request, pk=None):
+        """
+        Whole campaign state (party, current encounter, rooms) in one cached document
+        
+        Sends the document version as the ETag; a matching If-None-Match gets 304.
+        """
+        document = self.get_snapshot_or_404(pk)
+        if document is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        
+        etag = f'"{document["version"]}"'
+        if_none_match = [tag.strip().removeprefix('W/') for tag in request.headers.get('If-None-Match', '').split(',')]
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(document, headers={'ETag': etag})
+    
     @action(detail=True, methods=['post'])
     def end(self, request, pk=None):
         """End the campaign (manually)"""
@@ -1371,7 +1304,7 @@ class CampaignViewSet(viewsets.ModelViewSet):
             
             # Apply subclass features retroactively for current level
             from characters.models import CharacterFeature
-            from .class_features_data import get_subclass_features
+            from core.rules_registry import get_rules_registry
             
             features_applied = []
             current_level = character.level
@@ -1387,9 +1320,10 @@ class CampaignViewSet(viewsets.ModelViewSet):
             start_level = subclass_levels.get(character.character_class.name, 3)
             
             # Apply all subclass features from start_level to current level
-            for level in range(start_level, current_level + 1):
-                subclass_features = get_subclass_features(subclass, level)
-                
+            subclass_features_by_level = get_rules_registry().subclass_features_between(
+                subclass, start_level, current_level
+            )
+            for level, subclass_features in subclass_features_by_level.items():
                 for feature_data in subclass_features:
                     CharacterFeature.objects.create(
                         character=character,
@@ -1436,7 +1370,8 @@ class CampaignViewSet(viewsets.ModelViewSet):
     def discover_merchant(self, request, pk=None):
         """
         Discover a merchant encounter.
-        Generates random inventory based on current encounter depth.
+        Reveals the merchant stocked for the current encounter depth, or
+        generates one with random inventory based on that depth.
         """
         campaign = self.get_object()
         
@@ -1449,32 +1384,44 @@ class CampaignViewSet(viewsets.ModelViewSet):
         # Get current encounter depth
         encounter_depth = campaign.current_encounter_index + 1
         
-        # Check if merchant already exists for this encounter
         from merchants.models import MerchantEncounter
+        from merchants.rarity_weights import generate_merchant_name
+        from merchants.serializers import MerchantEncounterSerializer
+        
+        # Check if merchant already exists for this encounter
         existing_merchant = MerchantEncounter.objects.filter(
             campaign=campaign,
             encounter_number=encounter_depth
         ).first()
         
         if existing_merchant:
-            return Response(
-                {"error": f"Merchant already exists for encounter {encounter_depth}"},
-                status=status.HTTP_400_BAD_REQUEST
+            # A merchant stocked at generation time is revealed once
+            revealed = not existing_merchant.discovered and MerchantEncounter.objects.filter(
+                pk=existing_merchant.pk, discovered=False
+            ).update(discovered=True, discovered_at=timezone.now())
+            if not revealed:
+                return Response(
+                    {"error": f"Merchant already exists for encounter {encounter_depth}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            merchant = existing_merchant
+            merchant.refresh_from_db()
+        elif campaign.seed is not None:
+            # Procedural campaigns stock the merchant from their seed
+            merchant = ProceduralCampaign(campaign).materialize_merchant(
+                encounter_depth, count=int(request.data.get('item_count', 5))
             )
-        
-        # Create merchant
-        from merchants.rarity_weights import generate_merchant_name
-        from merchants.serializers import MerchantEncounterSerializer
-        
-        merchant = MerchantEncounter.objects.create(
-            campaign=campaign,
-            encounter_number=encounter_depth,
-            merchant_name=generate_merchant_name()
-        )
-        
-        # Generate inventory (5 items by default)
-        item_count = request.data.get('item_count', 5)
-        merchant.generate_inventory(count=int(item_count))
+        else:
+            # Create merchant
+            merchant = MerchantEncounter.objects.create(
+                campaign=campaign,
+                encounter_number=encounter_depth,
+                merchant_name=generate_merchant_name()
+            )
+            
+            # Generate inventory (5 items by default)
+            item_count = request.data.get('item_count', 5)
+            merchant.generate_inventory(count=int(item_count))
         
         serializer = MerchantEncounterSerializer(merchant)
         return Response({
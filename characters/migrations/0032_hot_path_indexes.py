@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0031_remove_character_builder_session'),
+        ('items', '0002_weapon_mastery_property'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='characteritem',
+            index=models.Index(condition=models.Q(('is_equipped', True)), fields=['character', 'equipment_slot'], name='char_item_equipped_idx'),
+        ),
+    ]
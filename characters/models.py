@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 from bestiary.models import Language, DamageType
@@ -579,6 +580,13 @@ class CharacterItem(models.Model):
     class Meta:
         unique_together = ['character', 'item', 'equipment_slot']
         ordering = ['equipment_slot', 'item__name']
+        indexes = [
+            # Equipped weapon/armor/shield lookups during attacks and AC calculation
+            models.Index(
+                fields=['character', 'equipment_slot'], condition=Q(is_equipped=True),
+                name='char_item_equipped_idx'
+            ),
+        ]
     
     def __str__(self):
         status = "equipped" if self.is_equipped else "inventory"
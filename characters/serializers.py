@@ -449,8 +449,8 @@ class CharacterSerializer(serializers.ModelSerializer):
                     from .models import Feat, CharacterFeat
                     feat = Feat.objects.filter(name__iexact=origin_feat_name).first()
                     if feat:
-                        from campaigns.feat_data import get_feat_config
-                        feat_config = get_feat_config(feat.name)
+                        from core.rules_registry import get_rules_registry
+                        feat_config = get_rules_registry().feat_config(feat.name)
                         
                         CharacterFeat.objects.create(
                             character=character,
@@ -640,8 +640,8 @@ class CharacterSerializer(serializers.ModelSerializer):
 
         # Apply Class Features (Level 1)
         if character_class:
-            from campaigns.class_features_data import get_class_features
-            features = get_class_features(character_class.name, 1, ruleset=ruleset_version)
+            from core.rules_registry import get_rules_registry
+            features = get_rules_registry().class_features(character_class.name, 1, ruleset=ruleset_version)
             for feature_data in features:
                 CharacterFeature.objects.create(
                     character=character,
@@ -696,13 +696,12 @@ class CharacterSerializer(serializers.ModelSerializer):
             
             # Apply Class Features for gained levels
             if instance.character_class:
-                from campaigns.class_features_data import get_class_features
+                from core.rules_registry import get_rules_registry
                 from .models import CharacterFeature
                 
                 # We need to apply features for ALL levels gained in this jump
                 for level in range(old_level + 1, new_level + 1):
-                    # Handle case-insensitive class name lookup
-                    features = get_class_features(instance.character_class.name.lower(), level)
+                    features = get_rules_registry().class_features(instance.character_class.name, level)
                     for feature_data in features:
                         CharacterFeature.objects.get_or_create(
                             character=instance,
@@ -780,7 +779,7 @@ class CharacterFeatSerializer(serializers.ModelSerializer):
         if character and feat_id:
             from .models import CharacterFeat, Feat
             # Check if likely duplicate, unless it's repeatable
-            from campaigns.feat_data import get_feat_config
+            from core.rules_registry import get_rules_registry
 
             duplicate_exists = not self.instance and CharacterFeat.objects.filter(character=character, feat_id=feat_id).exists()
             
@@ -788,7 +787,7 @@ class CharacterFeatSerializer(serializers.ModelSerializer):
                 # Check config
                 try:
                     feat = Feat.objects.get(pk=feat_id)
-                    feat_config = get_feat_config(feat.name)
+                    feat_config = get_rules_registry().feat_config(feat.name)
                     if feat_config.get('repeatable'):
                         # Allowed to duplicate
                         pass
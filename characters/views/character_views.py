@@ -245,7 +245,7 @@ class CharacterViewSet(viewsets.ModelViewSet):
         """
         import random
         from campaigns.utils import calculate_spell_slots, get_spellcasting_ability, calculate_spell_save_dc, calculate_spell_attack_bonus
-        from campaigns.class_features_data import get_class_features, get_subclass_features
+        from core.rules_registry import get_rules_registry
         from characters.spell_management import calculate_spells_known
         
         def dlog(msg):
@@ -428,7 +428,7 @@ class CharacterViewSet(viewsets.ModelViewSet):
             
             # Apply class features for this class level
             features_gained = []
-            class_features = get_class_features(target_class.name, new_class_level, ruleset=character.ruleset_version)
+            class_features = get_rules_registry().class_features(target_class.name, new_class_level, ruleset=character.ruleset_version)
             for feature_data in class_features:
                 CharacterFeature.objects.get_or_create(
                     character=character,
@@ -449,7 +449,7 @@ class CharacterViewSet(viewsets.ModelViewSet):
             
             # Apply subclass features if applicable
             if class_level.subclass:
-                subclass_features = get_subclass_features(class_level.subclass, new_class_level, ruleset=character.ruleset_version)
+                subclass_features = get_rules_registry().subclass_features(class_level.subclass, new_class_level, ruleset=character.ruleset_version)
                 for feature_data in subclass_features:
                     CharacterFeature.objects.get_or_create(
                         character=character,
@@ -634,7 +634,7 @@ class CharacterViewSet(viewsets.ModelViewSet):
         
         # Apply class features
         features_gained = []
-        class_features = get_class_features(primary_class.name, new_level, ruleset=character.ruleset_version)
+        class_features = get_rules_registry().class_features(primary_class.name, new_level, ruleset=character.ruleset_version)
         for feature_data in class_features:
             CharacterFeature.objects.get_or_create(
                 character=character,
@@ -653,7 +653,7 @@ class CharacterViewSet(viewsets.ModelViewSet):
         
         # Apply subclass features if character has a subclass
         if character.subclass:
-            subclass_features = get_subclass_features(character.subclass, new_level, ruleset=character.ruleset_version)
+            subclass_features = get_rules_registry().subclass_features(character.subclass, new_level, ruleset=character.ruleset_version)
             for feature_data in subclass_features:
                 CharacterFeature.objects.get_or_create(
                     character=character,
@@ -775,8 +775,8 @@ class CharacterViewSet(viewsets.ModelViewSet):
                 )
             
             # Get feat config (options/limits)
-            from campaigns.feat_data import get_feat_config
-            feat_config = get_feat_config(feat.name)
+            from core.rules_registry import get_rules_registry
+            feat_config = get_rules_registry().feat_config(feat.name)
             
             # Check if character already has this feat (and it's not repeatable)
             if CharacterFeat.objects.filter(character=character, feat=feat).exists():
@@ -1107,8 +1107,8 @@ class CharacterViewSet(viewsets.ModelViewSet):
                     feature.save()
             
             # Apply subclass features immediately
-            from campaigns.class_features_data import get_all_subclass_features_up_to_level
-            features_by_level = get_all_subclass_features_up_to_level(
+            from core.rules_registry import get_rules_registry
+            features_by_level = get_rules_registry().subclass_features_up_to_level(
                 subclass_name, 
                 character.level, 
                 ruleset=character.ruleset_version
@@ -0,0 +1,298 @@
+"""
+Batched enemy turn resolution
+
+Resolves every consecutive enemy turn of a session in memory and writes the
+outcome in one transaction, instead of saving each attack, action log row
+and turn advance as it happens:
+
+- the board (participants, enemy attacks/abilities, expiring conditions) is
+  loaded once
+- turns run through the tactical policy (combat.ai_policy) or
+  combat_ai.resolve_enemy_turn against the in-memory participants, and
+  the turn pointer advances with the same rules as CombatSession.next_turn()
+- HP changes are saved as deltas (current_hp = MAX(current_hp - dealt, 0)),
+  so heals and hits from concurrent requests still land; the other action
+  economy fields the batch changed are written only if they still hold
+  the values the batch started from
+- attack logs are saved with one bulk_create, then the session's round and
+  turn index (checked against the session version)
+
+A concurrent advance, or a concurrent change to a resource the batch also
+changed (e.g. a reaction spent meanwhile), rolls the batch back with
+StaleVersionError.
+
+Usage:
+    from combat.ai_batch import EnemyTurnBatch
+
+    batch = EnemyTurnBatch(session)
+    enemy_turns = batch.run()
+    batch.commit()
+"""
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When, prefetch_related_objects
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from core.concurrency import StaleVersionError, guarded_update, versioned_update
+
+from .ai_policy import Board, resolve_tactical_turn
+from .combat_ai import resolve_enemy_turn
+from .condition_effects import should_remove_condition
+from .models import CombatAction, CombatParticipant, ConditionApplication
+
+
+# Participant fields the AI and turn advancing can change
+TRACKED_FIELDS = [
+    'current_hp', 'is_active', 'action_used', 'bonus_action_used', 'reaction_used',
+    'movement_used', 'attacks_remaining', 'legendary_actions_remaining', 'spell_uses_remaining',
+]
+
+
+class EnemyTurnBatch:
+    """
+    Consecutive enemy turns of one session, resolved in memory.
+
+    Args:
+        session: CombatSession (status 'active')
+        participants: Every participant of the session, if already loaded
+            (e.g. the viewset's prefetch, so a serializer sees the results)
+        max_turns: Safety limit on turns resolved per batch
+        strategy: 'tactical' or 'simple' AI
+    """
+
+    def __init__(self, session, participants=None, max_turns=20, strategy='simple'):
+        self.session = session
+        self.max_turns = max_turns
+        self.strategy = strategy
+        if participants is None:
+            participants = session.participants.select_related('character', 'encounter_enemy__enemy')
+        self.participants = list(participants)
+        self.actions = []
+        self.removed_conditions = []
+        self.turns_resolved = 0
+        self._load()
+
+    def _load(self):
+        prefetch_related_objects(
+            self.participants,
+            'encounter_enemy__enemy__attacks', 'encounter_enemy__enemy__abilities'
+        )
+
+        # Practice enemies reference the bestiary by name: resolve them all at once
+        practice = [
+            participant for participant in self.participants
+            if participant.participant_type == 'enemy' and not participant.encounter_enemy_id
+            and participant.name and not hasattr(participant, '_ai_enemy')
+        ]
+        if practice:
+            from bestiary.models import Enemy
+            by_name = {}
+            enemies = Enemy.objects.filter(
+                name__in={participant.name for participant in practice}
+            ).order_by(*(Enemy._meta.ordering or ['pk'])).prefetch_related(
+                'attacks', 'abilities', 'spells__slots', 'legendary_actions'
+            )
+            for enemy in enemies:
+                by_name.setdefault(enemy.name, enemy)
+            for participant in practice:
+                participant._ai_enemy = by_name.get(participant.name)
+
+        self._initial = {
+            participant.id: [getattr(participant, field) for field in TRACKED_FIELDS]
+            for participant in self.participants
+        }
+        self.board = Board(self.participants) if self.strategy == 'tactical' else None
+
+        # Only round-based applications can expire while turns advance
+        by_id = {participant.id: participant for participant in self.participants}
+        self.expiring = list(
+            ConditionApplication.objects.filter(
+                participant_id__in=by_id, removed_at__isnull=True,
+                duration_type='round', expires_at_round__isnull=False,
+            ).select_related('condition')
+        )
+        for application in self.expiring:
+            application.participant = by_id[application.participant_id]
+
+    # ---------- turn order ----------
+
+    def initiative_order(self):
+        """Active participants, highest initiative first (ties by id)"""
+        return sorted(
+            (participant for participant in self.participants if participant.is_active),
+            key=lambda participant: (-participant.initiative, participant.id)
+        )
+
+    def current(self):
+        order = self.initiative_order()
+        if self.session.current_turn_index < len(order):
+            return order[self.session.current_turn_index]
+        return None
+
+    def _start_round(self, order):
+        for participant in order:
+            if participant.legendary_actions_max > 0:
+                participant.legendary_actions_remaining = participant.legendary_actions_max
+            participant.reaction_used = False
+
+    def advance(self):
+        """In-memory CombatSession.next_turn(); returns the new current participant"""
+        session = self.session
+        order = self.initiative_order()
+        if not order:
+            return None
+
+        if session.current_turn_index == 0:
+            self._start_round(order)
+        session.current_turn_index += 1
+        if session.current_turn_index >= len(order):
+            session.current_round += 1
+            session.current_turn_index = 0
+            self._start_round(order)
+
+        current = self.current()
+        if current:
+            current.action_used = False
+            current.bonus_action_used = False
+            current.reaction_used = False
+            current.movement_used = 0
+            current.attacks_remaining = current._calculate_attacks_per_action()
+
+        self._expire_conditions()
+        return current
+
+    def _expire_conditions(self):
+        still_active = []
+        for application in self.expiring:
+            if self.session.current_round > application.expires_at_round:
+                if should_remove_condition(application.participant, application.condition.name, 'end_of_turn'):
+                    application.removal_reason = 'end_of_turn'
+                else:
+                    application.removal_reason = 'duration_expired'
+                application.removed_at = timezone.now()
+                self.removed_conditions.append(application)
+            else:
+                still_active.append(application)
+        self.expiring = still_active
+
+    # ---------- resolve ----------
+
+    def living_players(self):
+        """Living player participants, lowest HP first"""
+        return sorted(
+            (
+                participant for participant in self.participants
+                if participant.participant_type == 'character' and participant.is_active
+                and participant.current_hp > 0
+            ),
+            key=lambda participant: participant.current_hp
+        )
+
+    def run(self):
+        """
+        Resolve enemy turns until a player's turn, no players are left
+        standing or max_turns is reached.
+
+        Returns:
+            list of {'actor', 'actor_id', 'actions'} per resolved turn
+        """
+        enemy_turns = []
+        while self.turns_resolved < self.max_turns:
+            current = self.current()
+            if not current or current.participant_type != 'enemy':
+                break
+
+            if self.board is not None:
+                actions = resolve_tactical_turn(
+                    self.session, current, pending_actions=self.actions, board=self.board
+                )
+            else:
+                actions = resolve_enemy_turn(
+                    self.session, current, targets=self.living_players(), pending_actions=self.actions
+                )
+            enemy_turns.append({
+                "actor": current.get_name(),
+                "actor_id": current.id,
+                "actions": actions,
+            })
+            self.turns_resolved += 1
+
+            if not self.advance():
+                break
+            if not self.living_players():
+                break
+        return enemy_turns
+
+    # ---------- write ----------
+
+    def changed_participants(self):
+        return [
+            participant for participant in self.participants
+            if [getattr(participant, field) for field in TRACKED_FIELDS] != self._initial[participant.id]
+        ]
+
+    def _participant_changes(self, participant):
+        """
+        -> (changes, guard): update() arguments for a participant's changes and
+        the old values the absolute ones are conditioned on
+        """
+        initial = dict(zip(TRACKED_FIELDS, self._initial[participant.id]))
+        changes = {}
+        guard = {}
+
+        # HP moves by the batch's delta, on top of whatever other requests did
+        delta = participant.current_hp - initial['current_hp']
+        if delta < 0:
+            changes['current_hp'] = Greatest(F('current_hp') + delta, 0)
+            changes['is_active'] = Case(When(current_hp__lte=-delta, then=Value(False)), default=F('is_active'))
+        elif delta > 0:
+            changes['current_hp'] = Least(F('current_hp') + delta, F('max_hp'))
+            changes['is_active'] = Case(When(current_hp__gt=-delta, then=Value(True)), default=F('is_active'))
+
+        for field in TRACKED_FIELDS:
+            if field not in changes and getattr(participant, field) != initial[field]:
+                changes[field] = getattr(participant, field)
+                guard[field] = initial[field]
+        return changes, guard
+
+    def _write_participants(self, participants):
+        """Save participant changes; StaleVersionError if a guarded field moved meanwhile"""
+        groups = {}
+        for participant in participants:
+            changes, guard = self._participant_changes(participant)
+            if 'current_hp' in changes:
+                # Relative update: reload the stored result
+                if not guarded_update(participant, Q(**guard), **changes):
+                    raise StaleVersionError(f"Combat participant {participant.pk} changed concurrently")
+                continue
+            # Identical absolute changes (e.g. every goblin's spent action) share one UPDATE
+            key = repr((sorted(changes.items()), sorted(guard.items())))
+            groups.setdefault(key, (changes, guard, []))[2].append(participant.pk)
+
+        for changes, guard, pks in groups.values():
+            if CombatParticipant.objects.filter(pk__in=pks, **guard).update(**changes) != len(pks):
+                raise StaleVersionError("Combat participants changed concurrently")
+
+    def commit(self):
+        """Write HP, action economy, action logs, expired conditions and the turn pointer"""
+        with transaction.atomic():
+            self._write_participants(self.changed_participants())
+            if self.actions:
+                CombatAction.objects.bulk_create(self.actions)
+            if self.removed_conditions:
+                ConditionApplication.objects.bulk_update(self.removed_conditions, ['removed_at', 'removal_reason'])
+                Through = CombatParticipant.conditions.through
+                for application in self.removed_conditions:
+                    Through.objects.filter(
+                        combatparticipant_id=application.participant_id,
+                        condition_id=application.condition_id,
+                    ).delete()
+            if not versioned_update(self.session, ['current_round', 'current_turn_index']):
+                raise StaleVersionError(f"Combat session {self.session.pk} advanced concurrently")
+
+        self._initial = {
+            participant.id: [getattr(participant, field) for field in TRACKED_FIELDS]
+            for participant in self.participants
+        }
+        self.actions = []
+        self.removed_conditions = []
@@ -0,0 +1,664 @@
+"""
+Tactical AI policy engine
+
+Scores an enemy's candidate actions by expected value and plays the best
+one, on top of the dice and logging helpers in combat.combat_ai:
+
+- weapon attacks: every attack against every targetable hostile, with
+  Multiattack sequences planned swing by swing
+- area spells from the enemy's spell list that match an AOE_SPELL_TEMPLATES
+  entry, placed on candidate points and resolved with aoe_utils
+- legendary actions: bosses spend one at the end of each other creature's
+  AI-resolved turn
+
+Values are exact expectations rather than samples: hit and critical chances
+come from d20 tables (normal, advantage, disadvantage), save chances are
+closed form, and damage expressions are convolved once into "at least k
+damage" tables, so the chance of dropping a target is a lookup. Strategy
+profiles weight expected damage, kills, focus on wounded targets, broken
+concentration, friendly fire and limited spell uses. Cover, conditions
+(advantage/disadvantage) and spell uses (as can_cast_enemy_spell counts
+them) are taken into account.
+
+Each swing also looks one step ahead (the value of the best follow-up swing
+on the expected board) until the per-turn time budget
+(COMBAT_AI_TURN_BUDGET_MS) is spent; after that the policy decides greedily.
+
+Usage:
+    from combat.ai_policy import resolve_tactical_turn
+
+    actions = resolve_tactical_turn(session, participant, session.participants.all())
+"""
+import math
+import re
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import prefetch_related_objects
+
+from core.instrumentation import mark_stage, profiled
+
+from .aoe_utils import AOE_SPELL_TEMPLATES, get_aoe_targets
+from .combat_ai import (
+    _check_multiattack, _execute_attack, _get_enemy_attacks, _parse_and_roll_damage, _resolve_enemy
+)
+from .environmental_effects import calculate_cover_ac_bonus, has_full_cover
+from .utils import roll_d20
+
+
+STRATEGY_PROFILES = {
+    # damage: per expected hit point dealt to a hostile
+    # kill: per expected hostile dropped
+    # focus: per fraction of a target's remaining HP removed
+    # concentration: per expected broken concentration
+    # friendly_fire: per expected hit point dealt to an ally
+    # spell_cost: per limited spell use spent
+    # lookahead: weight of the best follow-up swing on the expected board
+    'brute': {
+        'damage': 1.0, 'kill': 8.0, 'focus': 4.0, 'concentration': 2.0,
+        'friendly_fire': 1.0, 'spell_cost': 6.0, 'lookahead': 0.5,
+    },
+    'caster': {
+        'damage': 1.0, 'kill': 8.0, 'focus': 2.0, 'concentration': 6.0,
+        'friendly_fire': 1.5, 'spell_cost': 2.0, 'lookahead': 0.5,
+    },
+    'boss': {
+        'damage': 1.0, 'kill': 10.0, 'focus': 3.0, 'concentration': 6.0,
+        'friendly_fire': 0.25, 'spell_cost': 1.0, 'lookahead': 0.75,
+    },
+}
+
+# Target conditions that grant advantage on attacks against it, and
+# attacker conditions that impose disadvantage on its own attacks
+ADVANTAGE_AGAINST = {'blinded', 'paralyzed', 'petrified', 'prone', 'restrained', 'stunned', 'unconscious'}
+DISADVANTAGE_ON_ATTACKS = {'blinded', 'frightened', 'poisoned', 'prone', 'restrained'}
+
+DEFAULT_SPELL_DC = 13
+
+# Points tried per area spell (sphere centres, cone/line directions)
+MAX_PLACEMENTS = 64
+
+DICE_PATTERN = re.compile(r'(\d+)d(\d+)([+\-]\d+)?')
+
+
+# ==================== EXPECTED VALUES ====================
+
+@lru_cache(maxsize=None)
+def hit_chances(need, mode=0):
+    """
+    Chances of a normal hit and of a critical hit for an attack that needs
+    a d20 roll of at least `need` (target AC minus attack bonus).
+
+    mode: 1 with advantage, -1 with disadvantage. A natural 1 always
+    misses and a natural 20 always crits, as in combat_ai._execute_attack.
+    """
+    if mode > 0:
+        weights = [(2 * roll - 1) / 400 for roll in range(1, 21)]
+    elif mode < 0:
+        weights = [(41 - 2 * roll) / 400 for roll in range(1, 21)]
+    else:
+        weights = [1 / 20] * 20
+    hit = sum(weights[roll - 1] for roll in range(2, 20) if roll >= need)
+    return hit, weights[19]
+
+
+def save_success_chance(dc, modifier):
+    """Chance that d20 + modifier meets the DC"""
+    return min(1.0, max(0.0, (21 - (dc - modifier)) / 20))
+
+
+@lru_cache(maxsize=256)
+def damage_table(damage, critical=False, halved=False):
+    """
+    Distribution of a damage expression as (mean, at_least), where
+    at_least[k] is the chance of dealing at least k damage.
+
+    Mirrors combat_ai._parse_and_roll_damage: dice are doubled on a
+    critical and a hit deals at least 1; halved (a successful save) rounds
+    down like the spell endpoints.
+    """
+    expression = damage.strip()
+    match = DICE_PATTERN.match(expression)
+    if match:
+        count, size = int(match.group(1)), int(match.group(2))
+        bonus = int(match.group(3)) if match.group(3) else 0
+    else:
+        try:
+            count, size, bonus = 0, 1, int(expression)
+        except ValueError:
+            count, size, bonus = 1, 6, 0
+    if critical:
+        count *= 2
+
+    totals = [1.0]  # totals[v] = chance the dice sum to v
+    for _ in range(count):
+        rolled = [0.0] * (len(totals) + size)
+        for value, chance in enumerate(totals):
+            if chance:
+                share = chance / size
+                for face in range(1, size + 1):
+                    rolled[value + face] += share
+        totals = rolled
+
+    outcomes = {}
+    for value, chance in enumerate(totals):
+        if chance:
+            dealt = max(1, value + bonus)
+            if halved:
+                dealt //= 2
+            outcomes[dealt] = outcomes.get(dealt, 0.0) + chance
+
+    highest = max(outcomes)
+    at_least = [0.0] * (highest + 2)
+    for value in range(highest, -1, -1):
+        at_least[value] = at_least[value + 1] + outcomes.get(value, 0.0)
+    mean = sum(value * chance for value, chance in outcomes.items())
+    return mean, tuple(at_least)
+
+
+def chance_at_least(at_least, amount):
+    """Look up the chance of dealing at least `amount` damage"""
+    amount = math.ceil(amount)
+    if amount <= 0:
+        return 1.0
+    if amount >= len(at_least):
+        return 0.0
+    return at_least[amount]
+
+
+# ==================== BOARD ====================
+
+class Unit:
+    """A participant as the policy sees it"""
+
+    __slots__ = (
+        'participant', 'id', 'participant_type', 'is_active', 'hp', 'max_hp', 'ac',
+        'full_cover', 'position_x', 'position_y', 'conditions', 'concentrating', 'saves',
+    )
+
+    def __init__(self, participant):
+        self.participant = participant
+        self.id = participant.id
+        self.participant_type = participant.participant_type
+        self.max_hp = max(1, participant.max_hp)
+        cover = participant.cover_type
+        self.full_cover = has_full_cover(cover)
+        self.ac = participant.armor_class + (calculate_cover_ac_bonus(cover) or 0)
+        try:
+            position = participant.position
+            self.position_x, self.position_y = position.x, position.y
+        except ObjectDoesNotExist:
+            self.position_x, self.position_y = participant.position_x, participant.position_y
+        self.conditions = {condition.name for condition in participant.conditions.all()}
+        self.saves = {}
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the state that changes during a turn"""
+        participant = self.participant
+        self.hp = participant.current_hp
+        self.is_active = participant.is_active and participant.current_hp > 0
+        self.concentrating = participant.is_concentrating
+
+    def save_modifier(self, ability):
+        if ability not in self.saves:
+            self.saves[ability] = self.participant.get_ability_modifier(ability)
+        return self.saves[ability]
+
+
+class Board:
+    """
+    Every participant of a session, loaded once with what the policy reads.
+
+    Args:
+        participants: The session's CombatParticipants (e.g. a prefetched
+            session.participants.all(); objects are updated in place)
+    """
+
+    def __init__(self, participants):
+        self.participants = list(participants)
+        prefetch_related_objects(
+            self.participants,
+            'conditions', 'position', 'character__stats',
+            'encounter_enemy__enemy__stats', 'encounter_enemy__enemy__attacks',
+            'encounter_enemy__enemy__abilities', 'encounter_enemy__enemy__spells__slots',
+            'encounter_enemy__enemy__legendary_actions',
+        )
+        self.units = {participant.id: Unit(participant) for participant in self.participants}
+
+    def refresh(self):
+        for unit in self.units.values():
+            unit.refresh()
+
+    def hostiles_of(self, unit):
+        return [
+            other for other in self.units.values()
+            if other.is_active and other.participant_type != unit.participant_type and not other.full_cover
+        ]
+
+
+def choose_profile(participant, enemy=None):
+    """Default strategy profile: bosses, area casters, everyone else"""
+    if participant.legendary_actions_max > 0:
+        return 'boss'
+    if enemy is not None and any(_template_for(spell) for spell in enemy.spells.all()):
+        return 'caster'
+    return 'brute'
+
+
+def _template_for(spell):
+    return AOE_SPELL_TEMPLATES.get(spell.name.lower().replace(' ', '_'))
+
+
+# ==================== POLICY ====================
+
+class TacticalPolicy:
+    """
+    Action selection for one enemy on a board.
+
+    Args:
+        board: Board of the session
+        participant: The acting CombatParticipant
+        profile: Name in STRATEGY_PROFILES (chosen from the stat block if None)
+        budget_ms: Time budget for lookahead (COMBAT_AI_TURN_BUDGET_MS)
+    """
+
+    def __init__(self, board, participant, profile=None, budget_ms=None):
+        self.board = board
+        self.me = board.units[participant.id]
+        self.actor = self.me.participant
+        self.enemy = _resolve_enemy(self.actor)
+        self.profile = profile or choose_profile(self.actor, self.enemy)
+        self.weights = STRATEGY_PROFILES[self.profile]
+        if budget_ms is None:
+            budget_ms = getattr(settings, 'COMBAT_AI_TURN_BUDGET_MS', 50)
+        self.deadline = time.perf_counter() + budget_ms / 1000
+        self.attacks = _get_enemy_attacks(self.actor)
+
+    def out_of_time(self):
+        return time.perf_counter() >= self.deadline
+
+    def attack_mode(self, target):
+        """1 for advantage, -1 for disadvantage, 0 for a straight roll"""
+        advantage = bool(target.conditions & ADVANTAGE_AGAINST) or 'invisible' in self.me.conditions
+        disadvantage = bool(self.me.conditions & DISADVANTAGE_ON_ATTACKS) or 'invisible' in target.conditions
+        return int(advantage) - int(disadvantage)
+
+    # ---------- scoring ----------
+
+    def score(self, target, hp, expected, kill_chance, damaged_chance, damage_if_hit):
+        """Profile-weighted value of an expected outcome against one unit"""
+        weights = self.weights
+        dealt = min(expected, hp)
+        if target.participant_type == self.me.participant_type:
+            return -weights['friendly_fire'] * dealt - weights['kill'] * kill_chance
+        value = weights['damage'] * dealt + weights['kill'] * kill_chance
+        value += weights['focus'] * dealt / max(hp, 1)
+        if target.concentrating and damaged_chance:
+            dc = max(10, int(damage_if_hit) // 2)
+            broken = 1 - save_success_chance(dc, target.save_modifier('CON'))
+            value += weights['concentration'] * damaged_chance * broken
+        return value
+
+    def swing_value(self, attack, target, hp):
+        """(score, expected damage) of one attack against a target at hp"""
+        hit, critical = hit_chances(max(-1, min(22, target.ac - attack['bonus'])), self.attack_mode(target))
+        mean, at_least = damage_table(attack['damage'])
+        critical_mean, critical_at_least = damage_table(attack['damage'], critical=True)
+        expected = hit * mean + critical * critical_mean
+        kill_chance = hit * chance_at_least(at_least, hp) + critical * chance_at_least(critical_at_least, hp)
+        damaged = hit + critical
+        damage_if_hit = expected / damaged if damaged else 0
+        return self.score(target, hp, expected, kill_chance, damaged, damage_if_hit), expected
+
+    def best_swing(self, hp, swings_left=1, lookahead=True):
+        """
+        Best (score, attack, target, expected damage) for the next swing.
+
+        Args:
+            hp: {unit id: expected HP} of the board
+            swings_left: Swings remaining this turn, including this one
+            lookahead: Add the value of the best follow-up swing on the
+                board this swing is expected to leave (while time allows)
+        """
+        best = None
+        for target in self.board.hostiles_of(self.me):
+            target_hp = hp[target.id]
+            if target_hp <= 0:
+                continue
+            for attack in self.attacks:
+                value, expected = self.swing_value(attack, target, target_hp)
+                if lookahead and swings_left > 1 and not self.out_of_time():
+                    after = dict(hp)
+                    after[target.id] = max(0.0, target_hp - expected)
+                    follow_up = self.best_swing(after, lookahead=False)
+                    if follow_up:
+                        value += self.weights['lookahead'] * follow_up[0]
+                if best is None or value > best[0]:
+                    best = (value, attack, target, expected)
+        return best
+
+    def attack_sequence_value(self, swings):
+        """Expected value of the Attack action, swing by swing on the expected board"""
+        hp = {unit.id: unit.hp for unit in self.board.units.values()}
+        total = 0.0
+        for _ in range(swings):
+            swing = self.best_swing(hp, lookahead=False)
+            if swing is None:
+                break
+            value, _, target, expected = swing
+            total += value
+            hp[target.id] = max(0.0, hp[target.id] - expected)
+        return total
+
+    # ---------- spells ----------
+
+    def spell_uses_left(self, spell):
+        """
+        Remaining uses of an enemy spell, or None if unlimited.
+        Same rules as CombatParticipant.can_cast_enemy_spell, without saving.
+        """
+        actor = self.actor
+        if not actor.encounter_enemy_id:
+            return None  # Practice enemies are not limited
+        if spell.name in actor.spell_uses_remaining:
+            return actor.spell_uses_remaining[spell.name]
+        slots = list(spell.slots.all())
+        return slots[0].uses if slots else None
+
+    def placements(self, template, hostiles):
+        """Candidate aoe_utils keyword arguments for a template"""
+        shape, size = template['shape'], template['size']
+        me = self.me
+        if shape == 'sphere':
+            points = [(unit.position_x, unit.position_y) for unit in hostiles]
+            points += [
+                ((a.position_x + b.position_x) / 2, (a.position_y + b.position_y) / 2)
+                for index, a in enumerate(hostiles) for b in hostiles[index + 1:]
+            ]
+            return [{'origin_x': x, 'origin_y': y, 'radius': size} for x, y in points[:MAX_PLACEMENTS]]
+
+        placements = []
+        for unit in hostiles[:MAX_PLACEMENTS]:
+            dx, dy = unit.position_x - me.position_x, unit.position_y - me.position_y
+            if shape == 'cube':
+                placements.append({
+                    'origin_x': unit.position_x - size / 2, 'origin_y': unit.position_y - size / 2, 'size': size,
+                })
+            elif dx or dy:
+                if shape == 'cone':
+                    placements.append({
+                        'caster_x': me.position_x, 'caster_y': me.position_y,
+                        'target_x': unit.position_x, 'target_y': unit.position_y, 'length': size,
+                    })
+                else:
+                    scale = size / math.hypot(dx, dy)
+                    placements.append({
+                        'start_x': me.position_x, 'start_y': me.position_y,
+                        'end_x': me.position_x + dx * scale, 'end_y': me.position_y + dy * scale,
+                        'width': template.get('width', 5),
+                    })
+        return placements
+
+    def area_value(self, template, dc, affected):
+        """Expected value of an area spell on the affected units"""
+        save = template['save_type'].upper()
+        full_mean, full_at_least = damage_table(template['base_damage'])
+        half_mean, half_at_least = damage_table(template['base_damage'], halved=True)
+        total = 0.0
+        for unit in affected:
+            saved = save_success_chance(dc, unit.save_modifier(save))
+            expected = (1 - saved) * full_mean + saved * half_mean
+            kill_chance = (
+                (1 - saved) * chance_at_least(full_at_least, unit.hp)
+                + saved * chance_at_least(half_at_least, unit.hp)
+            )
+            total += self.score(unit, unit.hp, expected, kill_chance, 1.0, expected)
+        return total
+
+    def best_spell(self):
+        """Best area spell option as a dict (spell, template, dc, affected, score), or None"""
+        if self.enemy is None:
+            return None
+        hostiles = self.board.hostiles_of(self.me)
+        if not hostiles:
+            return None
+        active = [unit for unit in self.board.units.values() if unit.is_active]
+
+        best = None
+        for spell in self.enemy.spells.all():
+            template = _template_for(spell)
+            if not template:
+                continue
+            uses_left = self.spell_uses_left(spell)
+            if uses_left is not None and uses_left <= 0:
+                continue
+            cost = self.weights['spell_cost'] if uses_left is not None else 0.0
+            dc = spell.save_dc or DEFAULT_SPELL_DC
+            for placement in self.placements(template, hostiles):
+                affected = [unit for unit, _ in get_aoe_targets(active, template['shape'], **placement)]
+                if template['shape'] != 'sphere':
+                    # Cones, lines and cubes emanate from the caster
+                    affected = [unit for unit in affected if unit is not self.me]
+                if not affected:
+                    continue
+                value = self.area_value(template, dc, affected) - cost
+                if best is None or value > best['score']:
+                    best = {
+                        'spell': spell, 'template': template, 'dc': dc,
+                        'placement': placement, 'affected': affected, 'score': value,
+                    }
+                if best is not None and self.out_of_time():
+                    return best
+        return best
+
+    # ---------- legendary actions ----------
+
+    def legendary_options(self):
+        """(name, cost, attacks) for legendary actions that make an attack"""
+        remaining = self.actor.legendary_actions_remaining
+        defined = list(self.enemy.legendary_actions.all()) if self.enemy is not None else []
+        if not defined:
+            return [('Legendary Attack', 1, self.attacks)] if remaining >= 1 else []
+
+        options = []
+        for legendary in defined:
+            text = f"{legendary.name} {legendary.description}".lower()
+            if legendary.cost > remaining or 'attack' not in text:
+                continue
+            named = [attack for attack in self.attacks if attack['name'].lower() in text]
+            options.append((legendary.name, legendary.cost, named or self.attacks))
+        return options
+
+    def best_legendary(self):
+        """Best (value, name, cost, attack, target), or None"""
+        hp = {unit.id: unit.hp for unit in self.board.units.values()}
+        best = None
+        for name, cost, attacks in self.legendary_options():
+            for target in self.board.hostiles_of(self.me):
+                for attack in attacks:
+                    value = self.swing_value(attack, target, hp[target.id])[0] / cost
+                    if best is None or value > best[0]:
+                        best = (value, name, cost, attack, target)
+        return best
+
+
+# ==================== EXECUTION ====================
+
+@profiled('tactical_turn')
+def resolve_tactical_turn(session, participant, participants=None, pending_actions=None, profile=None, board=None):
+    """
+    Resolve an enemy's turn with the tactical policy, then let bosses
+    spend legendary actions.
+
+    Args:
+        session: CombatSession instance
+        participant: CombatParticipant (enemy) whose turn it is
+        participants: The session's participants (queried if not given)
+        pending_actions: As in combat_ai.resolve_enemy_turn: nothing is
+            saved and unsaved CombatAction rows are appended here
+        profile: Strategy profile name (chosen per enemy if None)
+        board: A Board to reuse across turns (refreshed before use)
+
+    Returns:
+        list[dict]: Action results, in the format of resolve_enemy_turn
+    """
+    if board is None:
+        board = Board(participants if participants is not None else session.participants.all())
+    else:
+        board.refresh()
+    mark_stage('rules')
+    policy = TacticalPolicy(board, participant, profile)
+    actor = policy.actor
+
+    if not board.hostiles_of(policy.me):
+        return [{
+            'type': 'skip',
+            'message': f"{actor.get_name()} has no valid targets.",
+        }]
+
+    _, attack_count = _check_multiattack(actor)
+    actions = []
+    spell = policy.best_spell()
+    if spell is not None and spell['score'] > policy.attack_sequence_value(attack_count):
+        actions = _cast_area_spell(session, policy, spell, pending_actions)
+
+    if not actions:
+        for swing in range(attack_count):
+            mark_stage('rules')
+            hp = {unit.id: unit.hp for unit in board.units.values()}
+            choice = policy.best_swing(hp, swings_left=attack_count - swing)
+            if choice is None:
+                break
+            _, attack, target, expected = choice
+            mode = policy.attack_mode(target)
+            result = _execute_attack(
+                session, actor, target.participant, attack, pending_actions,
+                advantage=mode > 0, disadvantage=mode < 0, target_ac=target.ac,
+            )
+            result['expected_damage'] = round(expected, 2)
+            target.refresh()
+            actions.append(result)
+
+    for action in actions:
+        action['profile'] = policy.profile
+    actions.extend(resolve_legendary_actions(session, board, actor, pending_actions))
+    return actions
+
+
+def resolve_legendary_actions(session, board, after, pending_actions=None):
+    """
+    At the end of `after`'s turn, each other boss with legendary actions
+    left spends one on its best legendary attack.
+    """
+    results = []
+    for unit in list(board.units.values()):
+        boss = unit.participant
+        if (boss.id == after.id or boss.participant_type != 'enemy' or not unit.is_active
+                or boss.legendary_actions_remaining <= 0):
+            continue
+        policy = TacticalPolicy(board, boss, budget_ms=0)
+        choice = policy.best_legendary()
+        if choice is None or choice[0] <= 0:
+            continue
+        _, name, cost, attack, target = choice
+        if pending_actions is None:
+            # Spent in the database first, so a concurrent request can't overspend
+            if not boss.use_legendary_action(cost)[0]:
+                continue
+        else:
+            boss.legendary_actions_remaining -= cost
+        mode = policy.attack_mode(target)
+        result = _execute_attack(
+            session, boss, target.participant, {**attack, 'name': f"{name} ({attack['name']})"},
+            pending_actions, advantage=mode > 0, disadvantage=mode < 0,
+            target_ac=target.ac, legendary_cost=cost,
+        )
+        target.refresh()
+        result['profile'] = policy.profile
+        results.append(result)
+    return results
+
+
+def _cast_area_spell(session, policy, option, pending_actions=None):
+    """
+    Cast a planned area spell: one damage roll, a save per creature in the
+    area (half damage on a success), one CombatAction per creature.
+    """
+    from .models import CombatAction
+
+    actor = policy.actor
+    spell, template, dc = option['spell'], option['template'], option['dc']
+    if pending_actions is None and not actor.can_cast_enemy_spell(spell.name):
+        return []
+
+    save = template['save_type'].upper()
+    damage_amount, damage_type = _parse_and_roll_damage(f"{template['base_damage']} {template['damage_type']}")
+    results = []
+    for unit in option['affected']:
+        target = unit.participant
+        save_roll, _ = roll_d20()
+        saved = save_roll + unit.save_modifier(save) >= dc
+        dealt = damage_amount // 2 if saved else damage_amount
+        hp_before = target.current_hp
+        if pending_actions is None:
+            target.take_damage(dealt, check_concentration=False)
+        else:
+            target.current_hp = max(0, hp_before - dealt)
+            if target.current_hp <= 0:
+                target.is_active = False
+        killed = target.current_hp <= 0
+        unit.refresh()
+
+        result = {
+            'type': 'spell',
+            'attacker': actor.get_name(),
+            'attacker_id': actor.id,
+            'target': target.get_name(),
+            'target_id': target.id,
+            'spell_name': spell.name,
+            'save_type': save,
+            'save_dc': dc,
+            'save_roll': save_roll,
+            'save_success': saved,
+            'damage': dealt,
+            'damage_type': damage_type,
+            'target_hp_before': hp_before,
+            'target_hp_after': target.current_hp,
+            'target_killed': killed,
+        }
+        outcome = 'saves' if saved else 'fails'
+        action = CombatAction(
+            combat_session=session,
+            actor=actor,
+            target=target,
+            action_type='spell',
+            attack_name=spell.name,
+            damage_amount=dealt or None,
+            save_type=save,
+            save_dc=dc,
+            save_roll=save_roll,
+            save_success=saved,
+            round_number=session.current_round,
+            turn_number=session.current_turn_index,
+            description=(
+                f"{actor.get_name()} casts {spell.name}: {target.get_name()} {outcome} "
+                f"(DC {dc}) and takes {dealt} {damage_type} damage."
+            ),
+        )
+        if pending_actions is None:
+            action.save()
+        else:
+            pending_actions.append(action)
+        results.append(result)
+
+    if pending_actions is None:
+        actor.use_enemy_spell(spell.name)
+    else:
+        uses_left = policy.spell_uses_left(spell)
+        if uses_left is not None:
+            # A new dict, so bulk writers see the field change
+            actor.spell_uses_remaining = {**actor.spell_uses_remaining, spell.name: uses_left - 1}
+    return results
@@ -7,9 +7,11 @@ based on the enemy's available actions and basic tactical rules.
 import re
 import random
 from combat.utils import roll_d20
+from core.instrumentation import mark_stage, profiled
 
 
-def resolve_enemy_turn(session, participant):
+@profiled('enemy_turn')
+def resolve_enemy_turn(session, participant, targets=None, pending_actions=None):
     """
     Resolve an enemy participant's turn using simple AI.
     
@@ -22,6 +24,11 @@ def resolve_enemy_turn(session, participant):
     Args:
         session: CombatSession instance
         participant: CombatParticipant (enemy) whose turn it is
+        targets: Living player participants sorted by current HP; queried
+            when not given
+        pending_actions: If given, nothing is saved: damage stays on the
+            in-memory targets and unsaved CombatAction rows are appended
+            here for the caller to write in bulk (see combat.ai_batch)
         
     Returns:
         list[dict]: List of action results
@@ -29,13 +36,14 @@ def resolve_enemy_turn(session, participant):
     actions = []
     
     # Get all living player targets
-    targets = list(
-        session.participants.filter(
-            participant_type='character',
-            is_active=True,
-            current_hp__gt=0,
-        ).order_by('current_hp')  # Lowest HP first
-    )
+    if targets is None:
+        targets = list(
+            session.participants.filter(
+                participant_type='character',
+                is_active=True,
+                current_hp__gt=0,
+            ).order_by('current_hp')  # Lowest HP first
+        )
     
     if not targets:
         actions.append({
@@ -60,6 +68,7 @@ def resolve_enemy_turn(session, participant):
     # Execute attacks
     for i in range(attack_count):
         # Pick target (lowest HP that's still alive)
+        mark_stage('rules')
         target = _select_target(targets)
         if not target:
             break
@@ -68,7 +77,7 @@ def resolve_enemy_turn(session, participant):
         attack = _select_attack(enemy_attacks)
         
         # Execute the attack
-        result = _execute_attack(session, participant, target, attack)
+        result = _execute_attack(session, participant, target, attack, pending_actions)
         actions.append(result)
         
         # Refresh target list (they might have died)
@@ -82,8 +91,12 @@ def _resolve_enemy(participant):
     if participant.encounter_enemy:
         return participant.encounter_enemy.enemy
     elif participant.participant_type == 'enemy' and participant.name:
-        from bestiary.models import Enemy as EnemyModel
-        return EnemyModel.objects.filter(name=participant.name).first()
+        # Practice enemies are looked up by name once per participant
+        # (combat.ai_batch fills this in for a whole board at once)
+        if not hasattr(participant, '_ai_enemy'):
+            from bestiary.models import Enemy as EnemyModel
+            participant._ai_enemy = EnemyModel.objects.filter(name=participant.name).first()
+        return participant._ai_enemy
     return None
 
 
@@ -160,10 +173,16 @@ def _select_attack(attacks):
     return max(attacks, key=lambda a: a['bonus'])
 
 
-def _execute_attack(session, attacker, target, attack):
+def _execute_attack(session, attacker, target, attack, pending_actions=None,
+                    advantage=False, disadvantage=False, target_ac=None, legendary_cost=0):
     """
     Execute a single attack and apply damage.
     
+    With pending_actions, the target is not saved and the CombatAction is
+    appended there unsaved instead of being created. target_ac overrides
+    the target's armor class (e.g. to include cover); a legendary_cost
+    logs the attack as a legendary action.
+    
     Returns:
         dict with attack results
     """
@@ -174,13 +193,15 @@ def _execute_attack(session, attacker, target, attack):
     damage_str = attack['damage']
     
     # Roll attack
-    roll, roll_breakdown = roll_d20()
+    mark_stage('roll')
+    roll, roll_breakdown = roll_d20(advantage, disadvantage)
     attack_total = roll + attack_bonus
     
     # Determine hit
     is_critical = (roll == 20)
     is_fumble = (roll == 1)
-    target_ac = target.armor_class
+    if target_ac is None:
+        target_ac = target.armor_class
     hit = is_critical or (not is_fumble and attack_total >= target_ac)
     
     result = {
@@ -203,17 +224,24 @@ def _execute_attack(session, attacker, target, attack):
         'target_hp_after': target.current_hp,
         'target_killed': False,
     }
+    if legendary_cost:
+        result['type'] = 'legendary_action'
+        result['legendary_cost'] = legendary_cost
     
     if hit:
         # Parse and roll damage
         damage_amount, damage_type = _parse_and_roll_damage(damage_str, is_critical)
         
         # Apply damage
-        target.current_hp = max(0, target.current_hp - damage_amount)
+        mark_stage('persist')
+        if pending_actions is None:
+            # Atomic decrement, so concurrent hits and heals on the target still land
+            target.take_damage(damage_amount, check_concentration=False)
+        else:
+            target.current_hp = max(0, target.current_hp - damage_amount)
+            if target.current_hp <= 0:
+                target.is_active = False
         target_killed = target.current_hp <= 0
-        if target_killed:
-            target.is_active = False
-        target.save()
         
         result['damage'] = damage_amount
         result['damage_type'] = damage_type
@@ -221,29 +249,41 @@ def _execute_attack(session, attacker, target, attack):
         result['target_killed'] = target_killed
     
     # Log the action
+    mark_stage('persist')
+    if pending_actions is not None:
+        pending_actions.append(CombatAction(**_action_fields(session, attacker, target, result)))
+        return result
+    
     try:
-        CombatAction.objects.create(
-            combat_session=session,
-            actor=attacker,
-            target=target,
-            action_type='attack',
-            attack_name=attack_name,
-            attack_roll=roll,
-            attack_modifier=attack_bonus,
-            attack_total=attack_total,
-            round_number=session.current_round,
-            turn_number=session.current_turn_index,
-            hit=hit,
-            critical=is_critical,
-            damage_amount=result['damage'] if hit else 0,
-            description=_format_attack_description(result),
-        )
+        CombatAction.objects.create(**_action_fields(session, attacker, target, result))
     except Exception:
         pass  # Don't fail the AI turn if logging fails
     
     return result
 
 
+def _action_fields(session, attacker, target, result):
+    """CombatAction fields for an attack result"""
+    return dict(
+        combat_session=session,
+        actor=attacker,
+        target=target,
+        action_type='legendary_action' if result.get('legendary_cost') else 'attack',
+        is_legendary_action=bool(result.get('legendary_cost')),
+        legendary_action_cost=result.get('legendary_cost', 0),
+        attack_name=result['attack_name'],
+        attack_roll=result['roll'],
+        attack_modifier=result['attack_bonus'],
+        attack_total=result['attack_total'],
+        round_number=session.current_round,
+        turn_number=session.current_turn_index,
+        hit=result['hit'],
+        critical=result['critical'],
+        damage_amount=result['damage'] if result['hit'] else 0,
+        description=_format_attack_description(result),
+    )
+
+
 def _parse_and_roll_damage(damage_str, is_critical=False):
     """
     Parse a damage string like '2d6+3 slashing' and roll it.
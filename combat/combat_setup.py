@@ -0,0 +1,131 @@
+"""
+Bulk combat setup
+
+Creates every participant of a fight and rolls their initiative in a few
+queries instead of one add_participant request (and one save) per combatant:
+
+- build_participants(): unsaved CombatParticipants for encounter enemies and
+  characters, ready for one bulk_create
+- roll_initiative_for(): d20 + DEX for every participant in one pass,
+  persisted with one bulk_update
+
+Both expect the related stats to be loaded up front (select_related), so no
+query runs per participant.
+"""
+import random
+
+from .models import CombatParticipant
+
+
+def build_participants(session, encounter_enemies=(), characters=()):
+    """
+    Build unsaved participants for a session.
+
+    Args:
+        session: CombatSession the participants join
+        encounter_enemies: EncounterEnemy rows, with enemy__stats loaded
+        characters: Character rows, with stats loaded
+
+    Returns:
+        List of unsaved CombatParticipant
+    """
+    participants = []
+    for encounter_enemy in encounter_enemies:
+        stats = getattr(encounter_enemy.enemy, 'stats', None)
+        participants.append(CombatParticipant(
+            combat_session=session,
+            participant_type='enemy',
+            encounter_enemy=encounter_enemy,
+            initiative=0,
+            current_hp=encounter_enemy.current_hp,
+            max_hp=stats.hit_points if stats else encounter_enemy.current_hp,
+            armor_class=stats.armor_class if stats else 10,
+        ))
+    for character in characters:
+        stats = character.stats
+        participants.append(CombatParticipant(
+            combat_session=session,
+            participant_type='character',
+            character=character,
+            initiative=0,
+            current_hp=stats.hit_points,
+            max_hp=stats.max_hit_points,
+            armor_class=stats.armor_class,
+        ))
+    return participants
+
+
+def roll_initiative_for(participants, overrides=None, reroll=False):
+    """
+    Roll initiative for participants and save the changed rows in one query.
+
+    Manual overrides ({participant_id: value}, non-zero values only) are
+    applied first. Participants whose initiative is still 0 (or all of
+    them with reroll=True) roll d20 + DEX; the rest keep their value.
+
+    Returns:
+        List of result dicts (participant_id, name, roll, modifier,
+        initiative, source) in the order of participants
+    """
+    overrides = overrides or {}
+    manual = {}
+    for pid, value in overrides.items():
+        try:
+            value = int(value)
+            if value != 0:
+                manual[int(pid)] = value
+        except (TypeError, ValueError):
+            continue
+
+    participants = list(participants)
+    rolls = [random.randint(1, 20) for _ in participants]
+    results = []
+    changed = []
+    for participant, roll in zip(participants, rolls):
+        if participant.id in manual:
+            participant.initiative = manual[participant.id]
+            changed.append(participant)
+        if participant.initiative != 0 and (participant.id in manual or not reroll):
+            results.append({
+                'participant_id': participant.id,
+                'name': participant.get_name(),
+                'roll': None,
+                'modifier': None,
+                'initiative': participant.initiative,
+                'source': 'manual',
+            })
+            continue
+
+        modifier = participant.get_ability_modifier('DEX')
+        # Ensure we don't land on exactly 0 (would look unset)
+        participant.initiative = roll + modifier or 1
+        changed.append(participant)
+        results.append({
+            'participant_id': participant.id,
+            'name': participant.get_name(),
+            'roll': roll,
+            'modifier': modifier,
+            'initiative': participant.initiative,
+            'source': 'auto',
+        })
+
+    if changed:
+        CombatParticipant.objects.bulk_update(changed, ['initiative'])
+    return results
+
+
+def initiative_order(participants):
+    """Compact initiative order: highest initiative first, ties by id"""
+    ordered = sorted(participants, key=lambda participant: (-participant.initiative, participant.id))
+    return [
+        {
+            'id': participant.id,
+            'name': participant.get_name(),
+            'participant_type': participant.participant_type,
+            'initiative': participant.initiative,
+            'current_hp': participant.current_hp,
+            'max_hp': participant.max_hp,
+            'armor_class': participant.armor_class,
+        }
+        for participant in ordered
+    ]
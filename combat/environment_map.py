@@ -0,0 +1,258 @@
+"""
+Compiled environment layer for a combat session
+
+The active EnvironmentalEffect rows of a session are rasterized once into a
+grid of 5-ft cells holding the terrain, cover, lighting and hazard flags of
+every cell. Looking up what applies at a position is then a few array reads
+instead of one query (plus a circle test per effect) for each effect type.
+
+The compiled map is kept in the Django cache per session. It is rebuilt
+when effects are added or removed through the environmental_effects
+endpoint, and invalidated whenever an EnvironmentalEffect is saved or
+deleted (QuerySet.update() bypasses this; call invalidate_environment_map()
+after bulk changes).
+
+Precedence matches the per-query lookups this replaces: effects are read
+newest first, the newest terrain effect applies to the whole battlefield,
+the newest cover/lighting area containing a cell wins, and every hazard
+area containing a cell applies.
+
+Usage:
+    from combat.environment_map import get_environment_map
+
+    environment = get_environment_map(session)
+    environment.apply_to_position(position)
+"""
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.instrumentation import record_cache_lookup
+
+from .environmental_effects import calculate_movement_cost
+
+
+CELL_SIZE = 5  # feet
+
+# Areas larger than this are tested per lookup instead of rasterized
+MAX_GRID_CELLS = 250_000
+
+AREA_LAYERS = {
+    # effect_type: (value field, x field, y field, radius field)
+    'cover': ('cover_type', 'cover_area_x', 'cover_area_y', 'cover_area_radius'),
+    'lighting': ('lighting_type', 'lighting_area_x', 'lighting_area_y', 'lighting_area_radius'),
+    'hazard': ('hazard_type', 'hazard_area_x', 'hazard_area_y', 'hazard_area_radius'),
+}
+
+
+def cell_of(x, y):
+    """Return the (column, row) of the 5-ft cell containing a position in feet"""
+    return x // CELL_SIZE, y // CELL_SIZE
+
+
+class EnvironmentMap:
+    """
+    Rasterized environmental effects of one combat session.
+
+    Each layer stores small integer codes in a flat byte array: cover and
+    lighting index into per-map name tables (0 = none) and hazards are a
+    bitmask over the hazard table. Cells outside the grid's bounding box
+    carry no area effects.
+    """
+
+    def __init__(self, terrain=None, weather=None, areas=()):
+        self.terrain = terrain
+        self.weather = weather
+        # Per-cell cost multiplier for the battlefield terrain and weather
+        self.cost_multiplier = calculate_movement_cost(0, terrain_type=terrain, weather=weather)[1]
+
+        self.areas = list(areas)
+        self.cover_names = [None]
+        self.lighting_names = [None]
+        self.hazard_names = []
+        for layer, value, _, _, _ in self.areas:
+            names = self.hazard_names if layer == 'hazard' else getattr(self, f'{layer}_names')
+            if value not in names:
+                names.append(value)
+
+        self.origin = (0, 0)
+        self.width = 0
+        self.height = 0
+        self.cover = array('B')
+        self.lighting = array('B')
+        self.hazards = array('I')
+        self.rasterized = False
+        self._rasterize()
+
+    @classmethod
+    def from_effects(cls, effects):
+        """
+        Compile a map from active EnvironmentalEffect rows, newest first.
+        """
+        terrain = weather = None
+        areas = []
+        for effect in effects:
+            if effect.effect_type == 'terrain':
+                if terrain is None:
+                    terrain = effect.terrain_type
+            elif effect.effect_type == 'weather':
+                if weather is None:
+                    weather = effect.weather_type
+            elif effect.effect_type in AREA_LAYERS:
+                value_field, x_field, y_field, radius_field = AREA_LAYERS[effect.effect_type]
+                value = getattr(effect, value_field)
+                x, y, radius = getattr(effect, x_field), getattr(effect, y_field), getattr(effect, radius_field)
+                if value and x is not None and y is not None and radius:
+                    areas.append((effect.effect_type, value, x, y, radius))
+        return cls(terrain=terrain, weather=weather, areas=areas)
+
+    # ---------- compile ----------
+
+    def _rasterize(self):
+        if not self.areas:
+            return
+
+        min_col = min((x - radius) // CELL_SIZE for _, _, x, _, radius in self.areas)
+        min_row = min((y - radius) // CELL_SIZE for _, _, _, y, radius in self.areas)
+        max_col = max((x + radius) // CELL_SIZE for _, _, x, _, radius in self.areas)
+        max_row = max((y + radius) // CELL_SIZE for _, _, _, y, radius in self.areas)
+        width, height = max_col - min_col + 1, max_row - min_row + 1
+        if width * height > MAX_GRID_CELLS:
+            return
+
+        self.origin = (min_col, min_row)
+        self.width, self.height = width, height
+        cells = width * height
+        self.cover = array('B', bytes(cells))
+        self.lighting = array('B', bytes(cells))
+        self.hazards = array('I', [0]) * cells
+
+        # Oldest first, so newer cover/lighting areas overwrite older ones
+        for layer, value, x, y, radius in reversed(self.areas):
+            for index in self._cells_in_circle(x, y, radius):
+                if layer == 'hazard':
+                    self.hazards[index] |= 1 << self.hazard_names.index(value)
+                elif layer == 'cover':
+                    self.cover[index] = self.cover_names.index(value)
+                else:
+                    self.lighting[index] = self.lighting_names.index(value)
+        self.rasterized = True
+
+    def _cells_in_circle(self, center_x, center_y, radius):
+        """Yield grid indexes of cells whose origin lies within the circle"""
+        min_col, min_row = self.origin
+        radius_squared = radius * radius
+        for row in range((center_y - radius) // CELL_SIZE, (center_y + radius) // CELL_SIZE + 1):
+            dy = row * CELL_SIZE - center_y
+            for col in range((center_x - radius) // CELL_SIZE, (center_x + radius) // CELL_SIZE + 1):
+                dx = col * CELL_SIZE - center_x
+                if dx * dx + dy * dy <= radius_squared:
+                    yield (row - min_row) * self.width + (col - min_col)
+
+    # ---------- lookup ----------
+
+    def index_of(self, x, y):
+        """Grid index of the cell containing (x, y), or None outside the grid"""
+        col, row = cell_of(x, y)
+        col -= self.origin[0]
+        row -= self.origin[1]
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return row * self.width + col
+        return None
+
+    def effects_at(self, x, y):
+        """
+        Environmental effects at a position in feet.
+
+        Returns:
+            dict with terrain, cover, lighting and hazards
+        """
+        if not self.rasterized:
+            return self._effects_by_area_test(x, y)
+
+        index = self.index_of(x, y)
+        if index is None:
+            return {'terrain': self.terrain, 'cover': None, 'lighting': None, 'hazards': []}
+
+        hazard_bits = self.hazards[index]
+        return {
+            'terrain': self.terrain,
+            'cover': self.cover_names[self.cover[index]],
+            'lighting': self.lighting_names[self.lighting[index]],
+            'hazards': [name for bit, name in enumerate(self.hazard_names) if hazard_bits >> bit & 1],
+        }
+
+    def _effects_by_area_test(self, x, y):
+        """Fallback for maps too large to rasterize: test each area directly"""
+        col, row = cell_of(x, y)
+        x, y = col * CELL_SIZE, row * CELL_SIZE
+        found = {'terrain': self.terrain, 'cover': None, 'lighting': None, 'hazards': []}
+        for layer, value, center_x, center_y, radius in self.areas:
+            if (x - center_x) ** 2 + (y - center_y) ** 2 > radius * radius:
+                continue
+            if layer == 'hazard':
+                if value not in found['hazards']:
+                    found['hazards'].append(value)
+            elif found[layer] is None:
+                found[layer] = value
+        found['hazards'].sort(key=self.hazard_names.index)
+        return found
+
+    def has_hazard(self, x, y):
+        """Whether any hazard covers the cell at (x, y)"""
+        if not self.rasterized:
+            return bool(self._effects_by_area_test(x, y)['hazards'])
+        index = self.index_of(x, y)
+        return index is not None and self.hazards[index] != 0
+
+    def cost_at(self, x, y):
+        """Movement cost multiplier for entering the cell at (x, y)"""
+        return self.cost_multiplier
+
+    def movement_cost(self, base_movement):
+        """calculate_movement_cost() for this battlefield's terrain and weather"""
+        return calculate_movement_cost(base_movement, terrain_type=self.terrain, weather=self.weather)
+
+    def apply_to_position(self, position):
+        """Set a ParticipantPosition's current_* fields (does not save)"""
+        # Coordinates may still be raw request values before the save
+        effects = self.effects_at(int(position.x), int(position.y))
+        position.current_terrain = effects['terrain']
+        position.current_cover = effects['cover']
+        position.current_lighting = effects['lighting']
+        position.current_hazards = effects['hazards']
+        return effects
+
+
+# ==================== SESSION CACHE ====================
+
+def environment_map_cache_key(session_id):
+    return f"combat_environment_map:{session_id}"
+
+
+def build_environment_map(session):
+    """Compile the map for a session from its active effects (one query) and cache it"""
+    from .models import EnvironmentalEffect
+
+    effects = EnvironmentalEffect.objects.filter(combat_session_id=session.id, is_active=True)
+    environment = EnvironmentMap.from_effects(effects)
+    cache.set(
+        environment_map_cache_key(session.id),
+        environment,
+        settings.CACHE_TTL.get('environment_map', 3600)
+    )
+    return environment
+
+
+def get_environment_map(session):
+    """Return the session's compiled map, building it if it is not cached"""
+    environment = cache.get(environment_map_cache_key(session.id))
+    record_cache_lookup(environment is not None)
+    if environment is None:
+        environment = build_environment_map(session)
+    return environment
+
+
+def invalidate_environment_map(session_id):
+    cache.delete(environment_map_cache_key(session_id))
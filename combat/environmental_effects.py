@@ -174,7 +174,7 @@ def calculate_movement_cost(base_movement, terrain_type=None, weather=None):
         weather_effect = WEATHER_EFFECTS[weather]
         if 'movement_modifier' in weather_effect:
             if isinstance(weather_effect['movement_modifier'], (int, float)):
-                if weather_effect['movement_modifier'] < 1:
+                if 0 < weather_effect['movement_modifier'] < 1:
                     cost_multiplier /= weather_effect['movement_modifier']
     
     effective_movement = int(base_movement / cost_multiplier)
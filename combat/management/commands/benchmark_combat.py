@@ -0,0 +1,256 @@
+"""
+Management command to load-test the combat API
+
+Scripts complete fights against the real viewsets through DRF's APIClient
+on the configured database (SQLite or Postgres): session creation, bulk
+party setup and initiative, N rounds of player attacks/spells and batched
+AI enemy turns, then the stats/report/export/analytics reads. Every request
+is timed and its queries counted (CaptureQueriesContext) and payload size
+recorded; the summary is p50/p95 latency, queries and bytes per endpoint.
+
+Everything runs inside a transaction that is rolled back at the end (unless
+--keep), so the benchmark can be pointed at a development database. Views'
+own transaction.atomic() blocks become savepoints in that mode.
+
+Usage:
+    python manage.py benchmark_combat [--rounds 20] [--iterations 3]
+        [--output bench.json] [--thresholds thresholds.json]
+
+The thresholds file maps endpoint labels to limits, e.g.
+    {"attack": {"p95_ms": 40, "queries": 25, "bytes": 20000}}
+and the command fails if any measured p95 latency, max query count or max
+payload size exceeds its limit.
+"""
+import json
+import math
+import statistics
+import time
+from collections import defaultdict
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy, EnemyAbility, EnemyAttack, EnemyStats
+from characters.models import Character, CharacterClass, CharacterRace, CharacterSpell, CharacterStats
+from combat.models import CombatParticipant, CombatSession
+from encounters.models import Encounter, EncounterEnemy
+
+
+BASE_URL = '/api/combat'
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Script full combats through the API and report latency, queries and payload size per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help='Combat rounds per fight')
+        parser.add_argument('--iterations', type=int, default=1, help='Number of fights to run')
+        parser.add_argument('--party', type=int, default=4, help='Player characters per fight (one is a caster)')
+        parser.add_argument('--enemies', type=int, default=6, help='Enemies per fight')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+        parser.add_argument('--thresholds', help='JSON file of per-endpoint limits; exceeding one fails the run')
+        parser.add_argument('--keep', action='store_true', help='Commit the benchmark data instead of rolling it back')
+
+    def handle(self, *args, **options):
+        thresholds = {}
+        if options['thresholds']:
+            with open(options['thresholds']) as handle:
+                thresholds = json.load(handle)
+
+        self.samples = defaultdict(list)
+        started = time.perf_counter()
+
+        # Throttling would cap the run rather than measure it
+        with mock.patch('rest_framework.throttling.SimpleRateThrottle.allow_request', return_value=True):
+            for iteration in range(max(1, options['iterations'])):
+                with transaction.atomic():
+                    self.run_fight(iteration, options)
+                    if not options['keep']:
+                        transaction.set_rollback(True)
+
+        results = {
+            'config': {
+                key: options[key] for key in ('rounds', 'iterations', 'party', 'enemies')
+            },
+            'database': connection.vendor,
+            'wall_seconds': round(time.perf_counter() - started, 3),
+            'endpoints': {label: self.summarize(samples) for label, samples in sorted(self.samples.items())},
+        }
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+            self.stdout.write(f"\nResults written to {options['output']}")
+
+        failures = self.check_thresholds(results['endpoints'], thresholds)
+        if failures:
+            for failure in failures:
+                self.stderr.write(self.style.ERROR(f'  {failure}'))
+            raise CommandError(f'{len(failures)} threshold(s) exceeded')
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    # ---------- fight script ----------
+
+    def request(self, label, method, url, data=None):
+        """Issue one API call and record its latency, query count and payload size"""
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, data, format='json' if method == 'post' else None)
+            elapsed = time.perf_counter() - start
+        self.samples[label].append({
+            'ms': elapsed * 1000,
+            'queries': len(queries),
+            'bytes': len(response.content),
+            'ok': response.status_code < 400,
+        })
+        if response.status_code >= 400:
+            self.stderr.write(f'  {label}: HTTP {response.status_code} {response.content[:200]!r}')
+        return response
+
+    def seed(self, iteration, options):
+        """Create a party, a bestiary entry and an encounter sized for a long fight"""
+        user = User.objects.create_user(username=f'bench_{iteration}_{time.time_ns()}')
+        race, _ = CharacterRace.objects.get_or_create(name='Human')
+        fighter, _ = CharacterClass.objects.get_or_create(name='Fighter', defaults={'hit_dice': 'd10'})
+        sorcerer, _ = CharacterClass.objects.get_or_create(name='Sorcerer', defaults={'hit_dice': 'd6'})
+
+        characters = []
+        for index in range(max(1, options['party'])):
+            is_caster = index == 0
+            character = Character.objects.create(
+                user=user, name=f'Bench Hero {index}', level=5, race=race,
+                character_class=sorcerer if is_caster else fighter
+            )
+            # Enough HP that the fight lasts every scripted round
+            CharacterStats.objects.create(
+                character=character, strength=16, dexterity=14, constitution=14,
+                hit_points=5000, max_hit_points=5000, armor_class=16
+            )
+            if is_caster:
+                CharacterSpell.objects.create(character=character, name='Fire Bolt', level=0)
+            characters.append(character)
+
+        orc = Enemy.objects.create(name=f'Bench Orc {iteration}', challenge_rating='1/2')
+        EnemyStats.objects.create(enemy=orc, hit_points=2000, armor_class=13, strength=16, dexterity=12)
+        EnemyAttack.objects.create(enemy=orc, name='Greataxe', bonus=5, damage='1d12+3 slashing')
+        EnemyAbility.objects.create(enemy=orc, name='Multiattack', description='The orc makes two attacks.')
+
+        encounter = Encounter.objects.create(name=f'Benchmark Fight {iteration}')
+        EncounterEnemy.objects.bulk_create([
+            EncounterEnemy(encounter=encounter, enemy=orc, name=f'Orc {index}', current_hp=2000)
+            for index in range(max(1, options['enemies']))
+        ])
+        return user, encounter, characters
+
+    def run_fight(self, iteration, options):
+        user, encounter, characters = self.seed(iteration, options)
+        # Server errors are recorded like any other response instead of aborting the run
+        self.client = APIClient(raise_request_exception=False)
+        self.client.force_authenticate(user=user)
+
+        response = self.request('create_session', 'post', f'{BASE_URL}/sessions/', {'encounter_id': encounter.id})
+        session_url = f"{BASE_URL}/sessions/{response.data['id']}"
+        self.request('setup', 'post', f'{session_url}/setup/', {
+            'encounter_id': encounter.id, 'character_ids': [character.id for character in characters],
+        })
+        self.request('start', 'post', f'{session_url}/start/')
+
+        session = CombatSession.objects.get(pk=response.data['id'])
+        caster_id = characters[0].id
+        while True:
+            session.refresh_from_db()
+            if session.current_round > options['rounds'] or session.status != 'active':
+                break
+            current = session.get_current_participant()
+            if current is None:
+                break
+
+            if current.participant_type == 'enemy':
+                self.request('auto_enemy_turns', 'post', f'{session_url}/auto_enemy_turns/', {'compact': True})
+                continue
+
+            target = CombatParticipant.objects.filter(
+                combat_session=session, participant_type='enemy', is_active=True
+            ).order_by('current_hp').first()
+            if target is None:
+                break
+            if current.character_id == caster_id:
+                self.request('cast_spell', 'post', f'{session_url}/cast_spell/', {
+                    'caster_id': current.id, 'target_id': target.id, 'spell_name': 'Fire Bolt',
+                    'save_type': 'DEX', 'save_dc': 13, 'damage_string': '2d10',
+                })
+            else:
+                self.request('attack', 'post', f'{session_url}/attack/', {
+                    'attacker_id': current.id, 'target_id': target.id,
+                })
+            self.request('next_turn', 'post', f'{session_url}/next_turn/')
+
+        self.request('session_detail', 'get', f'{session_url}/')
+        self.request('stats', 'get', f'{session_url}/stats/')
+        self.request('report', 'get', f'{session_url}/report/')
+        self.request('export_json', 'get', f'{session_url}/export/', {'format': 'json'})
+        self.request('export_csv', 'get', f'{session_url}/export/', {'format': 'csv'})
+        response = self.request('end', 'post', f'{session_url}/end/')
+        if response.status_code < 400:
+            self.request('analytics', 'get', f"{BASE_URL}/logs/{response.data['log_id']}/analytics/")
+
+    # ---------- reporting ----------
+
+    def summarize(self, samples):
+        timings = [sample['ms'] for sample in samples]
+        queries = [sample['queries'] for sample in samples]
+        sizes = [sample['bytes'] for sample in samples]
+        return {
+            'calls': len(samples),
+            'errors': sum(1 for sample in samples if not sample['ok']),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'max_ms': round(max(timings), 2),
+            'mean_queries': round(statistics.mean(queries), 1),
+            'max_queries': max(queries),
+            'mean_bytes': round(statistics.mean(sizes)),
+            'max_bytes': max(sizes),
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"Combat API benchmark on {results['database']}: "
+            f"{results['config']['iterations']} fight(s) x {results['config']['rounds']} rounds "
+            f"in {results['wall_seconds']:.1f}s\n"
+        )
+        self.stdout.write(
+            f"  {'endpoint':<18} {'calls':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'queries':>8} {'max q':>6} {'bytes':>9}"
+        )
+        for label, summary in results['endpoints'].items():
+            self.stdout.write(
+                f"  {label:<18} {summary['calls']:>5} {summary['errors']:>4} {summary['p50_ms']:>8.1f} "
+                f"{summary['p95_ms']:>8.1f} {summary['mean_queries']:>8.1f} {summary['max_queries']:>6} "
+                f"{summary['mean_bytes']:>9}"
+            )
+
+    def check_thresholds(self, endpoints, thresholds):
+        """Return a message per exceeded limit"""
+        measured_as = {'p95_ms': 'p95_ms', 'queries': 'max_queries', 'bytes': 'max_bytes'}
+        failures = []
+        for label, limits in thresholds.items():
+            if label not in endpoints:
+                failures.append(f'{label}: not exercised by this run')
+                continue
+            for limit, value in limits.items():
+                measured = endpoints[label][measured_as.get(limit, limit)]
+                if measured > value:
+                    failures.append(f'{label}: {limit} {measured} > {value}')
+        return failures
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combat', '0013_add_attacks_remaining'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='combatsession',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every turn advance; guards against concurrent advances'),
+        ),
+    ]
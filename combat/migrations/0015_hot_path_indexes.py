@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bestiary', '0006_enemy_enemy_cr_idx_enemy_enemy_type_idx_and_more'),
+        ('characters', '0032_hot_path_indexes'),
+        ('combat', '0014_session_version'),
+        ('encounters', '0002_encountertheme_encounter_biome_encounter_is_chaotic_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='combataction',
+            index=models.Index(fields=['combat_session', 'round_number', 'turn_number', 'created_at'], name='combat_action_turn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='combatparticipant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['combat_session', '-initiative', 'id'], name='combat_part_turn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conditionapplication',
+            index=models.Index(condition=models.Q(('removed_at__isnull', True)), fields=['participant'], name='combat_cond_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='environmentaleffect',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['combat_session', 'effect_type'], name='combat_env_active_idx'),
+        ),
+    ]
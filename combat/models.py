@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest, Least
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from core.concurrency import guarded_update, versioned_update
 from encounters.models import Encounter, EncounterEnemy
 from characters.models import Character
 from bestiary.models import Condition, DamageType
@@ -22,6 +25,7 @@ class CombatSession(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(blank=True, null=True)
     notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every turn advance; guards against concurrent advances")
     
     class Meta:
         indexes = [
@@ -47,17 +51,20 @@ class CombatSession(models.Model):
         return self.participants.filter(is_active=True).order_by('-initiative', 'id')
     
     def next_turn(self):
-        """Advance to the next turn and remove expired conditions"""
+        """
+        Advance to the next turn and remove expired conditions.
+
+        The turn pointer is saved with an optimistic version check: if another
+        request advanced the turn since this session was loaded, that advance
+        stands and this one is dropped (a double-clicked "next turn" moves on
+        once). Participants are only reset once the advance has been claimed.
+        """
         participants = self.get_initiative_order()
         if not participants.exists():
             return None
         
-        # Reset legendary actions and reactions for all participants at start of new round
-        if self.current_turn_index == 0:
-            for participant in participants:
-                if participant.legendary_actions_max > 0:
-                    participant.reset_legendary_actions()
-                participant.reset_reaction()  # Reactions reset each round
+        # Reset legendary actions and reactions at the start of each round
+        new_round = self.current_turn_index == 0
         
         self.current_turn_index += 1
         
@@ -65,7 +72,13 @@ class CombatSession(models.Model):
         if self.current_turn_index >= participants.count():
             self.current_round += 1
             self.current_turn_index = 0
-            # Reset legendary actions and reactions at start of new round
+            new_round = True
+        
+        if not versioned_update(self, ['current_round', 'current_turn_index']):
+            self.refresh_from_db(fields=['current_round', 'current_turn_index', 'version'])
+            return self.get_current_participant()
+        
+        if new_round:
             for participant in participants:
                 if participant.legendary_actions_max > 0:
                     participant.reset_legendary_actions()
@@ -79,8 +92,7 @@ class CombatSession(models.Model):
         # Remove expired conditions
         self.remove_expired_conditions()
         
-        self.save()
-        return self.get_current_participant()
+        return current_participant
     
     def remove_expired_conditions(self):
         """Remove conditions that have expired"""
@@ -196,6 +208,26 @@ class EnvironmentalEffect(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Environment map / weather lookups only ever read live effects
+            models.Index(
+                fields=['combat_session', 'effect_type'], condition=Q(is_active=True),
+                name='combat_env_active_idx'
+            ),
+        ]
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The session's compiled environment map is stale now
+        from .environment_map import invalidate_environment_map
+        invalidate_environment_map(self.combat_session_id)
+    
+    def delete(self, *args, **kwargs):
+        session_id = self.combat_session_id
+        result = super().delete(*args, **kwargs)
+        from .environment_map import invalidate_environment_map
+        invalidate_environment_map(session_id)
+        return result
     
     def __str__(self):
         if self.effect_type == 'terrain':
@@ -265,7 +297,11 @@ class ParticipantPosition(models.Model):
         # This would need to be tracked - simplified for now
         
         # Mark reaction as used
-        attacker.use_reaction()
+        if not attacker.use_reaction():
+            return {
+                'success': False,
+                'reason': 'Reaction already used'
+            }
         
         # Create opportunity attack action
         opportunity_attack = CombatAction.objects.create(
@@ -459,6 +495,13 @@ class CombatParticipant(models.Model):
     class Meta:
         ordering = ['-initiative', 'id']
         unique_together = ['combat_session', 'character', 'encounter_enemy']
+        indexes = [
+            # Initiative order: session.participants.filter(is_active=True).order_by('-initiative', 'id')
+            models.Index(
+                fields=['combat_session', '-initiative', 'id'], condition=Q(is_active=True),
+                name='combat_part_turn_idx'
+            ),
+        ]
     
     def __str__(self):
         name = self.get_name()
@@ -724,22 +767,30 @@ class CombatParticipant(models.Model):
         return base_ac
     
     def take_damage(self, amount, damage_type=None, check_concentration=True):
-        """Apply damage to this participant"""
+        """
+        Apply damage to this participant.
+
+        HP is decremented in the database (UPDATE ... SET current_hp =
+        MAX(current_hp - amount, 0)), so simultaneous hits on the same
+        participant all land instead of the last save() winning.
+        """
         # Check for resistances/immunities
         if damage_type:
             # This would check resistances - simplified for now
             pass
         
-        self.current_hp = max(0, self.current_hp - amount)
-        if self.current_hp <= 0:
-            self.is_active = False
+        amount = max(0, amount)
+        guarded_update(
+            self,
+            current_hp=Greatest(F('current_hp') - amount, 0),
+            is_active=Case(When(current_hp__lte=amount, then=Value(False)), default=F('is_active')),
+        )
         
         # Check concentration if taking damage while concentrating
         concentration_broken = False
         if check_concentration and self.is_concentrating and amount > 0:
             concentration_broken, _, _, _ = self.check_concentration(amount)
         
-        self.save()
         return self.current_hp, concentration_broken
     
     def take_damage_simple(self, amount, damage_type=None):
@@ -747,11 +798,13 @@ class CombatParticipant(models.Model):
         return self.take_damage(amount, damage_type, check_concentration=False)[0]
     
     def heal(self, amount):
-        """Heal this participant"""
-        self.current_hp = min(self.max_hp, self.current_hp + amount)
-        if self.current_hp > 0:
-            self.is_active = True
-        self.save()
+        """Heal this participant (capped at max HP, applied atomically)"""
+        amount = max(0, amount)
+        guarded_update(
+            self,
+            current_hp=Least(F('current_hp') + amount, F('max_hp')),
+            is_active=Case(When(current_hp__gt=-amount, then=Value(True)), default=F('is_active')),
+        )
         return self.current_hp
     
     def reset_turn(self):
@@ -838,7 +891,7 @@ class CombatParticipant(models.Model):
             self.is_concentrating = False
             spell_name = self.concentration_spell
             self.concentration_spell = ""
-            self.save()
+            self.save(update_fields=['is_concentrating', 'concentration_spell'])
             return True, save_total, save_dc, f"Concentration broken! Lost concentration on {spell_name}"
         
         return False, save_total, save_dc, f"Concentration maintained (DC {save_dc}, rolled {save_total})"
@@ -848,11 +901,16 @@ class CombatParticipant(models.Model):
         if action_cost < 1:
             return False, "Legendary action cost must be at least 1"
         
-        if self.legendary_actions_remaining < action_cost:
+        # Decrement only while enough remain, so two requests can't overspend
+        spent = guarded_update(
+            self,
+            Q(legendary_actions_remaining__gte=action_cost),
+            legendary_actions_remaining=F('legendary_actions_remaining') - action_cost,
+        )
+        if not spent:
+            self.refresh_from_db(fields=['legendary_actions_remaining'])
             return False, "Not enough legendary actions remaining"
         
-        self.legendary_actions_remaining -= action_cost
-        self.save()
         return True, f"Used {action_cost} legendary action(s). {self.legendary_actions_remaining} remaining."
     
     def reset_legendary_actions(self):
@@ -922,9 +980,17 @@ class CombatParticipant(models.Model):
         return not self.reaction_used and self.is_active
     
     def use_reaction(self):
-        """Mark reaction as used"""
-        self.reaction_used = True
-        self.save()
+        """
+        Mark reaction as used.
+
+        Returns:
+            bool: False if the reaction was already spent (possibly by a
+            concurrent request) or the participant is down
+        """
+        used = guarded_update(self, Q(reaction_used=False, is_active=True), reaction_used=True)
+        if not used:
+            self.refresh_from_db(fields=['reaction_used', 'is_active'])
+        return used
     
     def get_reach(self):
         """Get melee reach in feet (default 5 feet)"""
@@ -1021,6 +1087,13 @@ class CombatAction(models.Model):
     
     class Meta:
         ordering = ['round_number', 'turn_number', 'created_at']
+        indexes = [
+            # Combat log/report reads a session's actions in turn order
+            models.Index(
+                fields=['combat_session', 'round_number', 'turn_number', 'created_at'],
+                name='combat_action_turn_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.actor.get_name()} - {self.get_action_type_display()} (Round {self.round_number})"
@@ -1224,6 +1297,10 @@ class ConditionApplication(models.Model):
     class Meta:
         ordering = ['-applied_at']
         unique_together = ['participant', 'condition', 'applied_at']  # Prevent duplicates
+        indexes = [
+            # Active conditions are looked up every turn; removed ones are history
+            models.Index(fields=['participant'], condition=Q(removed_at__isnull=True), name='combat_cond_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.participant.get_name()} - {self.condition.get_name_display()} (Round {self.applied_round})"
@@ -0,0 +1,241 @@
+"""
+Grid movement planner
+
+Plans a participant's movement over the session's compiled environment map
+(combat.environment_map) in 5-ft cells:
+
+- plan(x, y): cheapest path to a destination within the remaining movement
+  (A*), with the opportunity attacks it provokes and the hazards it crosses
+- reachable(): every cell the participant can end its move in (Dijkstra
+  flood fill), for highlighting in the UI
+
+Movement follows the grid rules: 8-way steps, 5 ft per step (diagonals
+included), multiplied by the terrain/weather cost of the cell entered.
+Among paths of equal length the planner prefers the one that provokes the
+fewest opportunity attacks, then the one through the fewest hazard cells,
+then the one with the fewest diagonal steps (so paths look straight).
+Cells occupied by hostile participants cannot be entered; cells occupied
+by allies can be crossed but not ended in.
+
+Everything is loaded up front (one query for participants and positions,
+the environment map from the cache), so planning itself runs no queries and
+is cheap enough to call on every mouse hover.
+
+Usage:
+    from combat.pathfinding import MovementPlanner
+
+    planner = MovementPlanner.for_participant(participant, budget=30)
+    plan = planner.plan(25, 10)
+"""
+import heapq
+import math
+
+from .environment_map import CELL_SIZE, cell_of, get_environment_map
+
+
+NEIGHBOURS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+def chebyshev(a, b):
+    """Grid distance in cells between two (col, row) cells"""
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+
+class MovementPlanner:
+    """
+    Movement planning for one participant.
+
+    Args:
+        environment: EnvironmentMap of the session
+        mover: The moving CombatParticipant (with a position)
+        participants: Every participant of the session, with positions loaded
+        budget: Movement available in feet
+    """
+
+    def __init__(self, environment, mover, participants, budget):
+        self.environment = environment
+        self.mover = mover
+        self.budget = budget
+        self.start = cell_of(int(mover.position.x), int(mover.position.y))
+
+        self.blocked = set()    # hostile cells: cannot be entered
+        self.occupied = set()   # any other participant: cannot end a move here
+        self.threats = {}       # cell -> hostiles whose reach covers it
+        for other in participants:
+            if other.id == mover.id or not other.is_active:
+                continue
+            position = getattr(other, 'position', None)
+            if position is None:
+                continue
+            cell = cell_of(position.x, position.y)
+            self.occupied.add(cell)
+            if other.participant_type == mover.participant_type:
+                continue
+            self.blocked.add(cell)
+            reach = max(1, other.get_reach() // CELL_SIZE)
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    self.threats.setdefault((cell[0] + dx, cell[1] + dy), []).append(other)
+
+    @classmethod
+    def for_participant(cls, participant, budget):
+        """Load the session's participants and environment map for a planner"""
+        session = participant.combat_session
+        participants = list(
+            session.participants.select_related(
+                'position', 'character', 'encounter_enemy__enemy'
+            )
+        )
+        mover = next(other for other in participants if other.id == participant.id)
+        return cls(get_environment_map(session), mover, participants, budget)
+
+    # ---------- search ----------
+
+    def _step(self, cell, neighbour):
+        """Cost of one step as (feet, provocations, hazard cells, diagonals)"""
+        x, y = neighbour[0] * CELL_SIZE, neighbour[1] * CELL_SIZE
+        feet = math.ceil(CELL_SIZE * self.environment.cost_at(x, y))
+        leaving = self.threats.get(cell)
+        provokes = 0
+        if leaving:
+            entering = self.threats.get(neighbour, ())
+            provokes = sum(1 for hostile in leaving if hostile not in entering)
+        hazards = 1 if self.environment.has_hazard(x, y) else 0
+        diagonal = 1 if cell[0] != neighbour[0] and cell[1] != neighbour[1] else 0
+        return feet, provokes, hazards, diagonal
+
+    def _search(self, goal=None):
+        """
+        Dijkstra from the start cell, or A* towards goal, bounded by budget.
+
+        Returns:
+            (best cost per cell, parent per cell)
+        """
+        # Admissible A* heuristic: every step costs at least this much
+        min_step = CELL_SIZE * self.environment.cost_multiplier
+
+        def priority(cost, cell):
+            if goal is None:
+                return cost
+            return (cost[0] + chebyshev(cell, goal) * min_step,) + cost[1:]
+
+        best = {self.start: (0, 0, 0, 0)}
+        parent = {self.start: None}
+        frontier = [(priority((0, 0, 0, 0), self.start), self.start)]
+        while frontier:
+            queued, cell = heapq.heappop(frontier)
+            if cell == goal:
+                break
+            cost = best[cell]
+            if queued != priority(cost, cell):
+                continue  # superseded by a cheaper entry
+            for dx, dy in NEIGHBOURS:
+                neighbour = (cell[0] + dx, cell[1] + dy)
+                if neighbour in self.blocked:
+                    continue
+                step = self._step(cell, neighbour)
+                new_cost = (cost[0] + step[0], cost[1] + step[1], cost[2] + step[2], cost[3] + step[3])
+                if new_cost[0] > self.budget:
+                    continue
+                if neighbour in best and best[neighbour] <= new_cost:
+                    continue
+                best[neighbour] = new_cost
+                parent[neighbour] = cell
+                heapq.heappush(frontier, (priority(new_cost, neighbour), neighbour))
+        return best, parent
+
+    # ---------- public API ----------
+
+    def plan(self, x, y):
+        """
+        Plan the cheapest move to (x, y) in feet.
+
+        Returns:
+            dict with reachable, cost (feet of movement), path (list of
+            {'x', 'y'} cells after the start), opportunity_attacks and
+            hazards along the way
+        """
+        goal = cell_of(int(x), int(y))
+        result = {
+            'reachable': False,
+            'cost': None,
+            'path': [],
+            'opportunity_attacks': [],
+            'hazards': [],
+            'budget': self.budget,
+        }
+        if goal == self.start:
+            result.update(reachable=True, cost=0)
+            return result
+        if goal in self.occupied:
+            result['reason'] = 'Destination is occupied'
+            return result
+
+        best, parent = self._search(goal)
+        if goal not in best:
+            result['reason'] = 'Destination is out of reach'
+            return result
+
+        cells = []
+        cell = goal
+        while cell is not None:
+            cells.append(cell)
+            cell = parent[cell]
+        cells.reverse()
+
+        result.update(
+            reachable=True,
+            cost=best[goal][0],
+            path=[{'x': col * CELL_SIZE, 'y': row * CELL_SIZE} for col, row in cells[1:]],
+            opportunity_attacks=self._opportunity_attacks(cells),
+            hazards=self._hazards(cells[1:]),
+        )
+        return result
+
+    def reachable(self):
+        """
+        Every cell the participant can end its move in.
+
+        Returns:
+            list of {'x', 'y', 'cost', 'provokes', 'hazard'} dicts
+        """
+        best, _ = self._search()
+        return [
+            {
+                'x': col * CELL_SIZE,
+                'y': row * CELL_SIZE,
+                'cost': cost[0],
+                'provokes': cost[1] > 0,
+                'hazard': self.environment.has_hazard(col * CELL_SIZE, row * CELL_SIZE),
+            }
+            for (col, row), cost in best.items()
+            if (col, row) not in self.occupied
+        ]
+
+    def _opportunity_attacks(self, cells):
+        """Hostiles whose reach the path leaves, once each, that can react"""
+        attacks = []
+        seen = set()
+        for cell, next_cell in zip(cells, cells[1:]):
+            entering = self.threats.get(next_cell, ())
+            for hostile in self.threats.get(cell, ()):
+                if hostile in entering or hostile.id in seen:
+                    continue
+                seen.add(hostile.id)
+                if hostile.can_make_opportunity_attack(self.mover):
+                    attacks.append({
+                        'attacker_id': hostile.id,
+                        'attacker_name': hostile.get_name(),
+                        'x': cell[0] * CELL_SIZE,
+                        'y': cell[1] * CELL_SIZE,
+                    })
+        return attacks
+
+    def _hazards(self, cells):
+        """Hazard cells entered along the path"""
+        exposure = []
+        for col, row in cells:
+            hazards = self.environment.effects_at(col * CELL_SIZE, row * CELL_SIZE)['hazards']
+            if hazards:
+                exposure.append({'x': col * CELL_SIZE, 'y': row * CELL_SIZE, 'hazards': hazards})
+        return exposure
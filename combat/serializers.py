@@ -168,6 +168,7 @@ class CombatSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CombatSession
         fields = "__all__"
+        read_only_fields = ['version']
     
     def get_current_participant(self, obj):
         current = obj.get_current_participant()
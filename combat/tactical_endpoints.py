@@ -6,10 +6,12 @@ Endpoints for AOE targeting, grappling, and cover systems.
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status as http_status
+from core.instrumentation import mark_stage, profiled
 from .aoe_utils import get_aoe_targets, AOE_SPELL_TEMPLATES
 from .utils import calculate_damage, calculate_saving_throw, roll_d20
 
 
+@profiled('cast_aoe_spell')
 def cast_aoe_spell_endpoint(self, request, pk=None):
     """
     Cast an area of effect spell hitting multiple targets.
@@ -78,6 +80,7 @@ def cast_aoe_spell_endpoint(self, request, pk=None):
         )
     
     # Get spell template or use custom params
+    mark_stage('rules')
     if spell_name in AOE_SPELL_TEMPLATES:
         template = AOE_SPELL_TEMPLATES[spell_name]
         shape = template['shape']
@@ -147,6 +150,7 @@ def cast_aoe_spell_endpoint(self, request, pk=None):
     
     for participant, distance in targets:
         # Roll save
+        mark_stage('roll')
         save_roll, _ = roll_d20()
         save_modifier = participant.get_ability_modifier(save_type.upper())
         
@@ -165,6 +169,7 @@ def cast_aoe_spell_endpoint(self, request, pk=None):
         damage_taken = base_damage // 2 if save_success else base_damage
         
         # Apply damage
+        mark_stage('persist')
         participant.take_damage(damage_taken, damage_type, check_concentration=True)
         
         targets_affected.append({
@@ -183,6 +188,7 @@ def cast_aoe_spell_endpoint(self, request, pk=None):
             'max_hp': participant.max_hp
         })
     
+    mark_stage('serialize')
     return Response({
         'spell_name': spell_name or 'Custom AOE',
         'caster': caster.get_name(),
@@ -1,15 +1,22 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 import logging
 
+from core.concurrency import StaleVersionError, versioned_update
+from core.instrumentation import InstrumentedViewMixin, mark_stage, profiled
 from core.throttles import CombatActionThrottle
 
 from .models import CombatSession, CombatParticipant, CombatAction, CombatLog, ConditionApplication, EnvironmentalEffect, ParticipantPosition
+from .combat_setup import build_participants, initiative_order, roll_initiative_for
 from .condition_effects import auto_apply_condition_from_spell, get_condition_for_spell
+from .environment_map import CELL_SIZE, build_environment_map, get_environment_map
+from .pathfinding import MovementPlanner
 from .environmental_effects import (
-    calculate_movement_cost, calculate_cover_ac_bonus, calculate_cover_save_bonus,
+    calculate_cover_ac_bonus, calculate_cover_save_bonus,
     has_full_cover, get_lighting_attack_modifier, get_weather_ranged_modifier,
     get_environmental_effects_summary
 )
@@ -30,7 +37,7 @@ from bestiary.models import EnemyAttack, DamageType
 logger = logging.getLogger('combat')
 
 
-class CombatSessionViewSet(viewsets.ModelViewSet):
+class CombatSessionViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """API endpoint for managing combat sessions"""
     queryset = CombatSession.objects.all().select_related(
         'encounter'
@@ -96,7 +103,11 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         session.current_round = 1
         session.current_turn_index = 0
         session.started_at = timezone.now()
-        session.save()
+        if not versioned_update(session, ['status', 'current_round', 'current_turn_index', 'started_at']):
+            return Response(
+                {"error": "Combat advanced in another request; reload and retry"},
+                status=status.HTTP_409_CONFLICT
+            )
         
         logger.info(f"Combat {pk} started with {participants.count()} participants")
         
@@ -239,6 +250,100 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=True, methods=['post'])
+    def setup(self, request, pk=None):
+        """Add a whole encounter and party to combat and roll initiative.
+        
+        Request body:
+            encounter_id: Encounter whose living enemies join (defaults to
+                the session's encounter; omit both for a party-only setup).
+                A session without an encounter is linked to this one.
+            character_ids: Characters to add
+            roll_initiative: Roll for the new participants (default true)
+        
+        Participants already in the session are skipped. Everything is
+        created with one bulk_create and initiative is saved with one
+        bulk_update; the response is the compact initiative order rather
+        than the full session serialization.
+        """
+        session = self.get_object()
+        encounter_id = request.data.get('encounter_id')
+        character_ids = request.data.get('character_ids') or []
+        should_roll = str(request.data.get('roll_initiative', True)).lower() not in ('false', '0')
+        
+        if not isinstance(character_ids, list):
+            character_ids = [character_ids]
+        try:
+            character_ids = list(dict.fromkeys(int(character_id) for character_id in character_ids))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "'character_ids' must be a list of ids"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        encounter = session.encounter
+        if encounter_id:
+            if encounter and str(encounter.id) != str(encounter_id):
+                return Response(
+                    {"error": "Combat session belongs to a different encounter"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                encounter = Encounter.objects.get(pk=encounter_id)
+            except (Encounter.DoesNotExist, ValueError):
+                return Response(
+                    {"error": "Encounter not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        characters = list(Character.objects.filter(pk__in=character_ids).select_related('stats'))
+        missing = sorted(set(character_ids) - {character.id for character in characters})
+        if missing:
+            return Response(
+                {"error": "Character not found", "character_ids": missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        without_stats = [character.name for character in characters if not hasattr(character, 'stats')]
+        if without_stats:
+            return Response(
+                {"error": "Character must have stats", "characters": without_stats},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        existing = list(session.participants.all())
+        present_characters = {participant.character_id for participant in existing}
+        present_enemies = {participant.encounter_enemy_id for participant in existing}
+        
+        encounter_enemies = []
+        if encounter is not None:
+            encounter_enemies = [
+                encounter_enemy
+                for encounter_enemy in encounter.enemies.filter(is_alive=True).select_related('enemy__stats')
+                if encounter_enemy.id not in present_enemies
+            ]
+        characters = [character for character in characters if character.id not in present_characters]
+        
+        new_participants = build_participants(session, encounter_enemies, characters)
+        with transaction.atomic():
+            if encounter is not None and session.encounter_id is None:
+                session.encounter = encounter
+                session.save(update_fields=['encounter'])
+            created = CombatParticipant.objects.bulk_create(new_participants)
+            results = roll_initiative_for(created) if should_roll else []
+        
+        logger.info(
+            f"Combat {session.id} setup: added {len(created)} participants "
+            f"({len(encounter_enemies)} enemies, {len(characters)} characters)"
+        )
+        
+        active = [participant for participant in existing + created if participant.is_active]
+        return Response({
+            "message": f"{len(created)} participants added to combat",
+            "added": [participant.id for participant in created],
+            "results": results,
+            "initiative_order": initiative_order(active),
+        })
+    
     @action(detail=True, methods=['post'])
     def roll_initiative(self, request, pk=None):
         """Roll initiative for participants.
@@ -246,62 +351,29 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         Accepts optional 'overrides' dict: {participant_id: initiative_value}
         for manually set values. Auto-rolls (d20 + DEX mod) only for
         participants whose initiative is still 0 after applying overrides.
+        With 'compact' set, returns the initiative order instead of the
+        full session.
         """
         session = self.get_object()
-        participants = session.participants.filter(is_active=True)
+        # The viewset prefetches participants with their stats, so rolling
+        # updates the same objects the session serializer reads
+        participants = [participant for participant in session.participants.all() if participant.is_active]
         
-        if not participants.exists():
+        if not participants:
             return Response(
                 {"error": "No participants in combat"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Apply manual overrides first
-        overrides = request.data.get('overrides', {})
-        for pid_str, value in overrides.items():
-            try:
-                pid = int(pid_str)
-                val = int(value)
-                if val != 0:
-                    participant = participants.get(pk=pid)
-                    participant.initiative = val
-                    participant.save()
-            except (ValueError, participants.model.DoesNotExist):
-                continue
+        # Manual overrides, then d20 + DEX for everyone still at 0,
+        # saved with a single bulk_update
+        results = roll_initiative_for(participants, request.data.get('overrides', {}))
         
-        # Re-fetch to get updated values
-        participants = session.participants.filter(is_active=True)
-        
-        results = []
-        for participant in participants:
-            if participant.initiative != 0:
-                # Already set manually — keep it
-                results.append({
-                    'participant_id': participant.id,
-                    'name': participant.get_name(),
-                    'roll': None,
-                    'modifier': None,
-                    'initiative': participant.initiative,
-                    'source': 'manual',
-                })
-                continue
-            
-            # Auto-roll for this participant
-            roll, _ = roll_d20()
-            modifier = participant.get_ability_modifier('DEX')
-            initiative = roll + modifier
-            # Ensure we don't land on exactly 0 (would look unset)
-            if initiative == 0:
-                initiative = 1
-            participant.initiative = initiative
-            participant.save()
-            results.append({
-                'participant_id': participant.id,
-                'name': participant.get_name(),
-                'roll': roll,
-                'modifier': modifier,
-                'initiative': initiative,
-                'source': 'auto',
+        if str(request.data.get('compact', '')).lower() in ('true', '1'):
+            return Response({
+                "message": "Initiative rolled",
+                "results": results,
+                "initiative_order": initiative_order(participants),
             })
         
         serializer = self.get_serializer(session)
@@ -335,6 +407,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'])
+    @profiled('attack')
     def attack(self, request, pk=None):
         """Make an attack"""
         session = self.get_object()
@@ -431,9 +504,11 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                 damage_string = enemy_attack.damage
         
         # Roll attack
+        mark_stage('roll')
         roll, roll_breakdown = roll_d20(advantage=advantage, disadvantage=disadvantage)
         
         # Calculate attack modifier
+        mark_stage('rules')
         ability_mod = attacker.get_ability_modifier(use_ability)
         damage_ability_mod = ability_mod  # Separate tracker for damage (may differ from attack bonus for enemies)
         if attacker.character:
@@ -554,6 +629,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         critical = (roll == 20)  # Natural 20 is critical
         
         # Calculate damage if hit
+        mark_stage('roll')
         damage_amount = 0
         damage_breakdown = ""
         concentration_broken = False
@@ -563,9 +639,11 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             damage_amount, damage_breakdown = calculate_damage(
                 damage_string, damage_modifier, critical
             )
+            mark_stage('persist')
             new_hp, concentration_broken = target.take_damage(damage_amount)
         
         # Create combat action
+        mark_stage('persist')
         action = CombatAction.objects.create(
             combat_session=session,
             actor=attacker,
@@ -589,6 +667,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             attacker.action_used = True
         attacker.save()
         
+        mark_stage('serialize')
         return Response({
             "message": f"{attacker.get_name()} attacks {target.get_name()}",
             "attack_roll": roll,
@@ -621,6 +700,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'])
+    @profiled('cast_spell')
     def cast_spell(self, request, pk=None):
         """Cast a spell"""
         session = self.get_object()
@@ -669,6 +749,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             )
         
         # Validate spell slots for player characters
+        mark_stage('rules')
         if caster.character:
             from characters.spell_management import can_cast_spell
             is_ritual = request.data.get('is_ritual', False)
@@ -711,6 +792,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                 )
         
         # Handle concentration
+        mark_stage('persist')
         if requires_concentration:
             caster.is_concentrating = True
             caster.concentration_spell = spell_name
@@ -721,6 +803,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         save_success = None
         damage_amount = 0
         if save_type and save_dc and target:
+            mark_stage('roll')
             save_roll, save_breakdown = roll_d20()
             ability_mod = target.get_ability_modifier(save_type)
             proficiency_bonus = target.character.proficiency_bonus if target.character else 2
@@ -739,14 +822,17 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                     damage_amount, _ = calculate_damage(damage_string, 0, False)
                 
                 if damage_amount > 0:
+                    mark_stage('persist')
                     new_hp, _ = target.take_damage(damage_amount)
         
         # Auto-apply conditions from spell (if save failed or no save)
+        mark_stage('rules')
         applied_condition = None
         if target and (not save_success or not save_type):
             applied_condition = auto_apply_condition_from_spell(target, spell_name)
             if applied_condition:
                 # Create condition application record
+                mark_stage('persist')
                 ConditionApplication.objects.create(
                     participant=target,
                     condition=applied_condition,
@@ -760,6 +846,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                 )
         
         # Create combat action
+        mark_stage('persist')
         action = CombatAction.objects.create(
             combat_session=session,
             actor=caster,
@@ -784,6 +871,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         if caster.encounter_enemy:
             caster.use_enemy_spell(spell_name)
         
+        mark_stage('serialize')
         return Response({
             "message": f"{caster.get_name()} casts {spell_name}",
             "spell_name": spell_name,
@@ -1027,7 +1115,8 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        if attacker.reaction_used:
+        # Claim the reaction up front so two requests can't both spend it
+        if attacker.reaction_used or not attacker.use_reaction():
             return Response(
                 {"error": "Reaction already used this turn"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -1106,10 +1195,6 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             )
             new_hp, concentration_broken = target.take_damage(damage_amount)
         
-        # Mark reaction as used
-        attacker.reaction_used = True
-        attacker.save()
-        
         # Create combat action
         action = CombatAction.objects.create(
             combat_session=session,
@@ -1212,8 +1297,12 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
         
-        # Mark reaction as used
-        participant.use_reaction()
+        # Mark reaction as used (fails if a concurrent request got there first)
+        if not participant.use_reaction():
+            return Response(
+                {"error": "Reaction already used this round"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Get reaction details
         if reaction_type == 'spell':
@@ -1316,7 +1405,8 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         
         session.status = 'ended'
         session.ended_at = timezone.now()
-        session.save()
+        # Leave the turn pointer and version to concurrent advances
+        session.save(update_fields=['status', 'ended_at'])
         
         # Generate combat log
         log = session.generate_log()
@@ -1369,13 +1459,17 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         report = session.get_combat_report()
         return Response(report)
     
-    @action(detail=True, methods=['get', 'post'])
+    @action(detail=True, methods=['get', 'post', 'delete'])
     def environmental_effects(self, request, pk=None):
         """
-        Get or add environmental effects to combat session.
+        Get, add or remove environmental effects of a combat session.
         
         GET: List all environmental effects
         POST: Add a new environmental effect
+        DELETE: Deactivate an effect ({"effect_id": 3})
+        
+        Adding or removing an effect recompiles the session's environment
+        map (combat.environment_map) used for position and movement lookups.
         """
         session = self.get_object()
         
@@ -1441,11 +1535,35 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             serializer = EnvironmentalEffectSerializer(data=effect_data)
             if serializer.is_valid():
                 effect = serializer.save()
+                build_environment_map(session)
                 return Response({
                     "message": f"Environmental effect added: {effect.get_effect_type_display()}",
                     "effect": serializer.data
                 }, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        elif request.method == 'DELETE':
+            effect_id = request.data.get('effect_id')
+            if not effect_id:
+                return Response(
+                    {"error": "effect_id is required"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            try:
+                effect = EnvironmentalEffect.objects.get(pk=effect_id, combat_session=session, is_active=True)
+            except EnvironmentalEffect.DoesNotExist:
+                return Response(
+                    {"error": "Environmental effect not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            effect.is_active = False
+            effect.save()
+            build_environment_map(session)
+            return Response({
+                "message": f"Environmental effect removed: {effect.get_effect_type_display()}"
+            })
     
     @action(detail=True, methods=['post'])
     def set_participant_position(self, request, pk=None):
@@ -1493,52 +1611,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
     
     def _update_position_environmental_effects(self, position, session):
         """Update environmental effects at participant's position"""
-        # Check for terrain
-        terrain_effects = EnvironmentalEffect.objects.filter(
-            combat_session=session,
-            effect_type='terrain',
-            is_active=True
-        )
-        if terrain_effects.exists():
-            position.current_terrain = terrain_effects.first().terrain_type
-        
-        # Check for cover
-        cover_effects = EnvironmentalEffect.objects.filter(
-            combat_session=session,
-            effect_type='cover',
-            is_active=True
-        )
-        for cover_effect in cover_effects:
-            if cover_effect.cover_area_x and cover_effect.cover_area_y and cover_effect.cover_area_radius:
-                if position.is_in_area(cover_effect.cover_area_x, cover_effect.cover_area_y, cover_effect.cover_area_radius):
-                    position.current_cover = cover_effect.cover_type
-                    break
-        
-        # Check for lighting
-        lighting_effects = EnvironmentalEffect.objects.filter(
-            combat_session=session,
-            effect_type='lighting',
-            is_active=True
-        )
-        for lighting_effect in lighting_effects:
-            if lighting_effect.lighting_area_x and lighting_effect.lighting_area_y and lighting_effect.lighting_area_radius:
-                if position.is_in_area(lighting_effect.lighting_area_x, lighting_effect.lighting_area_y, lighting_effect.lighting_area_radius):
-                    position.current_lighting = lighting_effect.lighting_type
-                    break
-        
-        # Check for hazards
-        hazard_effects = EnvironmentalEffect.objects.filter(
-            combat_session=session,
-            effect_type='hazard',
-            is_active=True
-        )
-        hazards = []
-        for hazard_effect in hazard_effects:
-            if hazard_effect.hazard_area_x and hazard_effect.hazard_area_y and hazard_effect.hazard_area_radius:
-                if position.is_in_area(hazard_effect.hazard_area_x, hazard_effect.hazard_area_y, hazard_effect.hazard_area_radius):
-                    hazards.append(hazard_effect.hazard_type)
-        position.current_hazards = hazards
-        
+        get_environment_map(session).apply_to_position(position)
         position.save()
     
     @action(detail=False, methods=['post'])
@@ -1697,7 +1770,11 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         """
         Resolve the current enemy's turn using AI.
         The AI selects targets, executes attacks, then advances the turn.
+        
+        'strategy' picks the AI: 'tactical' (combat.ai_policy) or 'simple';
+        defaults to settings.COMBAT_AI_STRATEGY.
         """
+        from .ai_policy import resolve_tactical_turn
         from .combat_ai import resolve_enemy_turn
         
         session = self.get_object()
@@ -1723,7 +1800,11 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         
         try:
             # Resolve the enemy's turn
-            actions = resolve_enemy_turn(session, current)
+            strategy = request.data.get('strategy', settings.COMBAT_AI_STRATEGY)
+            if strategy == 'tactical':
+                actions = resolve_tactical_turn(session, current, session.participants.all())
+            else:
+                actions = resolve_enemy_turn(session, current)
             
             # Advance to next turn
             next_participant = session.next_turn()
@@ -1734,6 +1815,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
                 "actor": current.get_name(),
                 "actor_id": current.id,
                 "actions": actions,
+                "strategy": strategy,
                 "next_turn": next_participant.get_name() if next_participant else None,
                 "session": serializer.data,
             })
@@ -1749,8 +1831,13 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
         """
         Automatically resolve all consecutive enemy turns.
         Stops when it's a player character's turn or combat ends.
+        
+        The turns are resolved in memory against the prefetched board and
+        written in one transaction (see combat.ai_batch). 'strategy' works
+        as in ai_turn. With 'compact' set, returns the initiative order
+        instead of the full session.
         """
-        from .combat_ai import resolve_enemy_turn
+        from .ai_batch import EnemyTurnBatch
         
         session = self.get_object()
         
@@ -1761,52 +1848,31 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            all_actions = []
-            turns_resolved = 0
-            max_turns = 20  # Safety limit
-            
-            while turns_resolved < max_turns:
-                current = session.get_current_participant()
-                if not current:
-                    break
-                
-                # Stop if it's a player's turn
-                if current.participant_type != 'enemy':
-                    break
-                
-                # Resolve this enemy's turn
-                actions = resolve_enemy_turn(session, current)
-                all_actions.append({
-                    "actor": current.get_name(),
-                    "actor_id": current.id,
-                    "actions": actions,
-                })
-                turns_resolved += 1
-                
-                # Advance turn
-                next_participant = session.next_turn()
-                if not next_participant:
-                    break
-                
-                # Check if all players are dead (combat should end)
-                living_players = session.participants.filter(
-                    participant_type='character',
-                    is_active=True,
-                    current_hp__gt=0,
-                ).count()
-                if living_players == 0:
-                    break
-            
-            serializer = self.get_serializer(session)
-            current = session.get_current_participant()
+            batch = EnemyTurnBatch(
+                session, participants=session.participants.all(),
+                strategy=request.data.get('strategy', settings.COMBAT_AI_STRATEGY)
+            )
+            all_actions = batch.run()
+            batch.commit()
+            turns_resolved = batch.turns_resolved
+            current = batch.current()
             
-            return Response({
+            response = {
                 "message": f"Resolved {turns_resolved} enemy turn(s)",
                 "turns_resolved": turns_resolved,
                 "enemy_turns": all_actions,
                 "current_turn": current.get_name() if current else None,
-                "session": serializer.data,
-            })
+            }
+            if str(request.data.get('compact', '')).lower() in ('true', '1'):
+                response["initiative_order"] = initiative_order(batch.initiative_order())
+            else:
+                response["session"] = self.get_serializer(session).data
+            return Response(response)
+        except StaleVersionError:
+            return Response(
+                {"error": "Combat advanced in another request; reload and retry"},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             logger.exception(f"Auto enemy turns error: {e}")
             return Response(
@@ -1815,7 +1881,7 @@ class CombatSessionViewSet(viewsets.ModelViewSet):
             )
 
 
-class CombatParticipantViewSet(viewsets.ModelViewSet):
+class CombatParticipantViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """API endpoint for managing combat participants"""
     queryset = CombatParticipant.objects.all()
     serializer_class = CombatParticipantSerializer
@@ -1915,6 +1981,61 @@ class CombatParticipantViewSet(viewsets.ModelViewSet):
             "participant": serializer.data
         })
     
+    def _movement_budget(self, participant):
+        """Return (base speed, movement left this turn) in feet"""
+        base_speed = 30  # Default
+        if participant.character and hasattr(participant.character, 'stats'):
+            base_speed = participant.character.stats.speed or 30
+        return base_speed, max(0, base_speed - participant.movement_used)
+    
+    def _planner_for(self, participant):
+        """MovementPlanner for a positioned participant, or an error Response"""
+        try:
+            participant.position
+        except ParticipantPosition.DoesNotExist:
+            return None, Response(
+                {"error": "Participant has no position"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        _, budget = self._movement_budget(participant)
+        return MovementPlanner.for_participant(participant, budget), None
+    
+    @action(detail=True, methods=['get'])
+    def plan_move(self, request, pk=None):
+        """
+        Plan a move to a destination without moving.
+        
+        Query params: x, y (destination in feet)
+        Returns the cheapest path within the remaining movement, the
+        opportunity attacks it would provoke and the hazards it crosses.
+        """
+        participant = self.get_object()
+        try:
+            x = int(request.query_params['x'])
+            y = int(request.query_params['y'])
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "x and y query parameters are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        planner, error = self._planner_for(participant)
+        if error:
+            return error
+        return Response(planner.plan(x, y))
+    
+    @action(detail=True, methods=['get'])
+    def reachable(self, request, pk=None):
+        """Cells the participant can end its move in this turn (for highlighting)"""
+        participant = self.get_object()
+        planner, error = self._planner_for(participant)
+        if error:
+            return error
+        return Response({
+            "budget": planner.budget,
+            "cells": planner.reachable()
+        })
+    
     @action(detail=True, methods=['post'])
     def move(self, request, pk=None):
         """
@@ -1927,6 +2048,10 @@ class CombatParticipantViewSet(viewsets.ModelViewSet):
             "y": 10,  // Optional: new Y position
             "z": 0   // Optional: new Z position
         }
+        
+        Without "distance", a positioned participant moves to (x, y) along
+        the cheapest path from plan_move; the response lists the path, the
+        opportunity attacks it provoked and the hazards crossed.
         """
         participant = self.get_object()
         session = participant.combat_session
@@ -1943,9 +2068,7 @@ class CombatParticipantViewSet(viewsets.ModelViewSet):
         z = request.data.get('z', 0)
         
         # Get participant's base speed
-        base_speed = 30  # Default
-        if participant.character and hasattr(participant.character, 'stats'):
-            base_speed = participant.character.stats.speed or 30
+        base_speed, _ = self._movement_budget(participant)
         
         # Get current position
         try:
@@ -1957,21 +2080,14 @@ class CombatParticipantViewSet(viewsets.ModelViewSet):
                 y=y or 0,
                 z=z or 0
             )
+        else:
+            if 'distance' not in request.data and x is not None and y is not None:
+                return self._move_along_path(participant, position, int(x), int(y), z)
         
-        # Calculate movement cost considering terrain
-        terrain_type = position.current_terrain
-        weather_effect = EnvironmentalEffect.objects.filter(
-            combat_session=session,
-            effect_type='weather',
-            is_active=True
-        ).first()
-        weather = weather_effect.weather_type if weather_effect else None
-        
-        effective_movement, cost_multiplier = calculate_movement_cost(
-            base_speed,
-            terrain_type=terrain_type,
-            weather=weather
-        )
+        # Calculate movement cost considering terrain (from the compiled
+        # environment map, so no effect queries per step)
+        environment = get_environment_map(session)
+        effective_movement, cost_multiplier = environment.movement_cost(base_speed)
         
         # Calculate actual movement cost
         movement_cost = int(distance * cost_multiplier)
@@ -1990,8 +2106,7 @@ class CombatParticipantViewSet(viewsets.ModelViewSet):
             position.y = y
             position.z = z
             # Update environmental effects at new position
-            session_viewset = CombatSessionViewSet()
-            session_viewset._update_position_environmental_effects(position, session)
+            environment.apply_to_position(position)
             position.save()
         
         # Update movement used
@@ -2008,6 +2123,38 @@ class CombatParticipantViewSet(viewsets.ModelViewSet):
             "participant": serializer.data
         })
     
+    def _move_along_path(self, participant, position, x, y, z):
+        """Move to (x, y) along the planned path, charging its cost"""
+        base_speed, budget = self._movement_budget(participant)
+        planner = MovementPlanner.for_participant(participant, budget)
+        plan = planner.plan(x, y)
+        if not plan['reachable']:
+            return Response(
+                {"error": plan.get('reason', 'Destination is out of reach'), "plan": plan},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        position.x = x
+        position.y = y
+        position.z = z
+        planner.environment.apply_to_position(position)
+        position.save()
+        
+        participant.movement_used += plan['cost']
+        participant.save()
+        
+        serializer = self.get_serializer(participant)
+        return Response({
+            "message": f"{participant.get_name()} moved {len(plan['path']) * CELL_SIZE} feet (cost: {plan['cost']} feet)",
+            "movement_used": participant.movement_used,
+            "movement_remaining": base_speed - participant.movement_used,
+            "path": plan['path'],
+            "opportunity_attacks": plan['opportunity_attacks'],
+            "hazards": plan['hazards'],
+            "position": ParticipantPositionSerializer(position).data,
+            "participant": serializer.data
+        })
+    
     @action(detail=True, methods=['post'])
     def apply_hazard_damage(self, request, pk=None):
         """
@@ -6,7 +6,10 @@ Provides decorators and helpers for caching API responses with Redis.
 from functools import wraps
 from django.core.cache import cache
 from django.conf import settings
+from django.db import transaction
+from django.views.decorators.cache import cache_page
 from rest_framework.response import Response
+from core.instrumentation import record_cache_lookup
 import hashlib
 import json
 
@@ -65,6 +68,7 @@ def cache_response(timeout=None, key_prefix=None):
             
             # Try to get from cache
             cached_data = cache.get(cache_key)
+            record_cache_lookup(cached_data is not None)
             if cached_data is not None:
                 return Response(cached_data)
             
@@ -109,7 +113,9 @@ def get_cached_model_instance(model_name, instance_id):
         Cached data or None if not found
     """
     cache_key = f"{model_name}:{instance_id}"
-    return cache.get(cache_key)
+    data = cache.get(cache_key)
+    record_cache_lookup(data is not None)
+    return data
 
 
 def invalidate_cache(pattern):
@@ -143,6 +149,68 @@ def invalidate_model_cache(model_name, instance_id=None):
     invalidate_cache(pattern)
 
 
+def get_catalogue_version(catalogue):
+    """
+    Current version of a reference-data catalogue (e.g. 'spells').
+
+    Caches built from the catalogue include this number in their keys, so
+    bumping it after an import retires every stale entry at once without
+    needing delete_pattern support from the cache backend.
+    """
+    cache_key = f"catalogue_version:{catalogue}"
+    version = cache.get(cache_key)
+    if version is None:
+        cache.add(cache_key, 1, None)
+        version = cache.get(cache_key, 1)
+    return version
+
+
+def bump_catalogue_version(catalogue):
+    """
+    Increment a catalogue version after its data changes.
+    
+    Returns:
+        int: The new version
+    """
+    cache_key = f"catalogue_version:{catalogue}"
+    get_catalogue_version(catalogue)
+    try:
+        return cache.incr(cache_key)
+    except ValueError:
+        # Key evicted between the read and the increment
+        cache.set(cache_key, 2, None)
+        return 2
+
+
+def retire_catalogue_version(catalogue):
+    """
+    Bump a catalogue version from a write, and again once the write's
+    transaction commits: a reader in between still sees the old rows and
+    may have cached them under the first new version.
+    """
+    bump_catalogue_version(catalogue)
+    transaction.on_commit(lambda: bump_catalogue_version(catalogue))
+
+
+def versioned_cache_page(timeout, key_prefix, catalogue):
+    """
+    cache_page whose key prefix carries the catalogue version.
+    
+    Usage:
+        @method_decorator(versioned_cache_page(3600, 'spells_cantrips', 'spells'))
+        @action(detail=False, methods=['get'])
+        def cantrips(self, request):
+            ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            prefix = f"{key_prefix}:v{get_catalogue_version(catalogue)}"
+            return cache_page(timeout, key_prefix=prefix)(view_func)(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class CacheInvalidationMixin:
     """
     Mixin for ViewSets to automatically invalidate cache on updates.
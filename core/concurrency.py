@@ -0,0 +1,71 @@
+"""
+Lock-free conditional updates for contended model rows.
+
+Two requests that read a row, change it in Python and save() it back will
+overwrite each other (two hits on the same goblin, two buyers on the same
+item). These helpers push the read-modify-write into a single
+UPDATE ... WHERE statement instead, so the database applies concurrent
+changes one after the other and a guard that no longer holds simply
+matches zero rows.
+
+Usage:
+    from django.db.models import F, Q
+    from core.concurrency import guarded_update
+
+    # Spend a reaction only if it is still available
+    if guarded_update(participant, Q(reaction_used=False), reaction_used=True):
+        ...
+
+    # Relative change; the instance is refreshed with the stored result
+    guarded_update(character, None, gold=F('gold') - 50)
+"""
+
+
+class StaleVersionError(Exception):
+    """Raised when an optimistic (version-checked) write loses a race"""
+
+
+def guarded_update(instance, guard=None, **changes):
+    """
+    Apply ``changes`` to ``instance``'s row only if ``guard`` still holds.
+
+    Args:
+        instance: Saved model instance
+        guard: Q object the row must match, or None for an unconditional
+            (but still atomic) update
+        **changes: Field values or expressions (F, Case, Greatest...)
+
+    Returns:
+        bool: True if the row was updated. The changed fields on
+        ``instance`` are then reloaded from the database, so relative
+        expressions resolve to the value other writers produced too.
+    """
+    queryset = type(instance)._default_manager.filter(pk=instance.pk)
+    if guard is not None:
+        queryset = queryset.filter(guard)
+    if not queryset.update(**changes):
+        return False
+    instance.refresh_from_db(fields=list(changes))
+    return True
+
+
+def versioned_update(instance, fields, version_field='version'):
+    """
+    Optimistically save ``fields`` of ``instance``, bumping its version.
+
+    The write only lands if nobody else saved the row since ``instance``
+    was read (its version column is unchanged); the caller decides
+    whether to reload and retry or report a conflict.
+
+    Returns:
+        bool: True if saved; ``instance``'s version is then the new one
+    """
+    version = getattr(instance, version_field)
+    changes = {field: getattr(instance, field) for field in fields}
+    changes[version_field] = version + 1
+    updated = type(instance)._default_manager.filter(
+        pk=instance.pk, **{version_field: version}
+    ).update(**changes)
+    if updated:
+        setattr(instance, version_field, version + 1)
+    return bool(updated)
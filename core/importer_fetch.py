@@ -0,0 +1,324 @@
+"""
+Shared fetch layer for the Open5e content importers
+
+The monster, item and spell import commands all walk DRF-style paginated
+endpoints ({"count", "next", "results"}). This module does that walk once,
+for all of them:
+
+- one pooled requests.Session with retries, shared across pages
+- after the first page the page count is known, so the remaining pages are
+  fetched concurrently by a bounded thread pool
+- results are streamed page by page, in order, so callers can parse page N
+  while later pages are still in flight (producer/consumer)
+- every response body is stored in an on-disk, content-addressed cache, so
+  re-imports and CI can run fully offline
+
+Usage:
+    from core.importer_fetch import PaginatedFetcher
+
+    fetcher = PaginatedFetcher(cache_dir=settings.IMPORTER_CACHE_DIR)
+    for monster in fetcher.iter_results('https://api.open5e.com/monsters/', params={...}):
+        ...
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 30
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be fetched (or is missing from an offline cache)"""
+
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache of response bodies.
+
+    Bodies are stored once under the SHA-256 of their content
+    (objects/ab/abcdef...). Each request URL maps to a small ref file
+    (refs/<sha256 of url>) naming the object it last returned, so identical
+    pages fetched through different URLs are stored once.
+    """
+
+    def __init__(self, cache_dir):
+        self.root = Path(cache_dir)
+
+    @staticmethod
+    def request_key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _ref_path(self, url):
+        return self.root / 'refs' / self.request_key(url)
+
+    def _object_path(self, digest):
+        return self.root / 'objects' / digest[:2] / digest
+
+    def get(self, url):
+        """Return the cached body for url, or None"""
+        try:
+            digest = self._ref_path(url).read_text().strip()
+            return self._object_path(digest).read_bytes()
+        except OSError:
+            return None
+
+    def put(self, url, body):
+        """Store a response body and point url at it"""
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            self._atomic_write(object_path, body)
+        self._atomic_write(self._ref_path(url), digest.encode('ascii'))
+
+    @staticmethod
+    def _atomic_write(path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def with_query(url, params):
+    """Return url with params merged into (and overriding) its query string"""
+    if not params:
+        return url
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(sorted(query.items()))))
+
+
+def page_url(next_url, page_number, page_size):
+    """
+    Build the URL for an arbitrary page from the API's own "next" link.
+
+    Supports page-number (?page=N) and limit/offset (?limit=&offset=)
+    pagination. Returns None for anything else (e.g. cursor pagination),
+    in which case pages can only be followed one at a time.
+    """
+    query = dict(parse_qsl(urlsplit(next_url).query, keep_blank_values=True))
+    if 'page' in query:
+        return with_query(next_url, {'page': page_number})
+    if 'offset' in query:
+        limit = int(query.get('limit') or page_size)
+        return with_query(next_url, {'offset': (page_number - 1) * limit})
+    return None
+
+
+class PaginatedFetcher:
+    """
+    Fetch every page of a paginated JSON endpoint.
+
+    Args:
+        cache_dir: Directory for the response cache (None disables caching)
+        workers: Maximum concurrent page requests
+        offline: Serve only from the cache; a miss raises FetchError
+        refresh: Ignore cached bodies (but still write fresh ones)
+        timeout: Per-request timeout in seconds
+        on_page: Optional callback(page_number, result_count, from_cache)
+    """
+
+    def __init__(self, cache_dir=None, workers=DEFAULT_WORKERS, offline=False,
+                 refresh=False, timeout=DEFAULT_TIMEOUT, on_page=None):
+        if not REQUESTS_AVAILABLE and not offline:
+            raise ImportError('Requests library not available. Install with: pip install requests')
+
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.workers = max(1, workers)
+        self.offline = offline
+        self.refresh = refresh
+        self.timeout = timeout
+        self.on_page = on_page
+        self._session = None
+
+        if offline and not self.cache:
+            raise ValueError('Offline mode needs a cache directory')
+
+    @property
+    def session(self):
+        """Pooled session sized for the worker count, created on first use"""
+        if self._session is None:
+            session = requests.Session()
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+            adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept': 'application/json'})
+            self._session = session
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------- single page ----------
+
+    def fetch_json(self, url):
+        """
+        Fetch one URL as JSON, through the cache.
+
+        Returns:
+            (decoded JSON, from_cache)
+        """
+        if self.cache and not self.refresh:
+            body = self.cache.get(url)
+            if body is not None:
+                return json.loads(body), True
+        if self.offline:
+            raise FetchError(f'Not in offline cache: {url}')
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.content
+            data = json.loads(body)
+        except (requests.RequestException, ValueError) as e:
+            raise FetchError(f'{url}: {e}') from e
+
+        if self.cache:
+            self.cache.put(url, body)
+        return data, False
+
+    def _fetch_page(self, url):
+        data, from_cache = self.fetch_json(url)
+        return data, data.get('results', []), from_cache
+
+    def _report(self, page_number, results, from_cache):
+        # Called from the consuming thread, so progress is reported in page order
+        if self.on_page:
+            self.on_page(page_number, len(results), from_cache)
+
+    # ---------- all pages ----------
+
+    def iter_pages(self, url, params=None, limit=None):
+        """
+        Yield the results list of each page, in page order.
+
+        The first page is fetched alone to learn the total count and page
+        size; the remaining pages are then fetched concurrently while earlier
+        pages are being yielded. Stops after `limit` results when given.
+        """
+        first, results, from_cache = self._fetch_page(with_query(url, params))
+        self._report(1, results, from_cache)
+        yield results[:limit] if limit else results
+
+        total = first.get('count')
+        next_url = first.get('next')
+        page_size = len(results)
+        remaining = (total if total is not None else math.inf) - page_size
+        if limit:
+            remaining = min(remaining, limit - page_size)
+        if not next_url or remaining <= 0 or not page_size:
+            return
+
+        template = page_url(next_url, 2, page_size)
+        if template is None or total is None:
+            yield from self._follow_next(next_url, 2, limit - page_size if limit else None)
+            return
+
+        last_page = 1 + math.ceil(remaining / page_size)
+        urls = [page_url(next_url, page, page_size) for page in range(2, last_page + 1)]
+        budget = limit - page_size if limit else None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._fetch_page, page_link) for page_link in urls]
+            try:
+                for page, future in enumerate(futures, start=2):
+                    _, page_results, from_cache = future.result()
+                    self._report(page, page_results, from_cache)
+                    if budget is not None:
+                        page_results = page_results[:budget]
+                        budget -= len(page_results)
+                    yield page_results
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _follow_next(self, url, page_number, limit):
+        """Sequential fallback for pagination styles we cannot address directly"""
+        while url and (limit is None or limit > 0):
+            data, results, from_cache = self._fetch_page(url)
+            self._report(page_number, results, from_cache)
+            if limit is not None:
+                results = results[:limit]
+                limit -= len(results)
+            yield results
+            url = data.get('next')
+            page_number += 1
+
+    def iter_results(self, url, params=None, limit=None):
+        """Yield individual results across every page, in order"""
+        for results in self.iter_pages(url, params=params, limit=limit):
+            yield from results
+
+    def fetch_all(self, url, params=None, limit=None):
+        """Return every result as a list"""
+        return list(self.iter_results(url, params=params, limit=limit))
+
+
+# ==================== MANAGEMENT COMMAND HELPERS ====================
+
+def add_fetch_arguments(parser):
+    """Add the shared fetch options to an import command's parser"""
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Concurrent page requests once the page count is known'
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Use only the local response cache (no network)'
+    )
+    parser.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        help='Ignore cached responses and fetch fresh copies'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the local response cache'
+    )
+
+
+def fetcher_from_options(options, on_page=None):
+    """Build a PaginatedFetcher from the options added by add_fetch_arguments"""
+    from django.conf import settings
+
+    cache_dir = None if options.get('no_cache') else getattr(settings, 'IMPORTER_CACHE_DIR', None)
+    return PaginatedFetcher(
+        cache_dir=cache_dir,
+        workers=options.get('workers') or DEFAULT_WORKERS,
+        offline=options.get('offline', False),
+        refresh=options.get('refresh_cache', False),
+        on_page=on_page,
+    )
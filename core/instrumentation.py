@@ -0,0 +1,549 @@
+"""
+Per-request instrumentation: query counts, DB/serializer time, cache hits.
+
+RequestMetricsMiddleware records, for every request:
+
+- view and action name (e.g. ``CombatSessionViewSet.attack``)
+- DB query count and total DB time (via connection.execute_wrapper)
+- cache hits and misses (reported by core.cache_utils and other cache
+  readers through record_cache_lookup)
+- serializer time (for views using InstrumentedViewMixin)
+- response bytes and total latency
+
+and folds them into an in-process histogram registry, scraped through
+``/api/metrics/`` (Prometheus text format, or JSON with ``?format=json``).
+Each worker process keeps its own registry; the scraper aggregates.
+
+Requests slower than REQUEST_METRICS['SLOW_REQUEST_MS'] are sampled
+(SLOW_SAMPLE_RATE) and their full query list is logged to the app's logger
+('combat', 'campaign', else 'api').
+
+Hot paths are split into named stages (resolve, rules, roll, persist,
+serialize) with @profiled and mark_stage(); @profiled adds a final 'render'
+stage covering the response's rendering (DRF's JSON encoding). Stage
+timing is collected for
+STAGE_SAMPLE_RATE of requests (a contextvar lookup otherwise) and for any
+request with ``?profile=1``; staff (or DEBUG) then get the per-stage
+breakdown in the response's ``profile`` key. That breakdown is built
+before the response renders, so render timings only reach the registry. With PROFILER set
+('cprofile' or 'pyinstrument'), PROFILER_SAMPLE_RATE of requests also run
+under that profiler and slow ones are handed to PROFILE_HOOK.
+
+Usage:
+    # settings.py
+    MIDDLEWARE = [..., 'core.instrumentation.RequestMetricsMiddleware', ...]
+
+    # views.py: adds serializer timing and the exact DRF action name
+    class CombatSessionViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
+
+        @action(detail=True, methods=['post'])
+        @profiled('attack')
+        def attack(self, request, pk=None):
+            ...                     # 'attack.resolve'
+            mark_stage('roll')
+            ...                     # 'attack.roll'
+"""
+import bisect
+import contextvars
+import cProfile
+import hmac
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.module_loading import import_string
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLE_RATE': 1.0,
+    'SCRAPE_TOKEN': None,
+    'STAGE_SAMPLE_RATE': 0.01,
+    'PROFILER': None,
+    'PROFILER_SAMPLE_RATE': 0.0,
+    'PROFILE_HOOK': 'core.instrumentation.log_profile',
+}
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# App label of the view's module -> logger for slow request samples
+APP_LOGGERS = {'combat': 'combat', 'campaigns': 'campaign'}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+def current_metrics():
+    """The metrics dict of the request being handled, or None"""
+    return _current.get()
+
+
+def record_cache_lookup(hit):
+    """Count a cache hit (True) or miss (False) against the current request"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics['cache_hits' if hit else 'cache_misses'] += 1
+
+
+# ==================== REGISTRY ====================
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def cumulative(self):
+        running = 0
+        buckets = []
+        for bound, count in zip((*self.bounds, '+Inf'), self.counts):
+            running += count
+            buckets.append((bound, running))
+        return buckets
+
+
+class MetricsRegistry:
+    """Per-endpoint histograms and counters, shared by a worker's threads"""
+
+    HISTOGRAMS = {
+        'latency_ms': LATENCY_BUCKETS_MS,
+        'db_ms': LATENCY_BUCKETS_MS,
+        'serializer_ms': LATENCY_BUCKETS_MS,
+        'queries': QUERY_BUCKETS,
+        'response_bytes': BYTES_BUCKETS,
+    }
+    COUNTERS = ('requests', 'errors', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, metrics):
+        with self._lock:
+            endpoint = self._endpoints.get(metrics['view'])
+            if endpoint is None:
+                endpoint = self._endpoints[metrics['view']] = {
+                    'histograms': {name: Histogram(bounds) for name, bounds in self.HISTOGRAMS.items()},
+                    'counters': dict.fromkeys(self.COUNTERS, 0),
+                    'stages': {},
+                }
+            for name, histogram in endpoint['histograms'].items():
+                histogram.observe(metrics[name])
+            counters = endpoint['counters']
+            counters['requests'] += 1
+            counters['errors'] += metrics['status'] >= 500
+            counters['cache_hits'] += metrics['cache_hits']
+            counters['cache_misses'] += metrics['cache_misses']
+            for stage, timing in (metrics['stages'] or {}).items():
+                histogram = endpoint['stages'].get(stage)
+                if histogram is None:
+                    histogram = endpoint['stages'][stage] = Histogram(LATENCY_BUCKETS_MS)
+                histogram.observe(timing['ms'])
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def snapshot(self):
+        """JSON-friendly copy: {view: {counters, histograms, stages}}"""
+        def summary(histogram):
+            return {
+                'count': histogram.count,
+                'sum': round(histogram.total, 3),
+                'buckets': histogram.cumulative(),
+            }
+
+        with self._lock:
+            return {
+                view: {
+                    **endpoint['counters'],
+                    **{name: summary(histogram) for name, histogram in endpoint['histograms'].items()},
+                    'stages': {stage: summary(histogram) for stage, histogram in sorted(endpoint['stages'].items())},
+                }
+                for view, endpoint in sorted(self._endpoints.items())
+            }
+
+    def prometheus(self):
+        """Prometheus text exposition of the registry"""
+        lines = []
+        snapshot = self.snapshot()
+        for counter in self.COUNTERS:
+            lines.append(f'# TYPE dnd_http_{counter}_total counter')
+            for view, data in snapshot.items():
+                lines.append(f'dnd_http_{counter}_total{{view="{view}"}} {data[counter]}')
+        for name in self.HISTOGRAMS:
+            lines.append(f'# TYPE dnd_http_{name} histogram')
+            for view, data in snapshot.items():
+                histogram = data[name]
+                for bound, count in histogram['buckets']:
+                    lines.append(f'dnd_http_{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'dnd_http_{name}_sum{{view="{view}"}} {histogram["sum"]}')
+                lines.append(f'dnd_http_{name}_count{{view="{view}"}} {histogram["count"]}')
+        lines.append('# TYPE dnd_http_stage_ms histogram')
+        for view, data in snapshot.items():
+            for stage, histogram in data['stages'].items():
+                labels = f'view="{view}",stage="{stage}"'
+                for bound, count in histogram['buckets']:
+                    lines.append(f'dnd_http_stage_ms_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'dnd_http_stage_ms_sum{{{labels}}} {histogram["sum"]}')
+                lines.append(f'dnd_http_stage_ms_count{{{labels}}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# ==================== STAGE PROFILING ====================
+
+class StageTimer:
+    """
+    Consecutive named stages of one code path.
+
+    mark() closes the running stage and opens the next; time and queries
+    accumulate per '<prefix>.<stage>' in the request's metrics, so a stage
+    entered twice (e.g. 'roll' for the attack and again for damage) adds
+    up. Does nothing unless the current request is sampled.
+    """
+
+    __slots__ = ('metrics', 'prefix', 'stage', 'started', 'queries')
+
+    def __init__(self, prefix, first='resolve'):
+        metrics = _current.get()
+        self.metrics = metrics if metrics is not None and metrics['stages'] is not None else None
+        self.prefix = prefix
+        self.stage = None
+        if self.metrics is not None:
+            self.metrics['timers'].append(self)
+            self.mark(first)
+
+    def mark(self, stage):
+        metrics = self.metrics
+        if metrics is None:
+            return
+        now = time.perf_counter()
+        if self.stage is not None:
+            timing = metrics['stages'].get(f'{self.prefix}.{self.stage}')
+            if timing is None:
+                timing = metrics['stages'][f'{self.prefix}.{self.stage}'] = {'ms': 0.0, 'queries': 0, 'calls': 0}
+            timing['ms'] += (now - self.started) * 1000
+            timing['queries'] += metrics['queries'] - self.queries
+            timing['calls'] += 1
+        self.stage = stage
+        self.started = now
+        self.queries = metrics['queries']
+
+    def finish(self):
+        if self.metrics is None:
+            return
+        self.mark(None)
+        if self in self.metrics['timers']:
+            self.metrics['timers'].remove(self)
+        self.metrics = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+
+
+def mark_stage(stage):
+    """Move the innermost running StageTimer on to ``stage``"""
+    metrics = _current.get()
+    if metrics is not None and metrics['timers']:
+        metrics['timers'][-1].mark(stage)
+
+
+def profiled(prefix, first='resolve'):
+    """
+    Decorator: run the function inside a StageTimer (when sampled)
+
+    A response that is not rendered yet keeps the timer running in a
+    '<prefix>.render' stage until it has been rendered.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _current.get()
+            if metrics is None or metrics['stages'] is None:
+                return func(*args, **kwargs)
+            timer = StageTimer(prefix, first)
+            try:
+                response = func(*args, **kwargs)
+            except BaseException:
+                timer.finish()
+                raise
+            if getattr(response, 'is_rendered', True):
+                timer.finish()
+                return response
+
+            def rendered(response):
+                timer.finish()
+
+            timer.mark('render')
+            response.add_post_render_callback(rendered)
+            return response
+        return wrapper
+    return decorator
+
+
+def profile_breakdown(metrics):
+    """Per-stage timing report of a request (closes any running stages)"""
+    for timer in list(metrics['timers']):
+        timer.finish()
+    return {
+        'view': metrics['view'],
+        'elapsed_ms': round((time.perf_counter() - metrics['started']) * 1000, 2),
+        'queries': metrics['queries'],
+        'db_ms': round(metrics['db_ms'], 2),
+        'serializer_ms': round(metrics['serializer_ms'], 2),
+        'cache_hits': metrics['cache_hits'],
+        'cache_misses': metrics['cache_misses'],
+        'stages': {
+            stage: {'ms': round(timing['ms'], 2), 'queries': timing['queries'], 'calls': timing['calls']}
+            for stage, timing in metrics['stages'].items()
+        },
+    }
+
+
+def _start_profiler(name):
+    """Start a cProfile or pyinstrument profiler; None if one can't run"""
+    if name == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logging.getLogger('api').warning("pyinstrument is not installed; profiling with cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None  # Another profiler is already active on this thread
+    return profiler
+
+
+def _stop_profiler(profiler):
+    """Stop a profiler from _start_profiler and return its text report"""
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(40)
+        return output.getvalue()
+    profiler.stop()
+    return profiler.output_text()
+
+
+def log_profile(request, metrics, report):
+    """Default PROFILE_HOOK: log the profiler report of a slow request"""
+    logger = logging.getLogger(APP_LOGGERS.get(metrics['app'], 'api'))
+    logger.warning(
+        "Profile of slow request %s %s (%s, %.0f ms):\n%s",
+        request.method, request.path, metrics['view'], metrics['latency_ms'], report,
+    )
+
+
+# ==================== MIDDLEWARE ====================
+
+class RequestMetricsMiddleware:
+    """Measure every request and record it in the registry"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = metrics_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        sample_stages = request.GET.get('profile') == '1' or random.random() < config['STAGE_SAMPLE_RATE']
+        start = time.perf_counter()
+        metrics = {
+            'view': 'unresolved', 'app': None, 'status': 0, 'started': start,
+            'queries': 0, 'db_ms': 0.0, 'sql': [],
+            'cache_hits': 0, 'cache_misses': 0, 'serializer_ms': 0.0,
+            'serializing': False, 'response_bytes': 0, 'latency_ms': 0.0,
+            'stages': {} if sample_stages else None, 'timers': [],
+        }
+        profiler = None
+        if config['PROFILER'] and random.random() < config['PROFILER_SAMPLE_RATE']:
+            profiler = _start_profiler(config['PROFILER'])
+
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self._wrap_query(metrics)))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            report = _stop_profiler(profiler) if profiler is not None else None
+        for timer in list(metrics['timers']):
+            timer.finish()
+
+        metrics['latency_ms'] = (time.perf_counter() - start) * 1000
+        metrics['status'] = response.status_code
+        if not response.streaming:
+            metrics['response_bytes'] = len(response.content)
+        registry.observe(metrics)
+
+        if metrics['latency_ms'] >= config['SLOW_REQUEST_MS']:
+            if random.random() < config['SLOW_SAMPLE_RATE']:
+                self._log_slow_request(request, metrics)
+            if report is not None:
+                import_string(config['PROFILE_HOOK'])(request, metrics, report)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return None
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if view_class is not None:
+            name = view_class.__name__
+            module = view_class.__module__
+        else:
+            name = getattr(view_func, '__name__', 'view')
+            module = getattr(view_func, '__module__', '')
+        # DRF viewsets carry their method -> action mapping
+        action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+        metrics['view'] = f'{name}.{action}' if action else name
+        metrics['app'] = module.split('.')[0]
+        return None
+
+    @staticmethod
+    def _wrap_query(metrics):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                metrics['queries'] += 1
+                metrics['db_ms'] += elapsed
+                metrics['sql'].append((round(elapsed, 2), sql))
+        return wrapper
+
+    @staticmethod
+    def _log_slow_request(request, metrics):
+        logger = logging.getLogger(APP_LOGGERS.get(metrics['app'], 'api'))
+        logger.warning(
+            "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, serializer %.0f ms, "
+            "cache %d hit/%d miss, %d bytes\n%s",
+            request.method, request.path, metrics['view'], metrics['latency_ms'],
+            metrics['queries'], metrics['db_ms'], metrics['serializer_ms'],
+            metrics['cache_hits'], metrics['cache_misses'], metrics['response_bytes'],
+            '\n'.join(f'  [{elapsed} ms] {sql}' for elapsed, sql in metrics['sql']),
+        )
+
+
+# ==================== DRF MIXIN ====================
+
+_timed_serializers = {}
+
+
+def _timed_serializer_class(serializer_class):
+    """Subclass of serializer_class whose top-level to_representation is timed"""
+    timed = _timed_serializers.get(serializer_class)
+    if timed is None:
+        class TimedSerializer(serializer_class):
+            def to_representation(self, instance):
+                metrics = _current.get()
+                if metrics is None or metrics['serializing']:
+                    return super().to_representation(instance)
+                metrics['serializing'] = True
+                start = time.perf_counter()
+                try:
+                    return super().to_representation(instance)
+                finally:
+                    metrics['serializing'] = False
+                    metrics['serializer_ms'] += (time.perf_counter() - start) * 1000
+
+        TimedSerializer.__name__ = serializer_class.__name__
+        TimedSerializer.__qualname__ = serializer_class.__qualname__
+        timed = _timed_serializers[serializer_class] = TimedSerializer
+    return timed
+
+
+class InstrumentedViewMixin:
+    """
+    DRF view mixin: times serializers built through get_serializer(),
+    names the request after the resolved action (covers routes the
+    middleware can only see as a method mapping) and attaches the stage
+    breakdown to ``?profile=1`` responses for staff.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = _current.get()
+        action = getattr(self, 'action', None)
+        if metrics is not None and action:
+            metrics['view'] = f'{type(self).__name__}.{action}'
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        if _current.get() is None:
+            return serializer_class
+        return _timed_serializer_class(serializer_class)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        metrics = _current.get()
+        if (
+            metrics is not None and metrics['stages'] is not None
+            and request.query_params.get('profile') == '1'
+            and isinstance(getattr(response, 'data', None), dict)
+            and (settings.DEBUG or getattr(request.user, 'is_staff', False))
+        ):
+            response.data['profile'] = profile_breakdown(metrics)
+        return response
+
+
+# ==================== SCRAPE ENDPOINT ====================
+
+def metrics_view(request):
+    """
+    Registry scrape endpoint.
+
+    Allowed with ``Authorization: Bearer <SCRAPE_TOKEN>`` when a token is
+    configured, otherwise for staff users or in DEBUG.
+    """
+    token = metrics_settings()['SCRAPE_TOKEN']
+    if token:
+        scheme, _, presented = request.headers.get('Authorization', '').partition(' ')
+        allowed = scheme == 'Bearer' and hmac.compare_digest(presented.encode(), str(token).encode())
+    else:
+        allowed = settings.DEBUG or getattr(request.user, 'is_staff', False)
+    if not allowed:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'endpoints': registry.snapshot()})
+    return HttpResponse(registry.prometheus(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,263 @@
+"""
+Declarative loot tables
+
+A loot table describes what a treasure room, boss or merchant hands out:
+
+    register_table('treasure:consumables', {
+        'rolls': (2, 4),                      # weighted draws per roll
+        'entries': [
+            {'pool': 'category:Consumable', 'quantity': (1, 3)},
+        ],
+        'guaranteed': [{'item': 'Potion of Healing'}],
+        'gold': (5, 30),
+    })
+
+Entries (drawn by weight, default 1):
+    pool:      item-index bucket(s) from core.sampling, e.g. 'category:Weapon',
+               'rarity:rare' or 'all'; a list means their union
+    fallback:  pools tried in order when the entry's pool is empty
+    item:      one item, by name
+    item_id:   one item, by id (dropped if the item no longer exists)
+    table:     a nested table, rolled and merged in
+    nothing:   an empty draw
+
+Table keys:
+    guaranteed:      entries dropped on every roll
+    gold, xp_bonus:  (min, max) ranges, or a fixed int
+    gold_per_value:  (min, max) multiplied by the roll's value argument
+    unique:          no item twice within one roll (default True)
+
+A table is compiled once per item-catalogue version: pools become tuples
+of item ids, entry weights a cumulative array searched with bisect, and
+item names ids (names that match no item are logged once, when the table
+is compiled). Rolling is then pure in-memory work, and roll_many() draws
+a batch of results for callers that write rows with bulk_create.
+
+A roll returns {'items': [{'item_id', 'quantity'}], 'gold', 'xp_bonus'}.
+"""
+import bisect
+import json
+import logging
+import random
+
+from django.apps import apps
+
+from core.cache_utils import get_catalogue_version
+from core.sampling import get_index
+
+
+logger = logging.getLogger('campaign')
+
+# Draws of an already-taken item before a unique draw gives up
+UNIQUE_RETRIES = 4
+
+# name -> spec
+LOOT_TABLES = {}
+
+# name -> (item catalogue version, CompiledTable)
+_compiled = {}
+
+# spec JSON -> (item catalogue version, CompiledTable), for unregistered specs
+_compiled_specs = {}
+
+
+def register_table(name, spec):
+    """Declare (or replace) a loot table"""
+    LOOT_TABLES[name] = spec
+    _compiled.pop(name, None)
+
+
+def _bounds(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value), int(value)
+    low, high = value
+    return int(low), int(high)
+
+
+def _draw(rng, bounds):
+    return rng.randint(*bounds) if bounds else 0
+
+
+def _pool_ids(index, pool):
+    buckets = [pool] if isinstance(pool, str) else pool
+    return tuple(dict.fromkeys(pk for bucket in buckets for pk in index.get(bucket, ())))
+
+
+def _nested_names(spec):
+    return [entry['table'] for entry in spec.get('entries', []) + spec.get('guaranteed', []) if 'table' in entry]
+
+
+def _item_names(spec):
+    return {entry['item'] for entry in spec.get('entries', []) + spec.get('guaranteed', []) if 'item' in entry}
+
+
+def _check_nesting(name, stack=()):
+    if name in stack:
+        raise ValueError(f"Loot table cycle: {' -> '.join(stack + (name,))}")
+    if name not in LOOT_TABLES:
+        raise ValueError(f"Unknown loot table: {name}")
+    for nested in _nested_names(LOOT_TABLES[name]):
+        _check_nesting(nested, stack + (name,))
+
+
+class CompiledTable:
+    """A loot table with its pools resolved to item ids"""
+
+    def __init__(self, name, spec, index, item_ids):
+        """
+        Args:
+            index: core.sampling item index ({bucket: [ids]})
+            item_ids: {item name: id} for the names the spec references
+        """
+        self.name = name
+        self.rolls = _bounds(spec.get('rolls', 1))
+        self.unique = spec.get('unique', True)
+        self.gold = _bounds(spec.get('gold'))
+        self.gold_per_value = spec.get('gold_per_value')
+        self.xp_bonus = _bounds(spec.get('xp_bonus'))
+
+        self.entries = []
+        self.cumulative = []
+        total = 0.0
+        for entry in spec.get('entries', []):
+            weight = float(entry.get('weight', 1))
+            compiled = self._compile_entry(entry, index, item_ids)
+            if weight > 0 and compiled is not None:
+                total += weight
+                self.entries.append(compiled)
+                self.cumulative.append(total)
+
+        self.guaranteed = [
+            compiled for compiled in (self._compile_entry(entry, index, item_ids) for entry in spec.get('guaranteed', []))
+            if compiled is not None
+        ]
+
+    @staticmethod
+    def _compile_entry(entry, index, item_ids):
+        """-> (kind, payload, quantity bounds), or None if the entry can never drop anything"""
+        quantity = _bounds(entry.get('quantity', 1))
+        if 'table' in entry:
+            return 'table', entry['table'], None
+        if entry.get('nothing'):
+            return 'nothing', None, None
+        if 'item' in entry:
+            pk = item_ids.get(entry['item'])
+            return ('items', (pk,), quantity) if pk else None
+        if 'item_id' in entry:
+            pk = entry['item_id']
+            return ('items', (pk,), quantity) if pk in index.get('all', ()) else None
+
+        ids = _pool_ids(index, entry['pool'])
+        for fallback in entry.get('fallback', ()):
+            if ids:
+                break
+            ids = _pool_ids(index, fallback)
+        return ('items', ids, quantity) if ids else None
+
+    def roll(self, rng=random, value=0):
+        """One result of this table"""
+        loot = {'items': [], 'gold': 0, 'xp_bonus': 0}
+        self._roll_into(loot, rng, value, set())
+        return loot
+
+    def roll_many(self, count, rng=random, value=0):
+        """`count` independent results"""
+        return [self.roll(rng, value) for _ in range(count)]
+
+    def _roll_into(self, loot, rng, value, taken):
+        for entry in self.guaranteed:
+            self._apply(entry, loot, rng, value, taken)
+
+        if self.entries:
+            total = self.cumulative[-1]
+            for _ in range(_draw(rng, self.rolls)):
+                position = bisect.bisect_right(self.cumulative, rng.random() * total)
+                self._apply(self.entries[min(position, len(self.entries) - 1)], loot, rng, value, taken)
+
+        loot['gold'] += _draw(rng, self.gold)
+        if self.gold_per_value and value:
+            low, high = self.gold_per_value
+            loot['gold'] += rng.randint(int(value * low), int(value * high))
+        loot['xp_bonus'] += _draw(rng, self.xp_bonus)
+
+    def _apply(self, entry, loot, rng, value, taken):
+        kind, payload, quantity = entry
+        if kind == 'table':
+            get_table(payload)._roll_into(loot, rng, value, taken)
+            return
+        if kind == 'nothing':
+            return
+
+        for _ in range(UNIQUE_RETRIES):
+            pk = payload[int(rng.random() * len(payload))]
+            if not (self.unique and pk in taken):
+                break
+        else:
+            return
+        taken.add(pk)
+        loot['items'].append({'item_id': pk, 'quantity': _draw(rng, quantity)})
+
+
+def get_table(name):
+    """
+    Compiled table by name, compiling it on first use
+
+    Raises:
+        ValueError: unknown table, or tables nested in a cycle
+    """
+    version = get_catalogue_version('items')
+    memoized = _compiled.get(name)
+    if memoized and memoized[0] == version:
+        return memoized[1]
+
+    _check_nesting(name)
+    table = _compile(name, LOOT_TABLES[name])
+    _compiled[name] = (version, table)
+    return table
+
+
+def compile_spec(spec, name='inline'):
+    """
+    Compiled table for a spec that is not registered (e.g. loot stored on a row)
+
+    Compiled tables are shared between equal specs, so rolling the same
+    stored loot again costs no queries. The registry is left untouched.
+
+    Raises:
+        ValueError: the spec nests an unknown table, or tables nested in a cycle
+    """
+    version = get_catalogue_version('items')
+    key = json.dumps(spec, sort_keys=True)
+    memoized = _compiled_specs.get(key)
+    if memoized and memoized[0] == version:
+        return memoized[1]
+
+    for nested in _nested_names(spec):
+        _check_nesting(nested)
+    table = _compile(name, spec)
+    _compiled_specs[key] = (version, table)
+    return table
+
+
+def _compile(name, spec):
+    names = _item_names(spec)
+    item_ids = {}
+    if names:
+        Item = apps.get_model('items', 'Item')
+        item_ids = dict(Item.objects.filter(name__in=names).values_list('name', 'pk'))
+        missing = sorted(names - item_ids.keys())
+        if missing:
+            logger.warning(f"Loot table {name}: no items named {', '.join(missing)}")
+    return CompiledTable(name, spec, get_index('items'), item_ids)
+
+
+def roll(name, rng=random, value=0):
+    """Roll a table once"""
+    return get_table(name).roll(rng, value)
+
+
+def roll_many(name, count, rng=random, value=0):
+    """Roll a table `count` times"""
+    return get_table(name).roll_many(count, rng, value)
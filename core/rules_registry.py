@@ -0,0 +1,444 @@
+"""
+Rules data registry
+
+Static rules tables (class/subclass features, racial and background features,
+feat configuration, starting equipment and starting spell rules) live as large
+nested dicts in their data modules. The lookup helpers in those modules
+normalize names case by case on every call and rebuild level ranges each time.
+
+This module loads those tables once per process into frozen, pre-normalized
+indexes:
+
+- names are keyed by their source spelling and case-insensitively, so a
+  lookup is one or two dict reads
+- 2024 -> 2014 ruleset fallbacks are resolved while the index is built
+- per-class feature tables carry cumulative prefix arrays, so
+  "all features up to level N" is a single read instead of a range walk
+
+Usage:
+    from core.rules_registry import get_rules_registry
+
+    registry = get_rules_registry()
+    registry.class_features('Fighter', 5, ruleset='2024')
+
+The registry returns read-only views (tuples and mappingproxy objects).
+Callers that need to mutate a result must copy it first.
+
+Loading is lazy: nothing is imported until the first lookup. When
+settings.RULES_REGISTRY_CACHE_DIR is set, the built registry is pickled there
+under a hash of the data modules' source, and later processes load that file
+instead of importing the data modules and rebuilding the indexes. Editing any
+data module changes the hash, so a stale cache is never read.
+"""
+import copyreg
+import hashlib
+import importlib.util
+import logging
+import os
+import pickle
+import tempfile
+from bisect import bisect_right
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+
+
+logger = logging.getLogger(__name__)
+
+# Modules whose tables the registry indexes (and whose source keys the cache)
+RULES_DATA_MODULES = (
+    'campaigns.class_features_data',
+    'campaigns.racial_features_data',
+    'campaigns.background_features_data',
+    'campaigns.feat_data',
+    'characters.starting_equipment',
+    'characters.starting_spells',
+)
+
+
+RULESETS = ('2014', '2024')
+DEFAULT_RULESET = '2014'
+
+EMPTY = ()
+EMPTY_MAPPING = MappingProxyType({})
+_MISSING = object()
+
+
+def freeze(value):
+    """
+    Recursively convert dicts and lists into read-only equivalents.
+
+    Args:
+        value: Any nested structure of dicts, lists, tuples and scalars
+
+    Returns:
+        The same structure built from mappingproxy objects and tuples
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _normalize(name):
+    """Normalize a rules-table key for case-insensitive lookup"""
+    return str(name).strip().casefold()
+
+
+def _spellings(name):
+    """Common spellings of a key that callers pass in verbatim"""
+    return (name, name.lower(), name.title(), _normalize(name))
+
+
+def _lookup(index, name, default):
+    """Read an index by the given spelling first, then by normalized name"""
+    value = index.get(name, _MISSING)
+    if value is _MISSING:
+        value = index.get(_normalize(name), default)
+    return value
+
+
+def _by_ruleset(tables, ruleset):
+    """Select the per-ruleset index; anything other than 2024 means 2014"""
+    return tables.get(ruleset) or tables[DEFAULT_RULESET]
+
+
+class LevelTable:
+    """
+    Frozen per-class (or per-subclass) feature table.
+
+    Attributes:
+        levels: Mapping of level -> tuple of features, including empty levels.
+            Point lookups read from here.
+        entries: Tuple of (level, features) pairs for non-empty levels, sorted
+            by level.
+        prefix: prefix[n] is the number of entries with level <= n.
+        cumulative: cumulative[n] is the frozen mapping built from
+            entries[:prefix[n]], so "features up to level n" is one read.
+    """
+    __slots__ = ('levels', 'entries', 'prefix', 'cumulative')
+
+    def __init__(self, levels, range_levels=None):
+        """
+        Args:
+            levels: dict of level -> list of features used for point lookups
+            range_levels: dict used for cumulative lookups (defaults to levels)
+        """
+        range_levels = levels if range_levels is None else range_levels
+        self.levels = freeze({int(lvl): features for lvl, features in levels.items()})
+        self.entries = tuple(
+            (int(lvl), freeze(features))
+            for lvl, features in sorted(range_levels.items(), key=lambda item: int(item[0]))
+            if features
+        )
+
+        entry_levels = [lvl for lvl, _ in self.entries]
+        max_level = max([20] + entry_levels)
+        self.prefix = tuple(bisect_right(entry_levels, lvl) for lvl in range(max_level + 1))
+        self.cumulative = tuple(
+            MappingProxyType(dict(self.entries[:count])) for count in self.prefix
+        )
+
+    def at(self, level):
+        """Features gained at exactly this level (empty tuple if none)"""
+        return self.levels.get(level, EMPTY)
+
+    def up_to(self, level):
+        """Mapping of level -> features for every non-empty level <= level"""
+        if level < 1:
+            return EMPTY_MAPPING
+        cumulative = self.cumulative
+        return cumulative[level] if level < len(cumulative) else cumulative[-1]
+
+
+class RulesRegistry:
+    """
+    Frozen, indexed view over every static rules-data module.
+
+    Get it through get_rules_registry() so each process pays the load cost
+    once; building another instance directly is only useful in tests and
+    benchmarks.
+    """
+
+    def __init__(self):
+        from campaigns import class_features_data as class_data
+        from campaigns.racial_features_data import RACIAL_FEATURES
+        from campaigns.background_features_data import BACKGROUND_FEATURES
+        from campaigns.feat_data import FEAT_DATA
+        from characters.starting_equipment import STARTING_EQUIPMENT, EQUIPMENT_PACKS
+        from characters.starting_spells import STARTING_SPELL_RULES, NON_CASTERS
+
+        self._class_tables = self._build_feature_index(
+            class_data.CLASS_FEATURES_2014,
+            class_data.CLASS_FEATURES_2024,
+            per_level_fallback=True,
+        )
+        self._subclass_tables = self._build_feature_index(
+            class_data.SUBCLASS_FEATURES_2014,
+            class_data.SUBCLASS_FEATURES_2024,
+            per_level_fallback=False,
+        )
+        available_2014 = self._index(class_data.AVAILABLE_SUBCLASSES_2014)
+        available_2024 = self._index(class_data.AVAILABLE_SUBCLASSES_2024)
+        self._available_subclasses = {
+            '2014': available_2014, 2014: available_2014,
+            '2024': available_2024, 2024: available_2024,
+        }
+        self._racial_features = self._index(RACIAL_FEATURES)
+        self._background_features = self._index(BACKGROUND_FEATURES)
+        self._feat_configs = self._index(FEAT_DATA)
+        self._starting_equipment = self._index(STARTING_EQUIPMENT)
+        self._equipment_packs = self._index(EQUIPMENT_PACKS)
+
+        non_casters = {_normalize(name) for name in NON_CASTERS}
+        self._starting_spell_rules = self._index({
+            name: rules
+            for name, rules in STARTING_SPELL_RULES.items()
+            if _normalize(name) not in non_casters
+        })
+
+    @staticmethod
+    def _index(table):
+        """Freeze a flat name -> data table under exact and normalized keys"""
+        index = {}
+        for name, data in table.items():
+            frozen = freeze(data)
+            index[name] = frozen
+            # First spelling wins, matching the exact-match-first lookups
+            for spelling in _spellings(name):
+                index.setdefault(spelling, frozen)
+        return MappingProxyType(index)
+
+    @staticmethod
+    def _build_feature_index(source_2014, source_2024, per_level_fallback):
+        """
+        Build {ruleset: {name: LevelTable}} with fallbacks resolved.
+
+        Names missing from the 2024 table always fall back to 2014. With
+        per_level_fallback, levels missing from a 2024 class table are also
+        filled from 2014 for point lookups (cumulative lookups still only use
+        the 2024 table, as the original helpers do).
+        """
+        raw_2014 = {}
+        for name, levels in source_2014.items():
+            raw_2014.setdefault(_normalize(name), levels)
+        raw_2024 = {}
+        for name, levels in source_2024.items():
+            raw_2024.setdefault(_normalize(name), levels)
+
+        tables_2014 = {key: LevelTable(levels) for key, levels in raw_2014.items()}
+        tables_2024 = dict(tables_2014)
+        for key, levels in raw_2024.items():
+            if per_level_fallback and key in raw_2014:
+                merged = dict(raw_2014[key])
+                merged.update(levels)
+                tables_2024[key] = LevelTable(merged, range_levels=levels)
+            else:
+                tables_2024[key] = LevelTable(levels)
+
+        # Also key each table under the spellings callers commonly pass so
+        # those lookups skip normalization
+        for tables, sources in ((tables_2014, (source_2014,)), (tables_2024, (source_2024, source_2014))):
+            for source in sources:
+                for name in source:
+                    for spelling in _spellings(name):
+                        tables.setdefault(spelling, tables[_normalize(name)])
+
+        frozen_2014 = MappingProxyType(tables_2014)
+        frozen_2024 = MappingProxyType(tables_2024)
+        return {'2014': frozen_2014, 2014: frozen_2014, '2024': frozen_2024, 2024: frozen_2024}
+
+    # ==================== CLASS & SUBCLASS FEATURES ====================
+
+    # Point lookups are inlined rather than routed through _lookup: they run
+    # inside per-level loops on the level-up paths.
+
+    def class_features(self, class_name, level, ruleset=DEFAULT_RULESET):
+        """Features a class gains at exactly this level"""
+        tables = self._class_tables.get(ruleset) or self._class_tables[DEFAULT_RULESET]
+        table = tables.get(class_name) or tables.get(_normalize(class_name))
+        return table.levels.get(level, EMPTY) if table else EMPTY
+
+    def class_features_up_to_level(self, class_name, level, ruleset=DEFAULT_RULESET):
+        """Mapping of level -> features for levels 1 through level"""
+        tables = self._class_tables.get(ruleset) or self._class_tables[DEFAULT_RULESET]
+        table = tables.get(class_name) or tables.get(_normalize(class_name))
+        return table.up_to(level) if table else EMPTY_MAPPING
+
+    def subclass_features(self, subclass_name, level, ruleset=DEFAULT_RULESET):
+        """Features a subclass grants at exactly this level"""
+        tables = self._subclass_tables.get(ruleset) or self._subclass_tables[DEFAULT_RULESET]
+        table = tables.get(subclass_name) or tables.get(_normalize(subclass_name))
+        return table.levels.get(level, EMPTY) if table else EMPTY
+
+    def subclass_features_up_to_level(self, subclass_name, level, ruleset=DEFAULT_RULESET):
+        """Mapping of level -> subclass features for levels 1 through level"""
+        tables = self._subclass_tables.get(ruleset) or self._subclass_tables[DEFAULT_RULESET]
+        table = tables.get(subclass_name) or tables.get(_normalize(subclass_name))
+        return table.up_to(level) if table else EMPTY_MAPPING
+
+    def subclass_features_between(self, subclass_name, start_level, end_level, ruleset=DEFAULT_RULESET):
+        """Dictionary of level -> subclass features for start_level..end_level"""
+        features_by_level = self.subclass_features_up_to_level(subclass_name, end_level, ruleset)
+        return {lvl: features for lvl, features in features_by_level.items() if lvl >= start_level}
+
+    def available_subclasses(self, class_name, ruleset=DEFAULT_RULESET):
+        """Subclass names selectable by a class under a ruleset"""
+        return _lookup(_by_ruleset(self._available_subclasses, ruleset), class_name, EMPTY)
+
+    # ==================== RACE, BACKGROUND & FEATS ====================
+
+    def racial_features(self, race_name):
+        """Features granted by a race"""
+        return _lookup(self._racial_features, race_name, EMPTY)
+
+    def background_features(self, background_name):
+        """Features granted by a background"""
+        return _lookup(self._background_features, background_name, EMPTY)
+
+    def feat_config(self, feat_name):
+        """Choice configuration for a feat (empty mapping if none)"""
+        return _lookup(self._feat_configs, feat_name, EMPTY_MAPPING)
+
+    # ==================== STARTING EQUIPMENT & SPELLS ====================
+
+    def starting_equipment(self, class_name):
+        """Starting equipment choices for a class, or None"""
+        return _lookup(self._starting_equipment, class_name, None)
+
+    def equipment_pack(self, pack_name):
+        """Contents of an equipment pack, or None"""
+        return _lookup(self._equipment_packs, pack_name, None)
+
+    def starting_spell_rules(self, class_name):
+        """Level 1 spell selection rules for a class, or None for non-casters"""
+        return _lookup(self._starting_spell_rules, class_name, None)
+
+
+# ==================== SERIALIZED CACHE ====================
+
+def _mappingproxy(mapping):
+    """Unpickling constructor for mappingproxy objects"""
+    return MappingProxyType(mapping)
+
+
+def _reduce_mappingproxy(proxy):
+    return _mappingproxy, (dict(proxy),)
+
+
+def source_fingerprint():
+    """
+    Hash the source of every rules-data module and of this module.
+
+    The data modules are located with find_spec, so computing the fingerprint
+    does not import (execute) them.
+
+    Returns:
+        str: Hex digest identifying the current rules data
+    """
+    digest = hashlib.sha256()
+    paths = [importlib.util.find_spec(name).origin for name in RULES_DATA_MODULES]
+    for path in paths + [__file__]:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def _cache_path(cache_dir, fingerprint):
+    return Path(cache_dir) / f'rules-{fingerprint[:20]}.pickle'
+
+
+def write_registry_cache(registry, cache_dir, fingerprint=None):
+    """
+    Serialize a registry into cache_dir, replacing older cache files.
+
+    Args:
+        registry: RulesRegistry to store
+        cache_dir: Directory for cache files (created if missing)
+        fingerprint: Source fingerprint (computed if not given)
+
+    Returns:
+        Path: The written cache file
+    """
+    fingerprint = fingerprint or source_fingerprint()
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = _cache_path(cache_dir, fingerprint)
+
+    # Write to a temp file and rename, so concurrent workers never read a
+    # half-written cache
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.dispatch_table = copyreg.dispatch_table.copy()
+            pickler.dispatch_table[MappingProxyType] = _reduce_mappingproxy
+            pickler.dump(registry)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    for stale in cache_dir.glob('rules-*.pickle'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def read_registry_cache(cache_dir, fingerprint=None):
+    """
+    Load a cached registry matching the current source, if there is one.
+
+    Returns:
+        RulesRegistry or None: The cached registry, or None on a miss
+    """
+    path = _cache_path(cache_dir, fingerprint or source_fingerprint())
+    try:
+        with open(path, 'rb') as f:
+            registry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable rules registry cache {path}: {e}")
+        return None
+    return registry if isinstance(registry, RulesRegistry) else None
+
+
+def load_rules_registry(cache_dir=None):
+    """
+    Load the registry from the serialized cache, or build (and cache) it.
+
+    Args:
+        cache_dir: Cache directory, or None to always build from source
+
+    Returns:
+        RulesRegistry: Loaded or freshly built registry
+    """
+    if not cache_dir:
+        return RulesRegistry()
+
+    fingerprint = source_fingerprint()
+    registry = read_registry_cache(cache_dir, fingerprint)
+    if registry is not None:
+        return registry
+
+    registry = RulesRegistry()
+    try:
+        write_registry_cache(registry, cache_dir, fingerprint)
+    except OSError as e:
+        logger.warning(f"Could not write rules registry cache to {cache_dir}: {e}")
+    return registry
+
+
+@lru_cache(maxsize=None)
+def get_rules_registry():
+    """
+    Return the process-wide rules registry, loading it on first use.
+
+    Returns:
+        RulesRegistry: Shared frozen registry
+    """
+    from django.conf import settings
+
+    cache_dir = getattr(settings, 'RULES_REGISTRY_CACHE_DIR', None) if settings.configured else None
+    return load_rules_registry(cache_dir)
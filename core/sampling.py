@@ -0,0 +1,222 @@
+"""
+Constant-time random sampling over catalogue tables
+
+Picking rows with .order_by('?') makes the database sort the whole table on
+every draw, and weighted picks that load every row first materialize the
+table in Python. This module keeps a sampling index per catalogue instead:
+
+- the primary keys of each bucket (e.g. items per category and per rarity)
+  as flat lists, built with one values_list() query
+- alias-method tables (Vose) for weighted choices, so a draw is one
+  random index plus one comparison whatever the number of options
+
+A draw picks ids from the index and only the chosen rows are loaded, by
+primary key.
+
+Indexes live in the Django cache under the catalogue version from
+core.cache_utils. Saving or deleting a sampled model bumps that version,
+and bumps it again when the transaction commits (bulk writes that bypass signals should call bump_catalogue_version()
+themselves), and a draw that finds one of its rows gone rebuilds the index
+once and retries.
+
+Usage:
+    from core.sampling import sample_rows
+
+    items = sample_rows('items', ['category:Weapon', 'category:Armor'], 2)
+"""
+import random
+from functools import lru_cache
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from core.cache_utils import bump_catalogue_version, get_catalogue_version, retire_catalogue_version
+from core.instrumentation import record_cache_lookup
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table for O(1) draws from a discrete distribution.
+
+    Built in O(n) from any non-negative weights; options with zero weight
+    are never drawn.
+    """
+
+    def __init__(self, options, weights):
+        options, weights = list(options), [float(weight) for weight in weights]
+        total = sum(weights)
+        if not options or total <= 0:
+            raise ValueError('AliasTable needs at least one positive weight')
+
+        count = len(options)
+        scaled = [weight * count / total for weight in weights]
+        self.options = options
+        self.probability = [0.0] * count
+        self.alias = [0] * count
+
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Leftovers are 1.0 up to rounding error
+        for index in small + large:
+            self.probability[index] = 1.0
+
+    def draw(self, rng=random):
+        index = int(rng.random() * len(self.options))
+        if rng.random() < self.probability[index]:
+            return self.options[index]
+        return self.options[self.alias[index]]
+
+
+@lru_cache(maxsize=256)
+def _alias_for(weights):
+    options = [option for option, weight in weights if weight > 0]
+    return AliasTable(options, [weight for _, weight in weights if weight > 0])
+
+
+def weighted_choice(weights, rng=random):
+    """
+    Draw one key of a {option: weight} dict in constant time.
+
+    Alias tables are memoized per distinct weights dict, so fixed tables such
+    as the merchant rarity weights are built once per process.
+    """
+    return _alias_for(tuple(sorted(weights.items()))).draw(rng)
+
+
+# ---------- catalogue indexes ----------
+
+# catalogue -> (model label, loader returning {bucket: [ids]})
+POOLS = {}
+
+# Per-process copy of each index, keyed by catalogue version
+_memo = {}
+
+
+def register_pool(catalogue, model_label, loader, subclasses=()):
+    """
+    Declare a sampled catalogue.
+
+    The loader receives the model class and returns {bucket: [pk, ...]}.
+    Saves and deletes of the model (string label, e.g. 'items.Item') and of
+    its multi-table subclasses retire the cached index.
+    """
+    POOLS[catalogue] = (model_label, loader)
+
+    def invalidate(sender, **kwargs):
+        retire_catalogue_version(catalogue)
+
+    for label in (model_label, *subclasses):
+        for name, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(invalidate, sender=label, weak=False, dispatch_uid=f'sampling:{catalogue}:{label}:{name}')
+
+
+def get_index(catalogue):
+    """Return the {bucket: [ids]} index of a catalogue, building it if needed"""
+    version = get_catalogue_version(catalogue)
+    memoized = _memo.get(catalogue)
+    if memoized and memoized[0] == version:
+        return memoized[1]
+
+    cache_key = f'sampling:{catalogue}:v{version}'
+    index = cache.get(cache_key)
+    record_cache_lookup(index is not None)
+    if index is None:
+        model_label, loader = POOLS[catalogue]
+        index = loader(apps.get_model(model_label))
+        cache.set(cache_key, index, None)
+    _memo[catalogue] = (version, index)
+    return index
+
+
+def sample_ids(catalogue, buckets, count, exclude=(), unique=True, rng=random):
+    """
+    Draw up to `count` ids uniformly from the union of disjoint buckets.
+
+    A bucket is chosen in proportion to its size, then an id within it, which
+    is a uniform draw over the union without concatenating the lists. With
+    unique=False ids are drawn with replacement.
+    """
+    index = get_index(catalogue)
+    exclude = set(exclude)
+    pools = [index[bucket] for bucket in buckets if index.get(bucket)]
+    available = sum(len(pool) for pool in pools) - sum(
+        1 for pk in exclude if any(pk in pool for pool in pools)
+    )
+    if count <= 0 or available <= 0:
+        return []
+    if unique and count >= available:
+        chosen = [pk for pool in pools for pk in pool if pk not in exclude]
+        rng.shuffle(chosen)
+        return chosen
+
+    table = AliasTable(range(len(pools)), [len(pool) for pool in pools])
+    chosen, seen = [], set()
+    while len(chosen) < count:
+        pool = pools[table.draw(rng)]
+        pk = pool[int(rng.random() * len(pool))]
+        if pk in exclude or (unique and pk in seen):
+            continue
+        seen.add(pk)
+        chosen.append(pk)
+    return chosen
+
+
+def sample_rows(catalogue, buckets, count, queryset=None, **kwargs):
+    """
+    Draw rows like sample_ids() and load only those rows, in draw order.
+
+    Args:
+        queryset: Optional queryset to load from (e.g. with select_related);
+            defaults to the catalogue model's manager.
+    """
+    model_label = POOLS[catalogue][0]
+    queryset = queryset if queryset is not None else apps.get_model(model_label).objects.all()
+
+    for attempt in range(2):
+        ids = sample_ids(catalogue, buckets, count, **kwargs)
+        rows = queryset.in_bulk(ids)
+        if len(rows) == len(set(ids)) or attempt:
+            return [rows[pk] for pk in ids if pk in rows]
+        # Rows were removed behind the index's back (bulk delete, flush)
+        bump_catalogue_version(catalogue)
+
+
+def _group(rows):
+    index = {}
+    for bucket, pk in rows:
+        index.setdefault(bucket, []).append(pk)
+    return index
+
+
+def _item_buckets(model):
+    rows = model.objects.values_list('pk', 'category__name', 'rarity')
+    index = _group([(f'category:{category}', pk) for pk, category, _ in rows if category])
+    index.update(_group([(f'rarity:{rarity}', pk) for pk, _, rarity in rows]))
+    index['all'] = [pk for pk, _, _ in rows]
+    return index
+
+
+def _rarity_buckets(model):
+    rows = model.objects.values_list('pk', 'rarity')
+    index = _group([(f'rarity:{rarity}', pk) for pk, rarity in rows])
+    index['all'] = [pk for pk, _ in rows]
+    return index
+
+
+def _all_rows(model):
+    return {'all': list(model.objects.values_list('pk', flat=True))}
+
+
+register_pool(
+    'items', 'items.Item', _item_buckets,
+    subclasses=('items.Weapon', 'items.Armor', 'items.Consumable', 'items.MagicItem')
+)
+register_pool('recruits', 'campaigns.RecruitableCharacter', _rarity_buckets)
+register_pool('enemies', 'bestiary.Enemy', _all_rows)
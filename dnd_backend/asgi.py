@@ -20,12 +20,13 @@ try:
     from channels.routing import ProtocolTypeRouter, URLRouter
     from channels.auth import AuthMiddlewareStack
     import combat.routing
+    import jobs.routing
     
     application = ProtocolTypeRouter({
         "http": django_asgi_app,
         "websocket": AuthMiddlewareStack(
             URLRouter(
-                combat.routing.websocket_urlpatterns
+                combat.routing.websocket_urlpatterns + jobs.routing.websocket_urlpatterns
             )
         ),
     })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -20,12 +21,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-(r=0mej@qk-^f*k*9%m9)-g((9^5ao+egu4t7mhq5v(dsdw57q'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', 'django-insecure-(r=0mej@qk-^f*k*9%m9)-g((9^5ao+egu4t7mhq5v(dsdw57q'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'testserver']
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'testserver'] + [
+    host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host
+]
 
 
 # Application definition
@@ -50,10 +55,12 @@ INSTALLED_APPS = [
     'logs',
     'spells',  # NEW: Spell library
     'merchants',  # NEW: Merchant/shop system
+    'jobs',  # Background job runner
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.instrumentation.RequestMetricsMiddleware',  # Outermost app middleware: sees the full request
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS must be before CommonMiddleware
     'django.middleware.common.CommonMiddleware',
@@ -86,30 +93,62 @@ WSGI_APPLICATION = 'dnd_backend.wsgi.application'
 # ASGI Application (for WebSocket support)
 ASGI_APPLICATION = 'dnd_backend.asgi.application'
 
+# Redis backs the cache and channel layer when REDIS_URL is set
+# (e.g. redis://127.0.0.1:6379/1); otherwise both stay in-process.
+REDIS_URL = os.environ.get('REDIS_URL')
+
 # Channel Layers (for WebSocket routing)
-CHANNEL_LAYERS = {
-    'default': {
-        # In-memory channel layer (development/testing)
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-        
-        # For production with Redis (uncomment when Redis is available):
-        # 'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        # 'CONFIG': {
-        #     'hosts': [('127.0.0.1', 6379)],
-        # },
-    },
-}
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.environ.get('REDIS_CHANNELS_URL', REDIS_URL)],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            # In-memory channel layer (development/testing)
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. DATABASE_ENGINE=postgres switches to Postgres configured
+# from the POSTGRES_* variables, with connections kept open for
+# DB_CONN_MAX_AGE seconds (health-checked before reuse). Behind PgBouncer in
+# transaction pooling mode set DB_PGBOUNCER=1: server-side cursors do not
+# survive a pooled transaction boundary.
+if os.environ.get('DATABASE_ENGINE', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'dnd_backend'),
+            'USER': os.environ.get('POSTGRES_USER', 'dnd_backend'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))}",
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
-}
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -192,31 +231,34 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 # Caching Configuration
-# Use local memory cache for testing/development without Redis
-# For production with Redis, change BACKEND to 'django_redis.cache.RedisCache'
-CACHES = {
-    'default': {
-        # For testing/development without Redis
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,  # 5 minutes default
-        
-        # For production with Redis (uncomment and install Redis):
-        # 'BACKEND': 'django_redis.cache.RedisCache',
-        # 'LOCATION': 'redis://127.0.0.1:6379/1',
-        # 'OPTIONS': {
-        #     'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-        #     'PARSER_CLASS': 'redis.connection.HiredisParser',
-        #     'CONNECTION_POOL_CLASS_KWARGS': {
-        #         'max_connections': 50,
-        #         'retry_on_timeout': True,
-        #     },
-        #     'SOCKET_CONNECT_TIMEOUT': 5,
-        #     'SOCKET_TIMEOUT': 5,
-        # },
-        # 'KEY_PREFIX': 'dnd_backend',
+# Local memory cache for testing/development; Redis (django-redis) when
+# REDIS_URL is set.
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,  # 5 minutes default
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'CONNECTION_POOL_KWARGS': {
+                    'max_connections': int(os.environ.get('REDIS_MAX_CONNECTIONS', 50)),
+                    'retry_on_timeout': True,
+                },
+                'SOCKET_CONNECT_TIMEOUT': 5,
+                'SOCKET_TIMEOUT': 5,
+            },
+            'KEY_PREFIX': 'dnd_backend',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,  # 5 minutes default
+        }
     }
-}
 
 # Cache timeout settings for different data types (in seconds)
 CACHE_TTL = {
@@ -225,7 +267,68 @@ CACHE_TTL = {
     'class_features': 3600, # 1 hour - class features static
     'character': 300,       # 5 minutes - characters change moderately
     'campaign': 60,         # 1 minute - campaigns change frequently
+    'campaign_snapshot': 3600, # 1 hour - retired on every campaign write
     'combat': 30,           # 30 seconds - combat is real-time
+    'environment_map': 3600, # 1 hour - rebuilt whenever effects change
+}
+
+# Serialized rules registry (core.rules_registry). Workers load the pickled
+# indexes from here on first use instead of importing the rules-data modules.
+# Set to None to always build from source.
+RULES_REGISTRY_CACHE_DIR = BASE_DIR / '.cache' / 'rules_registry'
+
+# Content-addressed cache of Open5e API responses (core.importer_fetch).
+# Lets the import_*_from_api commands re-run with --offline. None disables it.
+IMPORTER_CACHE_DIR = BASE_DIR / '.cache' / 'open5e'
+
+# Enemy AI (combat.ai_policy). 'simple' always hits the lowest-HP player
+# with the best attack; deployments opt in to 'tactical', which scores
+# attacks, area spells and legendary actions by expected value. The budget
+# bounds the tactical lookahead.
+COMBAT_AI_STRATEGY = os.environ.get('COMBAT_AI_STRATEGY', 'simple')
+COMBAT_AI_TURN_BUDGET_MS = 50
+
+# Per-request instrumentation (core.instrumentation). Query counts, DB and
+# serializer time, cache hits and response size per endpoint, scraped from
+# /api/metrics/. Requests slower than SLOW_REQUEST_MS are sampled at
+# SLOW_SAMPLE_RATE and their query lists logged to the app's logger.
+# Without a SCRAPE_TOKEN the endpoint is open to staff users (and in DEBUG).
+# Stage timings (resolve/rules/roll/persist/serialize) are collected for
+# STAGE_SAMPLE_RATE of requests and for ?profile=1. PROFILER ('cprofile' or
+# 'pyinstrument') profiles PROFILER_SAMPLE_RATE of requests and passes slow
+# ones to PROFILE_HOOK.
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLE_RATE': 1.0,
+    'SCRAPE_TOKEN': os.environ.get('METRICS_SCRAPE_TOKEN'),
+    'STAGE_SAMPLE_RATE': 0.01,
+    'PROFILER': None,
+    'PROFILER_SAMPLE_RATE': 0.0,
+    'PROFILE_HOOK': 'core.instrumentation.log_profile',
+}
+
+# Background jobs (jobs.runner). Long generation endpoints enqueue a job and
+# return 202; `python manage.py run_jobs` executes them in a pool of WORKERS
+# processes. EAGER runs jobs inline at enqueue time (no worker needed).
+# Running jobs older than STALE_AFTER seconds are requeued up to
+# MAX_ATTEMPTS times.
+JOBS = {
+    'EAGER': os.environ.get('JOBS_EAGER', '0') == '1',
+    'WORKERS': int(os.environ.get('JOBS_WORKERS', 2)),
+    'POLL_INTERVAL': 1.0,
+    'STALE_AFTER': 600,
+    'MAX_ATTEMPTS': 1,
+}
+
+# Warm pool of pre-built biome encounters (encounters.services.warm_pool).
+# Gauntlet creation takes TARGET encounters per biome/level/size/difficulty
+# key from stock and refill jobs top it back up; BIOME_TARGETS overrides the
+# target per biome (0 turns the pool off for that biome).
+ENCOUNTER_POOL = {
+    'ENABLED': True,
+    'TARGET': 2,
+    'BIOME_TARGETS': {},
 }
 
 # Logging Configuration
@@ -331,7 +434,6 @@ LOGGING = {
 }
 
 # Ensure logs directory exists
-import os
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
 # Default primary key field type
@@ -32,6 +32,8 @@ from items.views import (
 from campaigns.views import CampaignViewSet, CampaignCharacterViewSet, CampaignEncounterViewSet
 from spells.views import SpellViewSet
 from merchants.views import MerchantViewSet
+from jobs.views import JobViewSet
+from core.instrumentation import metrics_view
 
 
 router = DefaultRouter()
@@ -72,11 +74,14 @@ router.register(r'campaign-encounters', CampaignEncounterViewSet, basename='camp
 router.register(r'spells', SpellViewSet, basename='spell')
 # Merchant/shop system routes
 router.register(r'merchants', MerchantViewSet, basename='merchant')
+# Background job routes
+router.register(r'jobs', JobViewSet, basename='job')
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path('api/enemies/import/', import_monsters_view, name='import_monsters'),
+    path('api/metrics/', metrics_view, name='request_metrics'),
     path('api/', include(router.urls)),
 ]
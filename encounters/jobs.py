@@ -0,0 +1,12 @@
+"""
+Background jobs for the encounter warm pool (encounters.services.warm_pool)
+"""
+from jobs.runner import job
+
+
+@job('encounters.refill_pool')
+def refill_pool(job):
+    """Top a warm pool key back up to its target stock"""
+    from .services.warm_pool import refill
+
+    return {'key': job.payload['key'], 'added': refill(job.payload['key'])}
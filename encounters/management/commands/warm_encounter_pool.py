@@ -0,0 +1,71 @@
+"""
+Management command to pre-build warm pool encounters
+
+Fills the encounter warm pool (encounters.services.warm_pool) for a range
+of gauntlet inputs ahead of time, e.g. after seeding themes or before a
+release. Refill jobs keep the pool topped up afterwards.
+
+Usage:
+    python manage.py warm_encounter_pool [--biome forest --biome desert]
+        [--levels 1-5] [--sizes 4] [--target 2] [--stats]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from encounters.models import BiomeEncounterWeight
+from encounters.services import BiomeEncounterGenerator, warm_pool
+
+
+DIFFICULTIES = ['easy', 'medium', 'hard', 'deadly']
+
+
+def parse_range(value):
+    """'3' -> [3], '1-5' -> [1, 2, 3, 4, 5]"""
+    try:
+        start, _, end = value.partition('-')
+        return list(range(int(start), int(end or start) + 1))
+    except ValueError:
+        raise CommandError(f"Invalid range: {value}")
+
+
+class Command(BaseCommand):
+    help = 'Pre-build warm pool encounters for gauntlet generation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--biome', action='append', help='Biome to warm (repeatable; default all)')
+        parser.add_argument('--levels', default='1-20', help='Party levels, e.g. 5 or 1-10')
+        parser.add_argument('--sizes', default='1-4', help='Party sizes, e.g. 4 or 1-4')
+        parser.add_argument('--difficulty', action='append', choices=DIFFICULTIES,
+                            help='Difficulty to warm (repeatable; default all)')
+        parser.add_argument('--target', type=int, help='Stock per key (default: configured target)')
+        parser.add_argument('--stats', action='store_true', help='Only print pool stock and hit rates')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        biomes = options['biome'] or [choice for choice, _ in BiomeEncounterWeight.BIOME_CHOICES]
+        generator = BiomeEncounterGenerator()
+        added = 0
+        for biome in biomes:
+            for party_level in parse_range(options['levels']):
+                for party_size in parse_range(options['sizes']):
+                    for difficulty in options['difficulty'] or DIFFICULTIES:
+                        key = warm_pool.pool_key(biome, party_level, party_size, difficulty)
+                        added += warm_pool.refill(key, target=options['target'], generator=generator)
+            self.stdout.write(f'  {biome}: done')
+
+        self.stdout.write(self.style.SUCCESS(f'Added {added} encounter(s) to the warm pool'))
+
+    def print_stats(self):
+        stats = warm_pool.pool_stats()
+        if not stats:
+            self.stdout.write('Warm pool is empty')
+            return
+        self.stdout.write(f"  {'biome':<12} {'stock':>6} {'keys':>6} {'hits':>6} {'misses':>7} {'hit rate':>9}")
+        for biome, entry in sorted(stats.items()):
+            hit_rate = '-' if entry['hit_rate'] is None else f"{entry['hit_rate']:.0%}"
+            self.stdout.write(
+                f"  {biome:<12} {entry['stock']:>6} {entry['keys']:>6} {entry['hits']:>6} "
+                f"{entry['misses']:>7} {hit_rate:>9}"
+            )
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encounters', '0002_encountertheme_encounter_biome_encounter_is_chaotic_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encounter',
+            name='pooled_for',
+            field=models.CharField(blank=True, default='', help_text='Warm pool key (biome:level:size:difficulty) while unassigned', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='encounter',
+            index=models.Index(condition=models.Q(('pooled_for', ''), _negated=True), fields=['pooled_for', 'created_at'], name='encounter_pool_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 # encounters/models.py
 from django.db import models
+from django.db.models import Q
 from bestiary.models import Enemy, Condition
 
 
@@ -195,8 +196,22 @@ class Encounter(models.Model):
         help_text="Story reason for anomalies or chaotic encounters"
     )
     
+    # Warm pool membership (encounters.services.warm_pool): the pool key this
+    # pre-built encounter is stocked under, blank once it is in use
+    pooled_for = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="Warm pool key (biome:level:size:difficulty) while unassigned"
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['pooled_for', 'created_at'], condition=~Q(pooled_for=''), name='encounter_pool_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -20,8 +20,13 @@ class BiomeEncounterGenerator:
         'anomaly': 0.05
     }
     
-    def __init__(self):
-        self.encounter_generator = EncounterGenerator()
+    def __init__(self, rng=None):
+        """
+        Args:
+            rng: random.Random-like source for every roll (default: random module)
+        """
+        self.rng = rng or random
+        self.encounter_generator = EncounterGenerator(rng=self.rng)
     
     def generate_by_biome(self, biome, party_level, party_size,
                           difficulty='medium', force_category=None):
@@ -91,7 +96,7 @@ class BiomeEncounterGenerator:
     
     def _roll_category(self):
         """Roll for category using distribution percentages"""
-        roll = random.random()
+        roll = self.rng.random()
         cumulative = 0
         
         for category, probability in self.DISTRIBUTION.items():
@@ -120,7 +125,7 @@ class BiomeEncounterGenerator:
             return weights.first()
         
         theme_weights = [w.weight for w in weight_list]
-        selected = random.choices(weight_list, weights=theme_weights, k=1)[0]
+        selected = self.rng.choices(weight_list, weights=theme_weights, k=1)[0]
         
         return selected
     
@@ -41,6 +41,14 @@ class EncounterGenerator:
         20: {'easy': 2800, 'medium': 5700, 'hard': 8500, 'deadly': 12700},
     }
     
+    def __init__(self, rng=None):
+        """
+        Args:
+            rng: random.Random-like source for every roll (default: random
+                module); a seeded one makes generation reproducible
+        """
+        self.rng = rng or random
+    
     def generate_encounter(self, party_level, party_size, 
                           difficulty='medium', force_theme=None,
                           allow_chaotic=True):
@@ -61,7 +69,7 @@ class EncounterGenerator:
         is_chaotic = (
             allow_chaotic and 
             not force_theme and 
-            random.random() < self.CHAOS_THRESHOLD
+            self.rng.random() < self.CHAOS_THRESHOLD
         )
         
         if is_chaotic:
@@ -106,7 +114,7 @@ class EncounterGenerator:
         xp_budget = self._calculate_xp_budget(party_level, party_size, difficulty)
         
         # Select 2-3 incompatible themes
-        num_themes = random.randint(2, 3)
+        num_themes = self.rng.randint(2, 3)
         themes = self._select_incompatible_themes(num_themes, party_level)
         
         # Create chaotic encounter
@@ -148,7 +156,7 @@ class EncounterGenerator:
         theme_list = list(themes)
         weights = [t.weight for t in theme_list]
         
-        return random.choices(theme_list, weights=weights, k=1)[0]
+        return self.rng.choices(theme_list, weights=weights, k=1)[0]
     
     def _select_incompatible_themes(self, num_themes, party_level):
         """Select multiple incompatible themes"""
@@ -163,7 +171,7 @@ class EncounterGenerator:
             suitable_themes = list(EncounterTheme.objects.all())
         
         # Randomly select themes
-        selected = random.sample(suitable_themes, k=min(num_themes, len(suitable_themes)))
+        selected = self.rng.sample(suitable_themes, k=min(num_themes, len(suitable_themes)))
         
         return selected
     
@@ -186,8 +194,8 @@ class EncounterGenerator:
         
         # Add 1 leader (if exists)
         if leaders and remaining_xp > 0:
-            leader_assoc = random.choice(leaders)
-            count = random.randint(1, 1)  # Usually 1 leader
+            leader_assoc = self.rng.choice(leaders)
+            count = self.rng.randint(1, 1)  # Usually 1 leader
             xp_used = self._add_enemy_to_encounter(
                 encounter, leader_assoc.enemy, count
             )
@@ -196,8 +204,8 @@ class EncounterGenerator:
         # Add 1-2 primary/elite enemies
         heavy_hitters = (primaries if primaries else []) + (elites if elites else [])
         if heavy_hitters and remaining_xp > xp_budget * 0.3:
-            assoc = random.choice(heavy_hitters)
-            count = random.randint(1, 2)
+            assoc = self.rng.choice(heavy_hitters)
+            count = self.rng.randint(1, 2)
             xp_used = self._add_enemy_to_encounter(
                 encounter, assoc.enemy, count
             )
@@ -206,8 +214,8 @@ class EncounterGenerator:
         # Fill rest with support enemies
         if supports:
             while remaining_xp > xp_budget * 0.1:  # Keep adding until < 10% budget
-                assoc = random.choice(supports)
-                count = random.randint(assoc.min_count, assoc.max_count)
+                assoc = self.rng.choice(supports)
+                count = self.rng.randint(assoc.min_count, assoc.max_count)
                 xp_used = self._add_enemy_to_encounter(
                     encounter, assoc.enemy, count
                 )
@@ -288,4 +296,4 @@ class EncounterGenerator:
             "Desperate circumstances forced unusual cooperation between natural enemies",
             f"A powerful artifact's influence corrupted the area, drawing in {theme_names}",
         ]
-        return random.choice(narratives)
+        return self.rng.choice(narratives)
@@ -0,0 +1,188 @@
+"""
+Warm pool of pre-built biome encounters
+
+Gauntlet generation asks for biome encounters from a small, finite input
+space (biome x party level x party size x difficulty). The warm pool keeps
+a stock of fully built, unassigned Encounter graphs (the Encounter row and
+its EncounterEnemy rows) per key, so creating a gauntlet re-parents
+existing rows under CampaignEncounter instead of generating them.
+
+A stocked encounter carries its key in Encounter.pooled_for. Taking one is
+a conditional UPDATE that clears the key, so two requests never get the
+same encounter. After every take (hit or miss) a refill job for that key is
+queued once the transaction commits (jobs.runner), which tops the stock
+back up to its target in the background.
+
+Configuration (settings.ENCOUNTER_POOL):
+    ENABLED: use the pool at all
+    TARGET: encounters kept per key
+    BIOME_TARGETS: per-biome overrides of TARGET (0 disables a biome)
+
+Hits and misses are counted per biome in the cache; pool_stats() reports
+them with the current stock.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from encounters.models import Encounter
+
+
+logger = logging.getLogger('campaign')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TARGET': 2,
+    'BIOME_TARGETS': {},
+}
+
+REFILL_JOB = 'encounters.refill_pool'
+
+
+def pool_settings():
+    return {**DEFAULTS, **getattr(settings, 'ENCOUNTER_POOL', {})}
+
+
+def pool_key(biome, party_level, party_size, difficulty):
+    return f'{biome}:{party_level}:{party_size}:{difficulty}'
+
+
+def parse_key(key):
+    biome, party_level, party_size, difficulty = key.split(':')
+    return biome, int(party_level), int(party_size), difficulty
+
+
+def target_for(biome):
+    config = pool_settings()
+    if not config['ENABLED']:
+        return 0
+    return config['BIOME_TARGETS'].get(biome, config['TARGET'])
+
+
+def stock(key):
+    return Encounter.objects.filter(pooled_for=key).count()
+
+
+def _count(outcome, biome):
+    cache_key = f'encounter_pool:{outcome}:{biome}'
+    cache.add(cache_key, 0, None)
+    try:
+        cache.incr(cache_key)
+    except ValueError:
+        cache.set(cache_key, 1, None)
+
+
+def take(biome, party_level, party_size, difficulty):
+    """
+    Claim a pre-built encounter for the key, or None if the stock is empty.
+
+    The claimed encounter is no longer pooled; the caller attaches it.
+    """
+    key = pool_key(biome, party_level, party_size, difficulty)
+    while True:
+        candidate = Encounter.objects.filter(pooled_for=key).order_by('created_at', 'id').values_list(
+            'pk', flat=True
+        ).first()
+        if candidate is None:
+            return None
+        if Encounter.objects.filter(pk=candidate, pooled_for=key).update(pooled_for='') == 1:
+            return Encounter.objects.get(pk=candidate)
+
+
+def take_or_generate(generator, biome, party_level, party_size, difficulty):
+    """
+    Return a biome encounter from the pool, generating one on a miss.
+
+    Args:
+        generator: BiomeEncounterGenerator used on a miss
+    """
+    if target_for(biome) <= 0:
+        return generator.generate_by_biome(
+            biome=biome, party_level=party_level, party_size=party_size, difficulty=difficulty
+        )
+
+    encounter = take(biome, party_level, party_size, difficulty)
+    _count('hits' if encounter else 'misses', biome)
+    if encounter is None:
+        encounter = generator.generate_by_biome(
+            biome=biome, party_level=party_level, party_size=party_size, difficulty=difficulty
+        )
+
+    key = pool_key(biome, party_level, party_size, difficulty)
+    transaction.on_commit(lambda: schedule_refill(key))
+    return encounter
+
+
+def schedule_refill(key):
+    """Queue a refill job for a key unless one is already pending"""
+    from jobs.models import Job
+    from jobs.runner import enqueue
+
+    if Job.objects.filter(kind=REFILL_JOB, status__in=['queued', 'running'], payload__key=key).exists():
+        return None
+    return enqueue(REFILL_JOB, {'key': key})
+
+
+def refill(key, target=None, generator=None):
+    """
+    Generate encounters for a key until its stock reaches the target.
+
+    Returns:
+        Number of encounters added
+    """
+    from encounters.services import BiomeEncounterGenerator
+
+    biome, party_level, party_size, difficulty = parse_key(key)
+    target = target_for(biome) if target is None else target
+    generator = generator or BiomeEncounterGenerator()
+
+    added = 0
+    for _ in range(max(0, target - stock(key))):
+        with transaction.atomic():
+            encounter = generator.generate_by_biome(
+                biome=biome, party_level=party_level, party_size=party_size, difficulty=difficulty
+            )
+            # Only stock encounters that actually have enemies
+            if not encounter.enemies.exists():
+                encounter.delete()
+                logger.warning(f"Warm pool: {key} generated an empty encounter; stopping refill")
+                break
+            Encounter.objects.filter(pk=encounter.pk).update(pooled_for=key)
+        added += 1
+    return added
+
+
+def pool_stats():
+    """
+    Per-biome stock and hit rate.
+
+    Returns:
+        {biome: {'stock', 'keys', 'hits', 'misses', 'hit_rate'}}
+    """
+    stats = {}
+    stocked = Encounter.objects.exclude(pooled_for='').values('pooled_for').annotate(count=Count('id'))
+    for row in stocked:
+        biome = row['pooled_for'].split(':', 1)[0]
+        entry = stats.setdefault(biome, {'stock': 0, 'keys': 0})
+        entry['stock'] += row['count']
+        entry['keys'] += 1
+
+    biomes = set(stats) | {choice for choice, _ in Encounter._meta.get_field('biome').choices}
+    counters = cache.get_many(
+        [f'encounter_pool:{outcome}:{biome}' for biome in biomes for outcome in ('hits', 'misses')]
+    )
+    for biome in biomes:
+        hits = counters.get(f'encounter_pool:hits:{biome}', 0)
+        misses = counters.get(f'encounter_pool:misses:{biome}', 0)
+        if not (hits or misses or biome in stats):
+            continue
+        entry = stats.setdefault(biome, {'stock': 0, 'keys': 0})
+        entry.update({
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        })
+    return stats
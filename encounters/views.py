@@ -1,4 +1,4 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
@@ -7,14 +7,24 @@ from .serializers import (
     EncounterSerializer, EncounterEnemySerializer, EncounterThemeSerializer,
     BiomeEncounterWeightSerializer
 )
-from .services import EncounterGenerator, BiomeEncounterGenerator
+from .services import EncounterGenerator, BiomeEncounterGenerator, warm_pool
 
 
 class EncounterViewSet(viewsets.ModelViewSet):
     """API endpoint for managing encounters."""
-    queryset = Encounter.objects.all().order_by('-created_at')
+    # Warm pool stock is not handed out until a gauntlet claims it
+    queryset = Encounter.objects.filter(pooled_for='').order_by('-created_at')
     serializer_class = EncounterSerializer
 
+    @action(detail=False, methods=['get'], url_path='pool-stats', permission_classes=[permissions.IsAdminUser])
+    def pool_stats(self, request):
+        """
+        Warm pool stock and hit rate per biome
+        
+        GET /api/encounters/pool-stats/
+        """
+        return Response(warm_pool.pool_stats())
+
     @action(detail=False, methods=['post'], url_path='generate')
     def generate_encounter(self, request):
         """
@@ -2,12 +2,9 @@ import json
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-
+from core.importer_fetch import (
+    REQUESTS_AVAILABLE, FetchError, add_fetch_arguments, fetcher_from_options
+)
 from items.models import (
     Item, ItemCategory, ItemProperty, Weapon, Armor, Consumable, MagicItem, DamageType
 )
@@ -44,14 +41,16 @@ class Command(BaseCommand):
             type=int,
             help='Limit number of items to import (for testing)'
         )
+        add_fetch_arguments(parser)
 
     def handle(self, *args, **options):
         source = options['source']
         dry_run = options['dry_run']
         update_existing = options['update_existing']
         limit = options.get('limit')
+        self.fetch_options = options
 
-        if not REQUESTS_AVAILABLE and source == 'open5e':
+        if not REQUESTS_AVAILABLE and source == 'open5e' and not options.get('offline'):
             raise CommandError('Requests library not available. Install with: pip install requests')
 
         try:
@@ -86,34 +85,19 @@ class Command(BaseCommand):
         self.process_items(all_items, dry_run, update_existing)
 
     def _fetch_paginated_data(self, url, limit=None):
-        """Fetch all pages of data from Open5e API"""
+        """Fetch all pages of data from Open5e API (pages after the first concurrently)"""
+        def on_page(page, count, from_cache):
+            source = ' (cached)' if from_cache else ''
+            self.stdout.write(f'  Page {page}: {count} items{source}')
+
         items = []
-        page = 1
-        
-        while url:
+        with fetcher_from_options(self.fetch_options, on_page=on_page) as fetcher:
             try:
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                items.extend(results)
-                
-                self.stdout.write(f'  Page {page}: {len(results)} items')
-                
-                # Check if we've hit the limit
-                if limit and len(items) >= limit:
-                    items = items[:limit]
-                    break
-                
-                # Get next page
-                url = data.get('next')
-                page += 1
-                
-            except requests.RequestException as e:
-                self.stdout.write(self.style.WARNING(f'Failed to fetch page {page}: {str(e)}'))
-                break
-        
+                for results in fetcher.iter_pages(url, limit=limit):
+                    items.extend(results)
+            except FetchError as e:
+                self.stdout.write(self.style.WARNING(f'Failed to fetch page: {str(e)}'))
+
         return items
 
     def import_from_json(self, file_path, dry_run, update_existing):
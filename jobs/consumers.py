@@ -0,0 +1,56 @@
+"""
+WebSocket consumer for background job completion.
+
+Clients that started a job (e.g. gauntlet generation) can connect here
+instead of polling /api/jobs/<id>/ and are told when it finishes.
+"""
+import json
+import logging
+
+try:
+    from channels.generic.websocket import AsyncWebsocketConsumer
+    CHANNELS_AVAILABLE = True
+except ImportError:
+    CHANNELS_AVAILABLE = False
+    # Fallback class if channels not installed
+    class AsyncWebsocketConsumer:
+        pass
+
+logger = logging.getLogger('api')
+
+
+class JobConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for one job.
+
+    URL: ws://localhost:8000/ws/jobs/<job_id>/
+    """
+
+    async def connect(self):
+        """Handle WebSocket connection"""
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        self.job_group_name = f'job_{self.job_id}'
+
+        await self.channel_layer.group_add(
+            self.job_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection"""
+        await self.channel_layer.group_discard(
+            self.job_group_name,
+            self.channel_name
+        )
+
+    async def job_finished(self, event):
+        """Handle job completion (sent by jobs.runner.notify)"""
+        await self.send(text_data=json.dumps({
+            'type': 'job_finished',
+            'job_id': event['job_id'],
+            'kind': event.get('kind'),
+            'status': event['status'],
+            'error': event.get('error'),
+        }))
@@ -0,0 +1,109 @@
+"""
+Management command to run background jobs
+
+Polls the Job table and runs queued jobs in a process pool, so generation
+work never occupies a web worker. Claims happen in this process; pool
+processes only execute the claimed job ids, each on its own database
+connection.
+
+Usage:
+    python manage.py run_jobs [--workers 4] [--once]
+
+--workers 0 runs jobs inline in this process (no pool). --once drains the
+queue and exits instead of polling forever.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.runner import claim_next, execute_job, jobs_settings, requeue_stale, worker_name
+
+
+def _init_worker():
+    """Pool initializer: connections inherited from the parent can not be shared"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _run(job_id):
+    finished = execute_job(job_id)
+    return job_id, finished.status
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (campaign generation etc.) in a process pool'
+
+    def add_arguments(self, parser):
+        config = jobs_settings()
+        parser.add_argument('--workers', type=int, default=config['WORKERS'], help='Pool size; 0 runs jobs inline')
+        parser.add_argument('--poll-interval', type=float, default=config['POLL_INTERVAL'],
+                            help='Seconds between queue polls when idle')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        self.name = worker_name()
+        requeued, failed = requeue_stale()
+        if requeued or failed:
+            self.stdout.write(f'Recovered stale jobs: {requeued} requeued, {failed} failed')
+
+        try:
+            if options['workers'] <= 0:
+                processed = self.run_inline(options)
+            else:
+                processed = self.run_pool(options)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted; in-flight jobs were allowed to finish')
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s)'))
+
+    def report(self, job_id, status):
+        style = self.style.SUCCESS if status == 'succeeded' else self.style.ERROR
+        self.stdout.write(style(f'  job {job_id}: {status}'))
+
+    def run_inline(self, options):
+        processed = 0
+        while True:
+            job_id = claim_next(self.name)
+            if job_id is None:
+                if options['once']:
+                    return processed
+                time.sleep(options['poll_interval'])
+                continue
+            self.report(*_run(job_id))
+            processed += 1
+
+    def run_pool(self, options):
+        processed = 0
+        # Forked pool processes must not inherit this process's connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            in_flight = set()
+            last_recovery = time.monotonic()
+            while True:
+                while len(in_flight) < options['workers']:
+                    job_id = claim_next(self.name)
+                    if job_id is None:
+                        break
+                    in_flight.add(pool.submit(_run, job_id))
+
+                if not in_flight:
+                    if options['once']:
+                        return processed
+                    time.sleep(options['poll_interval'])
+                else:
+                    done, in_flight = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        processed += 1
+                        try:
+                            self.report(*future.result())
+                        except Exception as e:
+                            # The job stays 'running' and is recovered by requeue_stale()
+                            self.stderr.write(self.style.ERROR(f'  worker error: {e}'))
+
+                if time.monotonic() - last_recovery > jobs_settings()['STALE_AFTER']:
+                    requeue_stale()
+                    last_recovery = time.monotonic()
@@ -0,0 +1,13 @@
+"""
+WebSocket URL routing for background jobs.
+"""
+try:
+    from django.urls import re_path
+    from . import consumers
+
+    websocket_urlpatterns = [
+        re_path(r'ws/jobs/(?P<job_id>\d+)/$', consumers.JobConsumer.as_asgi()),
+    ]
+except ImportError:
+    # Channels not installed
+    websocket_urlpatterns = []
@@ -0,0 +1,169 @@
+"""
+Background job runner
+
+A small DB-backed job queue with no external broker. Handlers are plain
+functions registered under a kind name:
+
+    from jobs.runner import job
+
+    @job('campaigns.generate_gauntlet')
+    def generate_gauntlet(job):
+        ...
+        return {'campaign_id': campaign.id}
+
+and views enqueue work for them:
+
+    job = enqueue('campaigns.generate_gauntlet', {'biome': 'forest'}, owner=request.user)
+
+The run_jobs management command claims queued jobs and runs them in a
+process pool. A claim is a conditional UPDATE on status='queued', so any
+number of workers can poll the same table on SQLite or Postgres without
+double-running a job. Each handler runs in one transaction: a failure
+leaves no partial rows behind and the job is marked failed with the error.
+
+When a job finishes, a 'job.finished' event is sent to the job_<id>
+channel group (jobs.consumers.JobConsumer). Workers run in their own
+processes, so this only reaches WebSocket clients when the channel layer is
+shared (Redis, see REDIS_URL); clients can always poll /api/jobs/<id>/.
+
+With settings.JOBS['EAGER'] jobs run inline when enqueued, which is handy
+for development without a worker and for tests.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger('api')
+
+DEFAULTS = {
+    'EAGER': False,
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'STALE_AFTER': 600,   # seconds a running job may go without finishing
+    'MAX_ATTEMPTS': 1,
+}
+
+# kind -> handler
+JOB_HANDLERS = {}
+
+
+def jobs_settings():
+    return {**DEFAULTS, **getattr(settings, 'JOBS', {})}
+
+
+def job(kind):
+    """Register a function as the handler for a job kind"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind, payload=None, owner=None):
+    """
+    Queue a job and return it.
+
+    Raises:
+        ValueError: if no handler is registered for the kind
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    queued = Job.objects.create(kind=kind, payload=payload or {}, owner=owner)
+    if jobs_settings()['EAGER'] and claim(queued.pk, 'eager'):
+        return execute_job(queued.pk)
+    return queued
+
+
+def claim(job_id, worker):
+    """Move a queued job to running; False if another worker got there first"""
+    return Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', worker=worker, started_at=timezone.now(), attempts=F('attempts') + 1
+    ) == 1
+
+
+def claim_next(worker):
+    """Claim the oldest queued job and return its id, or None when the queue is empty"""
+    while True:
+        job_id = Job.objects.filter(status='queued').order_by('created_at', 'id').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        if claim(job_id, worker):
+            return job_id
+
+
+def execute_job(job_id):
+    """Run a claimed job's handler and record the outcome"""
+    current = Job.objects.select_related('owner').get(pk=job_id)
+    handler = JOB_HANDLERS.get(current.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {current.kind}")
+        with transaction.atomic():
+            current.result = handler(current)
+        current.status = 'succeeded'
+    except Exception as e:
+        logger.exception(f"Job {current} failed")
+        current.status = 'failed'
+        current.error = str(e)
+    current.finished_at = timezone.now()
+    current.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    notify(current)
+    return current
+
+
+def requeue_stale(stale_after=None, max_attempts=None):
+    """
+    Recover jobs whose worker died mid-run.
+
+    Running jobs older than STALE_AFTER are queued again, or failed once
+    they have used MAX_ATTEMPTS.
+
+    Returns:
+        (requeued, failed) counts
+    """
+    config = jobs_settings()
+    stale_after = config['STALE_AFTER'] if stale_after is None else stale_after
+    max_attempts = config['MAX_ATTEMPTS'] if max_attempts is None else max_attempts
+    stale = Job.objects.filter(status='running', started_at__lt=timezone.now() - timedelta(seconds=stale_after))
+
+    requeued = stale.filter(attempts__lt=max_attempts).update(status='queued', worker='')
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed', error='Worker stopped before the job finished', finished_at=timezone.now()
+    )
+    return requeued, failed
+
+
+def notify(finished):
+    """Push a job.finished event to the job's channel group"""
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+    except ImportError:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(f'job_{finished.pk}', {
+            'type': 'job.finished',
+            'job_id': finished.pk,
+            'kind': finished.kind,
+            'status': finished.status,
+            'error': finished.error,
+        })
+    except Exception as e:
+        # A missing or unreachable channel layer must not fail the job
+        logger.warning(f"Could not notify job {finished.pk}: {e}")
@@ -0,0 +1,18 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs (status and, once finished, result)"""
+    status_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'result', 'error', 'attempts',
+            'created_at', 'started_at', 'finished_at', 'status_url',
+        ]
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        return f'/api/jobs/{obj.pk}/'
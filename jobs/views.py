@@ -0,0 +1,36 @@
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for background jobs started by the current user.
+
+    GET /api/jobs/<id>/ reports the status (and result once finished);
+    GET /api/jobs/<id>/result/ returns just the result.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(owner=self.request.user).order_by('-created_at')
+
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        """The job's result: 202 while it is queued or running, 200 once it succeeded"""
+        job = self.get_object()
+        if not job.is_finished:
+            return Response(
+                {"status": job.status, "status_url": f'/api/jobs/{job.pk}/'},
+                status=status.HTTP_202_ACCEPTED
+            )
+        if job.status == 'failed':
+            return Response(
+                {"status": job.status, "error": job.error},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(job.result)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchantencounter',
+            name='discovered',
+            field=models.BooleanField(default=True, help_text='False while a pre-stocked merchant waits to be reached'),
+        ),
+    ]
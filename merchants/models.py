@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from campaigns.models import Campaign, CampaignCharacter
+from campaigns.snapshot import invalidate_snapshot
 from items.models import Item
 import random
 
@@ -15,6 +17,7 @@ class MerchantEncounter(models.Model):
     discovered_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True, help_text="Whether merchant is still available for trading")
     merchant_name = models.CharField(max_length=100, help_text="Randomly generated merchant name")
+    discovered = models.BooleanField(default=True, help_text="False while a pre-stocked merchant waits to be reached")
     
     class Meta:
         ordering = ['encounter_number', '-discovered_at']
@@ -23,40 +26,75 @@ class MerchantEncounter(models.Model):
     def __str__(self):
         return f"{self.merchant_name} (Campaign: {self.campaign.name}, Encounter {self.encounter_number})"
     
-    def generate_inventory(self, count=5):
+    def generate_inventory(self, count=5, rng=random):
         """
         Generate random inventory for this merchant based on encounter depth.
         Uses rarity-based weighted random selection.
         """
-        from .rarity_weights import select_random_items
+        from .rarity_weights import select_random_item_ids
         
-        # Get randomly selected items based on depth and rarity weights
-        selected_items = select_random_items(self.encounter_number, count)
-        
-        # Create inventory items
-        for item in selected_items:
-            # Calculate price based on item rarity and base value
-            price = self._calculate_price(item)
-            
-            MerchantInventoryItem.objects.create(
-                merchant=self,
-                item=item,
-                price=price
-            )
+        selected_ids = select_random_item_ids(self.encounter_number, count, rng)
+        MerchantInventoryItem.objects.bulk_create(stock_rows({self: selected_ids}, rng))
     
-    def _calculate_price(self, item):
-        """Calculate item price with some randomization"""
-        base_price = item.value if hasattr(item, 'value') else 100
+    @classmethod
+    def stock_campaign(cls, campaign, encounter_numbers, count=5):
+        """
+        Pre-stock undiscovered merchants for a campaign in one pass
+        
+        Merchants, their item draws and their prices are built in memory
+        and written with one bulk_create per table. Each merchant stays
+        hidden until discover_merchant reaches its depth.
+        
+        Args:
+            campaign: Campaign to stock
+            encounter_numbers: Depths that get a merchant
+            count: Items per merchant
         
-        # Add 0-20% variation
-        variation = random.uniform(0.8, 1.2)
-        return int(base_price * variation)
+        Returns:
+            list: The created MerchantEncounter objects
+        """
+        from .rarity_weights import generate_merchant_name, select_random_item_ids
+        
+        merchants = cls.objects.bulk_create([
+            cls(campaign=campaign, encounter_number=number, merchant_name=generate_merchant_name(), discovered=False)
+            for number in encounter_numbers
+        ])
+        MerchantInventoryItem.objects.bulk_create(stock_rows({
+            merchant: select_random_item_ids(merchant.encounter_number, count) for merchant in merchants
+        }))
+        return merchants
     
     def get_available_items(self):
         """Get unsold items from inventory"""
         return self.inventory.filter(is_sold=False)
 
 
+def price_vector(base_values, rng=random):
+    """Prices for a batch of items: each base value with 0-20% variation"""
+    variations = [rng.uniform(0.8, 1.2) for _ in base_values]
+    return [int(value * variation) for value, variation in zip(base_values, variations)]
+
+
+def stock_rows(selections, rng=random):
+    """
+    Unsaved inventory rows for {merchant: [item ids]}
+    
+    Base values for every selected item are read in one query; ids whose
+    item no longer exists are skipped.
+    """
+    selected_ids = {pk for ids in selections.values() for pk in ids}
+    values = dict(Item.objects.filter(pk__in=selected_ids).values_list('pk', 'value')) if selected_ids else {}
+    
+    pairs = [
+        (merchant, pk) for merchant, ids in selections.items() for pk in ids if pk in values
+    ]
+    prices = price_vector([values[pk] for _, pk in pairs], rng)
+    return [
+        MerchantInventoryItem(merchant=merchant, item_id=pk, price=price)
+        for (merchant, pk), price in zip(pairs, prices)
+    ]
+
+
 class MerchantInventoryItem(models.Model):
     """
     Individual item in a merchant's inventory.
@@ -86,35 +124,47 @@ class MerchantInventoryItem(models.Model):
         """
         Sell this item to a character.
         Returns True if successful, False if character can't afford it.
+        
+        The item is claimed and the gold deducted with conditional UPDATEs
+        (is_sold = False / gold >= price), so two buyers racing for the same
+        item, or one buyer spending the same gold twice, can't both succeed.
         """
-        if self.is_sold:
-            raise ValueError("Item already sold")
+        with transaction.atomic():
+            purchased_at = timezone.now()
+            claimed = MerchantInventoryItem.objects.filter(pk=self.pk, is_sold=False).update(
+                is_sold=True, purchased_by=campaign_character, purchased_at=purchased_at
+            )
+            if not claimed:
+                raise ValueError("Item already sold")
+            
+            # Deduct gold
+            paid = CampaignCharacter.objects.filter(
+                pk=campaign_character.pk, gold__gte=self.price
+            ).update(gold=F('gold') - self.price)
+            if paid:
+                # Add to character inventory (if inventory tracking exists)
+                try:
+                    from characters.models import CharacterInventoryItem
+                    CharacterInventoryItem.objects.create(
+                        character=campaign_character.character,
+                        item=self.item,
+                        quantity=self.quantity,
+                        equipped=False
+                    )
+                except ImportError:
+                    pass  # Inventory tracking not available
+            else:
+                # Release the claim on the item
+                transaction.set_rollback(True)
         
-        if campaign_character.gold < self.price:
+        campaign_character.refresh_from_db(fields=['gold'])
+        if not paid:
             return False
+        invalidate_snapshot(campaign_character.campaign_id)
         
-        # Deduct gold
-        campaign_character.gold -= self.price
-        campaign_character.save()
-        
-        # Mark as sold
         self.is_sold = True
         self.purchased_by = campaign_character
-        self.purchased_at = timezone.now()
-        self.save()
-        
-        # Add to character inventory (if inventory tracking exists)
-        try:
-            from characters.models import CharacterInventoryItem
-            CharacterInventoryItem.objects.create(
-                character=campaign_character.character,
-                item=self.item,
-                quantity=self.quantity,
-                equipped=False
-            )
-        except ImportError:
-            pass  # Inventory tracking not available
-        
+        self.purchased_at = purchased_at
         return True
 
 
@@ -3,7 +3,12 @@ Rarity-based weighted random selection for merchant inventory.
 Rarity chances increase as players progress deeper into the gauntlet.
 """
 import random
-from items.models import Item, Weapon, Armor, Consumable,MagicItem
+from core.loot import register_table, roll_many
+from items.models import Item
+
+
+# Rarities from most to least common (also the fallback order)
+RARITY_ORDER = ['common', 'uncommon', 'rare', 'very_rare', 'legendary', 'artifact']
 
 
 # Rarity progression by encounter depth
@@ -47,122 +52,91 @@ RARITY_WEIGHTS = {
 }
 
 
-def get_rarity_weights(encounter_depth: int) -> dict:
+def get_rarity_tier(encounter_depth: int) -> str:
     """
-    Get rarity weights based on encounter depth in the gauntlet.
+    Get the rarity tier ('early', 'mid', 'late' or 'endgame') for an encounter depth.
     
     Args:
         encounter_depth: Current encounter number (1-based)
     
     Returns:
-        Dictionary of rarity -> weight percentage
+        Key of RARITY_WEIGHTS
     """
     if encounter_depth <= 3:
-        return RARITY_WEIGHTS['early']
+        return 'early'
     elif encounter_depth <= 6:
-        return RARITY_WEIGHTS['mid']
+        return 'mid'
     elif encounter_depth <= 9:
-        return RARITY_WEIGHTS['late']
+        return 'late'
     else:
-        return RARITY_WEIGHTS['endgame']
+        return 'endgame'
 
 
-def select_random_items(encounter_depth: int, count: int = 5) -> list:
+def get_rarity_weights(encounter_depth: int) -> dict:
     """
-    Select random items weighted by rarity based on encounter depth.
+    Get rarity weights based on encounter depth in the gauntlet.
     
     Args:
-        encounter_depth: Current encounter number in gauntlet
-        count: Number of items to select
+        encounter_depth: Current encounter number (1-based)
     
     Returns:
-        List of Item objects (or subclasses)
+        Dictionary of rarity -> weight percentage
     """
-    weights = get_rarity_weights(encounter_depth)
-    selected_items = []
-    
-    # Get all items by rarity
-    items_by_rarity = _get_items_by_rarity()
-    
-    # If no items available, return empty list
-    if not any(items_by_rarity.values()):
-        return []
-    
-    # Select items based on weighted probabilities
-    for _ in range(count):
-        # Randomly choose a rarity based on weights
-        rarity = _weighted_random_choice(weights)
-        
-        # Get available items of this rarity
-        available_items = items_by_rarity.get(rarity, [])
-        
-        if available_items:
-            # Randomly select one item of this rarity
-            item = random.choice(available_items)
-            selected_items.append(item)
-        else:
-            # Fallback to any common item if this rarity has no items
-            for fallback_rarity in ['common', 'uncommon', 'rare', 'very_rare', 'legendary', 'artifact']:
-                fallback_items = items_by_rarity.get(fallback_rarity, [])
-                if fallback_items:
-                    item = random.choice(fallback_items)
-                    selected_items.append(item)
-                    break
-    
-    return selected_items
+    return RARITY_WEIGHTS[get_rarity_tier(encounter_depth)]
 
 
-def _get_items_by_rarity() -> dict:
+def select_random_item_ids(encounter_depth: int, count: int = 5, rng=random) -> list:
     """
-    Get all items organized by rarity.
+    Select random item ids weighted by rarity based on encounter depth.
     
-    Returns:
-        Dictionary of rarity -> list of items
-    """
-    items_by_rarity = {
-        'common': [],
-        'uncommon': [],
-        'rare': [],
-        'very_rare': [],
-        'legendary': [],
-        'artifact': [],
-    }
-    
-    # Collect all Item-based objects (Item, Weapon, Armor, Consumable, MagicItem)
-    all_items = list(Item.objects.filter(rarity__in=items_by_rarity.keys()))
+    Ids are drawn from the tier's 'merchant:<tier>' loot table (core.loot),
+    which is compiled from the cached per-rarity id pools, so no item rows
+    are read.
     
-    # Organize by rarity
-    for item in all_items:
-        rarity = item.rarity
-        if rarity in items_by_rarity:
-            items_by_rarity[rarity].append(item)
+    Args:
+        encounter_depth: Current encounter number in gauntlet
+        count: Number of items to select
+        rng: random.Random-like source (default: random module)
     
-    return items_by_rarity
+    Returns:
+        List of Item ids (ids may repeat)
+    """
+    rolls = roll_many(f'merchant:{get_rarity_tier(encounter_depth)}', count, rng=rng)
+    return [drop['item_id'] for loot in rolls for drop in loot['items']]
 
 
-def _weighted_random_choice(weights: dict) -> str:
+def select_random_items(encounter_depth: int, count: int = 5) -> list:
     """
-    Make a weighted random choice from a dictionary of weights.
+    Select random items weighted by rarity based on encounter depth.
     
     Args:
-        weights: Dictionary of option -> weight percentage
+        encounter_depth: Current encounter number in gauntlet
+        count: Number of items to select
     
     Returns:
-        Selected option
+        List of Item objects (or subclasses)
     """
-    # Filter out zero weights
-    valid_weights = {k: v for k, v in weights.items() if v > 0}
+    selected_ids = select_random_item_ids(encounter_depth, count)
     
-    if not valid_weights:
-        return 'common'  # Fallback
-    
-    # Create a list of (option, weight) pairs
-    options = list(valid_weights.keys())
-    weight_values = list(valid_weights.values())
-    
-    # Use random.choices for weighted selection
-    selected = random.choices(options, weights=weight_values, k=1)[0]
-    return selected
+    # Load only the chosen items; ids may repeat
+    items = Item.objects.in_bulk(selected_ids)
+    return [items[item_id] for item_id in selected_ids if item_id in items]
+
+
+# One item per roll; a rarity without items falls back to the most common
+# rarity that has some
+for _tier, _weights in RARITY_WEIGHTS.items():
+    register_table(f'merchant:{_tier}', {
+        'unique': False,
+        'entries': [
+            {
+                'pool': f'rarity:{rarity}',
+                'weight': weight,
+                'fallback': [f'rarity:{fallback}' for fallback in RARITY_ORDER],
+            }
+            for rarity, weight in _weights.items()
+        ],
+    })
 
 
 # Merchant name generation
@@ -179,8 +153,8 @@ MERCHANT_SUFFIXES = [
 ]
 
 
-def generate_merchant_name() -> str:
+def generate_merchant_name(rng=random) -> str:
     """Generate a random merchant name"""
-    prefix = random.choice(MERCHANT_PREFIXES)
-    suffix = random.choice(MERCHANT_SUFFIXES)
+    prefix = rng.choice(MERCHANT_PREFIXES)
+    suffix = rng.choice(MERCHANT_SUFFIXES)
     return f"{prefix} {suffix}"
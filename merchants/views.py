@@ -22,8 +22,8 @@ class MerchantViewSet(viewsets.ModelViewSet):
     serializer_class = MerchantEncounterSerializer
     
     def get_queryset(self):
-        """Filter merchants by campaign if specified"""
-        queryset = super().get_queryset()
+        """Filter merchants by campaign if specified (pre-stocked merchants stay hidden until discovered)"""
+        queryset = super().get_queryset().filter(discovered=True)
         
         campaign_id = self.request.query_params.get('campaign')
         if campaign_id:
@@ -106,8 +106,14 @@ class MerchantViewSet(viewsets.ModelViewSet):
             
             # Perform the purchase in a transaction
             with transaction.atomic():
-                # Sell the item
-                success = inventory_item.sell_to(campaign_character)
+                # Sell the item (the sold/gold checks above are repeated atomically)
+                try:
+                    success = inventory_item.sell_to(campaign_character)
+                except ValueError:
+                    return Response(
+                        {'error': 'Item already sold'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
                 
                 if not success:
                     return Response(
@@ -0,0 +1,288 @@
+"""
+Bulk spell import engine
+
+Imports a whole Open5e-format spell payload in staged passes:
+
+1. Parse: every spell is parsed into a plain dict of Spell fields plus its
+   class names, with no database access. Non-SRD spells and spells without
+   a name are skipped.
+2. Resolve: CharacterClass rows are loaded into one name -> id map, and the
+   existing spells are loaded so a spell whose name already exists under a
+   different slug updates that row instead of colliding with it.
+3. Write: Spell rows are upserted by slug with
+   bulk_create(update_conflicts=True).
+4. Link: the classes through-table is written in one bulk insert
+   (existing links are kept, as with classes.add()).
+
+Finally the 'spells' catalogue version is bumped so the cached spell
+endpoints are rebuilt.
+
+Usage:
+    from spells.bulk_import import SpellBulkImporter
+
+    result = SpellBulkImporter().run(spells)
+"""
+import time
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from characters.models import CharacterClass
+from core.cache_utils import bump_catalogue_version
+from spells.models import Spell
+
+
+DEFAULT_BATCH_SIZE = 500
+
+SRD_DOCUMENT = 'wotc-srd'
+
+VALID_SCHOOLS = [
+    'abjuration', 'conjuration', 'divination', 'enchantment',
+    'evocation', 'illusion', 'necromancy', 'transmutation'
+]
+
+# Spell fields refreshed when an existing spell is re-imported
+UPDATE_FIELDS = [
+    'name', 'level', 'school', 'casting_time', 'range', 'components', 'material',
+    'duration', 'concentration', 'ritual', 'description', 'higher_level',
+    'source', 'page', 'updated_at',
+]
+
+
+# ==================== PARSING ====================
+
+def parse_level(level_str):
+    """Parse spell level from Open5e format"""
+    if isinstance(level_str, int):
+        return level_str
+
+    level_str = str(level_str).lower()
+
+    if 'cantrip' in level_str:
+        return 0
+
+    # Extract number from string like "1st-level" or "2nd-level"
+    for i in range(10):
+        if str(i) in level_str:
+            return i
+
+    return 0
+
+
+def parse_school(school_str):
+    """Parse spell school from Open5e format"""
+    school_str = str(school_str).lower().strip()
+
+    for school in VALID_SCHOOLS:
+        if school in school_str:
+            return school
+
+    return 'evocation'  # Default fallback
+
+
+def parse_class_names(class_string):
+    """Split Open5e's comma-separated dnd_class field into lowercase names"""
+    if not class_string:
+        return []
+    return [name.strip().lower() for name in class_string.split(',') if name.strip()]
+
+
+def parse_spell(data):
+    """
+    Parse an Open5e spell dict.
+
+    Returns:
+        dict with 'fields' (Spell field values) and 'classes' (lowercase
+        class names), or None for spells that should be skipped
+    """
+    spell_name = data.get('name', '').strip()
+    if not spell_name:
+        return None
+
+    # STRICT SRD FILTER: Only allow wotc-srd content
+    # This ensures we don't import 3rd party content like 'a5e', 'dmag', etc.
+    if data.get('document__slug', '').lower() != SRD_DOCUMENT:
+        return None
+
+    duration = data.get('duration', 'Instantaneous')
+    return {
+        'fields': {
+            'name': spell_name,
+            'slug': data.get('slug') or slugify(spell_name),
+            'level': parse_level(data.get('level', 0)),
+            'school': parse_school(data.get('school', '')),
+            'casting_time': data.get('casting_time', '1 action'),
+            'range': data.get('range', 'Self'),
+            'components': data.get('components', 'V, S'),
+            'material': data.get('material', ''),
+            'duration': duration,
+            'concentration': 'concentration' in duration.lower(),
+            'ritual': data.get('ritual', 'no').lower() == 'yes',
+            'description': data.get('desc', ''),
+            'higher_level': data.get('higher_level', ''),
+            'source': data.get('document__slug', 'PHB'),
+            'page': data.get('page', ''),
+        },
+        'classes': parse_class_names(data.get('dnd_class')),
+    }
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ==================== IMPORT ENGINE ====================
+
+class SpellBulkImporter:
+    """
+    Staged bulk importer for Open5e spells.
+
+    Args:
+        batch_size: Rows per bulk insert
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.timings = {}
+        self.errors = []
+        self.unknown_classes = set()
+
+    def run(self, spells):
+        """
+        Import Open5e spell dicts from a list or any iterable.
+
+        Returns:
+            dict with created, updated, skipped, errors and class_links counts,
+            the names of created and updated spells, and the new catalogue
+            version
+        """
+        self.timings = {}
+        self.errors = []
+        self.unknown_classes = set()
+
+        start = time.perf_counter()
+        parsed, skipped = self.parse(spells)
+        self.timings['parse'] = time.perf_counter() - start
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            class_ids = {name.lower(): pk for pk, name in CharacterClass.objects.values_list('id', 'name')}
+            existing = self._load_existing(parsed)
+            self.timings['resolve'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            created, updated = self._write_spells(parsed, existing)
+            self.timings['write'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            links = self._write_class_links(parsed, class_ids)
+            self.timings['link'] = time.perf_counter() - start
+
+        version = bump_catalogue_version('spells') if parsed else None
+
+        return {
+            'created': len(created),
+            'updated': len(updated),
+            'skipped': skipped,
+            'errors': len(self.errors),
+            'class_links': links,
+            'created_names': created,
+            'updated_names': updated,
+            'catalogue_version': version,
+        }
+
+    def parse(self, spells):
+        """
+        Parse every spell; duplicate slugs or names keep the first occurrence.
+
+        Returns:
+            (parsed spells, skipped count)
+        """
+        parsed = []
+        skipped = 0
+        seen_slugs = set()
+        seen_names = set()
+        for data in spells:
+            try:
+                spell = parse_spell(data)
+            except Exception as e:
+                self.errors.append((data.get('name', 'Unknown') if isinstance(data, dict) else 'Unknown', str(e)))
+                continue
+            if spell is None:
+                skipped += 1
+                continue
+            fields = spell['fields']
+            if fields['slug'] in seen_slugs or fields['name'] in seen_names:
+                skipped += 1
+                continue
+            seen_slugs.add(fields['slug'])
+            seen_names.add(fields['name'])
+            parsed.append(spell)
+        return parsed, skipped
+
+    def _load_existing(self, parsed):
+        """Map slug and name -> slug for existing spells touched by this import"""
+        slugs = [spell['fields']['slug'] for spell in parsed]
+        names = [spell['fields']['name'] for spell in parsed]
+        existing = {'slugs': set(), 'names': {}}
+        for chunk in _chunks(slugs, self.batch_size):
+            existing['slugs'].update(Spell.objects.filter(slug__in=chunk).values_list('slug', flat=True))
+        for chunk in _chunks(names, self.batch_size):
+            existing['names'].update(Spell.objects.filter(name__in=chunk).values_list('name', 'slug'))
+        return existing
+
+    def _write_spells(self, parsed, existing):
+        """
+        Upsert Spell rows by slug.
+
+        The previous importer keyed spells by name, so a spell already stored
+        under the same name but another slug keeps its stored slug and is
+        updated in place rather than violating the unique name.
+
+        Returns:
+            (created names, updated names)
+        """
+        created, updated = [], []
+        rows = []
+        for spell in parsed:
+            fields = spell['fields']
+            stored_slug = existing['names'].get(fields['name'])
+            if stored_slug is not None:
+                fields['slug'] = stored_slug
+            if fields['slug'] in existing['slugs'] or stored_slug is not None:
+                updated.append(fields['name'])
+            else:
+                created.append(fields['name'])
+            rows.append(Spell(**fields))
+
+        Spell.objects.bulk_create(
+            rows,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=UPDATE_FIELDS,
+        )
+        return created, updated
+
+    def _write_class_links(self, parsed, class_ids):
+        """Insert every spell/class link in one bulk insert; returns links written"""
+        spell_ids = {}
+        slugs = [spell['fields']['slug'] for spell in parsed]
+        for chunk in _chunks(slugs, self.batch_size):
+            spell_ids.update(Spell.objects.filter(slug__in=chunk).values_list('slug', 'id'))
+
+        through = Spell.classes.through
+        links = []
+        for spell in parsed:
+            spell_id = spell_ids[spell['fields']['slug']]
+            for class_name in spell['classes']:
+                class_id = class_ids.get(class_name)
+                if class_id is None:
+                    self.unknown_classes.add(class_name)
+                    continue
+                links.append(through(spell_id=spell_id, characterclass_id=class_id))
+
+        # Links that already exist are kept, like classes.add()
+        through.objects.bulk_create(links, batch_size=self.batch_size, ignore_conflicts=True)
+        return len(links)
@@ -1,9 +1,6 @@
-import requests
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
-from spells.models import Spell, SpellDamage
-from characters.models import CharacterClass
-from bestiary.models import DamageType
+from core.importer_fetch import FetchError, add_fetch_arguments, fetcher_from_options
+from spells.bulk_import import SpellBulkImporter, DEFAULT_BATCH_SIZE
 
 
 class Command(BaseCommand):
@@ -27,11 +24,21 @@ class Command(BaseCommand):
             default=None,
             help='Limit number of spells to import'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Rows per bulk insert'
+        )
+        add_fetch_arguments(parser)
 
     def handle(self, *args, **options):
         source = options['source']
         dry_run = options['dry_run']
         limit = options['limit']
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.fetch_options = options
 
         if source == 'open5e':
             self.import_from_open5e(dry_run, limit)
@@ -44,25 +51,14 @@ class Command(BaseCommand):
         
         base_url = 'https://api.open5e.com/spells'
         all_spells = []
-        next_url = base_url
-        
-        # Fetch all pages
-        while next_url:
+
+        # Fetch all pages (pages after the first are fetched concurrently)
+        with fetcher_from_options(self.fetch_options) as fetcher:
             try:
-                response = requests.get(next_url, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                all_spells.extend(data.get('results', []))
-                next_url = data.get('next')
-                
-                self.stdout.write(f'Fetched {len(all_spells)} spells so far...')
-                
-                if limit and len(all_spells) >= limit:
-                    all_spells = all_spells[:limit]
-                    break
-                    
-            except requests.RequestException as e:
+                for results in fetcher.iter_pages(base_url, limit=limit):
+                    all_spells.extend(results)
+                    self.stdout.write(f'Fetched {len(all_spells)} spells so far...')
+            except FetchError as e:
                 self.stdout.write(self.style.ERROR(f'Error fetching spells: {e}'))
                 return
         
@@ -74,114 +70,29 @@ class Command(BaseCommand):
                 self.stdout.write(f"  - {spell_data.get('name')} (Level {spell_data.get('level')})")
             return
         
-        # Import spells
-        created_count = 0
-        updated_count = 0
-        skipped_count = 0
-        
-        for spell_data in all_spells:
-            try:
-                spell_name = spell_data.get('name', '').strip()
-                if not spell_name:
-                    skipped_count += 1
-                    continue
-                
-                # STRICT SRD FILTER: Only allow wotc-srd content
-                # This ensures we don't import 3rd party content like 'a5e', 'dmag', etc.
-                source_slug = spell_data.get('document__slug', '').lower()
-                if source_slug != 'wotc-srd':
-                    skipped_count += 1
-                    continue
-                
-                # Map Open5e data to our model
-                spell_defaults = {
-                    'slug': spell_data.get('slug', slugify(spell_name)),
-                    'level': self._parse_level(spell_data.get('level', 0)),
-                    'school': self._parse_school(spell_data.get('school', '')),
-                    'casting_time': spell_data.get('casting_time', '1 action'),
-                    'range': spell_data.get('range', 'Self'),
-                    'components': spell_data.get('components', 'V, S'),
-                    'material': spell_data.get('material', ''),
-                    'duration': spell_data.get('duration', 'Instantaneous'),
-                    'concentration': 'concentration' in spell_data.get('duration', '').lower(),
-                    'ritual': spell_data.get('ritual', 'no').lower() == 'yes',
-                    'description': spell_data.get('desc', ''),
-                    'higher_level': spell_data.get('higher_level', ''),
-                    'source': spell_data.get('document__slug', 'PHB'),
-                    'page': spell_data.get('page', ''),
-                }
-                
-                # Create or update spell
-                spell, created = Spell.objects.update_or_create(
-                    name=spell_name,
-                    defaults=spell_defaults
-                )
-                
-                if created:
-                    created_count += 1
-                    self.stdout.write(f'  Created: {spell_name}')
-                else:
-                    updated_count += 1
-                    self.stdout.write(f'  Updated: {spell_name}')
-                
-                # Add classes that can learn this spell
-                if 'dnd_class' in spell_data and spell_data['dnd_class']:
-                    self._add_spell_classes(spell, spell_data['dnd_class'])
-                
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error importing {spell_name}: {e}'))
-                skipped_count += 1
-        
-        self.stdout.write(self.style.SUCCESS(
-            f'\nImport complete!\n'
-            f'  Created: {created_count}\n'
-            f'  Updated: {updated_count}\n'
-            f'  Skipped: {skipped_count}'
-        ))
+        importer = SpellBulkImporter(batch_size=self.batch_size)
+        result = importer.run(all_spells)
 
-    def _parse_level(self, level_str):
-        """Parse spell level from Open5e format"""
-        if isinstance(level_str, int):
-            return level_str
-        
-        level_str = str(level_str).lower()
-        if 'cantrip' in level_str:
-            return 0
-        
-        # Extract number from string like "1st-level" or "2nd-level"
-        for i in range(10):
-            if str(i) in level_str:
-                return i
-        
-        return 0
+        if self.verbosity >= 2:
+            for name in result['created_names']:
+                self.stdout.write(f'  Created: {name}')
+            for name in result['updated_names']:
+                self.stdout.write(f'  Updated: {name}')
 
-    def _parse_school(self, school_str):
-        """Parse spell school from Open5e format"""
-        school_str = str(school_str).lower().strip()
-        
-        valid_schools = [
-            'abjuration', 'conjuration', 'divination', 'enchantment',
-            'evocation', 'illusion', 'necromancy', 'transmutation'
-        ]
-        
-        for school in valid_schools:
-            if school in school_str:
-                return school
-        
-        return 'evocation'  # Default fallback
+        for name, error in importer.errors:
+            self.stdout.write(self.style.ERROR(f'Error importing {name}: {error}'))
+        if importer.unknown_classes:
+            self.stdout.write(self.style.WARNING(
+                f'Unknown classes (not linked): {", ".join(sorted(importer.unknown_classes))}'
+            ))
 
-    def _add_spell_classes(self, spell, class_string):
-        """Add classes that can learn this spell"""
-        if not class_string:
-            return
-        
-        # Parse class string (may be comma-separated)
-        class_names = [c.strip().lower() for c in class_string.split(',')]
-        
-        for class_name in class_names:
-            try:
-                char_class = CharacterClass.objects.filter(name__iexact=class_name).first()
-                if char_class:
-                    spell.classes.add(char_class)
-            except Exception as e:
-                self.stdout.write(self.style.WARNING(f'Could not add class {class_name}: {e}'))
+        timings = ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in importer.timings.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'\nImport complete!\n'
+            f'  Created: {result["created"]}\n'
+            f'  Updated: {result["updated"]}\n'
+            f'  Skipped: {result["skipped"] + result["errors"]}\n'
+            f'  Class links: {result["class_links"]}\n'
+            f'  Catalogue version: {result["catalogue_version"]}\n'
+            f'  Timings: {timings}'
+        ))
@@ -1,10 +1,10 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.conf import settings
 
+from core.cache_utils import versioned_cache_page
 from core.throttles import SpellLookupThrottle
 
 from .models import Spell, SpellDamage
@@ -88,7 +88,7 @@ class SpellViewSet(viewsets.ModelViewSet):
         return SpellSerializer
     
     
-    @method_decorator(cache_page(settings.CACHE_TTL.get('spell', 3600), key_prefix='spells_by_class'))
+    @method_decorator(versioned_cache_page(settings.CACHE_TTL.get('spell', 3600), 'spells_by_class', 'spells'))
     @action(detail=False, methods=['get'])
     def by_class(self, request):
         """
@@ -107,7 +107,7 @@ class SpellViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(spells, many=True)
         return Response(serializer.data)
     
-    @method_decorator(cache_page(settings.CACHE_TTL.get('spell', 3600), key_prefix='spells_cantrips'))
+    @method_decorator(versioned_cache_page(settings.CACHE_TTL.get('spell', 3600), 'spells_cantrips', 'spells'))
     @action(detail=False, methods=['get'])
     def cantrips(self, request):
         """Get all cantrips (level 0 spells). Cached for 1 hour."""
@@ -115,7 +115,7 @@ class SpellViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(cantrips, many=True)
         return Response(serializer.data)
     
-    @method_decorator(cache_page(settings.CACHE_TTL.get('spell', 3600), key_prefix='spells_rituals'))
+    @method_decorator(versioned_cache_page(settings.CACHE_TTL.get('spell', 3600), 'spells_rituals', 'spells'))
     @action(detail=False, methods=['get'])
     def rituals(self, request):
         """Get all ritual spells. Cached for 1 hour."""
@@ -123,7 +123,7 @@ class SpellViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(rituals, many=True)
         return Response(serializer.data)
     
-    @method_decorator(cache_page(settings.CACHE_TTL.get('spell', 3600), key_prefix='spells_concentration'))
+    @method_decorator(versioned_cache_page(settings.CACHE_TTL.get('spell', 3600), 'spells_concentration', 'spells'))
     @action(detail=False, methods=['get'])
     def concentration(self, request):
         """Get all concentration spells. Cached for 1 hour."""
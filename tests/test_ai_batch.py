@@ -0,0 +1,177 @@
+"""
+Tests for batched enemy turn resolution (combat.ai_batch)
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bestiary.models import Condition, Enemy, EnemyAbility, EnemyAttack, EnemyStats
+from characters.models import Character, CharacterClass, CharacterRace, CharacterStats
+from combat.ai_batch import EnemyTurnBatch
+from combat.models import CombatAction, CombatParticipant, CombatSession, ConditionApplication
+from core.concurrency import StaleVersionError
+from encounters.models import Encounter, EncounterEnemy
+
+
+class EnemyTurnBatchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+        race = CharacterRace.objects.create(name="Human")
+        fighter_class = CharacterClass.objects.create(name="Fighter", hit_dice="d10")
+        encounter = Encounter.objects.create(name="Goblin Swarm")
+        self.session = CombatSession.objects.create(
+            encounter=encounter, status='active', current_round=1, current_turn_index=0
+        )
+
+        goblin = Enemy.objects.create(name="Goblin", challenge_rating="1/4")
+        EnemyStats.objects.create(enemy=goblin, hit_points=7, armor_class=15)
+        EnemyAttack.objects.create(enemy=goblin, name="Scimitar", bonus=4, damage="1d6+2 slashing")
+        EnemyAbility.objects.create(enemy=goblin, name="Multiattack", description="The goblin makes two attacks.")
+
+        self.goblins = []
+        for index in range(10):
+            encounter_enemy = EncounterEnemy.objects.create(
+                encounter=encounter, enemy=goblin, name=f"Goblin {index}", current_hp=7
+            )
+            self.goblins.append(CombatParticipant.objects.create(
+                combat_session=self.session, participant_type='enemy', encounter_enemy=encounter_enemy,
+                initiative=20 - index, current_hp=7, max_hp=7, armor_class=15
+            ))
+
+        self.heroes = []
+        for index in range(2):
+            character = Character.objects.create(
+                user=self.user, name=f"Hero {index}", level=5, character_class=fighter_class, race=race
+            )
+            CharacterStats.objects.create(character=character, max_hit_points=500, hit_points=500, armor_class=10)
+            self.heroes.append(CombatParticipant.objects.create(
+                combat_session=self.session, participant_type='character', character=character,
+                initiative=5 - index, current_hp=500, max_hp=500, armor_class=10
+            ))
+
+    def test_resolves_swarm_and_persists_in_bulk(self):
+        batch = EnemyTurnBatch(self.session)
+        enemy_turns = batch.run()
+
+        with CaptureQueriesContext(connection) as queries:
+            batch.commit()
+
+        self.assertEqual(len(enemy_turns), 10)
+        self.assertEqual(batch.current().id, self.heroes[0].id)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+
+        attacks = [action for turn in enemy_turns for action in turn['actions']]
+        self.assertEqual(len(attacks), 20)  # Multiattack: two each
+        self.assertEqual(CombatAction.objects.filter(combat_session=self.session).count(), 20)
+
+        damage = {hero.id: 0 for hero in self.heroes}
+        for attack in attacks:
+            damage[attack['target_id']] += attack['damage']
+        for hero in self.heroes:
+            hero.refresh_from_db()
+            self.assertEqual(hero.current_hp, 500 - damage[hero.id])
+
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.current_round, self.session.current_turn_index), (1, 10))
+
+    def test_commit_keeps_hits_and_reactions_from_other_requests(self):
+        batch = EnemyTurnBatch(self.session)
+        enemy_turns = batch.run()
+        # A player's request lands while the batch is resolving
+        concurrent = CombatParticipant.objects.get(pk=self.heroes[0].pk)
+        concurrent.take_damage(50)
+        self.assertTrue(concurrent.use_reaction())
+
+        batch.commit()
+
+        dealt = sum(
+            action['damage'] for turn in enemy_turns for action in turn['actions']
+            if action['target_id'] == self.heroes[0].id
+        )
+        self.heroes[0].refresh_from_db()
+        self.assertEqual(self.heroes[0].current_hp, 500 - 50 - dealt)
+        self.assertTrue(self.heroes[0].reaction_used)
+
+    def test_commit_rejects_resources_changed_meanwhile(self):
+        self.goblins[0].legendary_actions_remaining = 1
+        self.goblins[0].legendary_actions_max = 3
+        self.goblins[0].save()
+        batch = EnemyTurnBatch(self.session)
+        batch.run()
+        goblin = next(participant for participant in batch.participants if participant.id == self.goblins[0].id)
+        goblin.legendary_actions_remaining = 3
+        CombatParticipant.objects.get(pk=self.goblins[0].pk).use_legendary_action(1)
+
+        with self.assertRaises(StaleVersionError):
+            batch.commit()
+
+        self.goblins[0].refresh_from_db()
+        self.assertEqual(self.goblins[0].legendary_actions_remaining, 0)
+
+    def test_wraps_to_next_round_and_expires_conditions(self):
+        # Heroes act first this round; the goblins close it out
+        for hero in self.heroes:
+            hero.initiative = 30
+            hero.save()
+        self.session.current_turn_index = 2
+        self.session.save()
+        condition = Condition.objects.create(name='poisoned')
+        self.heroes[0].conditions.add(condition)
+        application = ConditionApplication.objects.create(
+            participant=self.heroes[0], condition=condition,
+            duration_type='round', duration_rounds=1, expires_at_round=1
+        )
+
+        batch = EnemyTurnBatch(self.session)
+        self.assertEqual(len(batch.run()), 10)
+        batch.commit()
+
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.current_round, self.session.current_turn_index), (2, 0))
+        application.refresh_from_db()
+        self.assertEqual(application.removal_reason, 'duration_expired')
+        self.assertFalse(self.heroes[0].conditions.exists())
+
+    def test_stops_when_no_players_stand(self):
+        for hero in self.heroes:
+            hero.current_hp = 1
+            hero.armor_class = 1
+            hero.save()
+
+        batch = EnemyTurnBatch(self.session)
+        enemy_turns = batch.run()
+        batch.commit()
+
+        self.assertLess(len(enemy_turns), 10)
+        self.assertFalse(
+            CombatParticipant.objects.filter(participant_type='character', is_active=True).exists()
+        )
+
+    def test_auto_enemy_turns_endpoint(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/combat/sessions/{self.session.id}/auto_enemy_turns/', {'compact': True}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['turns_resolved'], 10)
+        self.assertEqual(response.data['current_turn'], 'Hero 0')
+        self.assertEqual(len(response.data['initiative_order']), 12)
+        self.assertLess(len(queries), 30)
+
+    def test_auto_enemy_turns_session_payload_is_current(self):
+        response = self.client.post(f'/api/combat/sessions/{self.session.id}/auto_enemy_turns/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['session']['current_turn_index'], 10)
+        serialized = {participant['id']: participant['current_hp'] for participant in response.data['session']['participants']}
+        for hero in self.heroes:
+            hero.refresh_from_db()
+            self.assertEqual(serialized[hero.id], hero.current_hp)
@@ -0,0 +1,219 @@
+"""
+Tests for the tactical AI policy engine (combat.ai_policy)
+"""
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy, EnemyAttack, EnemySpell, EnemySpellSlot, EnemyStats
+from combat.ai_policy import (
+    Board, TacticalPolicy, damage_table, hit_chances, resolve_tactical_turn, save_success_chance
+)
+from combat.models import CombatAction, CombatParticipant, CombatSession
+from encounters.models import Encounter, EncounterEnemy
+
+
+class ExpectedValueTests(SimpleTestCase):
+
+    def test_hit_chances(self):
+        self.assertAlmostEqual(hit_chances(11)[0], 0.45)
+        self.assertAlmostEqual(hit_chances(11)[1], 0.05)
+        # Natural 1 misses and natural 20 crits whatever the numbers say
+        self.assertAlmostEqual(sum(hit_chances(-5)), 0.95)
+        self.assertAlmostEqual(sum(hit_chances(30)), 0.05)
+        self.assertAlmostEqual(hit_chances(11, 1)[1], 39 / 400)
+        self.assertGreater(hit_chances(11, 1)[0], hit_chances(11)[0])
+        self.assertLess(hit_chances(11, -1)[0], hit_chances(11)[0])
+
+    def test_damage_tables(self):
+        mean, at_least = damage_table('1d6+2')
+        self.assertAlmostEqual(mean, 5.5)
+        self.assertAlmostEqual(at_least[3], 1.0)
+        self.assertAlmostEqual(at_least[8], 1 / 6)
+        self.assertEqual(at_least[9], 0.0)
+
+        self.assertAlmostEqual(damage_table('1d6+2', critical=True)[0], 9.0)
+        self.assertAlmostEqual(damage_table('2d4', halved=True)[0], 2.25)
+        self.assertAlmostEqual(damage_table('7')[0], 7.0)
+
+    def test_save_chance(self):
+        self.assertAlmostEqual(save_success_chance(15, 2), 0.4)
+        self.assertEqual(save_success_chance(30, 0), 0.0)
+        self.assertEqual(save_success_chance(1, 0), 1.0)
+
+
+class TacticalPolicyTests(TestCase):
+
+    def setUp(self):
+        self.encounter = Encounter.objects.create(name="Ambush")
+        self.session = CombatSession.objects.create(encounter=self.encounter, status='active', current_round=1)
+
+    def add_enemy(self, name, attack=('Scimitar', 4, '1d6+2 slashing'), x=0, y=0, **fields):
+        enemy = Enemy.objects.create(name=name)
+        EnemyStats.objects.create(enemy=enemy, hit_points=fields.get('max_hp', 7), armor_class=13)
+        EnemyAttack.objects.create(enemy=enemy, name=attack[0], bonus=attack[1], damage=attack[2])
+        encounter_enemy = EncounterEnemy.objects.create(
+            encounter=self.encounter, enemy=enemy, name=name, current_hp=fields.get('max_hp', 7)
+        )
+        participant = CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='enemy', encounter_enemy=encounter_enemy,
+            current_hp=fields.pop('current_hp', fields.get('max_hp', 7)), max_hp=fields.pop('max_hp', 7),
+            armor_class=13, position_x=x, position_y=y, **fields
+        )
+        return participant
+
+    def add_hero(self, name, hp=30, x=0, y=0, **fields):
+        return CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='character', name=name,
+            current_hp=hp, max_hp=max(hp, 30), armor_class=fields.pop('armor_class', 10),
+            position_x=x, position_y=y, **fields
+        )
+
+    def policy_for(self, participant, **kwargs):
+        return TacticalPolicy(Board(self.session.participants.all()), participant, **kwargs)
+
+    def test_focuses_the_target_it_can_drop(self):
+        goblin = self.add_enemy('Goblin')
+        wounded = self.add_hero('Wounded', hp=4)
+        healthy = self.add_hero('Healthy', hp=30)
+        policy = self.policy_for(goblin)
+
+        _, _, target, _ = policy.best_swing({unit.id: unit.hp for unit in policy.board.units.values()})
+
+        self.assertEqual(target.id, wounded.id)
+        self.assertNotEqual(target.id, healthy.id)
+
+    def test_cover_shifts_the_choice(self):
+        goblin = self.add_enemy('Goblin')
+        covered = self.add_hero('Covered', cover_type='three_quarters')
+        exposed = self.add_hero('Exposed')
+        policy = self.policy_for(goblin)
+
+        _, _, target, _ = policy.best_swing({unit.id: unit.hp for unit in policy.board.units.values()})
+
+        self.assertEqual(target.id, exposed.id)
+        self.assertEqual(policy.board.units[covered.id].ac, 15)
+
+    def test_full_cover_is_not_targetable(self):
+        goblin = self.add_enemy('Goblin')
+        self.add_hero('Hidden', cover_type='full')
+
+        actions = resolve_tactical_turn(self.session, goblin)
+
+        self.assertEqual(actions[0]['type'], 'skip')
+
+    def test_unbatched_turns_keep_concurrent_changes(self):
+        goblin = self.add_enemy('Goblin')
+        hero = self.add_hero('Hero', hp=30)
+        participants = list(self.session.participants.all())
+        # Another request lands after the board was loaded
+        concurrent = CombatParticipant.objects.get(pk=hero.pk)
+        concurrent.take_damage(5)
+        concurrent.use_reaction()
+
+        actions = resolve_tactical_turn(self.session, goblin, participants)
+
+        hero.refresh_from_db()
+        self.assertEqual(hero.current_hp, 25 - sum(action['damage'] for action in actions))
+        self.assertTrue(hero.reaction_used)
+
+    def test_caster_fireballs_a_cluster_then_runs_out(self):
+        mage = self.add_enemy('Mage', attack=('Staff', 2, '1d6'), x=60)
+        fireball = EnemySpell.objects.create(enemy=mage.encounter_enemy.enemy, name='Fireball', save_dc=15)
+        EnemySpellSlot.objects.create(spell=fireball, level=3, uses=1)
+        # Enough HP to survive a maximum-damage Fireball (48)
+        heroes = [
+            self.add_hero(f'Hero {index}', hp=50, x=x, y=y) for index, (x, y) in enumerate([(0, 0), (5, 0), (0, 5)])
+        ]
+
+        actions = resolve_tactical_turn(self.session, mage)
+
+        self.assertEqual([action['type'] for action in actions], ['spell'] * 3)
+        self.assertEqual({action['target_id'] for action in actions}, {hero.id for hero in heroes})
+        # One damage roll for the whole area
+        self.assertLessEqual(len({action['damage'] for action in actions if not action['save_success']}), 1)
+        mage.refresh_from_db()
+        self.assertEqual(mage.spell_uses_remaining, {'Fireball': 0})
+        self.assertEqual(CombatAction.objects.filter(action_type='spell').count(), 3)
+
+        actions = resolve_tactical_turn(self.session, mage)
+
+        self.assertEqual(actions[0]['type'], 'attack')
+
+    def test_avoids_fireball_that_hits_allies(self):
+        mage = self.add_enemy('Mage', attack=('Staff', 2, '1d6'), x=60)
+        EnemySpell.objects.create(enemy=mage.encounter_enemy.enemy, name='Fireball', save_dc=15)
+        self.add_hero('Hero', hp=50)
+        for index, (x, y) in enumerate([(5, 0), (0, 5), (5, 5)]):
+            self.add_enemy(f'Goblin {index}', x=x, y=y)
+
+        actions = resolve_tactical_turn(self.session, mage)
+
+        self.assertEqual([action['type'] for action in actions], ['attack'])
+
+    def test_bosses_spend_legendary_actions_after_other_turns(self):
+        goblin = self.add_enemy('Goblin')
+        dragon = self.add_enemy(
+            'Dragon', attack=('Tail', 10, '2d8+6 bludgeoning'), max_hp=200,
+            legendary_actions_max=3, legendary_actions_remaining=3
+        )
+        self.add_hero('Hero', hp=100)
+
+        actions = resolve_tactical_turn(self.session, goblin)
+
+        legendary = [action for action in actions if action['type'] == 'legendary_action']
+        self.assertEqual(len(legendary), 1)
+        self.assertEqual(legendary[0]['attacker_id'], dragon.id)
+        self.assertEqual(legendary[0]['profile'], 'boss')
+        dragon.refresh_from_db()
+        self.assertEqual(dragon.legendary_actions_remaining, 2)
+        self.assertTrue(CombatAction.objects.filter(actor=dragon, is_legendary_action=True).exists())
+
+    def test_zero_budget_still_decides(self):
+        goblin = self.add_enemy('Goblin')
+        self.add_hero('Hero')
+
+        policy = self.policy_for(goblin, budget_ms=0)
+
+        self.assertIsNotNone(policy.best_swing({unit.id: unit.hp for unit in policy.board.units.values()}, 2))
+
+
+class AITurnStrategyTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='testuser', password='testpass'))
+        encounter = Encounter.objects.create(name="Ambush")
+        self.session = CombatSession.objects.create(encounter=encounter, status='active', current_round=1)
+        enemy = Enemy.objects.create(name="Goblin")
+        EnemyAttack.objects.create(enemy=enemy, name="Scimitar", bonus=4, damage="1d6+2 slashing")
+        CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='enemy', initiative=20, current_hp=7, max_hp=7,
+            armor_class=13, encounter_enemy=EncounterEnemy.objects.create(
+                encounter=encounter, enemy=enemy, name="Goblin", current_hp=7
+            )
+        )
+        CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='character', name='Hero', initiative=10,
+            current_hp=30, max_hp=30, armor_class=10
+        )
+
+    def test_ai_turn_strategies(self):
+        for strategy in ('tactical', 'simple'):
+            self.session.current_turn_index = 0
+            self.session.save()
+
+            response = self.client.post(
+                f'/api/combat/sessions/{self.session.id}/ai_turn/', {'strategy': strategy}, format='json'
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['strategy'], strategy)
+            self.assertEqual(response.data['actions'][0]['type'], 'attack')
+
+    def test_ai_turn_defaults_to_simple(self):
+        response = self.client.post(f'/api/combat/sessions/{self.session.id}/ai_turn/', {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['strategy'], 'simple')
@@ -0,0 +1,169 @@
+"""
+Tests for conditional, lock-free HP and resource updates (core.concurrency)
+
+Concurrent requests are simulated with two stale in-memory copies of the
+same row: each copy's write must still see the other's.
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from campaigns.models import Campaign, CampaignCharacter
+from characters.models import Character, CharacterClass, CharacterRace
+from combat.ai_batch import EnemyTurnBatch
+from combat.models import CombatParticipant, CombatSession
+from core.concurrency import StaleVersionError
+from items.models import Item
+from merchants.models import MerchantEncounter, MerchantInventoryItem
+
+
+class CombatParticipantMutationTests(TestCase):
+
+    def setUp(self):
+        self.session = CombatSession.objects.create(status='active', current_round=1)
+        self.participant = CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='character', name='Hero',
+            initiative=10, current_hp=30, max_hp=30, armor_class=15,
+            legendary_actions_max=3, legendary_actions_remaining=3
+        )
+
+    def copies(self):
+        return (
+            CombatParticipant.objects.get(pk=self.participant.pk),
+            CombatParticipant.objects.get(pk=self.participant.pk),
+        )
+
+    def test_concurrent_damage_is_not_lost(self):
+        first, second = self.copies()
+
+        first.take_damage(10)
+        hp, _ = second.take_damage(5)
+
+        self.assertEqual(hp, 15)
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.current_hp, 15)
+
+    def test_damage_to_zero_deactivates_and_heal_revives(self):
+        first, second = self.copies()
+
+        first.take_damage(20)
+        second.take_damage(20)
+        self.assertEqual((second.current_hp, second.is_active), (0, False))
+
+        self.assertEqual(first.heal(50), 30)
+        self.assertTrue(first.is_active)
+
+    def test_damage_does_not_overwrite_other_fields(self):
+        first, second = self.copies()
+        first.movement_used = 15
+        first.save()
+
+        second.take_damage(3)
+
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.movement_used, 15)
+
+    def test_reaction_can_only_be_spent_once(self):
+        first, second = self.copies()
+
+        self.assertTrue(first.use_reaction())
+        self.assertFalse(second.use_reaction())
+        self.assertTrue(second.reaction_used)
+
+    def test_legendary_actions_can_not_be_overspent(self):
+        first, second = self.copies()
+
+        self.assertTrue(first.use_legendary_action(2)[0])
+        success, message = second.use_legendary_action(2)
+
+        self.assertFalse(success)
+        self.assertEqual(second.legendary_actions_remaining, 1)
+
+    def test_next_turn_bumps_version_once_per_advance(self):
+        first = CombatSession.objects.get(pk=self.session.pk)
+        stale = CombatSession.objects.get(pk=self.session.pk)
+
+        first.next_turn()
+        stale.next_turn()
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.version, 1)
+        self.assertEqual(stale.version, 1)
+        self.assertEqual(
+            (stale.current_round, stale.current_turn_index),
+            (self.session.current_round, self.session.current_turn_index)
+        )
+
+    def test_stale_next_turn_leaves_participants_alone(self):
+        stale = CombatSession.objects.get(pk=self.session.pk)
+        CombatSession.objects.get(pk=self.session.pk).next_turn()
+        self.participant.refresh_from_db()
+        self.participant.use_legendary_action(1)
+
+        stale.next_turn()
+
+        self.participant.refresh_from_db()
+        self.assertEqual(self.participant.legendary_actions_remaining, 2)
+
+    def test_batch_commit_rejects_stale_session(self):
+        batch = EnemyTurnBatch(CombatSession.objects.get(pk=self.session.pk))
+        CombatSession.objects.get(pk=self.session.pk).next_turn()
+        batch.advance()
+
+        with self.assertRaises(StaleVersionError):
+            batch.commit()
+
+
+class CampaignAndMerchantMutationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass')
+        character = Character.objects.create(
+            user=user, name='Buyer', level=1,
+            character_class=CharacterClass.objects.create(name='Rogue', hit_dice='d8'),
+            race=CharacterRace.objects.create(name='Halfling')
+        )
+        campaign = Campaign.objects.create(owner=user, name='Gauntlet', status='active')
+        self.campaign_character = CampaignCharacter.objects.create(
+            campaign=campaign, character=character, current_hp=20, max_hp=20, gold=100
+        )
+        merchant = MerchantEncounter.objects.create(
+            campaign=campaign, encounter_number=1, merchant_name='Trader'
+        )
+        item = Item.objects.create(name='Dagger', rarity='common', value=2)
+        self.items = [
+            MerchantInventoryItem.objects.create(merchant=merchant, item=item, price=60) for _ in range(2)
+        ]
+
+    def test_campaign_damage_and_heal(self):
+        first = CampaignCharacter.objects.get(pk=self.campaign_character.pk)
+        second = CampaignCharacter.objects.get(pk=self.campaign_character.pk)
+
+        first.take_damage(8)
+        self.assertEqual(second.take_damage(4), 8)
+
+        self.assertEqual(first.heal(5), 5)
+        self.assertEqual(second.heal(50), 7)  # Capped at max
+        self.assertEqual(second.current_hp, 20)
+
+        first.take_damage(30)
+        self.assertFalse(first.is_alive)
+        self.assertEqual(first.heal(5), 0)
+
+    def test_item_sells_once(self):
+        other = MerchantInventoryItem.objects.get(pk=self.items[0].pk)
+
+        self.assertTrue(self.items[0].sell_to(self.campaign_character))
+        with self.assertRaises(ValueError):
+            other.sell_to(self.campaign_character)
+
+        self.assertEqual(self.campaign_character.gold, 40)
+
+    def test_gold_can_not_be_spent_twice(self):
+        stale = CampaignCharacter.objects.get(pk=self.campaign_character.pk)
+
+        self.assertTrue(self.items[0].sell_to(self.campaign_character))
+        self.assertFalse(self.items[1].sell_to(stale))
+
+        self.assertEqual(stale.gold, 40)
+        self.items[1].refresh_from_db()
+        self.assertFalse(self.items[1].is_sold)
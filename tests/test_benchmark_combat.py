@@ -0,0 +1,48 @@
+"""
+Smoke tests for the combat API benchmark command (benchmark_combat)
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from combat.models import CombatSession
+
+
+class BenchmarkCombatCommandTests(TestCase):
+
+    def run_benchmark(self, *args):
+        out, err = StringIO(), StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'benchmark_combat', '--rounds', '2', '--party', '2', '--enemies', '2',
+                '--output', output, *args, stdout=out, stderr=err
+            )
+            with open(output) as handle:
+                return json.load(handle)
+
+    def test_scripted_fight_is_measured_and_rolled_back(self):
+        results = self.run_benchmark()
+
+        endpoints = results['endpoints']
+        for label in ('setup', 'start', 'attack', 'cast_spell', 'next_turn', 'auto_enemy_turns', 'stats', 'end'):
+            self.assertEqual(endpoints[label]['errors'], 0)
+        # Read endpoints are measured whatever they return
+        for label in ('report', 'export_json', 'export_csv', 'analytics'):
+            self.assertEqual(endpoints[label]['calls'], 1)
+        self.assertGreater(endpoints['setup']['max_queries'], 0)
+        self.assertLessEqual(endpoints['attack']['p50_ms'], endpoints['attack']['p95_ms'])
+        self.assertFalse(CombatSession.objects.exists())
+
+    def test_exceeded_threshold_fails_the_run(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as handle:
+            json.dump({'attack': {'queries': 0}}, handle)
+        self.addCleanup(os.unlink, handle.name)
+
+        with self.assertRaisesMessage(CommandError, '1 threshold(s) exceeded'):
+            self.run_benchmark('--thresholds', handle.name)
@@ -1,7 +1,7 @@
 """
 Tests for Boss Encounter Integration in Campaign System
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -145,8 +145,9 @@ class CampaignGeneratorTests(TestCase):
         self.assertGreater(boss_encounter.enemies.count(), 0)
 
 
+@override_settings(JOBS={'EAGER': True})
 class CampaignAPITests(TestCase):
-    """Test campaign API endpoints with boss support"""
+    """Test campaign API endpoints with boss support (generation jobs run inline)"""
     
     def setUp(self):
         self.client = APIClient()
@@ -183,10 +184,11 @@ class CampaignAPITests(TestCase):
             'encounter_count': 5
         })
         
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn('campaign', response.data)
-        self.assertIn('boss_encounter', response.data)
-        self.assertEqual(response.data['encounters'], 6)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        result = self.client.get(f"/api/jobs/{response.data['job']['id']}/result/").data
+        self.assertIn('campaign', result)
+        self.assertIn('boss_encounter', result)
+        self.assertEqual(result['encounters'], 6)
     
     def test_generate_gauntlet_missing_biome(self):
         """Test validation for missing biome"""
@@ -217,6 +219,6 @@ class CampaignAPITests(TestCase):
             'name': 'My Custom Gauntlet'
         })
         
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        campaign = Campaign.objects.get(id=response.data['campaign']['id'])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        campaign = Campaign.objects.get(id=response.data['job']['result']['campaign']['id'])
         self.assertEqual(campaign.name, 'My Custom Gauntlet')
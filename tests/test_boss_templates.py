@@ -0,0 +1,95 @@
+"""
+Tests for compiled boss templates (campaigns.boss_templates)
+"""
+from unittest import mock
+
+from django.test import TestCase
+
+from bestiary.models import Enemy, EnemyStats
+from campaigns.boss_templates import get_compiled_boss
+from campaigns.loot_tables import boss_table
+from campaigns.models import CampaignEncounter
+from campaigns.services.campaign_generator import CampaignGenerator
+from core.sampling import get_index
+from items.models import Item
+
+
+# Always picks the biome's first boss (forest: The Ancient Guardian)
+FIRST_BOSS = mock.Mock(**{'choice.side_effect': lambda options: options[0]})
+
+
+class BossTemplateTests(TestCase):
+
+    def setUp(self):
+        self.treant = Enemy.objects.create(name='Treant', creature_type='plant', challenge_rating='9')
+        EnemyStats.objects.create(enemy=self.treant, hit_points=138, armor_class=16)
+        self.wolf = Enemy.objects.create(name='Wolf', creature_type='beast', challenge_rating='1/4')
+        EnemyStats.objects.create(enemy=self.wolf, hit_points=11, armor_class=13)
+        self.staff = Item.objects.create(name='Ironwood Staff')
+
+    def test_templates_resolve_enemies_and_loot(self):
+        compiled = get_compiled_boss('forest', 'The Ancient Guardian')
+
+        self.assertEqual(compiled['boss'], {
+            'enemy_id': self.treant.id, 'name': 'Treant', 'hp': 138, 'challenge_rating': '9',
+        })
+        # 'Awakened Tree' is not in the bestiary
+        self.assertIsNone(compiled['minions'][0])
+        self.assertEqual(compiled['minions'][1]['enemy_id'], self.wolf.id)
+        self.assertEqual(compiled['loot_item_ids'], [self.staff.id])
+
+    def test_missing_references_are_reported_once(self):
+        with self.assertLogs('campaign', level='WARNING') as logs:
+            get_compiled_boss('forest', 'The Ancient Guardian')
+        with self.assertNumQueries(0):
+            get_compiled_boss('desert', 'The Sand Tyrant')
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Awakened Tree', logs.output[0])
+        self.assertNotIn('Ironwood Staff', logs.output[0])
+
+    def test_bosses_without_their_enemy_fall_back(self):
+        dragon = Enemy.objects.create(name='Ancient Red Dragon', creature_type='dragon', challenge_rating='24')
+
+        compiled = get_compiled_boss('desert', 'The Sand Tyrant')
+
+        self.assertEqual((compiled['boss']['enemy_id'], compiled['boss']['hp']), (dragon.id, 100))
+
+    def test_bestiary_changes_recompile(self):
+        get_compiled_boss('forest', 'The Ancient Guardian')
+
+        self.treant.stats.hit_points = 150
+        self.treant.stats.save()
+
+        self.assertEqual(get_compiled_boss('forest', 'The Ancient Guardian')['boss']['hp'], 150)
+
+    def test_templates_compiled_before_commit_are_retired(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.treant.stats.hit_points = 150
+            self.treant.stats.save()
+            during = get_compiled_boss('forest', 'The Ancient Guardian')
+        for callback in callbacks:
+            callback()
+
+        self.assertIsNot(get_compiled_boss('forest', 'The Ancient Guardian'), during)
+
+    def test_boss_encounter_is_built_with_one_bulk_insert(self):
+        generator = CampaignGenerator()
+        get_compiled_boss('forest', 'The Ancient Guardian')
+
+        with self.assertNumQueries(2):
+            encounter, loot = generator._generate_boss_encounter('forest', 5, 4, rng=FIRST_BOSS)
+
+        enemies = list(encounter.enemies.order_by('id').values_list('enemy_id', 'name', 'current_hp'))
+        self.assertEqual(enemies, [(self.treant.id, 'The Ancient Guardian', 138), (self.wolf.id, 'Wolf 2', 11)])
+        self.assertEqual((loot['guaranteed_items'], loot['item_ids']), (['Ironwood Staff'], [self.staff.id]))
+
+    def test_boss_loot_rolls_from_resolved_ids(self):
+        encounter, loot = CampaignGenerator()._generate_boss_encounter('forest', 5, 4, rng=FIRST_BOSS)
+        campaign_encounter = CampaignEncounter(encounter=encounter, boss_loot_table=loot)
+        get_index('items')
+
+        with self.assertNumQueries(0):
+            rewards = boss_table(campaign_encounter).roll()
+
+        self.assertEqual(rewards['items'], [{'item_id': self.staff.id, 'quantity': 1}])
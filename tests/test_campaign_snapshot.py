@@ -0,0 +1,119 @@
+"""
+Tests for the denormalized campaign read model (campaigns.snapshot)
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy
+from campaigns.models import Campaign, CampaignCharacter, CampaignEncounter, CharacterXP, TreasureRoom, TreasureRoomReward
+from campaigns.snapshot import get_snapshot
+from characters.models import Character, CharacterClass, CharacterRace
+from encounters.models import Encounter, EncounterEnemy
+
+
+class CampaignSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        fighter = CharacterClass.objects.create(
+            name='fighter', hit_dice='d10', primary_ability='STR', saving_throw_proficiencies='STR,CON'
+        )
+        human = CharacterRace.objects.create(name='human', size='M', speed=30)
+        character = Character.objects.create(
+            user=self.user, name='Test Fighter', level=1, character_class=fighter, race=human, alignment='NG'
+        )
+        self.campaign = Campaign.objects.create(
+            name='Gauntlet', owner=self.user, status='active', total_encounters=2
+        )
+        self.member = CampaignCharacter.objects.create(
+            campaign=self.campaign, character=character, current_hp=12, max_hp=12,
+            hit_dice_remaining={'d10': 1}, gold=10
+        )
+        CharacterXP.objects.create(campaign_character=self.member, current_xp=120)
+
+        encounter = Encounter.objects.create(name='Goblin Ambush', biome='forest')
+        goblin = Enemy.objects.create(name='Goblin', challenge_rating='1/4', size='S')
+        EncounterEnemy.objects.create(encounter=encounter, enemy=goblin, name='Goblin', current_hp=7)
+        CampaignEncounter.objects.create(campaign=self.campaign, encounter=encounter, encounter_number=1)
+        room = TreasureRoom.objects.create(campaign=self.campaign, encounter_number=1, room_type='gold')
+        TreasureRoomReward.objects.create(treasure_room=room, gold_amount=25)
+
+    def url(self, campaign=None):
+        return f'/api/campaigns/{(campaign or self.campaign).id}/snapshot/'
+
+    def test_snapshot_document(self):
+        response = self.client.get(self.url())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{response.data["version"]}"')
+        party = response.data['party']
+        self.assertEqual(len(party), 1)
+        self.assertEqual(party[0]['class'], 'Fighter')
+        self.assertEqual((party[0]['available_hit_dice'], party[0]['current_xp']), (1, 120))
+        self.assertEqual(response.data['current_encounter']['name'], 'Goblin Ambush')
+        self.assertEqual(response.data['treasure_rooms'][0]['unclaimed_rewards'], 1)
+        self.assertTrue(response.data['can_long_rest'])
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.client.get(self.url())['ETag']
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cached_snapshot_is_served_without_queries(self):
+        get_snapshot(self.campaign.id)
+
+        with self.assertNumQueries(0):
+            document = get_snapshot(self.campaign.id)
+        self.assertEqual(document['id'], self.campaign.id)
+
+    def test_writes_retire_the_snapshot(self):
+        before = get_snapshot(self.campaign.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.take_damage(5)
+        after_damage = get_snapshot(self.campaign.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.campaign.short_rests_used = 1
+            self.campaign.save()
+        after_rest = get_snapshot(self.campaign.id)
+
+        self.assertEqual(after_damage['party'][0]['current_hp'], 7)
+        self.assertNotEqual(before['version'], after_damage['version'])
+        self.assertEqual(after_rest['short_rests_used'], 1)
+        self.assertNotEqual(after_damage['version'], after_rest['version'])
+
+    def test_character_edits_retire_the_snapshot(self):
+        get_snapshot(self.campaign.id)
+        character = self.member.character
+
+        with self.captureOnCommitCallbacks(execute=True):
+            character.name = 'Renamed Fighter'
+            character.level = 2
+            character.save()
+        party = get_snapshot(self.campaign.id)['party']
+
+        self.assertEqual((party[0]['character'], party[0]['level']), ('Renamed Fighter', 2))
+
+    def test_other_users_campaigns_are_not_found(self):
+        other = User.objects.create_user(username='other', password='testpass')
+        campaign = Campaign.objects.create(name='Theirs', owner=other)
+
+        self.assertEqual(self.client.get(self.url(campaign)).status_code, 404)
+        self.assertEqual(self.client.get('/api/campaigns/999999/snapshot/').status_code, 404)
+
+    def test_party_status_reads_the_snapshot(self):
+        response = self.client.get(f'/api/campaigns/{self.campaign.id}/party_status/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['party'], get_snapshot(self.campaign.id)['party'])
+        self.assertEqual(response.data['long_rests_remaining'], 2)
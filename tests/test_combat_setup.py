@@ -0,0 +1,149 @@
+"""
+Tests for bulk combat setup and bulk initiative (combat.combat_setup)
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy, EnemyStats
+from characters.models import Character, CharacterClass, CharacterRace, CharacterStats
+from combat.models import CombatSession, CombatParticipant
+from encounters.models import Encounter, EncounterEnemy
+
+
+class CombatSetupTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+        race = CharacterRace.objects.create(name="Human")
+        fighter_class = CharacterClass.objects.create(name="Fighter", hit_dice="d10")
+        self.characters = []
+        for index in range(5):
+            character = Character.objects.create(
+                user=self.user, name=f"Hero {index}", level=3, character_class=fighter_class, race=race
+            )
+            CharacterStats.objects.create(
+                character=character, dexterity=14, max_hit_points=30, hit_points=25, armor_class=16
+            )
+            self.characters.append(character)
+
+        goblin = Enemy.objects.create(name="Goblin", challenge_rating="1/4")
+        EnemyStats.objects.create(enemy=goblin, hit_points=7, armor_class=15, dexterity=14)
+        self.encounter = Encounter.objects.create(name="Goblin Ambush")
+        for index in range(10):
+            EncounterEnemy.objects.create(
+                encounter=self.encounter, enemy=goblin, name=f"Goblin {index}", current_hp=7
+            )
+        EncounterEnemy.objects.create(
+            encounter=self.encounter, enemy=goblin, name="Dead Goblin", current_hp=0, is_alive=False
+        )
+        self.session = CombatSession.objects.create(encounter=self.encounter)
+
+    def setup_url(self):
+        return f'/api/combat/sessions/{self.session.id}/setup/'
+
+    def test_setup_creates_everyone_in_a_handful_of_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.setup_url(), {
+                'encounter_id': self.encounter.id,
+                'character_ids': [character.id for character in self.characters],
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['added']), 15)
+        self.assertEqual(self.session.participants.count(), 15)
+        self.assertLessEqual(len(queries), 15)
+
+        order = response.data['initiative_order']
+        self.assertEqual(len(order), 15)
+        initiatives = [entry['initiative'] for entry in order]
+        self.assertEqual(initiatives, sorted(initiatives, reverse=True))
+        self.assertTrue(all(result['source'] == 'auto' for result in response.data['results']))
+        self.assertTrue(all(result['modifier'] == 2 for result in response.data['results']))
+
+        hero = CombatParticipant.objects.get(combat_session=self.session, character=self.characters[0])
+        self.assertEqual((hero.current_hp, hero.max_hp, hero.armor_class), (25, 30, 16))
+        self.assertNotEqual(hero.initiative, 0)
+
+    def test_setup_skips_participants_already_present(self):
+        self.client.post(self.setup_url(), {'character_ids': [self.characters[0].id]}, format='json')
+
+        response = self.client.post(self.setup_url(), {
+            'character_ids': [character.id for character in self.characters[:2]],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Second call adds the other character only; enemies joined on the first call
+        self.assertEqual(len(response.data['added']), 1)
+        self.assertEqual(self.session.participants.count(), 12)
+
+    def test_setup_without_rolling(self):
+        response = self.client.post(self.setup_url(), {
+            'character_ids': [self.characters[0].id], 'roll_initiative': False,
+        }, format='json')
+
+        self.assertEqual(response.data['results'], [])
+        self.assertFalse(self.session.participants.exclude(initiative=0).exists())
+
+    def test_setup_rejects_unknown_characters(self):
+        response = self.client.post(self.setup_url(), {'character_ids': [999999]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['character_ids'], [999999])
+        self.assertEqual(self.session.participants.count(), 0)
+
+    def test_setup_rejects_other_encounter(self):
+        other = Encounter.objects.create(name="Elsewhere")
+
+        response = self.client.post(self.setup_url(), {'encounter_id': other.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Combat session belongs to a different encounter")
+
+    def test_setup_links_a_session_without_encounter(self):
+        self.session = CombatSession.objects.create()
+
+        response = self.client.post(self.setup_url(), {'encounter_id': self.encounter.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.encounter_id, self.encounter.id)
+        self.assertEqual(len(response.data['added']), 10)
+
+    def test_roll_initiative_saves_in_bulk(self):
+        self.client.post(self.setup_url(), {
+            'character_ids': [character.id for character in self.characters], 'roll_initiative': False,
+        }, format='json')
+        first = self.session.participants.order_by('id').first()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/combat/sessions/{self.session.id}/roll_initiative/',
+                {'overrides': {str(first.id): 25}, 'compact': True}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(response.data['initiative_order'][0]['id'], first.id)
+        first.refresh_from_db()
+        self.assertEqual(first.initiative, 25)
+        self.assertFalse(self.session.participants.filter(initiative=0).exists())
+
+    def test_roll_initiative_session_payload_reflects_new_values(self):
+        self.client.post(self.setup_url(), {
+            'character_ids': [self.characters[0].id], 'roll_initiative': False,
+        }, format='json')
+
+        response = self.client.post(f'/api/combat/sessions/{self.session.id}/roll_initiative/')
+
+        rolled = {result['participant_id']: result['initiative'] for result in response.data['results']}
+        serialized = {
+            participant['id']: participant['initiative'] for participant in response.data['session']['participants']
+        }
+        self.assertEqual(rolled, serialized)
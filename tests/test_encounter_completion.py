@@ -0,0 +1,158 @@
+"""
+Tests for the encounter completion pipeline (campaigns.services.encounter_completion)
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy
+from campaigns.models import Campaign, CampaignCharacter, CampaignEncounter, CharacterXP, TreasureRoom
+from campaigns.services.encounter_completion import EncounterCompletion
+from characters.models import Character, CharacterClass, CharacterRace, CharacterStats
+from encounters.models import Encounter, EncounterEnemy
+
+
+# Never rolls a random room
+NO_ROOMS = mock.Mock(**{'random.return_value': 0.99})
+
+
+class EncounterCompletionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.fighter = CharacterClass.objects.create(
+            name='fighter', hit_dice='d10', primary_ability='STR', saving_throw_proficiencies='STR,CON'
+        )
+        self.human = CharacterRace.objects.create(name='human', size='M', speed=30)
+        self.goblin = Enemy.objects.create(name='Goblin', challenge_rating='1/4', size='S')
+        self.campaign = Campaign.objects.create(
+            name='Gauntlet', owner=self.user, status='active', total_encounters=3
+        )
+
+    def add_character(self, name, campaign=None):
+        character = Character.objects.create(
+            user=self.user, name=name, level=1, character_class=self.fighter, race=self.human, alignment='NG'
+        )
+        CharacterStats.objects.create(
+            character=character, constitution=14, hit_points=12, max_hit_points=12, armor_class=16
+        )
+        return CampaignCharacter.objects.create(
+            campaign=campaign or self.campaign, character=character, current_hp=12, max_hp=12
+        )
+
+    def add_encounter(self, encounter_number, enemies=1, campaign=None):
+        encounter = Encounter.objects.create(name=f'Encounter {encounter_number}')
+        EncounterEnemy.objects.bulk_create([
+            EncounterEnemy(encounter=encounter, enemy=self.goblin, name=f'Goblin {i}', current_hp=7)
+            for i in range(enemies)
+        ])
+        return CampaignEncounter.objects.create(
+            campaign=campaign or self.campaign, encounter=encounter,
+            encounter_number=encounter_number, status='active'
+        )
+
+    def test_xp_is_split_across_the_party_and_the_campaign_advances(self):
+        first, second = self.add_character('A'), self.add_character('B')
+        CharacterXP.objects.create(campaign_character=first, current_xp=100, total_xp_gained=100)
+        campaign_encounter = self.add_encounter(1, enemies=2)
+
+        outcome = EncounterCompletion(self.campaign, campaign_encounter, rng=NO_ROOMS).run(rewards={'gold': 5})
+
+        # Two CR 1/4 goblins at party level 1: 50 XP each, 100 XP split two ways
+        self.assertEqual(outcome['xp_rewards']['total_xp_granted'], 100)
+        self.assertEqual(
+            sorted(row['total_xp'] for row in outcome['xp_rewards']['characters']), [50, 150]
+        )
+        self.assertEqual(CharacterXP.objects.get(campaign_character=second).current_xp, 50)
+        self.assertEqual(CharacterXP.objects.get(campaign_character=first).total_xp_gained, 150)
+
+        campaign_encounter.refresh_from_db()
+        self.campaign.refresh_from_db()
+        self.assertEqual((campaign_encounter.status, campaign_encounter.rewards), ('completed', {'gold': 5}))
+        self.assertEqual((self.campaign.current_encounter_index, self.campaign.status), (1, 'active'))
+
+    def test_level_up_applies_hp_and_pending_choices(self):
+        member = self.add_character('A')
+        CharacterXP.objects.create(campaign_character=member, current_xp=280, total_xp_gained=280)
+        campaign_encounter = self.add_encounter(1)
+
+        outcome = EncounterCompletion(self.campaign, campaign_encounter, rng=NO_ROOMS).run()
+
+        self.assertEqual(outcome['xp_rewards']['levels_gained'], 1)
+        member.refresh_from_db()
+        member.character.refresh_from_db()
+        self.assertEqual(member.character.level, 2)
+        self.assertGreater(member.max_hp, 12)
+        self.assertEqual(member.xp_tracking.level_ups_gained, 1)
+
+    def test_last_encounter_completes_the_campaign(self):
+        self.add_character('A')
+        self.campaign.total_encounters = 1
+        self.campaign.save()
+        campaign_encounter = self.add_encounter(1)
+
+        EncounterCompletion(self.campaign, campaign_encounter, rng=NO_ROOMS).run()
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'completed')
+        self.assertIsNotNone(self.campaign.ended_at)
+
+    def test_an_encounter_is_completed_once(self):
+        self.add_character('A')
+        campaign_encounter = self.add_encounter(1)
+        stale = CampaignEncounter.objects.get(pk=campaign_encounter.pk)
+
+        EncounterCompletion(self.campaign, campaign_encounter, rng=NO_ROOMS).run()
+
+        with self.assertRaises(ValueError):
+            EncounterCompletion(self.campaign, stale, rng=NO_ROOMS).run()
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.current_encounter_index, 1)
+
+    def test_treasure_room_every_third_encounter(self):
+        self.add_character('A')
+        self.campaign.total_encounters = 5
+        self.campaign.save()
+        campaign_encounter = self.add_encounter(3)
+
+        outcome = EncounterCompletion(self.campaign, campaign_encounter, rng=NO_ROOMS).run()
+
+        self.assertIsInstance(outcome['treasure_room'], TreasureRoom)
+        self.assertTrue(outcome['treasure_room'].reward_items.all())
+
+    def test_query_count_is_flat_in_party_and_encounter_size(self):
+        def completion_queries(party_size, enemies):
+            campaign = Campaign.objects.create(
+                name=f'Gauntlet {party_size}', owner=self.user, status='active', total_encounters=3
+            )
+            for i in range(party_size):
+                member = self.add_character(f'{party_size}-{i}', campaign=campaign)
+                if i % 2:
+                    CharacterXP.objects.create(campaign_character=member)
+            campaign_encounter = self.add_encounter(1, enemies=enemies, campaign=campaign)
+            with CaptureQueriesContext(connection) as queries:
+                EncounterCompletion(campaign, campaign_encounter, rng=NO_ROOMS).run()
+            return len(queries)
+
+        self.assertEqual(completion_queries(party_size=2, enemies=1), completion_queries(party_size=6, enemies=8))
+
+    def test_complete_encounter_endpoint(self):
+        self.add_character('A')
+        campaign_encounter = self.add_encounter(1)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with mock.patch('campaigns.services.encounter_completion.random', NO_ROOMS):
+            response = client.post(f'/api/campaigns/{self.campaign.id}/complete_encounter/', {}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['campaign_encounter']['id'], campaign_encounter.id)
+        self.assertEqual(response.data['campaign_status'], 'active')
+        self.assertEqual(response.data['xp_rewards']['total_xp_granted'], 50)
+        self.assertNotIn('treasure_room', response.data)
@@ -0,0 +1,79 @@
+"""
+Tests for the warm pool of pre-built biome encounters (encounters.services.warm_pool)
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy, EnemyStats
+from campaigns.services.campaign_generator import CampaignGenerator
+from encounters.models import Encounter, EncounterTheme, EnemyThemeAssociation
+from encounters.services import warm_pool
+from jobs.models import Job
+
+
+class WarmPoolTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        theme = EncounterTheme.objects.create(name='Bandits', category='humanoid', min_cr=0, max_cr=10)
+        enemy = Enemy.objects.create(name='Bandit', creature_type='humanoid', challenge_rating='1/8')
+        EnemyStats.objects.create(enemy=enemy, hit_points=11, armor_class=12)
+        EnemyThemeAssociation.objects.create(theme=theme, enemy=enemy, role='support')
+        self.key = warm_pool.pool_key('forest', 3, 4, 'easy')
+
+    def test_refill_stocks_the_key(self):
+        self.assertEqual(warm_pool.refill(self.key, target=2), 2)
+        self.assertEqual(warm_pool.refill(self.key, target=2), 0)
+
+        pooled = Encounter.objects.filter(pooled_for=self.key)
+        self.assertEqual(pooled.count(), 2)
+        self.assertTrue(all(encounter.enemies.exists() for encounter in pooled))
+
+    def test_an_encounter_is_taken_once(self):
+        warm_pool.refill(self.key, target=1)
+
+        self.assertIsNotNone(warm_pool.take('forest', 3, 4, 'easy'))
+        self.assertIsNone(warm_pool.take('forest', 3, 4, 'easy'))
+
+    def test_gauntlet_reparents_pooled_encounters_and_schedules_refill(self):
+        warm_pool.refill(self.key, target=1)
+        pooled_id = Encounter.objects.get(pooled_for=self.key).id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            campaign = CampaignGenerator().generate_gauntlet(
+                biome='forest', party_level=3, party_size=4, encounter_count=1, owner=self.user
+            )
+
+        first = campaign.campaign_encounters.get(encounter_number=1)
+        self.assertEqual(first.encounter_id, pooled_id)
+        self.assertEqual(Encounter.objects.get(pk=pooled_id).pooled_for, '')
+        self.assertTrue(Job.objects.filter(kind=warm_pool.REFILL_JOB, payload__key=self.key).exists())
+        stats = warm_pool.pool_stats()['forest']
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 0, 1.0))
+
+    def test_refill_is_queued_once_per_key(self):
+        self.assertIsNotNone(warm_pool.schedule_refill(self.key))
+        self.assertIsNone(warm_pool.schedule_refill(self.key))
+
+    @override_settings(ENCOUNTER_POOL={'BIOME_TARGETS': {'forest': 0}})
+    def test_disabled_biome_always_generates(self):
+        warm_pool.refill(self.key, target=1)
+
+        CampaignGenerator().generate_gauntlet(
+            biome='forest', party_level=3, party_size=4, encounter_count=1, owner=self.user
+        )
+
+        self.assertEqual(warm_pool.stock(self.key), 1)
+
+    def test_pooled_encounters_are_hidden_from_the_encounter_api(self):
+        warm_pool.refill(self.key, target=1)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/encounters/')
+
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(results, [])
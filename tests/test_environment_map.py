@@ -0,0 +1,133 @@
+"""
+Tests for the compiled per-session environment map (combat.environment_map)
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from characters.models import Character, CharacterClass, CharacterRace, CharacterStats
+from combat.environment_map import EnvironmentMap, get_environment_map
+from combat.models import CombatSession, CombatParticipant, EnvironmentalEffect, ParticipantPosition
+from encounters.models import Encounter
+
+
+def area(layer, value, x, y, radius):
+    return (layer, value, x, y, radius)
+
+
+class EnvironmentMapTests(SimpleTestCase):
+    """Rasterized lookups without the database"""
+
+    def test_area_lookups(self):
+        environment = EnvironmentMap(terrain='rubble', weather='snow', areas=[
+            area('cover', 'half', 10, 10, 5),
+            area('lighting', 'dim_light', 0, 0, 30),
+            area('hazard', 'lava', 40, 40, 10),
+            area('hazard', 'poison_gas', 45, 40, 10),
+        ])
+
+        self.assertEqual(environment.effects_at(10, 10), {
+            'terrain': 'rubble', 'cover': 'half', 'lighting': 'dim_light', 'hazards': [],
+        })
+        self.assertEqual(environment.effects_at(45, 40)['hazards'], ['lava', 'poison_gas'])
+        self.assertIsNone(environment.effects_at(30, 30)['lighting'])
+        # Outside every area only the battlefield-wide terrain applies
+        self.assertEqual(environment.effects_at(500, 500), {
+            'terrain': 'rubble', 'cover': None, 'lighting': None, 'hazards': [],
+        })
+        # Rubble doubles the cost and snow halves speed
+        self.assertEqual(environment.cost_at(500, 500), 4.0)
+        self.assertEqual(environment.movement_cost(30), (7, 4.0))
+
+    def test_newest_area_wins(self):
+        """Areas are given newest first, like the effect queryset ordering"""
+        environment = EnvironmentMap(areas=[
+            area('cover', 'three_quarters', 10, 10, 5),
+            area('cover', 'half', 10, 10, 20),
+        ])
+
+        self.assertEqual(environment.effects_at(10, 10)['cover'], 'three_quarters')
+        self.assertEqual(environment.effects_at(25, 10)['cover'], 'half')
+
+    def test_positions_snap_to_cells(self):
+        environment = EnvironmentMap(areas=[area('cover', 'half', 10, 10, 5)])
+
+        self.assertEqual(environment.effects_at(17, 12), environment.effects_at(15, 10))
+
+    def test_huge_areas_fall_back_to_area_tests(self):
+        areas = [area('lighting', 'darkness', 0, 0, 10000), area('hazard', 'acid', 20, 20, 5)]
+        environment = EnvironmentMap(areas=areas)
+
+        self.assertFalse(environment.rasterized)
+        self.assertEqual(environment.effects_at(20, 20)['lighting'], 'darkness')
+        self.assertEqual(environment.effects_at(20, 20)['hazards'], ['acid'])
+        self.assertEqual(environment.effects_at(100, 100)['hazards'], [])
+
+
+class SessionEnvironmentMapTests(TestCase):
+    """Compiled map cached with the session and used by movement"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+        race = CharacterRace.objects.create(name="Human")
+        fighter_class = CharacterClass.objects.create(name="Fighter", hit_dice="d10")
+        character = Character.objects.create(
+            user=self.user, name="Fighter", level=5, character_class=fighter_class, race=race
+        )
+        CharacterStats.objects.create(character=character, max_hit_points=45, hit_points=45, armor_class=18)
+
+        self.session = CombatSession.objects.create(encounter=Encounter.objects.create(name="Test Combat"), status='active')
+        self.participant = CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='character', character=character,
+            initiative=20, current_hp=45, max_hp=45, armor_class=18
+        )
+        ParticipantPosition.objects.create(participant=self.participant, x=0, y=0)
+
+    def add_effect(self, **data):
+        return self.client.post(f'/api/combat/sessions/{self.session.id}/environmental_effects/', data)
+
+    def test_move_reads_effects_from_compiled_map(self):
+        self.add_effect(effect_type='cover', cover_type='half', cover_area_x=10, cover_area_y=10, cover_area_radius=5)
+        self.add_effect(effect_type='hazard', hazard_type='acid', hazard_area_x=10, hazard_area_y=10, hazard_area_radius=5)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/combat/participants/{self.participant.id}/move/', {'distance': 15, 'x': 10, 'y': 10}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['position']['current_cover'], 'half')
+        self.assertEqual(response.data['position']['current_hazards'], ['acid'])
+        self.assertFalse(any('combat_environmentaleffect' in query['sql'] for query in queries))
+
+    def test_effects_saved_directly_invalidate_the_map(self):
+        get_environment_map(self.session)
+        EnvironmentalEffect.objects.create(
+            combat_session=self.session, effect_type='terrain', terrain_type='mud'
+        )
+
+        self.assertEqual(get_environment_map(self.session).terrain, 'mud')
+
+    def test_remove_effect(self):
+        effect_id = self.add_effect(
+            effect_type='lighting', lighting_type='darkness',
+            lighting_area_x=5, lighting_area_y=5, lighting_area_radius=10
+        ).data['effect']['id']
+        self.assertEqual(get_environment_map(self.session).effects_at(5, 5)['lighting'], 'darkness')
+
+        response = self.client.delete(
+            f'/api/combat/sessions/{self.session.id}/environmental_effects/',
+            {'effect_id': effect_id}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_environment_map(self.session).effects_at(5, 5)['lighting'])
+        self.assertFalse(EnvironmentalEffect.objects.get(pk=effect_id).is_active)
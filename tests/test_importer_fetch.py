@@ -0,0 +1,253 @@
+"""
+Tests for the shared importer fetch layer (core.importer_fetch)
+
+Pages are served by a local stub HTTP server running on a background thread.
+"""
+import json
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from bestiary.models import Enemy
+from core.importer_fetch import FetchError, PaginatedFetcher, ResponseCache, page_url, with_query
+
+
+ITEMS = [{'name': f'Item {i}'} for i in range(23)]
+PAGE_SIZE = 5
+
+
+class StubOpen5eHandler(BaseHTTPRequestHandler):
+    """
+    /pages/   page-number pagination (?page=N)
+    /offset/  limit/offset pagination
+    /cursor/  opaque cursor pagination (no count)
+    /missing/ always 404
+    """
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        self.server.requests.append(self.path)
+        base = f'http://{self.server.server_address[0]}:{self.server.server_address[1]}{parts.path}'
+
+        if parts.path == '/pages/':
+            page = int(query.get('page', 1))
+            start = (page - 1) * PAGE_SIZE
+            has_next = start + PAGE_SIZE < len(ITEMS)
+            body = {
+                'count': len(ITEMS),
+                'next': with_query(base, {**query, 'page': page + 1}) if has_next else None,
+                'results': ITEMS[start:start + PAGE_SIZE],
+            }
+        elif parts.path == '/offset/':
+            offset = int(query.get('offset', 0))
+            has_next = offset + PAGE_SIZE < len(ITEMS)
+            body = {
+                'count': len(ITEMS),
+                'next': with_query(base, {'limit': PAGE_SIZE, 'offset': offset + PAGE_SIZE}) if has_next else None,
+                'results': ITEMS[offset:offset + PAGE_SIZE],
+            }
+        elif parts.path == '/cursor/':
+            start = int(query.get('cursor', 0))
+            has_next = start + PAGE_SIZE < len(ITEMS)
+            body = {
+                'next': with_query(base, {'cursor': start + PAGE_SIZE}) if has_next else None,
+                'results': ITEMS[start:start + PAGE_SIZE],
+            }
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServerMixin:
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpen5eHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.stop_server()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().tearDown()
+
+    def stop_server(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class PaginatedFetcherTest(StubServerMixin, SimpleTestCase):
+
+    def test_fetches_every_page_in_order(self):
+        with PaginatedFetcher(workers=3) as fetcher:
+            results = fetcher.fetch_all(f'{self.base_url}/pages/')
+
+        self.assertEqual(results, ITEMS)
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_reports_pages_in_order(self):
+        pages = []
+        with PaginatedFetcher(workers=4, on_page=lambda page, count, cached: pages.append((page, count))) as fetcher:
+            fetcher.fetch_all(f'{self.base_url}/pages/')
+
+        self.assertEqual(pages, [(1, 5), (2, 5), (3, 5), (4, 5), (5, 3)])
+
+    def test_limit_skips_unneeded_pages(self):
+        with PaginatedFetcher() as fetcher:
+            results = fetcher.fetch_all(f'{self.base_url}/pages/', limit=7)
+
+        self.assertEqual(results, ITEMS[:7])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_params_apply_to_every_page(self):
+        with PaginatedFetcher() as fetcher:
+            fetcher.fetch_all(f'{self.base_url}/pages/', params={'document__slug': 'wotc-srd'})
+
+        self.assertTrue(all('document__slug=wotc-srd' in path for path in self.server.requests))
+
+    def test_offset_pagination(self):
+        with PaginatedFetcher(workers=2) as fetcher:
+            results = fetcher.fetch_all(f'{self.base_url}/offset/')
+
+        self.assertEqual(results, ITEMS)
+
+    def test_cursor_pagination_falls_back_to_following_next(self):
+        with PaginatedFetcher() as fetcher:
+            results = fetcher.fetch_all(f'{self.base_url}/cursor/')
+
+        self.assertEqual(results, ITEMS)
+
+    def test_http_error_raises_fetch_error(self):
+        with PaginatedFetcher() as fetcher:
+            with self.assertRaises(FetchError):
+                fetcher.fetch_all(f'{self.base_url}/missing/')
+
+    def test_cached_responses_serve_offline(self):
+        url = f'{self.base_url}/pages/'
+        with PaginatedFetcher(cache_dir=self.cache_dir) as fetcher:
+            online = fetcher.fetch_all(url)
+        self.stop_server()
+
+        cached_pages = []
+        with PaginatedFetcher(cache_dir=self.cache_dir, offline=True,
+                              on_page=lambda page, count, cached: cached_pages.append(cached)) as fetcher:
+            offline = fetcher.fetch_all(url)
+
+        self.assertEqual(offline, online)
+        self.assertTrue(all(cached_pages))
+
+    def test_offline_cache_miss_raises(self):
+        with PaginatedFetcher(cache_dir=self.cache_dir, offline=True) as fetcher:
+            with self.assertRaises(FetchError):
+                fetcher.fetch_all(f'{self.base_url}/pages/')
+        self.assertEqual(self.server.requests, [])
+
+    def test_refresh_ignores_cache(self):
+        url = f'{self.base_url}/pages/'
+        with PaginatedFetcher(cache_dir=self.cache_dir) as fetcher:
+            fetcher.fetch_all(url)
+            fetcher.fetch_all(url)
+        self.assertEqual(len(self.server.requests), 5)
+
+        with PaginatedFetcher(cache_dir=self.cache_dir, refresh=True) as fetcher:
+            fetcher.fetch_all(url)
+        self.assertEqual(len(self.server.requests), 10)
+
+
+class ResponseCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_identical_bodies_are_stored_once(self):
+        self.cache.put('https://example.com/a', b'{"results": []}')
+        self.cache.put('https://example.com/b', b'{"results": []}')
+
+        objects = list((self.cache.root / 'objects').rglob('*'))
+        self.assertEqual(len([path for path in objects if path.is_file()]), 1)
+        self.assertEqual(self.cache.get('https://example.com/b'), b'{"results": []}')
+
+    def test_miss_returns_none(self):
+        self.assertIsNone(self.cache.get('https://example.com/missing'))
+
+
+class PageUrlTest(SimpleTestCase):
+
+    def test_page_number(self):
+        self.assertEqual(
+            page_url('https://api.open5e.com/monsters/?document__slug=wotc-srd&page=2', 4, 50),
+            'https://api.open5e.com/monsters/?document__slug=wotc-srd&page=4'
+        )
+
+    def test_limit_offset(self):
+        self.assertEqual(
+            page_url('https://api.example.com/x/?limit=20&offset=20', 3, 20),
+            'https://api.example.com/x/?limit=20&offset=40'
+        )
+
+    def test_unknown_style(self):
+        self.assertIsNone(page_url('https://api.example.com/x/?cursor=abc', 2, 20))
+
+
+class OfflineImportCommandTest(TestCase):
+    """import_monsters_from_api runs entirely from a pre-populated cache"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        url = 'https://api.open5e.com/monsters/'
+        params = {'document__slug': 'wotc-srd'}
+        cache = ResponseCache(self.cache_dir)
+        cache.put(with_query(url, params), json.dumps({
+            'count': 3,
+            'next': with_query(url, {**params, 'page': 2}),
+            'results': [self._monster('Cached Goblin'), self._monster('Cached Orc')],
+        }).encode('utf-8'))
+        cache.put(with_query(url, {**params, 'page': 2}), json.dumps({
+            'count': 3,
+            'next': None,
+            'results': [self._monster('Cached Ogre')],
+        }).encode('utf-8'))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    @staticmethod
+    def _monster(name):
+        return {'name': name, 'hit_points': 10, 'armor_class': 12, 'challenge_rating': '1'}
+
+    def test_offline_import(self):
+        out = StringIO()
+        with override_settings(IMPORTER_CACHE_DIR=self.cache_dir):
+            call_command('import_monsters_from_api', '--offline', stdout=out)
+
+        self.assertEqual(
+            set(Enemy.objects.filter(name__startswith='Cached').values_list('name', flat=True)),
+            {'Cached Goblin', 'Cached Orc', 'Cached Ogre'}
+        )
+        self.assertIn('Page 2: 1 monsters (cached)', out.getvalue())
+        self.assertIn('Imported: 3', out.getvalue())
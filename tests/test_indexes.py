@@ -0,0 +1,67 @@
+"""
+Query-plan tests for the hot-path indexes
+
+Each test runs the query a view issues through EXPLAIN and checks the
+planner picks the matching index. Postgres prefers sequential scans on tiny
+test tables, so they are disabled for the check there.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from characters.models import Character, CharacterClass, CharacterItem, CharacterRace
+from combat.models import CombatAction, CombatParticipant, CombatSession, ConditionApplication, EnvironmentalEffect
+
+
+class HotPathIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = CombatSession.objects.create(status='active', current_round=1)
+        cls.participant = CombatParticipant.objects.create(
+            combat_session=cls.session, participant_type='character', name='Hero',
+            initiative=10, current_hp=20, max_hp=20, armor_class=12
+        )
+        user = User.objects.create_user(username='testuser', password='testpass')
+        cls.character = Character.objects.create(
+            user=user, name='Hero', level=1,
+            character_class=CharacterClass.objects.create(name='Fighter', hit_dice='d10'),
+            race=CharacterRace.objects.create(name='Human')
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_initiative_order(self):
+        self.assertUsesIndex(
+            self.session.participants.filter(is_active=True).order_by('-initiative', 'id'),
+            'combat_part_turn_idx'
+        )
+
+    def test_actions_in_turn_order(self):
+        self.assertUsesIndex(
+            CombatAction.objects.filter(combat_session=self.session).order_by('round_number', 'turn_number', 'created_at'),
+            'combat_action_turn_idx'
+        )
+
+    def test_active_conditions(self):
+        self.assertUsesIndex(
+            ConditionApplication.objects.filter(participant=self.participant, removed_at__isnull=True),
+            'combat_cond_active_idx'
+        )
+
+    def test_active_weather_effect(self):
+        self.assertUsesIndex(
+            EnvironmentalEffect.objects.filter(combat_session=self.session, effect_type='weather', is_active=True),
+            'combat_env_active_idx'
+        )
+
+    def test_equipped_item_in_slot(self):
+        self.assertUsesIndex(
+            CharacterItem.objects.filter(character=self.character, is_equipped=True, equipment_slot='main_hand'),
+            'char_item_equipped_idx'
+        )
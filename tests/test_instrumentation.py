@@ -0,0 +1,170 @@
+"""
+Tests for per-request instrumentation (core.instrumentation)
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from campaigns.models import Campaign, CampaignEncounter
+from combat.models import CombatParticipant, CombatSession, ParticipantPosition
+from core.instrumentation import Histogram, registry
+from encounters.models import Encounter
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_cumulative_buckets(self):
+        histogram = Histogram((1, 5, 10))
+        for value in (0.5, 1, 3, 7, 50):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(1, 2), (5, 3), (10, 4), ('+Inf', 5)])
+        self.assertEqual((histogram.count, histogram.total), (5, 61.5))
+
+
+@override_settings(DEBUG=True)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.session = CombatSession.objects.create(status='active', current_round=1)
+        for index in range(3):
+            CombatParticipant.objects.create(
+                combat_session=self.session, participant_type='character', name=f'Hero {index}',
+                initiative=10 - index, current_hp=20, max_hp=20, armor_class=12
+            )
+
+    def test_requests_are_recorded_per_action(self):
+        self.client.get(f'/api/combat/sessions/{self.session.id}/')
+        self.client.post(f'/api/combat/sessions/{self.session.id}/next_turn/')
+        self.client.post(f'/api/combat/sessions/{self.session.id}/next_turn/')
+
+        snapshot = self.client.get('/api/metrics/', {'format': 'json'}).json()['endpoints']
+
+        detail = snapshot['CombatSessionViewSet.retrieve']
+        self.assertEqual(detail['requests'], 1)
+        self.assertGreater(detail['queries']['sum'], 0)
+        self.assertGreater(detail['response_bytes']['sum'], 0)
+        self.assertGreater(detail['serializer_ms']['sum'], 0)
+        self.assertEqual(snapshot['CombatSessionViewSet.next_turn']['requests'], 2)
+
+    def test_cache_lookups_are_counted(self):
+        participant = self.session.participants.first()
+        ParticipantPosition.objects.create(participant=participant, x=0, y=0)
+        self.client.get(f'/api/combat/participants/{participant.id}/reachable/')
+        self.client.get(f'/api/combat/participants/{participant.id}/reachable/')
+
+        endpoint = registry.snapshot()['CombatParticipantViewSet.reachable']
+
+        self.assertEqual((endpoint['cache_misses'], endpoint['cache_hits']), (1, 1))
+
+    def test_prometheus_exposition(self):
+        self.client.get(f'/api/combat/sessions/{self.session.id}/')
+
+        body = self.client.get('/api/metrics/').content.decode()
+
+        self.assertIn('dnd_http_requests_total{view="CombatSessionViewSet.retrieve"} 1', body)
+        self.assertIn('dnd_http_latency_ms_bucket{view="CombatSessionViewSet.retrieve",le="+Inf"} 1', body)
+
+    @override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 0})
+    def test_slow_requests_log_their_queries(self):
+        with self.assertLogs('combat', level='WARNING') as logs:
+            self.client.get(f'/api/combat/sessions/{self.session.id}/')
+
+        self.assertIn('CombatSessionViewSet.retrieve', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(DEBUG=False, REQUEST_METRICS={'SCRAPE_TOKEN': 'secret'})
+    def test_scrape_requires_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        for header in ('Bearer secre', 'Bearer secret2', 'Token secret', 'secret'):
+            self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION=header).status_code, 403)
+
+
+@override_settings(DEBUG=False)
+class StageProfilingTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='gm', password='testpass', is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.session = CombatSession.objects.create(status='active', current_round=1)
+        self.hero = CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='character', name='Hero',
+            initiative=20, current_hp=20, max_hp=20, armor_class=12
+        )
+        self.goblin = CombatParticipant.objects.create(
+            combat_session=self.session, participant_type='enemy', name='Goblin',
+            initiative=10, current_hp=50, max_hp=50, armor_class=1
+        )
+
+    def attack(self, query=''):
+        return self.client.post(
+            f'/api/combat/sessions/{self.session.id}/attack/{query}',
+            {'attacker_id': self.hero.id, 'target_id': self.goblin.id, 'attack_name': 'Punch', 'damage': '1d4'},
+            format='json'
+        )
+
+    def test_profile_param_attaches_stage_breakdown_for_staff(self):
+        response = self.attack('?profile=1')
+
+        self.assertEqual(response.status_code, 200)
+        stages = response.data['profile']['stages']
+        for stage in ('resolve', 'roll', 'rules', 'persist', 'serialize'):
+            self.assertIn(f'attack.{stage}', stages)
+        self.assertGreater(stages['attack.persist']['queries'], 0)
+        self.assertIn('attack.persist', registry.snapshot()['CombatSessionViewSet.attack']['stages'])
+
+    def test_campaign_actions_are_profiled(self):
+        campaign = Campaign.objects.create(name='Gauntlet', owner=self.user, status='active', total_encounters=3)
+        CampaignEncounter.objects.create(
+            campaign=campaign, encounter=Encounter.objects.create(name='Ambush'), encounter_number=1, status='active'
+        )
+
+        response = self.client.post(f'/api/campaigns/{campaign.id}/complete_encounter/?profile=1', format='json')
+
+        self.assertEqual(response.status_code, 200)
+        stages = response.data['profile']['stages']
+        for stage in ('resolve', 'rules', 'serialize'):
+            self.assertIn(f'complete_encounter.{stage}', stages)
+
+    @override_settings(REQUEST_METRICS={'STAGE_SAMPLE_RATE': 1.0})
+    def test_sampled_requests_time_rendering(self):
+        self.attack()
+
+        stages = registry.snapshot()['CombatSessionViewSet.attack']['stages']
+        self.assertIn('attack.serialize', stages)
+        self.assertIn('attack.render', stages)
+
+    def test_profile_param_is_ignored_for_players(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.attack('?profile=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('profile', response.data)
+
+    @override_settings(REQUEST_METRICS={'STAGE_SAMPLE_RATE': 0})
+    def test_unsampled_requests_skip_stages(self):
+        self.attack()
+
+        self.assertEqual(registry.snapshot()['CombatSessionViewSet.attack']['stages'], {})
+
+    @override_settings(REQUEST_METRICS={
+        'PROFILER': 'cprofile', 'PROFILER_SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 0, 'SLOW_SAMPLE_RATE': 0,
+    })
+    def test_slow_sampled_requests_are_profiled(self):
+        with self.assertLogs('combat', level='WARNING') as logs:
+            self.attack()
+
+        self.assertIn('Profile of slow request', logs.output[0])
+        self.assertIn('cumulative', logs.output[0])
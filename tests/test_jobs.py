@@ -0,0 +1,106 @@
+"""
+Tests for the background job runner (jobs.runner, run_jobs)
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from campaigns.models import Campaign
+from jobs.models import Job
+from jobs.runner import JOB_HANDLERS, claim, claim_next, enqueue, job, requeue_stale
+
+
+@job('tests.echo')
+def echo(current):
+    if current.payload.get('fail'):
+        Campaign.objects.create(owner=current.owner, name='Half-written')
+        raise RuntimeError('boom')
+    return {'echo': current.payload['value']}
+
+
+class JobRunnerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def test_handlers_are_autodiscovered(self):
+        self.assertIn('campaigns.generate_gauntlet', JOB_HANDLERS)
+        self.assertIn('campaigns.populate', JOB_HANDLERS)
+
+    def test_jobs_are_claimed_once_in_order(self):
+        first = enqueue('tests.echo', {'value': 1})
+        second = enqueue('tests.echo', {'value': 2})
+
+        self.assertEqual(claim_next('worker-a'), first.pk)
+        self.assertFalse(claim(first.pk, 'worker-b'))
+        self.assertEqual(claim_next('worker-b'), second.pk)
+        self.assertIsNone(claim_next('worker-a'))
+
+    def test_worker_runs_queued_jobs(self):
+        ok = enqueue('tests.echo', {'value': 'hi'}, owner=self.user)
+        broken = enqueue('tests.echo', {'fail': True}, owner=self.user)
+
+        with self.assertLogs('api', level='ERROR'):
+            call_command('run_jobs', '--workers', '0', '--once', stdout=StringIO())
+
+        ok.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((ok.status, ok.result, ok.attempts), ('succeeded', {'echo': 'hi'}, 1))
+        self.assertEqual((broken.status, broken.error), ('failed', 'boom'))
+        # The failed handler's writes were rolled back
+        self.assertFalse(Campaign.objects.filter(name='Half-written').exists())
+
+    def test_stale_running_jobs_are_recovered(self):
+        stale = enqueue('tests.echo', {'value': 1})
+        claim(stale.pk, 'dead-worker')
+        Job.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(max_attempts=2), (1, 0))
+        claim(stale.pk, 'dead-worker')
+        Job.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(max_attempts=2), (0, 1))
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+
+class JobEndpointTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.campaign = Campaign.objects.create(owner=self.user, name='Gauntlet', status='preparing')
+
+    def test_populate_returns_accepted_job(self):
+        response = self.client.post(f'/api/campaigns/{self.campaign.id}/populate/', {'num_encounters': 2})
+
+        self.assertEqual(response.status_code, 202)
+        job_url = response['Location']
+        self.assertEqual(self.client.get(job_url).data['status'], 'queued')
+        self.assertEqual(self.client.get(f'{job_url}result/').status_code, 202)
+
+        call_command('run_jobs', '--workers', '0', '--once', stdout=StringIO())
+
+        result = self.client.get(f'{job_url}result/')
+        self.assertEqual(result.status_code, 200)
+        self.assertIn('summary', result.data)
+
+    def test_jobs_are_private_to_their_owner(self):
+        queued = enqueue('tests.echo', {'value': 1}, owner=self.user)
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='other', password='testpass'))
+
+        self.assertEqual(other.get(f'/api/jobs/{queued.pk}/').status_code, 404)
+
+    @override_settings(JOBS={'EAGER': True})
+    def test_eager_mode_runs_inline(self):
+        response = self.client.post(f'/api/campaigns/{self.campaign.id}/populate/', {'num_encounters': 1})
+
+        self.assertEqual(response.data['job']['status'], 'succeeded')
@@ -0,0 +1,165 @@
+"""
+Tests for the loot-table engine (core.loot) and the tables built on it
+"""
+import random
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from campaigns.loot_tables import boss_table
+from campaigns.models import Campaign, CampaignEncounter
+from campaigns.utils import TreasureGenerator
+from core.loot import LOOT_TABLES, get_table, register_table, roll, roll_many
+from encounters.models import Encounter
+from items.models import Item, ItemCategory
+from merchants.models import MerchantEncounter
+
+
+class LootTableTests(TestCase):
+
+    def setUp(self):
+        weapon = ItemCategory.objects.create(name='Weapon')
+        consumable = ItemCategory.objects.create(name='Consumable')
+        self.weapons = [
+            Item.objects.create(name=f'Sword {index}', category=weapon, rarity='common', value=100)
+            for index in range(4)
+        ]
+        self.potion = Item.objects.create(name='Potion of Healing', category=consumable, rarity='rare', value=50)
+
+    def test_rolls_draw_from_pools_with_gold(self):
+        register_table('test:weapons', {'rolls': 3, 'entries': [{'pool': 'category:Weapon'}], 'gold': (5, 10)})
+
+        loot = roll('test:weapons', rng=random.Random(3))
+
+        ids = [drop['item_id'] for drop in loot['items']]
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertTrue(set(ids) <= {item.id for item in self.weapons})
+        self.assertTrue(5 <= loot['gold'] <= 10)
+
+    def test_weights_and_zero_weight_entries(self):
+        register_table('test:weighted', {
+            'unique': False,
+            'entries': [
+                {'pool': 'category:Weapon', 'weight': 0},
+                {'pool': 'category:Consumable', 'weight': 3},
+                {'nothing': True, 'weight': 1},
+            ],
+        })
+
+        drops = [drop['item_id'] for loot in roll_many('test:weighted', 4000, rng=random.Random(5)) for drop in loot['items']]
+
+        self.assertEqual(set(drops), {self.potion.id})
+        self.assertAlmostEqual(len(drops) / 4000, 0.75, delta=0.03)
+
+    def test_nested_tables_guaranteed_items_and_fallbacks(self):
+        register_table('test:inner', {'rolls': 0, 'xp_bonus': 40})
+        register_table('test:outer', {
+            'entries': [{'pool': 'category:Magic Item', 'fallback': ['category:Armor', 'category:Weapon']}],
+            'guaranteed': [{'item': 'Potion of Healing', 'quantity': 2}, {'table': 'test:inner'}],
+        })
+
+        loot = roll('test:outer')
+
+        self.assertEqual(loot['items'][0], {'item_id': self.potion.id, 'quantity': 2})
+        self.assertIn(loot['items'][1]['item_id'], {item.id for item in self.weapons})
+        self.assertEqual(loot['xp_bonus'], 40)
+
+    def test_table_cycles_are_rejected(self):
+        register_table('test:a', {'entries': [{'table': 'test:b'}]})
+        register_table('test:b', {'entries': [{'table': 'test:a'}]})
+
+        with self.assertRaises(ValueError):
+            get_table('test:a')
+
+    def test_compiles_once_and_logs_missing_items_once(self):
+        register_table('test:named', {'guaranteed': [{'item': 'Potion of Healing'}, {'item': 'Vorpal Sword'}]})
+
+        with self.assertLogs('campaign', level='WARNING') as logs:
+            get_table('test:named')
+        with self.assertNumQueries(0):
+            loot = roll_many('test:named', 3)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Vorpal Sword', logs.output[0])
+        self.assertEqual([[drop['item_id'] for drop in result['items']] for result in loot], [[self.potion.id]] * 3)
+
+    def test_item_changes_recompile_tables(self):
+        register_table('test:consumables', {'entries': [{'pool': 'category:Consumable'}]})
+        get_table('test:consumables')
+
+        self.potion.category = None
+        self.potion.save()
+
+        self.assertEqual(roll('test:consumables')['items'], [])
+
+
+class LootConsumerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.campaign = Campaign.objects.create(name='Gauntlet', owner=self.user, status='active', total_encounters=5)
+        armor = ItemCategory.objects.create(name='Armor')
+        self.shield = Item.objects.create(name='Dragon Scale Shield', category=armor, rarity='rare', value=500)
+        self.commons = [Item.objects.create(name=f'Torch {index}', value=1) for index in range(3)]
+
+    def test_boss_completion_drops_boss_loot(self):
+        from campaigns.services.encounter_completion import EncounterCompletion
+
+        encounter = Encounter.objects.create(name='The Green Dragon', biome='forest')
+        campaign_encounter = CampaignEncounter.objects.create(
+            campaign=self.campaign, encounter=encounter, encounter_number=5, status='active', is_boss=True,
+            boss_loot_table={'guaranteed_items': ['Dragon Scale Shield'], 'gold': 900, 'xp_multiplier': 2.5},
+        )
+
+        outcome = EncounterCompletion(
+            self.campaign, campaign_encounter, rng=mock.Mock(**{'random.return_value': 0.99})
+        ).run()
+
+        room = outcome['treasure_room']
+        self.assertEqual(room.encounter_number, 5)
+        self.assertEqual(room.rewards['items'][0]['name'], 'Dragon Scale Shield')
+        self.assertEqual(sum(reward.gold_amount for reward in room.reward_items.all()), 900)
+
+    def test_stored_boss_loot_overrides_template(self):
+        encounter = Encounter.objects.create(name='The Green Dragon', biome='forest')
+        campaign_encounter = CampaignEncounter(
+            campaign=self.campaign, encounter=encounter, encounter_number=5, boss_loot_table={'gold': 5}
+        )
+
+        self.assertEqual(boss_table(campaign_encounter).roll(), {'items': [], 'gold': 5, 'xp_bonus': 0})
+        self.assertNotEqual(LOOT_TABLES['boss:The Green Dragon']['gold'], 5)
+
+    def test_boss_tables_are_shared_by_equal_loot(self):
+        encounter = Encounter.objects.create(name='The Green Dragon', biome='forest')
+        loot = {'guaranteed_items': ['Dragon Scale Shield'], 'gold': 900}
+        first, second = (
+            CampaignEncounter(campaign=self.campaign, encounter=encounter, encounter_number=5, boss_loot_table=dict(loot))
+            for _ in range(2)
+        )
+
+        table = boss_table(first)
+        with self.assertNumQueries(0):
+            self.assertIs(boss_table(second), table)
+        self.assertEqual(table.roll()['items'], [{'item_id': self.shield.id, 'quantity': 1}])
+
+    def test_treasure_room_rewards_are_written_in_bulk(self):
+        with mock.patch.object(TreasureGenerator, '_select_room_type', return_value='gold'):
+            room = TreasureGenerator.generate_treasure_room(self.campaign, 2)
+
+        # Treasure value 2 * 50 + 1 * 25 -> 1000-1500 gold, split in three
+        gold = [reward.gold_amount for reward in room.reward_items.all() if reward.gold_amount]
+        self.assertEqual(len(gold), 3)
+        self.assertTrue(1000 <= sum(gold) <= 1500)
+        self.assertEqual(sum(gold), room.rewards['gold'])
+
+    def test_merchant_inventory_is_created_in_one_insert(self):
+        merchant = MerchantEncounter.objects.create(
+            campaign=self.campaign, encounter_number=1, merchant_name='Griswald the Trader'
+        )
+
+        with self.assertNumQueries(3):
+            merchant.generate_inventory(count=6)
+
+        self.assertEqual(merchant.inventory.count(), 6)
@@ -0,0 +1,52 @@
+"""
+Tests for batched merchant stocking (MerchantEncounter.stock_campaign)
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from campaigns.models import Campaign
+from items.models import Item
+from merchants.models import MerchantEncounter, MerchantInventoryItem, price_vector
+
+
+class MerchantStockingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.campaign = Campaign.objects.create(name='Gauntlet', owner=self.user, status='active', total_encounters=6)
+        self.items = [Item.objects.create(name=f'Torch {index}', value=100) for index in range(4)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_price_vector(self):
+        rng = mock.Mock(**{'uniform.side_effect': [0.8, 1.0, 1.2]})
+
+        self.assertEqual(price_vector([100, 55, 10], rng), [80, 55, 12])
+
+    def test_stock_campaign_writes_in_bulk(self):
+        # Index build, merchant insert, base values, inventory insert
+        with self.assertNumQueries(4):
+            merchants = MerchantEncounter.stock_campaign(self.campaign, range(1, 6), count=3)
+
+        self.assertEqual(len(merchants), 5)
+        self.assertFalse(any(merchant.discovered for merchant in merchants))
+        self.assertEqual(MerchantInventoryItem.objects.filter(merchant__campaign=self.campaign).count(), 15)
+        prices = MerchantInventoryItem.objects.values_list('price', flat=True)
+        self.assertTrue(all(80 <= price <= 120 for price in prices))
+
+    def test_stocked_merchants_are_hidden_until_discovered(self):
+        MerchantEncounter.stock_campaign(self.campaign, [1, 2], count=3)
+
+        self.assertEqual(self.client.get('/api/merchants/', {'campaign': self.campaign.id}).data['count'], 0)
+
+        response = self.client.post(f'/api/campaigns/{self.campaign.id}/discover_merchant/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['merchant']['discovered'])
+        self.assertEqual(len(response.data['merchant']['inventory']), 3)
+
+        again = self.client.post(f'/api/campaigns/{self.campaign.id}/discover_merchant/')
+        self.assertEqual(again.status_code, 400)
+        self.assertEqual(self.client.get('/api/merchants/', {'campaign': self.campaign.id}).data['count'], 1)
@@ -0,0 +1,161 @@
+"""
+Tests for the bulk monster import engine (bestiary.bulk_import)
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from bestiary.bulk_import import MonsterBulkImporter, parse_monster
+from bestiary.models import (
+    Enemy, EnemyAttack, EnemyAbility, EnemyResistance, EnemyLanguage, EnemySpell,
+    EnemySpellSlot, EnemyConditionImmunity, DamageType, Language, Condition
+)
+
+
+def make_monster(name, **overrides):
+    """Build an Open5e-format monster dict"""
+    data = {
+        'name': name,
+        'hit_points': 22,
+        'armor_class': 13,
+        'challenge_rating': '1',
+        'strength': 14,
+        'dexterity': 12,
+        'speed': {'walk': '30 ft.'},
+        'senses': {'darkvision': '60 ft.', 'passive_perception': 12},
+        'actions': [
+            {'name': 'Bite', 'desc': 'Melee Weapon Attack: +4 to hit. Hit: 1d8+2 piercing damage.'},
+        ],
+        'special_abilities': [
+            {'name': 'Keen Smell', 'desc': 'Advantage on smell-based Perception checks.'},
+            {
+                'name': 'Innate Spellcasting',
+                'desc': 'spell save DC 13\nAt will: mage hand, light\n1/day each: sleep',
+            },
+        ],
+        'legendary_actions': [{'name': 'Tail', 'desc': 'Tail attack.'}],
+        'damage_resistances': 'cold; fire',
+        'damage_immunities': 'poison',
+        'condition_immunities': 'poisoned, charmed',
+        'languages': 'Common, Draconic (understands but can\'t speak)',
+    }
+    data.update(overrides)
+    return data
+
+
+class ParseMonsterTests(TestCase):
+    """Parsing happens without database access"""
+
+    def test_parse_monster(self):
+        with self.assertNumQueries(0):
+            parsed = parse_monster(make_monster('Wolf'))
+
+        self.assertEqual(parsed['enemy']['challenge_rating'], '1')
+        self.assertEqual(parsed['attacks'], [{'name': 'Bite', 'bonus': 4, 'damage': '1d8+2 piercing'}])
+        self.assertIn('[Legendary] Tail', [ability['name'] for ability in parsed['abilities']])
+        self.assertEqual(
+            parsed['resistances'],
+            [('Cold', 'resistance'), ('Fire', 'resistance'), ('Poison', 'immunity')]
+        )
+        self.assertEqual(parsed['languages'], ['Common', 'Draconic'])
+        self.assertEqual(parsed['condition_immunities'], ['poisoned', 'charmed'])
+        self.assertEqual(
+            parsed['spells'],
+            [('Mage Hand', 13, None, None), ('Light', 13, None, None), ('Sleep', 13, 0, 1)]
+        )
+
+
+class MonsterBulkImporterTests(TestCase):
+    """Staged bulk import into the bestiary tables"""
+
+    def setUp(self):
+        DamageType.objects.create(name='Fire')
+        Language.objects.create(name='Common')
+        Condition.objects.create(name='poisoned')
+
+    def test_imports_full_graph(self):
+        """Every related row is created and lookups are reused"""
+        result = MonsterBulkImporter().run([make_monster('Wolf'), make_monster('Ogre')])
+
+        self.assertEqual(result['imported'], 2)
+        wolf = Enemy.objects.get(name='Wolf')
+        self.assertEqual(wolf.stats.darkvision, '60 ft.')
+        self.assertEqual(wolf.stats.passive_perception, 12)
+        self.assertEqual(EnemyAttack.objects.filter(enemy=wolf).count(), 1)
+        self.assertEqual(EnemyAbility.objects.filter(enemy=wolf).count(), 3)
+        self.assertEqual(EnemyResistance.objects.filter(enemy=wolf).count(), 3)
+        self.assertEqual(EnemyLanguage.objects.filter(enemy=wolf).count(), 2)
+        self.assertEqual(EnemySpell.objects.filter(enemy=wolf).count(), 3)
+        self.assertEqual(EnemySpellSlot.objects.filter(spell__enemy=wolf).count(), 1)
+        # Only conditions that exist are linked; they are never created
+        self.assertEqual(EnemyConditionImmunity.objects.filter(enemy=wolf).count(), 1)
+        self.assertEqual(Condition.objects.count(), 1)
+        # Missing lookup rows are created once, not per monster
+        self.assertEqual(DamageType.objects.filter(name='Cold').count(), 1)
+        self.assertEqual(Language.objects.filter(name='Draconic').count(), 1)
+
+    def test_query_count_is_flat_in_payload_size(self):
+        """Importing 40 monsters costs no more queries than importing 4"""
+        with CaptureQueriesContext(connection) as small:
+            MonsterBulkImporter().run([make_monster(f'Small {i}') for i in range(4)])
+        with CaptureQueriesContext(connection) as large:
+            MonsterBulkImporter().run([make_monster(f'Large {i}') for i in range(40)])
+
+        self.assertEqual(Enemy.objects.count(), 44)
+        self.assertLessEqual(len(large), len(small))
+
+    def test_existing_monsters_are_skipped(self):
+        """Without update mode, existing monsters are left untouched"""
+        MonsterBulkImporter().run([make_monster('Wolf')])
+        result = MonsterBulkImporter().run([make_monster('Wolf', hit_points=99)])
+
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual(Enemy.objects.get(name='Wolf').hp, 22)
+
+    def test_upsert_by_name(self):
+        """Update mode rewrites the enemy in place and rebuilds its children"""
+        MonsterBulkImporter().run([make_monster('Wolf')])
+        wolf_id = Enemy.objects.get(name='Wolf').id
+
+        result = MonsterBulkImporter(update_existing=True).run([
+            make_monster('Wolf', hit_points=30, actions=[], languages='—', strength=18)
+        ])
+
+        self.assertEqual(result['updated'], 1)
+        wolf = Enemy.objects.get(name='Wolf')
+        self.assertEqual(wolf.id, wolf_id)
+        self.assertEqual(wolf.hp, 30)
+        self.assertEqual(wolf.stats.strength, 18)
+        self.assertEqual(wolf.stats.darkvision, '60 ft.')
+        self.assertFalse(EnemyAttack.objects.filter(enemy=wolf).exists())
+        self.assertFalse(EnemyLanguage.objects.filter(enemy=wolf).exists())
+        self.assertEqual(EnemySpell.objects.filter(enemy=wolf).count(), 3)
+
+    def test_duplicate_names_in_payload(self):
+        """A payload listing the same monster twice imports it once"""
+        result = MonsterBulkImporter().run([make_monster('Wolf'), make_monster('Wolf')])
+
+        self.assertEqual(result['imported'], 1)
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual(Enemy.objects.filter(name='Wolf').count(), 1)
+
+
+class ImportMonstersCommandTests(TestCase):
+    """import_monsters_from_api --source json runs through the bulk engine"""
+
+    def test_json_import(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'monsters': [make_monster('Wolf'), make_monster('Ogre')]}, f)
+        self.addCleanup(os.unlink, f.name)
+
+        out = StringIO()
+        call_command('import_monsters_from_api', source='json', file=f.name, stdout=out)
+
+        self.assertIn('Imported: 2', out.getvalue())
+        self.assertEqual(Enemy.objects.count(), 2)
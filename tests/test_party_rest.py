@@ -0,0 +1,122 @@
+"""
+Tests for the party rest engine (campaigns.services.party_rest)
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from campaigns.models import Campaign, CampaignCharacter
+from campaigns.services.party_rest import PartyRest
+from characters.models import Character, CharacterClass, CharacterRace, CharacterStats
+
+
+class PartyRestTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.fighter = CharacterClass.objects.create(
+            name='fighter', hit_dice='d10', primary_ability='STR', saving_throw_proficiencies='STR,CON'
+        )
+        self.warlock = CharacterClass.objects.create(
+            name='warlock', hit_dice='d8', primary_ability='CHA', saving_throw_proficiencies='WIS,CHA'
+        )
+        self.human = CharacterRace.objects.create(name='human', size='M', speed=30)
+        self.campaign = Campaign.objects.create(name='Gauntlet', owner=self.user, status='active')
+
+    def add_member(self, name, character_class=None, level=3, current_hp=5, hit_dice=None, campaign=None):
+        character_class = character_class or self.fighter
+        character = Character.objects.create(
+            user=self.user, name=name, level=level, character_class=character_class, race=self.human, alignment='NG'
+        )
+        CharacterStats.objects.create(
+            character=character, constitution=14, hit_points=30, max_hit_points=30, armor_class=12
+        )
+        return CampaignCharacter.objects.create(
+            campaign=campaign or self.campaign, character=character, current_hp=current_hp, max_hp=30,
+            hit_dice_remaining=hit_dice if hit_dice is not None else {character_class.hit_dice: level},
+        )
+
+    def test_short_rest_spends_requested_dice(self):
+        first = self.add_member('A')
+        second = self.add_member('B')
+        rng = mock.Mock(**{'randint.return_value': 6})
+
+        results = PartyRest(self.campaign, rng=rng).short_rest(hit_dice_to_spend={str(first.id): 2})
+
+        # d10 rolls of 6 with +2 CON heal 8 each
+        by_id = {result['character_id']: result for result in results}
+        self.assertEqual((by_id[first.id]['hit_dice_spent'], by_id[first.id]['healing']), (2, 16))
+        self.assertEqual((by_id[second.id]['hit_dice_spent'], by_id[second.id]['healing']), (1, 8))
+        first.refresh_from_db()
+        self.assertEqual((first.current_hp, first.hit_dice_remaining), (21, {'d10': 1}))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.short_rests_used, 1)
+
+    def test_short_rest_healing_is_capped_and_spent_dice_are_removed(self):
+        member = self.add_member('A', current_hp=28, hit_dice={'d10': 1})
+        rng = mock.Mock(**{'randint.return_value': 10})
+
+        results = PartyRest(self.campaign, rng=rng).short_rest()
+
+        self.assertEqual(results[0]['healing'], 2)
+        member.refresh_from_db()
+        self.assertEqual((member.current_hp, member.hit_dice_remaining), (30, {}))
+
+    def test_short_rest_restores_pact_slots_only(self):
+        warlock = self.add_member('Hexer', character_class=self.warlock)
+        fighter = self.add_member('Knight')
+        CampaignCharacter.objects.filter(pk=warlock.pk).update(spell_slots={'2': 0})
+
+        PartyRest(self.campaign).short_rest()
+
+        warlock.refresh_from_db()
+        fighter.refresh_from_db()
+        self.assertEqual(warlock.spell_slots, {'2': 2})
+        self.assertEqual(fighter.spell_slots, {})
+
+    def test_long_rest_restores_everything(self):
+        member = self.add_member('Hexer', character_class=self.warlock, hit_dice={})
+
+        results = PartyRest(self.campaign).long_rest()
+
+        self.assertEqual(results[0]['hp_restored'], 25)
+        member.refresh_from_db()
+        self.assertEqual(
+            (member.current_hp, member.hit_dice_remaining, member.spell_slots), (30, {'d8': 3}, {'2': 2})
+        )
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.long_rests_used, 1)
+
+    def test_rest_without_alive_members_is_rejected(self):
+        with self.assertRaises(ValueError):
+            PartyRest(self.campaign).long_rest()
+
+    def test_query_count_is_flat_in_party_size(self):
+        def rest_queries(party_size):
+            campaign = Campaign.objects.create(name=f'Party of {party_size}', owner=self.user, status='active')
+            for i in range(party_size):
+                self.add_member(f'{party_size}-{i}', campaign=campaign)
+            with CaptureQueriesContext(connection) as queries:
+                PartyRest(campaign).short_rest(hit_dice_to_spend={})
+            return len(queries)
+
+        self.assertEqual(rest_queries(1), rest_queries(4))
+
+    def test_short_rest_endpoint(self):
+        member = self.add_member('A')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(
+            f'/api/campaigns/{self.campaign.id}/short_rest/',
+            {'hit_dice_to_spend': {str(member.id): 3}}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['characters'][0]['hit_dice_spent'], 3)
+        self.assertEqual(response.data['characters'][0]['remaining_hit_dice'], 0)
+        self.assertEqual(response.data['total_healing'], response.data['characters'][0]['healing'])
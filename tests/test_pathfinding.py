@@ -0,0 +1,174 @@
+"""
+Tests for the grid movement planner (combat.pathfinding)
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from combat.environment_map import EnvironmentMap
+from combat.models import CombatSession, CombatParticipant, EnvironmentalEffect, ParticipantPosition
+from combat.pathfinding import MovementPlanner
+from encounters.models import Encounter
+
+
+class PathfindingTestBase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.session = CombatSession.objects.create(
+            encounter=Encounter.objects.create(name="Test Combat"), status='active'
+        )
+        self.hero = self.add_participant('Hero', 'character', 0, 0)
+
+    def add_participant(self, name, participant_type, x, y):
+        participant = CombatParticipant.objects.create(
+            combat_session=self.session, participant_type=participant_type, name=name,
+            current_hp=10, max_hp=10, armor_class=12
+        )
+        ParticipantPosition.objects.create(participant=participant, x=x, y=y)
+        return participant
+
+    def planner(self, budget=30):
+        return MovementPlanner.for_participant(self.hero, budget)
+
+
+class MovementPlannerTests(PathfindingTestBase):
+
+    def test_straight_path(self):
+        plan = self.planner().plan(20, 0)
+
+        self.assertTrue(plan['reachable'])
+        self.assertEqual(plan['cost'], 20)
+        self.assertEqual(plan['path'], [{'x': 5, 'y': 0}, {'x': 10, 'y': 0}, {'x': 15, 'y': 0}, {'x': 20, 'y': 0}])
+
+    def test_diagonals_cost_one_step(self):
+        self.assertEqual(self.planner().plan(15, 15)['cost'], 15)
+
+    def test_difficult_terrain_doubles_cost(self):
+        EnvironmentalEffect.objects.create(combat_session=self.session, effect_type='terrain', terrain_type='rubble')
+
+        self.assertEqual(self.planner().plan(15, 0)['cost'], 30)
+        plan = self.planner().plan(20, 0)
+        self.assertFalse(plan['reachable'])
+        self.assertEqual(plan['reason'], 'Destination is out of reach')
+
+    def test_routes_around_hostiles_and_reports_opportunity_attacks(self):
+        goblin = self.add_participant('Goblin', 'enemy', 5, 0)
+
+        staying_in_reach = self.planner().plan(10, 0)
+        plan = self.planner().plan(15, 0)
+
+        self.assertEqual(staying_in_reach['opportunity_attacks'], [])
+        self.assertTrue(plan['reachable'])
+        self.assertNotIn({'x': 5, 'y': 0}, plan['path'])
+        self.assertEqual([attack['attacker_id'] for attack in plan['opportunity_attacks']], [goblin.id])
+
+    def test_reaction_used_means_no_opportunity_attack(self):
+        goblin = self.add_participant('Goblin', 'enemy', 5, 0)
+        goblin.reaction_used = True
+        goblin.save()
+
+        plan = self.planner().plan(25, 0)
+
+        self.assertEqual(plan['opportunity_attacks'], [])
+
+    def test_allies_can_be_crossed_but_not_ended_on(self):
+        self.add_participant('Cleric', 'character', 5, 0)
+
+        self.assertEqual(self.planner().plan(10, 0)['cost'], 10)
+        self.assertEqual(self.planner().plan(5, 0)['reason'], 'Destination is occupied')
+
+    def test_prefers_equal_length_path_without_hazards(self):
+        EnvironmentalEffect.objects.create(
+            combat_session=self.session, effect_type='hazard', hazard_type='lava',
+            hazard_area_x=10, hazard_area_y=0, hazard_area_radius=1
+        )
+
+        avoided = self.planner().plan(20, 0)
+        forced = self.planner().plan(10, 0)
+
+        self.assertEqual(avoided['cost'], 20)
+        self.assertEqual(avoided['hazards'], [])
+        self.assertEqual(forced['hazards'], [{'x': 10, 'y': 0, 'hazards': ['lava']}])
+
+    def test_reachable_flood_fill(self):
+        self.add_participant('Goblin', 'enemy', 10, 0)
+
+        cells = self.planner(budget=10).reachable()
+
+        # A 5x5 block around the start, minus the goblin's cell
+        self.assertEqual(len(cells), 24)
+        self.assertNotIn((10, 0), [(cell['x'], cell['y']) for cell in cells])
+        self.assertTrue(all(cell['cost'] <= 10 for cell in cells))
+
+    def test_planning_runs_no_queries(self):
+        planner = self.planner()
+
+        with CaptureQueriesContext(connection) as queries:
+            planner.plan(25, 25)
+            planner.reachable()
+
+        self.assertEqual(len(queries), 0)
+
+    def test_fast_on_large_maps(self):
+        """A full flood fill of a 100x100 map stays interactive"""
+        environment = EnvironmentMap(areas=[('hazard', 'acid', 250, 250, 40)])
+        self.hero.position.x = self.hero.position.y = 250
+        planner = MovementPlanner(environment, self.hero, [self.hero], budget=250)
+
+        start = time.perf_counter()
+        cells = planner.reachable()
+        planner.plan(0, 0)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(cells), 101 * 101)
+        self.assertLess(elapsed, 2.0)
+
+
+class MovementEndpointTests(PathfindingTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='testuser', password='testpass'))
+
+    def test_plan_move_endpoint(self):
+        response = self.client.get(f'/api/combat/participants/{self.hero.id}/plan_move/', {'x': 10, 'y': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cost'], 10)
+
+    def test_reachable_endpoint(self):
+        response = self.client.get(f'/api/combat/participants/{self.hero.id}/reachable/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['budget'], 30)
+        self.assertEqual(len(response.data['cells']), 13 * 13)
+
+    def test_move_along_planned_path(self):
+        goblin = self.add_participant('Goblin', 'enemy', 5, 0)
+
+        response = self.client.post(
+            f'/api/combat/participants/{self.hero.id}/move/', {'x': 15, 'y': 0}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['movement_used'], 15)
+        self.assertEqual(response.data['movement_remaining'], 15)
+        self.assertEqual(response.data['opportunity_attacks'][0]['attacker_id'], goblin.id)
+        self.hero.position.refresh_from_db()
+        self.assertEqual((self.hero.position.x, self.hero.position.y), (15, 0))
+
+    def test_move_out_of_reach_is_rejected(self):
+        response = self.client.post(
+            f'/api/combat/participants/{self.hero.id}/move/', {'x': 100, 'y': 0}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('plan', response.data)
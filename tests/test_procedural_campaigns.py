@@ -0,0 +1,137 @@
+"""
+Tests for seed-addressable procedural campaigns (campaigns.services.procedural)
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from bestiary.models import Enemy, EnemyStats
+from campaigns.models import CampaignCharacter, RecruitableCharacter
+from campaigns.services.campaign_generator import CampaignGenerator
+from campaigns.services.encounter_completion import EncounterCompletion
+from campaigns.services.procedural import ProceduralCampaign
+from characters.models import Character, CharacterClass, CharacterRace
+from encounters.models import EncounterTheme, EnemyThemeAssociation
+from items.models import Item, ItemCategory
+
+
+class ProceduralCampaignTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        theme = EncounterTheme.objects.create(name='Beasts', category='beast', min_cr=1, max_cr=10)
+        for name, cr in [('Wolf', '1/4'), ('Bear', '1'), ('Treant', '9')]:
+            enemy = Enemy.objects.create(name=name, creature_type='beast', challenge_rating=cr)
+            EnemyStats.objects.create(enemy=enemy, hit_points=20, armor_class=12)
+            EnemyThemeAssociation.objects.create(theme=theme, enemy=enemy, role='support')
+        consumable = ItemCategory.objects.create(name='Consumable')
+        for index in range(6):
+            Item.objects.create(name=f'Potion {index}', category=consumable, value=50 + index)
+
+    def generate(self, seed=42, encounter_count=2):
+        return CampaignGenerator().generate_gauntlet(
+            biome='forest', party_level=3, party_size=2, encounter_count=encounter_count, owner=self.user, seed=seed
+        )
+
+    def replay(self, campaign):
+        """Materialize the whole run and describe it"""
+        procedural = ProceduralCampaign(campaign)
+        run = []
+        for number in range(1, campaign.total_encounters + 1):
+            campaign_encounter = procedural.materialize_encounter(number)
+            run.append((
+                campaign_encounter.is_boss,
+                campaign_encounter.encounter.name,
+                sorted(campaign_encounter.encounter.enemies.values_list('enemy__name', flat=True)),
+            ))
+        return run
+
+    def test_generation_writes_only_the_campaign(self):
+        campaign = CampaignGenerator().generate_gauntlet(
+            biome='forest', party_level=3, party_size=2, encounter_count=4, owner=self.user, procedural=True
+        )
+
+        self.assertIsNotNone(campaign.seed)
+        self.assertEqual(campaign.total_encounters, 5)
+        self.assertEqual(campaign.generation_spec['encounter_count'], 4)
+        self.assertFalse(campaign.campaign_encounters.exists())
+
+    def test_encounters_materialize_when_reached(self):
+        campaign = self.generate()
+        fighter = CharacterClass.objects.create(
+            name='fighter', hit_dice='d10', primary_ability='STR', saving_throw_proficiencies='STR,CON'
+        )
+        character = Character.objects.create(
+            user=self.user, name='Solo', level=3, character_class=fighter,
+            race=CharacterRace.objects.create(name='human', size='M', speed=30), alignment='NG'
+        )
+        CampaignCharacter.objects.create(campaign=campaign, character=character, current_hp=20, max_hp=20)
+
+        self.assertIsNone(campaign.get_current_encounter())
+        campaign.start()
+        first = campaign.get_current_encounter()
+
+        self.assertEqual(first.encounter_number, 1)
+        self.assertEqual(campaign.get_current_encounter(), first)
+        self.assertEqual(list(campaign.campaign_encounters.values_list('encounter_number', flat=True)), [1])
+
+    def test_same_seed_replays_the_same_run(self):
+        run = self.replay(self.generate())
+
+        self.assertEqual(run, self.replay(self.generate()))
+        self.assertEqual([is_boss for is_boss, _, _ in run], [False, False, True])
+
+    def test_rooms_and_merchants_follow_the_seed(self):
+        def rooms_and_merchant(campaign):
+            campaign.status = 'active'
+            campaign.save()
+            campaign_encounter = ProceduralCampaign(campaign).materialize_encounter(3)
+            campaign_encounter.status = 'active'
+            campaign_encounter.save()
+            room = EncounterCompletion(campaign, campaign_encounter).run()['treasure_room']
+            merchant = ProceduralCampaign(campaign).materialize_merchant(4, count=4)
+            return (
+                room.room_type, room.rewards,
+                merchant.merchant_name, list(merchant.inventory.order_by('id').values_list('item_id', 'price')),
+            )
+
+        first = rooms_and_merchant(self.generate(seed=7, encounter_count=4))
+
+        self.assertEqual(first, rooms_and_merchant(self.generate(seed=7, encounter_count=4)))
+        self.assertEqual(len(first[3]), 4)
+
+    def test_recruitment_rooms_follow_the_seed(self):
+        fighter = CharacterClass.objects.create(
+            name='fighter', hit_dice='d10', primary_ability='STR', saving_throw_proficiencies='STR,CON'
+        )
+        human = CharacterRace.objects.create(name='human', size='M', speed=30)
+        for index, rarity in enumerate(['common'] * 4 + ['uncommon'] * 3 + ['rare'] * 2):
+            RecruitableCharacter.objects.create(
+                name=f'Recruit {index}', character_class=fighter, race=human, rarity=rarity,
+                recruitment_description='Looking for work'
+            )
+
+        def recruitment_room(campaign):
+            campaign.start_mode = 'solo'
+            campaign.status = 'active'
+            campaign.save()
+            campaign_encounter = ProceduralCampaign(campaign).materialize_encounter(4)
+            campaign_encounter.status = 'active'
+            campaign_encounter.save()
+            room = EncounterCompletion(campaign, campaign_encounter).run()['recruitment_room']
+            return sorted(room.available_recruits.values_list('name', flat=True))
+
+        first = recruitment_room(self.generate(seed=11, encounter_count=4))
+
+        self.assertEqual(first, recruitment_room(self.generate(seed=11, encounter_count=4)))
+        self.assertEqual(len(first), 3)
+
+    def test_out_of_range_seed_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post('/api/campaigns/generate-gauntlet/', {
+            'biome': 'forest', 'party_level': 3, 'party_size': 2, 'seed': 2 ** 63,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
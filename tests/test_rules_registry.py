@@ -0,0 +1,167 @@
+"""
+Tests for the frozen rules-data registry in core.rules_registry
+
+The registry must return exactly what the legacy helpers in the rules-data
+modules return, for every class, subclass, level and ruleset.
+"""
+
+from django.test import SimpleTestCase
+
+from campaigns import class_features_data as class_data
+from campaigns.racial_features_data import RACIAL_FEATURES, get_racial_features
+from campaigns.background_features_data import BACKGROUND_FEATURES, get_background_features
+from campaigns.feat_data import get_feat_config
+from characters.starting_spells import get_starting_spell_rules
+from core.rules_registry import RulesRegistry, freeze, get_rules_registry
+
+
+def frozen_levels(features_by_level):
+    """Freeze a legacy level -> features dict for comparison"""
+    return {level: freeze(features) for level, features in features_by_level.items()}
+
+
+class RulesRegistryParityTests(SimpleTestCase):
+    """Registry lookups match the legacy helpers"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.registry = RulesRegistry()
+
+    def test_class_features_match_legacy(self):
+        """Point lookups match get_class_features, including 2024 fallbacks"""
+        names = set(class_data.CLASS_FEATURES_2014) | set(class_data.CLASS_FEATURES_2024)
+        for name in names:
+            for spelling in (name, name.upper(), name.title()):
+                for ruleset in ('2014', '2024'):
+                    for level in range(0, 22):
+                        self.assertEqual(
+                            self.registry.class_features(spelling, level, ruleset),
+                            freeze(class_data.get_class_features(spelling, level, ruleset)),
+                            f"{spelling} L{level} ({ruleset})"
+                        )
+
+    def test_class_features_up_to_level_match_legacy(self):
+        """Cumulative lookups match get_all_features_up_to_level"""
+        names = set(class_data.CLASS_FEATURES_2014) | set(class_data.CLASS_FEATURES_2024)
+        for name in names:
+            for ruleset in ('2014', '2024'):
+                for level in range(0, 22):
+                    self.assertEqual(
+                        dict(self.registry.class_features_up_to_level(name, level, ruleset)),
+                        frozen_levels(class_data.get_all_features_up_to_level(name, level, ruleset)),
+                        f"{name} up to L{level} ({ruleset})"
+                    )
+
+    def test_subclass_features_match_legacy(self):
+        """Subclass lookups match the legacy helpers, including 2014 fallback"""
+        names = set(class_data.SUBCLASS_FEATURES_2014) | set(class_data.SUBCLASS_FEATURES_2024)
+        for name in names:
+            for ruleset in ('2014', '2024'):
+                for level in range(0, 22):
+                    self.assertEqual(
+                        self.registry.subclass_features(name, level, ruleset),
+                        freeze(class_data.get_subclass_features(name, level, ruleset))
+                    )
+                    self.assertEqual(
+                        dict(self.registry.subclass_features_up_to_level(name, level, ruleset)),
+                        frozen_levels(class_data.get_all_subclass_features_up_to_level(name, level, ruleset))
+                    )
+
+    def test_race_background_and_feat_lookups(self):
+        """Flat tables are case-insensitive and match the legacy helpers"""
+        for race in RACIAL_FEATURES:
+            self.assertEqual(self.registry.racial_features(race.title()), freeze(get_racial_features(race)))
+        for background in BACKGROUND_FEATURES:
+            self.assertEqual(
+                self.registry.background_features(background.upper()),
+                freeze(get_background_features(background))
+            )
+        self.assertEqual(self.registry.feat_config('skilled'), freeze(get_feat_config('Skilled')))
+        self.assertEqual(dict(self.registry.feat_config('Unknown Feat')), {})
+
+    def test_starting_spell_rules(self):
+        """Non-casters have no starting spell rules"""
+        self.assertIsNone(self.registry.starting_spell_rules('fighter'))
+        self.assertEqual(self.registry.starting_spell_rules('WIZARD'), freeze(get_starting_spell_rules('wizard')))
+
+
+class RulesRegistryBehaviourTests(SimpleTestCase):
+    """Registry structure and caching"""
+
+    def test_registry_is_built_once(self):
+        """get_rules_registry returns the shared instance"""
+        self.assertIs(get_rules_registry(), get_rules_registry())
+
+    def test_results_are_read_only(self):
+        """Lookups return frozen views that cannot corrupt the shared tables"""
+        registry = get_rules_registry()
+        features = registry.class_features('Fighter', 1)
+        self.assertIsInstance(features, tuple)
+        with self.assertRaises(TypeError):
+            features[0]['name'] = 'Changed'
+        with self.assertRaises(TypeError):
+            registry.class_features_up_to_level('Fighter', 5)[99] = ()
+
+    def test_unknown_names_return_empty(self):
+        """Unknown classes and subclasses return empty results"""
+        registry = get_rules_registry()
+        self.assertEqual(registry.class_features('Artificer', 1), ())
+        self.assertEqual(dict(registry.class_features_up_to_level('Artificer', 5)), {})
+        self.assertEqual(registry.subclass_features('Nonexistent', 3, '2024'), ())
+
+    def test_subclass_features_between(self):
+        """Range lookups exclude levels below the start level"""
+        registry = get_rules_registry()
+        features_by_level = registry.subclass_features_between('Champion', 7, 20)
+        self.assertTrue(features_by_level)
+        self.assertTrue(all(7 <= level <= 20 for level in features_by_level))
+
+
+class RulesRegistryCacheTests(SimpleTestCase):
+    """Serialized registry cache keyed by the data modules' source"""
+
+    def setUp(self):
+        import tempfile
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_cache_round_trip(self):
+        """A cached registry answers lookups like a freshly built one"""
+        from core.rules_registry import load_rules_registry, read_registry_cache
+
+        built = load_rules_registry(self.cache_dir)
+        cached = read_registry_cache(self.cache_dir)
+
+        self.assertIsNotNone(cached)
+        self.assertIsNot(cached, built)
+        self.assertEqual(cached.class_features('Fighter', 5, '2024'), built.class_features('Fighter', 5, '2024'))
+        self.assertEqual(
+            dict(cached.class_features_up_to_level('wizard', 20)),
+            dict(built.class_features_up_to_level('wizard', 20))
+        )
+        with self.assertRaises(TypeError):
+            cached.class_features_up_to_level('wizard', 20)[1] = ()
+
+    def test_source_change_misses_cache(self):
+        """A cache written for different source is never read"""
+        from core.rules_registry import read_registry_cache, write_registry_cache
+
+        write_registry_cache(RulesRegistry(), self.cache_dir, fingerprint='0' * 64)
+        self.assertIsNone(read_registry_cache(self.cache_dir))
+
+    def test_corrupt_cache_is_rebuilt(self):
+        """An unreadable cache file is ignored and replaced"""
+        from pathlib import Path
+        from core.rules_registry import load_rules_registry, read_registry_cache, source_fingerprint
+
+        path = Path(self.cache_dir) / f'rules-{source_fingerprint()[:20]}.pickle'
+        path.write_bytes(b'not a pickle')
+
+        with self.assertLogs('core.rules_registry', level='WARNING'):
+            registry = load_rules_registry(self.cache_dir)
+        self.assertEqual(registry.racial_features('Elf'), get_rules_registry().racial_features('elf'))
+        self.assertIsNotNone(read_registry_cache(self.cache_dir))
@@ -0,0 +1,91 @@
+"""
+Tests for the catalogue sampling index (core.sampling)
+"""
+import random
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from campaigns.models import Campaign
+from campaigns.utils import TreasureGenerator
+from core.sampling import AliasTable, get_index, sample_ids, sample_rows
+from items.models import Item, ItemCategory
+from merchants.rarity_weights import select_random_items
+
+
+class AliasTableTests(SimpleTestCase):
+
+    def test_draws_follow_weights(self):
+        table = AliasTable(['a', 'b', 'c', 'd'], [70, 25, 5, 0])
+        rng = random.Random(7)
+
+        counts = Counter(table.draw(rng) for _ in range(20000))
+
+        self.assertNotIn('d', counts)
+        self.assertAlmostEqual(counts['a'] / 20000, 0.70, delta=0.02)
+        self.assertAlmostEqual(counts['b'] / 20000, 0.25, delta=0.02)
+        self.assertAlmostEqual(counts['c'] / 20000, 0.05, delta=0.01)
+
+    def test_rejects_all_zero_weights(self):
+        with self.assertRaises(ValueError):
+            AliasTable(['a'], [0])
+
+
+class SamplingIndexTests(TestCase):
+
+    def setUp(self):
+        weapon = ItemCategory.objects.create(name='Weapon')
+        consumable = ItemCategory.objects.create(name='Consumable')
+        self.weapons = [
+            Item.objects.create(name=f'Sword {index}', category=weapon, rarity='common') for index in range(5)
+        ]
+        self.potions = [
+            Item.objects.create(name=f'Potion {index}', category=consumable, rarity='rare') for index in range(3)
+        ]
+
+    def test_buckets_by_category_and_rarity(self):
+        index = get_index('items')
+
+        self.assertEqual(sorted(index['category:Weapon']), sorted(item.id for item in self.weapons))
+        self.assertEqual(sorted(index['rarity:rare']), sorted(item.id for item in self.potions))
+
+    def test_unique_draws_respect_buckets_and_exclusions(self):
+        excluded = self.weapons[0].id
+
+        ids = sample_ids('items', ['category:Weapon', 'category:Consumable'], 7, exclude=[excluded])
+
+        self.assertEqual(len(set(ids)), 7)
+        self.assertNotIn(excluded, ids)
+        self.assertEqual(len(sample_ids('items', ['category:Weapon'], 10)), 5)
+        self.assertEqual(sample_ids('items', ['category:Armor'], 2), [])
+
+    def test_saving_an_item_retires_the_index(self):
+        get_index('items')
+
+        potion = Item.objects.create(name='Elixir', category=self.potions[0].category, rarity='rare')
+
+        self.assertIn(potion.id, get_index('items')['rarity:rare'])
+
+    def test_rows_deleted_behind_the_index_are_rebuilt(self):
+        get_index('items')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM items_item WHERE id = %s', [self.potions[0].id])
+
+        rows = sample_rows('items', ['category:Consumable'], 2)
+
+        self.assertEqual({item.id for item in rows}, {item.id for item in self.potions[1:]})
+
+    def test_generators_do_not_sort_by_random(self):
+        user = User.objects.create_user(username='testuser', password='testpass')
+        campaign = Campaign.objects.create(owner=user, name='Gauntlet', status='active', total_encounters=5)
+
+        with CaptureQueriesContext(connection) as queries:
+            for number in range(1, 6):
+                TreasureGenerator.generate_treasure_room(campaign, number)
+            items = select_random_items(encounter_depth=8, count=5)
+
+        self.assertEqual(len(items), 5)
+        self.assertFalse(any('RANDOM()' in query['sql'] for query in queries.captured_queries))
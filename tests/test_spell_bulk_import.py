@@ -0,0 +1,133 @@
+"""
+Tests for the bulk spell import engine (spells.bulk_import)
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from characters.models import CharacterClass
+from core.cache_utils import get_catalogue_version
+from spells.bulk_import import SpellBulkImporter, parse_spell
+from spells.models import Spell
+
+
+def make_spell(name, **overrides):
+    """Build an Open5e-format spell dict"""
+    data = {
+        'name': name,
+        'slug': name.lower().replace(' ', '-'),
+        'level': '3rd-level',
+        'school': 'Evocation',
+        'casting_time': '1 action',
+        'range': '150 feet',
+        'components': 'V, S, M',
+        'material': 'A tiny ball of bat guano and sulfur.',
+        'duration': 'Instantaneous',
+        'ritual': 'no',
+        'desc': 'A bright streak flashes.',
+        'higher_level': '',
+        'dnd_class': 'Sorcerer, Wizard',
+        'document__slug': 'wotc-srd',
+        'page': 'phb 241',
+    }
+    data.update(overrides)
+    return data
+
+
+class ParseSpellTests(TestCase):
+    """Parsing happens without database access"""
+
+    def test_parse_spell(self):
+        with self.assertNumQueries(0):
+            parsed = parse_spell(make_spell('Fireball', duration='Concentration, up to 1 minute'))
+
+        self.assertEqual(parsed['fields']['level'], 3)
+        self.assertEqual(parsed['fields']['school'], 'evocation')
+        self.assertTrue(parsed['fields']['concentration'])
+        self.assertEqual(parsed['classes'], ['sorcerer', 'wizard'])
+
+    def test_non_srd_and_nameless_spells_are_skipped(self):
+        self.assertIsNone(parse_spell(make_spell('Homebrew', document__slug='a5e')))
+        self.assertIsNone(parse_spell(make_spell('  ')))
+
+
+class SpellBulkImporterTests(TestCase):
+    """Staged bulk import into the spell tables"""
+
+    def setUp(self):
+        cache.clear()
+        self.wizard = CharacterClass.objects.create(name='wizard', hit_dice='d6', primary_ability='INT')
+        self.sorcerer = CharacterClass.objects.create(name='sorcerer', hit_dice='d6', primary_ability='CHA')
+
+    def test_imports_spells_and_class_links(self):
+        result = SpellBulkImporter().run([
+            make_spell('Fireball'),
+            make_spell('Shield', level='1st-level', school='Abjuration', dnd_class='Wizard'),
+            make_spell('Homebrew', document__slug='a5e'),
+        ])
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual(result['class_links'], 3)
+        fireball = Spell.objects.get(slug='fireball')
+        self.assertEqual(set(fireball.classes.all()), {self.wizard, self.sorcerer})
+        self.assertEqual(Spell.objects.get(name='Shield').school, 'abjuration')
+
+    def test_reimport_updates_by_slug(self):
+        SpellBulkImporter().run([make_spell('Fireball')])
+        result = SpellBulkImporter().run([make_spell('Fireball', range='300 feet', dnd_class='Wizard')])
+
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['updated'], 1)
+        fireball = Spell.objects.get(slug='fireball')
+        self.assertEqual(fireball.range, '300 feet')
+        # Links are additive, like classes.add()
+        self.assertEqual(fireball.classes.count(), 2)
+
+    def test_existing_name_with_other_slug_is_updated(self):
+        """Spells stored by name under a different slug are updated, not duplicated"""
+        Spell.objects.create(
+            name='Fireball', slug='fireball-phb', level=3, school='evocation',
+            casting_time='1 action', range='150 feet', components='V, S, M',
+            duration='Instantaneous', description='Old text'
+        )
+        result = SpellBulkImporter().run([make_spell('Fireball')])
+
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(Spell.objects.count(), 1)
+        self.assertEqual(Spell.objects.get(slug='fireball-phb').description, 'A bright streak flashes.')
+
+    def test_unknown_classes_are_reported(self):
+        importer = SpellBulkImporter()
+        importer.run([make_spell('Fireball', dnd_class='Wizard, Artificer')])
+
+        self.assertEqual(importer.unknown_classes, {'artificer'})
+
+    def test_query_count_does_not_grow_per_spell(self):
+        """Query count depends on batches, not on the number of spells"""
+        with CaptureQueriesContext(connection) as queries:
+            importer = SpellBulkImporter()
+            importer.run([make_spell(f'Spell {i}') for i in range(200)])
+
+        self.assertEqual(Spell.objects.count(), 200)
+        self.assertEqual(Spell.classes.through.objects.count(), 400)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(list(importer.timings), ['parse', 'resolve', 'write', 'link'])
+
+    def test_import_bumps_catalogue_version(self):
+        before = get_catalogue_version('spells')
+        result = SpellBulkImporter().run([make_spell('Fireball')])
+
+        self.assertEqual(result['catalogue_version'], before + 1)
+        self.assertEqual(get_catalogue_version('spells'), before + 1)
+
+    def test_cached_spell_endpoints_refresh_after_import(self):
+        """The cantrips endpoint is cached per catalogue version"""
+        self.client.get('/api/spells/cantrips/')
+        SpellBulkImporter().run([make_spell('Light', level='Cantrip')])
+
+        response = self.client.get('/api/spells/cantrips/')
+
+        names = [spell['name'] for spell in response.json()]
+        self.assertEqual(names, ['Light'])